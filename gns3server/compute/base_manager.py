@@ -40,6 +40,7 @@ from ..utils.asyncio import wait_run_in_executor
 from ..utils import force_unix_path
 from .project_manager import ProjectManager
 from .port_manager import PortManager
+from .cgroups import Cgroups
 
 from .nios.nio_udp import NIOUDP
 from .nios.nio_tap import NIOTAP
@@ -64,6 +65,7 @@ class BaseManager:
         BaseManager._convert_lock = asyncio.Lock()
         self._nodes = {}
         self._port_manager = None
+        self._cgroups = None
         self._config = Config.instance()
 
     @classmethod
@@ -83,6 +85,21 @@ class BaseManager:
 
         return self._nodes.values()
 
+    def resource_usage(self):
+        """
+        Returns the resources used by the node processes in a cgroup.
+        Routers sharing a Dynamips hypervisor report the usage of the hypervisor process.
+
+        :returns: list of dictionaries
+        """
+
+        usage = []
+        for node in self._nodes.values():
+            stats = node.resource_usage()
+            if stats is not None:
+                usage.append(dict(stats, node_id=node.id, project_id=node.project.id, name=node.name))
+        return usage
+
     @classmethod
     def instance(cls):
         """
@@ -132,6 +149,22 @@ class BaseManager:
 
         return self._config
 
+    @property
+    def cgroups(self):
+        """
+        Returns the cgroups where the node processes are limited.
+
+        :returns: Cgroups instance
+        """
+
+        if self._cgroups is None:
+            server_config = self._config.get_section_config("Server")
+            self._cgroups = Cgroups(server_config.get("cgroups_path", "/sys/fs/cgroup/gns3"),
+                                    enabled=server_config.getboolean("cgroups_support", False),
+                                    memory_overhead=int(server_config.get("cgroups_memory_overhead", 256)),
+                                    io_weight=int(server_config.get("cgroups_io_weight", 100)))
+        return self._cgroups
+
     async def unload(self):
 
         tasks = []
@@ -26,21 +26,53 @@ import tempfile
 import psutil
 import platform
 import re
+import time
+import functools
+import contextlib
+import collections
 
 from aiohttp.web import WebSocketResponse
 from gns3server.utils.interfaces import interfaces
 from ..compute.port_manager import PortManager
 from ..utils.asyncio import wait_run_in_executor, locking
-from ..utils.asyncio.telnet_server import AsyncioTelnetServer
+from ..utils.asyncio.telnet_server import AsyncioTelnetServer, TelnetScrollback, DEFAULT_SCROLLBACK_SIZE
+from ..utils.asyncio.frame_coalescer import FrameCoalescer, DEFAULT_MAX_FRAME_SIZE, DEFAULT_FLUSH_DELAY
 from ..ubridge.hypervisor import Hypervisor
 from ..ubridge.ubridge_error import UbridgeError
 from .nios.nio_udp import NIOUDP
 from .error import NodeError
+from .start_timings import StartTimings
 
 
 log = logging.getLogger(__name__)
 
 
+def timed_start(f):
+    """
+    Decorator measuring the duration of a node start and of its
+    phases (see BaseNode.timing_span()).
+    """
+
+    @functools.wraps(f)
+    async def wrapper(node, *args, **kwargs):
+
+        if node._start_begin is not None:
+            # nested start
+            return await f(node, *args, **kwargs)
+        node._start_begin = time.time()
+        node._start_phases = collections.OrderedDict()
+        try:
+            result = await f(node, *args, **kwargs)
+        finally:
+            total = time.time() - node._start_begin
+            node._start_begin = None
+        # nothing is measured when the node is already started or only resumed
+        if node._start_phases:
+            node._record_start_timings(total)
+        return result
+    return wrapper
+
+
 class BaseNode:
 
     """
@@ -77,9 +109,14 @@ class BaseNode:
         self._allocate_aux = allocate_aux
         self._wrap_console = wrap_console
         self._wrapper_telnet_server = None
+        self._console_scrollback = None
         self._internal_console_port = None
         self._custom_adapters = []
         self._ubridge_require_privileged_access = False
+        self._cgroup = None
+        self._start_begin = None
+        self._start_phases = None
+        self._start_timings = None
 
         if self._console is not None:
             if console_type == "vnc":
@@ -162,6 +199,54 @@ class BaseNode:
         """
         self.project.emit("node.updated", self)
 
+    @contextlib.contextmanager
+    def timing_span(self, phase):
+        """
+        Measures the duration of a phase of the node start, the durations of
+        a phase measured several times are added up. Nothing is measured
+        outside a start.
+
+        :param phase: phase name (e.g. disks, ubridge, console, process, links)
+        """
+
+        if self._start_begin is None:
+            yield
+            return
+        begin = time.time()
+        try:
+            yield
+        finally:
+            self._start_phases[phase] = self._start_phases.get(phase, 0) + time.time() - begin
+
+    def _record_start_timings(self, total):
+        """
+        Keeps the durations of the start which just ended, adds them
+        to the compute statistics and sends them to the clients.
+
+        :param total: duration in seconds of the whole start
+        """
+
+        self._start_timings = {"total": round(total, 4),
+                               "phases": {phase: round(duration, 4) for phase, duration in self._start_phases.items()}}
+        log.info("{module}: {name} [{id}] started in {total:.4f} seconds ({phases})".format(
+            module=self.manager.module_name,
+            name=self.name,
+            id=self.id,
+            total=total,
+            phases=", ".join("{} {:.4f}s".format(phase, duration) for phase, duration in self._start_phases.items())))
+        StartTimings.instance().record(self.manager.module_name.lower(), self._start_phases, total)
+        self.updated()
+
+    @property
+    def start_timings(self):
+        """
+        Returns the duration of the last start of this node and of its phases.
+
+        :returns: dictionary {"total": seconds, "phases": {phase: seconds}} or None
+        """
+
+        return self._start_timings
+
     @property
     def command_line(self):
         """
@@ -343,6 +428,9 @@ class BaseNode:
             self._manager.port_manager.release_tcp_port(self._aux, self._project)
             self._aux = None
 
+        if self._console_scrollback:
+            self._console_scrollback.clear()
+
         self._closed = True
         return True
 
@@ -373,20 +461,50 @@ class BaseNode:
 
         if not self._wrap_console or self._console_type != "telnet":
             return
-        remaining_trial = 60
-        while True:
-            try:
-                (reader, writer) = await asyncio.open_connection(host="127.0.0.1", port=self._internal_console_port)
-                break
-            except (OSError, ConnectionRefusedError) as e:
-                if remaining_trial <= 0:
-                    raise e
-            await asyncio.sleep(0.1)
-            remaining_trial -= 1
-        await AsyncioTelnetServer.write_client_intro(writer, echo=True)
-        server = AsyncioTelnetServer(reader=reader, writer=writer, binary=True, echo=True)
-        # warning: this will raise OSError exception if there is a problem...
-        self._wrapper_telnet_server = await asyncio.start_server(server.run, self._manager.port_manager.console_host, self.console)
+        with self.timing_span("console"):
+            remaining_trial = 60
+            while True:
+                try:
+                    (reader, writer) = await asyncio.open_connection(host="127.0.0.1", port=self._internal_console_port)
+                    break
+                except (OSError, ConnectionRefusedError) as e:
+                    if remaining_trial <= 0:
+                        raise e
+                await asyncio.sleep(0.1)
+                remaining_trial -= 1
+            await AsyncioTelnetServer.write_client_intro(writer, echo=True)
+            server = AsyncioTelnetServer(reader=reader, writer=writer, binary=True, echo=True, scrollback=self.console_scrollback)
+            # warning: this will raise OSError exception if there is a problem...
+            self._wrapper_telnet_server = await asyncio.start_server(server.run, self._manager.port_manager.console_host, self.console)
+
+    @property
+    def console_scrollback(self):
+        """
+        Returns the buffer keeping the recent output of the telnet console,
+        replayed to the clients when they connect.
+
+        :returns: TelnetScrollback instance or None if disabled
+        """
+
+        if self._console_scrollback is None:
+            server_config = self._manager.config.get_section_config("Server")
+            size = int(server_config.get("console_scrollback_size", DEFAULT_SCROLLBACK_SIZE)) * 1024
+            if size > 0:
+                self._console_scrollback = TelnetScrollback(size)
+        return self._console_scrollback
+
+    def get_console_scrollback(self):
+        """
+        Returns the recent output of the telnet console.
+
+        :returns: bytes
+        """
+
+        if self._console_type != "telnet":
+            raise NodeError("Node {} console type is not telnet".format(self.name))
+        if self.console_scrollback is None:
+            return b""
+        return self.console_scrollback.get()
 
     async def stop_wrap_console(self):
         """
@@ -430,15 +548,21 @@ class BaseNode:
                     telnet_writer.write(msg.data.encode())
                     await telnet_writer.drain()
                 elif msg.type == aiohttp.WSMsgType.BINARY:
-                    await telnet_writer.write(msg.data)
+                    telnet_writer.write(msg.data)
                     await telnet_writer.drain()
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     log.debug("Websocket connection closed with exception {}".format(ws.exception()))
 
+        # group the console output in bigger frames when the console is busy
+        server_config = self._manager.config.get_section_config("Server")
+        coalescer = FrameCoalescer(telnet_reader,
+                                   max_frame_size=int(server_config.get("console_ws_max_frame_size", DEFAULT_MAX_FRAME_SIZE)),
+                                   flush_delay=float(server_config.get("console_ws_flush_delay", DEFAULT_FLUSH_DELAY)))
+
         async def telnet_forward(telnet_reader):
 
             while not ws.closed and not telnet_reader.at_eof():
-                data = await telnet_reader.read(1024)
+                data = await coalescer.read_frame()
                 if data:
                     await ws.send_bytes(data)
 
@@ -447,6 +571,12 @@ class BaseNode:
             await asyncio.wait([ws_forward(telnet_writer), telnet_forward(telnet_reader)], return_when=asyncio.FIRST_COMPLETED)
         finally:
             log.info("Client has disconnected from console WebSocket")
+            stats = coalescer.stats()
+            log.debug("Console WebSocket for node {}: {} frames and {} bytes sent ({} frames/s, {} bytes/s)".format(self.name,
+                                                                                                              stats["frames"],
+                                                                                                              stats["bytes"],
+                                                                                                              stats["frames_per_second"],
+                                                                                                              stats["bytes_per_second"]))
             if not ws.closed:
                 await ws.close()
             request.app['websockets'].discard(ws)
@@ -632,6 +762,39 @@ class BaseNode:
         except UbridgeError as e:
             raise UbridgeError("Error while sending command '{}': {}: {}".format(command, e, self._ubridge_hypervisor.read_stdout()))
 
+    async def _ubridge_send_batch(self, commands):
+        """
+        Sends several commands to uBridge hypervisor in one go.
+
+        :param commands: list of commands to send
+        """
+
+        if not self._ubridge_hypervisor or not self._ubridge_hypervisor.is_running():
+            await self._start_ubridge(self._ubridge_require_privileged_access)
+        if not self._ubridge_hypervisor or not self._ubridge_hypervisor.is_running():
+            raise NodeError("Cannot send commands '{}': uBridge is not running".format("; ".join(commands)))
+        try:
+            await self._ubridge_hypervisor.send_batch(commands)
+        except UbridgeError as e:
+            raise UbridgeError("Error while sending commands '{}': {}: {}".format("; ".join(commands), e, self._ubridge_hypervisor.read_stdout()))
+
+    async def _ubridge_rollback(self, commands):
+        """
+        Sends commands undoing a batch sent to uBridge which failed.
+
+        The commands following a failed command in a batch are run anyway
+        so this is needed to not leave a half configured bridge.
+        Errors are ignored.
+
+        :param commands: list of commands to send
+        """
+
+        for command in commands:
+            try:
+                await self._ubridge_send(command)
+            except (UbridgeError, NodeError) as e:
+                log.debug("Could not roll back with command '{}': {}".format(command, e))
+
     @locking
     async def _start_ubridge(self, require_privileged_access=False):
         """
@@ -651,12 +814,18 @@ class BaseNode:
         server_config = self._manager.config.get_section_config("Server")
         server_host = server_config.get("host")
         if not self.ubridge:
-            self._ubridge_hypervisor = Hypervisor(self._project, self.ubridge_path, self.working_dir, server_host)
+            nodes_per_hypervisor = int(server_config.get("ubridge_nodes_per_hypervisor", 1))
+            if nodes_per_hypervisor == 1:
+                self._ubridge_hypervisor = Hypervisor(self._project, self.ubridge_path, self.working_dir, server_host)
+            else:
+                # the bridges of this node are hosted by a uBridge hypervisor shared with other nodes
+                self._ubridge_hypervisor = self._project.ubridge_pool.attach(self.id, self.ubridge_path, server_host, nodes_per_hypervisor)
         log.info("Starting new uBridge hypervisor {}:{}".format(self._ubridge_hypervisor.host, self._ubridge_hypervisor.port))
-        await self._ubridge_hypervisor.start()
-        if self._ubridge_hypervisor:
-            log.info("Hypervisor {}:{} has successfully started".format(self._ubridge_hypervisor.host, self._ubridge_hypervisor.port))
-            await self._ubridge_hypervisor.connect()
+        with self.timing_span("ubridge"):
+            await self._ubridge_hypervisor.start()
+            if self._ubridge_hypervisor:
+                log.info("Hypervisor {}:{} has successfully started".format(self._ubridge_hypervisor.host, self._ubridge_hypervisor.port))
+                await self._ubridge_hypervisor.connect()
         # save if privileged are required in case uBridge needs to be restarted in self._ubridge_send()
         self._ubridge_require_privileged_access = require_privileged_access
 
@@ -679,27 +848,29 @@ class BaseNode:
         :param destination_nio: destination NIO instance
         """
 
-        await self._ubridge_send("bridge create {name}".format(name=bridge_name))
-
         if not isinstance(destination_nio, NIOUDP):
             raise NodeError("Destination NIO is not UDP")
 
-        await self._ubridge_send('bridge add_nio_udp {name} {lport} {rhost} {rport}'.format(name=bridge_name,
-                                                                                                 lport=source_nio.lport,
-                                                                                                 rhost=source_nio.rhost,
-                                                                                                 rport=source_nio.rport))
-
-        await self._ubridge_send('bridge add_nio_udp {name} {lport} {rhost} {rport}'.format(name=bridge_name,
-                                                                                                 lport=destination_nio.lport,
-                                                                                                 rhost=destination_nio.rhost,
-                                                                                                 rport=destination_nio.rport))
-
+        # the bridge is created first so an existing bridge is left alone,
+        # then it is configured with one round trip to uBridge
+        commands = []
+        for nio in (source_nio, destination_nio):
+            commands.append('bridge add_nio_udp {name} {lport} {rhost} {rport}'.format(name=bridge_name,
+                                                                                       lport=nio.lport,
+                                                                                       rhost=nio.rhost,
+                                                                                       rport=nio.rport))
         if destination_nio.capturing:
-            await self._ubridge_send('bridge start_capture {name} "{pcap_file}"'.format(name=bridge_name,
-                                                                                             pcap_file=destination_nio.pcap_output_file))
-
-        await self._ubridge_send('bridge start {name}'.format(name=bridge_name))
-        await self._ubridge_apply_filters(bridge_name, destination_nio.filters)
+            commands.append('bridge start_capture {name} "{pcap_file}"'.format(name=bridge_name,
+                                                                               pcap_file=destination_nio.pcap_output_file))
+        commands.append('bridge start {name}'.format(name=bridge_name))
+        with self.timing_span("links"):
+            await self._ubridge_send("bridge create {name}".format(name=bridge_name))
+            try:
+                await self._ubridge_send_batch(commands)
+            except UbridgeError:
+                await self._ubridge_rollback(["bridge delete {name}".format(name=bridge_name)])
+                raise
+            await self._ubridge_apply_filters(bridge_name, destination_nio.filters)
 
     async def update_ubridge_udp_connection(self, bridge_name, source_nio, destination_nio):
         if destination_nio:
@@ -836,6 +1007,51 @@ class BaseNode:
 
         return self._hw_virtualization
 
+    def _set_resource_limits(self, pid, cpu=0, memory=0, name=None):
+        """
+        Moves a node process to its own cgroup and limits its resources.
+
+        :param pid: process identifier
+        :param cpu: percentage of one CPU allowed, 0 for no limit
+        :param memory: RAM of the node in MB, 0 for no memory limit
+        :param name: cgroup name, default is the node identifier
+
+        :returns: True if the process is in a cgroup
+        """
+
+        cgroups = self.manager.cgroups
+        if not cgroups.available:
+            return False
+        try:
+            cgroup = cgroups.create(name or self.id, cpu=cpu, memory=memory)
+            cgroup.add_process(pid)
+        except OSError as e:
+            log.warning("Could not limit the resources of {} with a cgroup: {}".format(self.name, e))
+            return False
+        log.info("{} process PID={} moved to cgroup {}".format(self.name, pid, cgroup.path))
+        self._cgroup = cgroup
+        return True
+
+    def _remove_resource_limits(self):
+        """
+        Removes the cgroup of the node process once it has stopped.
+        """
+
+        if self._cgroup:
+            self._cgroup.remove()
+            self._cgroup = None
+
+    def resource_usage(self):
+        """
+        Returns the resources used by the node process, when it is in a cgroup.
+
+        :returns: dictionary or None
+        """
+
+        if self._cgroup:
+            return self._cgroup.stats()
+        return None
+
     def check_available_ram(self, requested_ram):
         """
         Sends a warning notification if there is not enough RAM on the system to allocate requested RAM.
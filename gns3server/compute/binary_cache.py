@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of the results of the probes run on the emulator executables
+(version, supported options, shared library dependencies etc.)
+
+Results are keyed by the executable path, size and modification time so a
+probe only runs again when the executable is replaced. Nodes starting at
+the same time share the same running probe.
+"""
+
+import os
+import asyncio
+import functools
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class BinaryCache:
+    """
+    Cache of the executable probes, shared by all the emulator managers.
+    """
+
+    def __init__(self):
+
+        self._results = {}
+        self._probes = {}
+
+    @staticmethod
+    def reset():
+        BinaryCache._instance = None
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of BinaryCache.
+
+        :returns: instance of BinaryCache
+        """
+
+        if not hasattr(BinaryCache, "_instance") or BinaryCache._instance is None:
+            BinaryCache._instance = BinaryCache()
+        return BinaryCache._instance
+
+    @staticmethod
+    def _binary_key(path):
+        """
+        Returns what identifies a version of an executable (path, size and modification time).
+
+        :param path: executable path
+
+        :returns: tuple or None if the executable cannot be found
+        """
+
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            return None
+        return os.path.realpath(path), stat.st_size, stat.st_mtime_ns
+
+    async def probe(self, path, name, probe):
+        """
+        Returns the result of a probe on an executable,
+        runs the probe if the result is not in the cache.
+
+        :param path: executable path
+        :param name: probe name (e.g. "version")
+        :param probe: coroutine function running the probe, its result
+        is not cached when it raises an exception
+
+        :returns: probe result
+        """
+
+        binary_key = self._binary_key(path)
+        if binary_key is None:
+            return await probe()
+
+        key = binary_key + (name,)
+        if key in self._results:
+            return self._results[key]
+        task = self._probes.get(key)
+        if task is None:
+            log.debug("Running probe '{}' on {}".format(name, path))
+            task = asyncio.ensure_future(probe())
+            self._probes[key] = task
+            task.add_done_callback(functools.partial(self._probe_done, key))
+        return await asyncio.shield(task)
+
+    def _probe_done(self, key, task):
+
+        self._probes.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        # forget the results for the previous versions of the executable
+        for old_key in [k for k in self._results if k[0] == key[0] and k[1:3] != key[1:3]]:
+            del self._results[old_key]
+        self._results[key] = task.result()
+
+    def invalidate(self, path, name=None):
+        """
+        Removes the results of the probes on an executable.
+
+        :param path: executable path
+        :param name: probe name, all the probes if None
+        """
+
+        path = os.path.realpath(path)
+        for key in [k for k in self._results if k[0] == path and (name is None or k[3] == name)]:
+            del self._results[key]
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+cgroup v2 resource limits for the node processes (Linux only).
+
+Each node process is moved to its own cgroup below a parent cgroup
+delegated to the server, where the CPU (cpu.max), memory (memory.max)
+and I/O weight (io.weight) are limited and the usage can be read back.
+"""
+
+import os
+import sys
+
+import logging
+log = logging.getLogger(__name__)
+
+
+CPU_MAX_PERIOD = 100000  # microseconds
+
+
+class Cgroup:
+    """
+    cgroup of a node process.
+
+    :param path: cgroup directory
+    """
+
+    def __init__(self, path):
+
+        self._path = path
+
+    @property
+    def path(self):
+
+        return self._path
+
+    def _write(self, filename, value):
+
+        with open(os.path.join(self._path, filename), "w") as f:
+            f.write(str(value))
+
+    def _read(self, filename):
+
+        with open(os.path.join(self._path, filename)) as f:
+            return f.read().strip()
+
+    def add_process(self, pid):
+        """
+        Moves a process to this cgroup.
+
+        :param pid: process identifier
+        """
+
+        self._write("cgroup.procs", pid)
+
+    def set_cpu_max(self, percentage):
+        """
+        Limits the CPU usage.
+
+        :param percentage: percentage of one CPU allowed (can be more than 100 on multi-core hosts), 0 for no limit
+        """
+
+        if percentage:
+            self._write("cpu.max", "{} {}".format(int(CPU_MAX_PERIOD * percentage / 100), CPU_MAX_PERIOD))
+        else:
+            self._write("cpu.max", "max {}".format(CPU_MAX_PERIOD))
+
+    def set_memory_max(self, memory):
+        """
+        Limits the memory usage.
+
+        :param memory: memory allowed in MB, 0 for no limit
+        """
+
+        if memory:
+            self._write("memory.max", memory * 1024 * 1024)
+        else:
+            self._write("memory.max", "max")
+
+    def set_io_weight(self, weight):
+        """
+        Sets the I/O weight.
+
+        :param weight: weight from 1 to 10000
+        """
+
+        self._write("io.weight", "default {}".format(weight))
+
+    def stats(self):
+        """
+        Returns the resource usage of the processes in this cgroup.
+
+        :returns: dictionary with the CPU time used and throttled in microseconds,
+        the memory used in bytes and the bytes read and written
+        """
+
+        stats = {}
+        try:
+            cpu_stat = dict(line.split() for line in self._read("cpu.stat").splitlines() if line.strip())
+            stats["cpu_usage_usec"] = int(cpu_stat.get("usage_usec", 0))
+            stats["cpu_throttled_usec"] = int(cpu_stat.get("throttled_usec", 0))
+        except (OSError, ValueError) as e:
+            log.debug("Could not read the CPU statistics of cgroup {}: {}".format(self._path, e))
+        try:
+            stats["memory_current"] = int(self._read("memory.current"))
+        except (OSError, ValueError) as e:
+            log.debug("Could not read the memory statistics of cgroup {}: {}".format(self._path, e))
+        try:
+            read_bytes = write_bytes = 0
+            for line in self._read("io.stat").splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+            stats["io_read_bytes"] = read_bytes
+            stats["io_write_bytes"] = write_bytes
+        except (OSError, ValueError) as e:
+            log.debug("Could not read the I/O statistics of cgroup {}: {}".format(self._path, e))
+        return stats
+
+    def remove(self):
+        """
+        Removes this cgroup, it must not contain any process.
+        """
+
+        try:
+            os.rmdir(self._path)
+        except OSError as e:
+            log.warning("Could not remove cgroup {}: {}".format(self._path, e))
+
+
+class Cgroups:
+    """
+    Parent cgroup of the node processes.
+
+    :param path: parent cgroup directory
+    :param enabled: whether the cgroups must be used
+    :param memory_overhead: memory in MB allowed to a process on top of the RAM of its node
+    :param io_weight: I/O weight of the node processes
+    """
+
+    CONTROLLERS = ("cpu", "memory", "io")
+
+    def __init__(self, path, enabled=True, memory_overhead=256, io_weight=100):
+
+        self._path = path
+        self._enabled = enabled
+        self._memory_overhead = memory_overhead
+        self._io_weight = io_weight
+        self._available = None
+
+    @property
+    def path(self):
+
+        return self._path
+
+    @property
+    def memory_overhead(self):
+
+        return self._memory_overhead
+
+    @property
+    def available(self):
+        """
+        Checks once if the parent cgroup is a writable cgroup v2
+        directory and enables the controllers for its children.
+
+        :returns: boolean
+        """
+
+        if self._available is None:
+            self._available = self._enabled and self._check()
+        return self._available
+
+    def _check(self):
+
+        if not sys.platform.startswith("linux"):
+            return False
+        controllers_file = os.path.join(self._path, "cgroup.controllers")
+        if not os.path.isfile(controllers_file) or not os.access(self._path, os.W_OK):
+            log.warning("cgroup v2 directory {} is not writable, falling back to cpulimit for CPU throttling".format(self._path))
+            return False
+        try:
+            with open(controllers_file) as f:
+                available_controllers = f.read().split()
+            controllers = ["+{}".format(c) for c in self.CONTROLLERS if c in available_controllers]
+            if controllers:
+                with open(os.path.join(self._path, "cgroup.subtree_control"), "w") as f:
+                    f.write(" ".join(controllers))
+        except OSError as e:
+            log.warning("Could not enable the cgroup controllers in {}: {}".format(self._path, e))
+            return False
+        log.info("Node processes are limited with the cgroups in {}".format(self._path))
+        return True
+
+    def create(self, name, cpu=0, memory=0):
+        """
+        Creates the cgroup of a node process.
+
+        :param name: cgroup name
+        :param cpu: percentage of one CPU allowed, 0 for no limit
+        :param memory: RAM of the node in MB, 0 for no memory limit
+
+        :returns: Cgroup instance
+        """
+
+        cgroup = Cgroup(os.path.join(self._path, name))
+        os.makedirs(cgroup.path, exist_ok=True)
+        cgroup.set_cpu_max(cpu)
+        cgroup.set_memory_max(memory + self._memory_overhead if memory else 0)
+        if self._io_weight:
+            try:
+                cgroup.set_io_weight(self._io_weight)
+            except OSError as e:
+                # the io controller is not always available
+                log.debug("Could not set the I/O weight of cgroup {}: {}".format(cgroup.path, e))
+        return cgroup
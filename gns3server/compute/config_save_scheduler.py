@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Background extraction of the node configurations.
+
+When the NVRAM of many routers changes at the same time (a whole lab
+saving its configuration for instance) the extractions are queued and run
+a few at a time, with a minimum delay between two of them, so the
+hypervisors and the disk are not hammered. Config files are only
+rewritten when their content changed.
+"""
+
+import os
+import asyncio
+import hashlib
+
+from ..utils.asyncio import wait_run_in_executor
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def write_config_if_changed(path, content, written):
+    """
+    Writes a config file only if its content is different from the file on disk.
+
+    :param path: path of the config file
+    :param content: config content (bytes)
+    :param written: dictionary of the files written before (path -> (checksum, mtime, size)),
+    updated by this function
+
+    :returns: True if the file was written
+    """
+
+    checksum = hashlib.md5(content).hexdigest()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        stat = None
+
+    if stat and stat.st_size == len(content):
+        if written.get(path) == (checksum, stat.st_mtime_ns, stat.st_size):
+            return False
+        # the file was not written by us or has been modified since, compare the content
+        with open(path, "rb") as f:
+            if hashlib.md5(f.read()).hexdigest() == checksum:
+                written[path] = (checksum, stat.st_mtime_ns, stat.st_size)
+                return False
+
+    with open(path, "wb") as f:
+        f.write(content)
+    stat = os.stat(path)
+    written[path] = (checksum, stat.st_mtime_ns, stat.st_size)
+    return True
+
+
+class ConfigSaveScheduler:
+    """
+    Runs the config extractions of the nodes of a project in the background.
+
+    :param concurrency: maximum number of extractions running at the same time
+    :param interval: minimum delay in seconds between the start of two extractions
+    """
+
+    def __init__(self, concurrency=4, interval=0.05):
+
+        self._concurrency = max(1, concurrency)
+        self._interval = max(0, interval)
+        self._pending = {}
+        self._running = {}
+        self._worker = None
+        self._semaphore = None
+        self._last_start = None
+
+    @property
+    def pending(self):
+        """
+        Returns the identifiers of the nodes waiting for an extraction.
+        """
+
+        return list(self._pending)
+
+    def schedule(self, node_id, callback):
+        """
+        Schedules a config extraction, an extraction already
+        waiting for the same node is not scheduled twice.
+
+        :param node_id: node identifier
+        :param callback: function or coroutine function saving the configs
+        """
+
+        if node_id in self._pending:
+            return
+        self._pending[node_id] = callback
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+
+    def cancel(self, node_id):
+        """
+        Cancels the extraction waiting for a node, if any.
+
+        :param node_id: node identifier
+        """
+
+        self._pending.pop(node_id, None)
+
+    def _next(self):
+        """
+        Returns the first node waiting for an extraction which
+        is not already running one.
+        """
+
+        for node_id, callback in self._pending.items():
+            if node_id not in self._running:
+                del self._pending[node_id]
+                return node_id, callback
+        return None, None
+
+    async def _run(self):
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            await self._semaphore.acquire()
+            node_id, callback = self._next()
+            if node_id is None:
+                self._semaphore.release()
+                if not self._running:
+                    # the pending extractions have been cancelled
+                    continue
+                await asyncio.wait(list(self._running.values()), return_when=asyncio.FIRST_COMPLETED)
+                continue
+            if self._last_start is not None:
+                delay = self._last_start + self._interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last_start = loop.time()
+            self._running[node_id] = asyncio.ensure_future(self._save(node_id, callback))
+
+    async def _save(self, node_id, callback):
+
+        try:
+            if asyncio.iscoroutinefunction(callback):
+                await callback()
+            else:
+                await wait_run_in_executor(callback)
+        except Exception as e:
+            log.warning("Could not save the configs of node {}: {}".format(node_id, e))
+        finally:
+            del self._running[node_id]
+            self._semaphore.release()
+
+    async def flush(self):
+        """
+        Waits until all the scheduled extractions are done.
+        """
+
+        while self._pending or self._running:
+            if self._pending and (self._worker is None or self._worker.done()):
+                self._worker = asyncio.ensure_future(self._run())
+            tasks = list(self._running.values())
+            if self._worker and not self._worker.done():
+                tasks.append(self._worker)
+            await asyncio.wait(tasks)
+
+    async def close(self):
+        """
+        Cancels the pending extractions and waits for the running ones.
+        """
+
+        self._pending.clear()
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.wait(list(self._running.values()))
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Console gateway: carries the telnet consoles of many nodes of a project
+over a single WebSocket.
+
+Console data is sent in binary messages starting with the channel ID
+(unsigned 16-bit integer, big endian) followed by the console data.
+
+Channels are controlled with JSON text messages:
+
+    client -> server
+        {"action": "attach", "channel": 1, "node_id": "<uuid>", "window": 65536}
+        {"action": "detach", "channel": 1}
+        {"action": "ack", "channel": 1, "bytes": 4096}
+
+    server -> client
+        {"action": "attached", "channel": 1, "node_id": "<uuid>", "window": 65536}
+        {"action": "detached", "channel": 1, "reason": "..."}
+        {"action": "error", "channel": 1, "message": "..."}
+
+Flow control is done per channel: the server stops reading the output of
+a node when the client has not acknowledged "window" bytes for this channel.
+"""
+
+import json
+import struct
+import asyncio
+import aiohttp
+
+from aiohttp.web import WebSocketResponse
+from .error import NodeError
+from ..utils.asyncio import current_task
+from ..utils.asyncio.frame_coalescer import FrameCoalescer, DEFAULT_MAX_FRAME_SIZE, DEFAULT_FLUSH_DELAY
+
+import logging
+log = logging.getLogger(__name__)
+
+CHANNEL_HEADER = struct.Struct(">H")
+DEFAULT_WINDOW = 65536  # bytes
+MAX_WINDOW = 1024 * 1024  # bytes
+
+
+class ConsoleGatewayError(Exception):
+    pass
+
+
+class ConsoleChannel:
+    """
+    Console of a node attached to a channel of the gateway.
+
+    :param gateway: ConsoleGateway instance
+    :param channel_id: channel identifier
+    :param node: Node instance
+    :param window: number of bytes that can be sent without acknowledgement
+    """
+
+    def __init__(self, gateway, channel_id, node, window):
+
+        self._gateway = gateway
+        self._channel_id = channel_id
+        self._node = node
+        self._window = window
+        self._credits = window
+        self._credits_available = asyncio.Event()
+        self._reader = None
+        self._writer = None
+        self._task = None
+
+    @property
+    def channel_id(self):
+
+        return self._channel_id
+
+    @property
+    def node(self):
+
+        return self._node
+
+    @property
+    def credits(self):
+
+        return self._credits
+
+    async def open(self):
+        """
+        Connects to the telnet console of the node.
+        """
+
+        if self._node.status != "started":
+            raise NodeError("Node {} is not started".format(self._node.name))
+        if self._node.console_type != "telnet":
+            raise NodeError("Node {} console type is not telnet".format(self._node.name))
+
+        try:
+            (self._reader, self._writer) = await asyncio.open_connection(self._node.manager.port_manager.console_host, self._node.console)
+        except OSError as e:
+            raise NodeError("Cannot connect to node {} telnet server: {}".format(self._node.name, e))
+        self._task = asyncio.ensure_future(self._forward())
+
+    async def _forward(self):
+        """
+        Forwards the console output to the WebSocket while the client has credits.
+        """
+
+        coalescer = FrameCoalescer(self._reader,
+                                   max_frame_size=self._gateway.max_frame_size,
+                                   flush_delay=self._gateway.flush_delay)
+        try:
+            while True:
+                if self._credits <= 0:
+                    self._credits_available.clear()
+                    await self._credits_available.wait()
+                    continue
+                data = await coalescer.read_frame()
+                if not data:
+                    break
+                # the last frame can exceed the credits by at most one frame
+                self._credits -= len(data)
+                await self._gateway.send_data(self._channel_id, data)
+        except ConnectionError:
+            pass
+        await self._gateway.channel_closed(self, "Console connection closed")
+
+    def acknowledge(self, nbytes):
+        """
+        Gives back credits to the channel.
+
+        :param nbytes: number of bytes received by the client
+        """
+
+        self._credits = min(self._credits + nbytes, self._window)
+        if self._credits > 0:
+            self._credits_available.set()
+
+    async def write(self, data):
+        """
+        Sends data to the console.
+
+        :param data: data received from the client
+        """
+
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def close(self):
+
+        if self._task and not self._task.done() and self._task is not current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._writer:
+            self._writer.close()
+
+
+class ConsoleGateway:
+    """
+    Multiplexes the consoles of the nodes of a project over one WebSocket.
+
+    :param project: Project instance
+    :param max_frame_size: maximum size of a console frame
+    :param flush_delay: delay in ms to group the output of a busy console
+    """
+
+    def __init__(self, project, max_frame_size=DEFAULT_MAX_FRAME_SIZE, flush_delay=DEFAULT_FLUSH_DELAY):
+
+        self._project = project
+        self._channels = {}
+        self._ws = None
+        self._send_lock = asyncio.Lock()
+        self.max_frame_size = max_frame_size
+        self.flush_delay = flush_delay
+
+    @property
+    def channels(self):
+
+        return self._channels
+
+    async def run(self, request):
+        """
+        Handles the WebSocket until the client disconnects.
+
+        :param request: request upgraded to a WebSocket
+        """
+
+        self._ws = WebSocketResponse()
+        await self._ws.prepare(request)
+        request.app['websockets'].add(self._ws)
+        log.info("New client has connected to the console gateway of project {}".format(self._project.id))
+
+        try:
+            async for msg in self._ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    await self._control(msg.data)
+                elif msg.type == aiohttp.WSMsgType.BINARY:
+                    await self._data(msg.data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    log.debug("Websocket connection closed with exception {}".format(self._ws.exception()))
+        finally:
+            log.info("Client has disconnected from the console gateway of project {}".format(self._project.id))
+            for channel in list(self._channels.values()):
+                await channel.close()
+            self._channels = {}
+            if not self._ws.closed:
+                await self._ws.close()
+            request.app['websockets'].discard(self._ws)
+        return self._ws
+
+    async def _control(self, data):
+        """
+        Handles a control message.
+        """
+
+        channel_id = None
+        try:
+            try:
+                message = json.loads(data)
+                action = message["action"]
+                channel_id = message["channel"]
+            except (ValueError, TypeError, KeyError):
+                raise ConsoleGatewayError("Invalid control message")
+            if not isinstance(channel_id, int) or not 0 <= channel_id <= 0xffff:
+                raise ConsoleGatewayError("Invalid channel ID {}".format(channel_id))
+
+            if action == "attach":
+                await self._attach(channel_id, message.get("node_id"), message.get("window", DEFAULT_WINDOW))
+            elif action == "detach":
+                await self._detach(channel_id, "Detached by the client")
+            elif action == "ack":
+                channel = self._get_channel(channel_id)
+                nbytes = message.get("bytes")
+                if not isinstance(nbytes, int) or nbytes < 0:
+                    raise ConsoleGatewayError("Invalid number of bytes acknowledged")
+                channel.acknowledge(nbytes)
+            else:
+                raise ConsoleGatewayError("Unknown action {}".format(action))
+        except (ConsoleGatewayError, NodeError, aiohttp.web.HTTPException) as e:
+            message = e.text if isinstance(e, aiohttp.web.HTTPException) else str(e)
+            await self._send_json({"action": "error", "channel": channel_id, "message": message})
+
+    async def _data(self, data):
+        """
+        Handles console data sent by the client.
+        """
+
+        if len(data) < CHANNEL_HEADER.size:
+            return
+        channel_id = CHANNEL_HEADER.unpack_from(data)[0]
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            await self._send_json({"action": "error", "channel": channel_id, "message": "Channel {} is not attached".format(channel_id)})
+            return
+        try:
+            await channel.write(data[CHANNEL_HEADER.size:])
+        except ConnectionError:
+            await self.channel_closed(channel, "Console connection closed")
+
+    def _get_channel(self, channel_id):
+
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            raise ConsoleGatewayError("Channel {} is not attached".format(channel_id))
+        return channel
+
+    async def _attach(self, channel_id, node_id, window):
+
+        if channel_id in self._channels:
+            raise ConsoleGatewayError("Channel {} is already attached".format(channel_id))
+        if node_id is None:
+            raise ConsoleGatewayError("Missing node ID")
+        if not isinstance(window, int) or window <= 0:
+            raise ConsoleGatewayError("Invalid window size")
+        window = min(window, MAX_WINDOW)
+
+        node = self._project.get_node(node_id)
+        channel = ConsoleChannel(self, channel_id, node, window)
+        await channel.open()
+        self._channels[channel_id] = channel
+        log.debug("Console of node {} attached to channel {}".format(node.name, channel_id))
+        await self._send_json({"action": "attached", "channel": channel_id, "node_id": node.id, "window": window})
+
+    async def _detach(self, channel_id, reason):
+
+        channel = self._get_channel(channel_id)
+        del self._channels[channel_id]
+        await channel.close()
+        await self._send_json({"action": "detached", "channel": channel_id, "reason": reason})
+
+    async def channel_closed(self, channel, reason):
+        """
+        Called when the console of a channel has been closed.
+        """
+
+        if self._channels.get(channel.channel_id) is channel:
+            await self._detach(channel.channel_id, reason)
+
+    async def send_data(self, channel_id, data):
+
+        await self._send(self._ws.send_bytes, CHANNEL_HEADER.pack(channel_id) + data)
+
+    async def _send_json(self, message):
+
+        await self._send(self._ws.send_str, json.dumps(message))
+
+    async def _send(self, send, data):
+
+        # the channels are sending concurrently, the messages must not be interleaved
+        async with self._send_lock:
+            if not self._ws.closed:
+                await send(data)
@@ -19,6 +19,7 @@
 Docker server module.
 """
 
+import re
 import sys
 import json
 import asyncio
@@ -39,6 +40,17 @@ DOCKER_MINIMUM_VERSION = "1.13"
 DOCKER_PREFERRED_API_VERSION = "1.30"
 CHUNK_SIZE = 1024 * 8  # 8KB
 
+# container state after an event of the Docker daemon
+CONTAINER_EVENT_STATES = {
+    "start": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+}
+CONTAINER_EVENTS = list(CONTAINER_EVENT_STATES) + ["oom", "destroy"]
+CONTAINER_ACTION_PATH = re.compile(r"^containers/([^/]+)(/(start|stop|restart|kill|pause|unpause))?$")
+EVENTS_MAX_RECONNECT_DELAY = 30  # seconds
+
 
 class Docker(BaseManager):
 
@@ -54,6 +66,11 @@ class Docker(BaseManager):
         self._connector = None
         self._session = None
         self._api_version = DOCKER_MINIMUM_API_VERSION
+        # container states maintained from the events of the Docker daemon
+        self._events_task = None
+        self._events_connected = False
+        self._events_received = 0
+        self._container_states = {}
 
     async def _check_connection(self):
 
@@ -91,6 +108,13 @@ class Docker(BaseManager):
     async def unload(self):
 
         await super().unload()
+        if self._events_task:
+            self._events_task.cancel()
+            try:
+                await self._events_task
+            except asyncio.CancelledError:
+                pass
+            self._events_task = None
         if self._connected:
             if self._connector and not self._connector.closed:
                 await self._connector.close()
@@ -167,8 +191,121 @@ class Docker(BaseManager):
                 raise DockerHttp404Error("Docker has returned an error: {} {}".format(response.status, body))
             else:
                 raise DockerError("Docker has returned an error: {} {}".format(response.status, body))
+        if method in ("POST", "DELETE"):
+            # the container state has been changed by this query, the cache
+            # is updated by the corresponding event or the next inspection
+            match = CONTAINER_ACTION_PATH.match(path)
+            if match:
+                self._container_states.pop(match.group(1), None)
         return response
 
+    @property
+    def events_received(self):
+        """
+        Number of container events received from the Docker daemon.
+        """
+
+        return self._events_received
+
+    def watch_events(self):
+        """
+        Subscribes to the container events of the Docker daemon, in the
+        background, if not already subscribed.
+        """
+
+        if self._events_task is None or self._events_task.done():
+            self._events_task = asyncio.ensure_future(self._watch_events())
+
+    def container_state(self, cid):
+        """
+        Returns the state of a container known from the events.
+
+        :param cid: container identifier
+
+        :returns: state (e.g. running, paused etc.) or None if unknown
+        """
+
+        if not self._events_connected:
+            return None
+        return self._container_states.get(cid)
+
+    def cache_container_state(self, cid, state, events_received):
+        """
+        Caches the state of a container returned by an inspection, the
+        state is only cached if no event has been received during the inspection.
+
+        :param cid: container identifier
+        :param state: container state
+        :param events_received: number of events received before the inspection
+        """
+
+        if self._events_connected and events_received == self._events_received:
+            self._container_states[cid] = state
+
+    async def _watch_events(self):
+
+        delay = 1
+        while True:
+            try:
+                response = await self.http_query("GET", "events",
+                                                 params={"filters": json.dumps({"type": ["container"], "event": CONTAINER_EVENTS})},
+                                                 timeout=None)
+            except DockerError as e:
+                log.debug("Could not subscribe to the Docker events, retrying in {} seconds: {}".format(delay, e))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, EVENTS_MAX_RECONNECT_DELAY)
+                continue
+
+            log.info("Subscribed to the Docker container events")
+            self._events_connected = True
+            delay = 1
+            try:
+                while True:
+                    line = await response.content.readline()
+                    if not line:
+                        break
+                    try:
+                        event = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        continue
+                    self._container_event(event)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.warning("Lost the Docker events stream: {}".format(e))
+            finally:
+                # events may be missed until the subscription is back
+                self._events_connected = False
+                self._container_states.clear()
+                response.close()
+            await asyncio.sleep(delay)
+
+    def _container_event(self, event):
+        """
+        Updates the container states and the nodes after an event.
+
+        :param event: event of the Docker daemon
+        """
+
+        if event.get("Type", "container") != "container":
+            return
+        action = event.get("Action", event.get("status", "")).split(":")[0]
+        actor = event.get("Actor", {})
+        cid = actor.get("ID", event.get("id"))
+        if not cid:
+            return
+        log.debug("Docker container {} event: {}".format(cid, action))
+        self._events_received += 1
+        if action == "destroy":
+            self._container_states.pop(cid, None)
+        elif action in CONTAINER_EVENT_STATES:
+            self._container_states[cid] = CONTAINER_EVENT_STATES[action]
+
+        for node in list(self._nodes.values()):
+            if node.container_id == cid:
+                try:
+                    node.container_event(action, actor.get("Attributes", {}))
+                except Exception as e:
+                    log.error("Error while handling the Docker event '{}' of container {}: {}".format(action, cid, e), exc_info=1)
+
     async def websocket_query(self, path, params={}):
         """
         Opens a websocket connection
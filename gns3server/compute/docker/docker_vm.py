@@ -36,7 +36,7 @@ from gns3server.utils.asyncio import monitor_process
 from gns3server.utils.get_resource import get_resource
 
 from gns3server.ubridge.ubridge_error import UbridgeError, UbridgeNamespaceError
-from ..base_node import BaseNode
+from ..base_node import BaseNode, timed_start
 
 from ..adapters.ethernet_adapter import EthernetAdapter
 from ..nios.nio_udp import NIOUDP
@@ -97,6 +97,9 @@ class DockerVM(BaseNode):
         self._permissions_fixed = False
         self._display = None
         self._closing = False
+        self._stop_task = None
+        # restarts whose container events have not all been received yet
+        self._restarts_in_flight = 0
 
         self._volumes = []
         # Keep a list of created bridge
@@ -132,6 +135,7 @@ class DockerVM(BaseNode):
             "node_directory": self.working_path,
             "extra_hosts": self.extra_hosts,
             "extra_volumes": self.extra_volumes,
+            "start_timings": self.start_timings,
         }
 
     def _get_free_display_port(self):
@@ -211,24 +215,85 @@ class DockerVM(BaseNode):
     def extra_volumes(self, extra_volumes):
         self._extra_volumes = extra_volumes
 
+    @property
+    def container_id(self):
+        """
+        Returns the Docker container identifier.
+
+        :returns: identifier
+        """
+
+        return self._cid
+
     async def _get_container_state(self):
         """
-        Returns the container state (e.g. running, paused etc.)
+        Returns the container state (e.g. running, paused etc.), the
+        container is only inspected if its state is not known from the events.
 
         :returns: state
         :rtype: str
         """
 
+        state = self.manager.container_state(self._cid)
+        if state is not None:
+            return state
+
+        events_received = self.manager.events_received
         try:
             result = await self.manager.query("GET", "containers/{}/json".format(self._cid))
         except DockerError:
             return "exited"
 
         if result["State"]["Paused"]:
-            return "paused"
-        if result["State"]["Running"]:
-            return "running"
-        return "exited"
+            state = "paused"
+        elif result["State"]["Running"]:
+            state = "running"
+        else:
+            state = "exited"
+        self.manager.cache_container_state(self._cid, state, events_received)
+        return state
+
+    def container_event(self, action, attributes):
+        """
+        Updates the node after an event of its container.
+
+        :param action: event action (e.g. die, oom, pause etc.)
+        :param attributes: event attributes
+        """
+
+        if action == "oom":
+            log.warning("Docker container '{name}' [{image}] is out of memory".format(name=self._name, image=self._image))
+            self.project.emit("log.warning", {"message": "Docker container '{}' is out of memory".format(self._name)})
+            self.updated()
+        elif action == "start":
+            if self._restarts_in_flight > 0:
+                # the container is running again after a restart
+                self._restarts_in_flight -= 1
+        elif action == "die":
+            if self._restarts_in_flight > 0:
+                # stopped by a restart, a start event follows
+                return
+            if self.status == "started" and self._stop_task is None and not self._closing:
+                # the container has died on its own, clean the consoles and links
+                log.warning("Docker container '{name}' [{image}] has stopped unexpectedly with exit code {code}".format(name=self._name,
+                                                                                                                      image=self._image,
+                                                                                                                      code=attributes.get("exitCode")))
+                self.project.emit("log.warning", {"message": "Docker container '{}' has stopped unexpectedly".format(self._name)})
+                self.status = "stopped"
+                asyncio.ensure_future(self._stop_after_exit())
+        elif action == "pause":
+            if self.status == "started":
+                self.status = "suspended"
+        elif action == "unpause":
+            if self.status == "suspended":
+                self.status = "started"
+
+    async def _stop_after_exit(self):
+
+        try:
+            await self.stop()
+        except DockerError as e:
+            log.warning("Could not clean Docker container '{name}' after it stopped: {error}".format(name=self._name, error=e))
 
     async def _get_image_information(self):
         """
@@ -404,6 +469,7 @@ class DockerVM(BaseNode):
         result = await self.manager.query("POST", "containers/create", data=params)
         self._cid = result['Id']
         log.info("Docker container '{name}' [{id}] created".format(name=self._name, id=self._id))
+        self.manager.watch_events()
         return True
 
     def _format_env(self, variables, env):
@@ -443,6 +509,7 @@ class DockerVM(BaseNode):
         if state == "running":
             await self.start()
 
+    @timed_start
     async def start(self):
         """
         Starts this Docker container.
@@ -466,8 +533,9 @@ class DockerVM(BaseNode):
 
             await self._clean_servers()
 
-            await self.manager.query("POST", "containers/{}/start".format(self._cid))
-            self._namespace = await self._get_namespace()
+            with self.timing_span("process"):
+                await self.manager.query("POST", "containers/{}/start".format(self._cid))
+                self._namespace = await self._get_namespace()
 
             await self._start_ubridge(require_privileged_access=True)
 
@@ -475,7 +543,8 @@ class DockerVM(BaseNode):
                 nio = self._ethernet_adapters[adapter_number].get_nio(0)
                 async with self.manager.ubridge_lock:
                     try:
-                        await self._add_ubridge_connection(nio, adapter_number)
+                        with self.timing_span("links"):
+                            await self._add_ubridge_connection(nio, adapter_number)
                     except UbridgeNamespaceError:
                         log.error("Container %s failed to start", self.name)
                         await self.stop()
@@ -486,13 +555,14 @@ class DockerVM(BaseNode):
                             log.error(line)
                         raise DockerError(logdata)
 
-            if self.console_type == "telnet":
-                await self._start_console()
-            elif self.console_type == "http" or self.console_type == "https":
-                await self._start_http()
+            with self.timing_span("console"):
+                if self.console_type == "telnet":
+                    await self._start_console()
+                elif self.console_type == "http" or self.console_type == "https":
+                    await self._start_http()
 
-            if self.allocate_aux:
-                await self._start_aux()
+                if self.allocate_aux:
+                    await self._start_aux()
 
         self._permissions_fixed = False
         self.status = "started"
@@ -694,7 +764,12 @@ class DockerVM(BaseNode):
 
         output_stream = asyncio.StreamReader()
         input_stream = InputStream()
-        telnet = AsyncioTelnetServer(reader=output_stream, writer=input_stream, echo=True, naws=True, window_size_changed_callback=self._window_size_changed_callback)
+        telnet = AsyncioTelnetServer(reader=output_stream,
+                                     writer=input_stream,
+                                     echo=True,
+                                     naws=True,
+                                     window_size_changed_callback=self._window_size_changed_callback,
+                                     scrollback=self.console_scrollback)
         try:
             self._telnet_servers.append((await asyncio.start_server(telnet.run, self._manager.port_manager.console_host, self.console)))
         except OSError as e:
@@ -749,7 +824,12 @@ class DockerVM(BaseNode):
         Restart this Docker container.
         """
 
-        await self.manager.query("POST", "containers/{}/restart".format(self._cid))
+        self._restarts_in_flight += 1
+        try:
+            await self.manager.query("POST", "containers/{}/restart".format(self._cid))
+        except BaseException:
+            self._restarts_in_flight -= 1
+            raise
         log.info("Docker container '{name}' [{image}] restarted".format(
             name=self._name, image=self._image))
 
@@ -766,9 +846,22 @@ class DockerVM(BaseNode):
 
     async def stop(self):
         """
-        Stops this Docker container.
+        Stops this Docker container, a stop already in progress
+        (e.g. console closed and container died) is waited for.
         """
 
+        if self._stop_task is None:
+            self._stop_task = asyncio.ensure_future(self._stop())
+            self._stop_task.add_done_callback(self._stop_done)
+        await asyncio.shield(self._stop_task)
+
+    def _stop_done(self, task):
+
+        self._stop_task = None
+
+    async def _stop(self):
+
+        self._restarts_in_flight = 0
         try:
             await self._clean_servers()
             await self._stop_ubridge()
@@ -928,15 +1021,24 @@ class DockerVM(BaseNode):
     async def _connect_nio(self, adapter_number, nio):
 
         bridge_name = 'bridge{}'.format(adapter_number)
-        await self._ubridge_send('bridge add_nio_udp {bridge_name} {lport} {rhost} {rport}'.format(bridge_name=bridge_name,
-                                                                                                        lport=nio.lport,
-                                                                                                        rhost=nio.rhost,
-                                                                                                        rport=nio.rport))
-
+        commands = ['bridge add_nio_udp {bridge_name} {lport} {rhost} {rport}'.format(bridge_name=bridge_name,
+                                                                                      lport=nio.lport,
+                                                                                      rhost=nio.rhost,
+                                                                                      rport=nio.rport)]
         if nio.capturing:
-            await self._ubridge_send('bridge start_capture {bridge_name} "{pcap_file}"'.format(bridge_name=bridge_name,
-                                                                                                    pcap_file=nio.pcap_output_file))
-        await self._ubridge_send('bridge start {bridge_name}'.format(bridge_name=bridge_name))
+            commands.append('bridge start_capture {bridge_name} "{pcap_file}"'.format(bridge_name=bridge_name,
+                                                                                      pcap_file=nio.pcap_output_file))
+        commands.append('bridge start {bridge_name}'.format(bridge_name=bridge_name))
+        try:
+            await self._ubridge_send_batch(commands)
+        except UbridgeError:
+            # the bridge is created with the namespace, only remove what this batch added
+            await self._ubridge_rollback(["bridge stop {bridge_name}".format(bridge_name=bridge_name),
+                                          "bridge remove_nio_udp {bridge_name} {lport} {rhost} {rport}".format(bridge_name=bridge_name,
+                                                                                                            lport=nio.lport,
+                                                                                                            rhost=nio.rhost,
+                                                                                                            rport=nio.rport)])
+            raise
         await self._ubridge_apply_filters(bridge_name, nio.filters)
 
     async def adapter_add_nio_binding(self, adapter_number, nio):
@@ -36,6 +36,7 @@ log = logging.getLogger(__name__)
 from gns3server.utils.interfaces import interfaces, is_interface_up
 from gns3server.utils.asyncio import wait_run_in_executor
 from gns3server.utils import parse_version
+from gns3server.utils.images import md5sum
 from uuid import uuid4
 from ..base_manager import BaseManager
 from ..port_manager import PortManager
@@ -43,6 +44,7 @@ from .dynamips_error import DynamipsError
 from .hypervisor import Hypervisor
 from .nodes.router import Router
 from .dynamips_factory import DynamipsFactory
+from .ghost_cache import GhostCache
 
 # NIOs
 from .nios.nio_udp import NIOUDP
@@ -108,20 +110,30 @@ PLATFORMS_DEFAULT_RAM = {"c1700": 160,
                          "c7200": 512}
 
 
+# maximum time to wait for a router to boot before looking for Idle-PC values
+AUTO_IDLEPC_BOOT_TIMEOUT = 120  # seconds
+
+# end of the IOS boot, setup dialog (router without startup-config) or prompt printed on the console
+CONSOLE_READY_RE = re.compile(br"Press RETURN to get started|"
+                              br"Would you like to enter the initial configuration dialog\? \[yes/no\]|"
+                              br"% Please answer 'yes' or 'no'|"
+                              br"[\r\n][\w.\-]+(\(\S+\))?[>#] ?$")
+
+
 class Dynamips(BaseManager):
 
     _NODE_CLASS = DynamipsFactory
     _NODE_TYPE = "dynamips"
-    _ghost_ios_lock = None
 
     def __init__(self):
 
         super().__init__()
-        Dynamips._ghost_ios_lock = asyncio.Lock()
         self._devices = {}
-        self._ghost_files = set()
+        self._ghost_cache = None
         self._dynamips_path = None
         self._dynamips_ids = {}
+        self._router_hypervisors = {}
+        self._placement_lock = asyncio.Lock()
 
     @classmethod
     def node_types(cls):
@@ -224,8 +236,6 @@ class Dynamips(BaseManager):
         for file in files:
             try:
                 log.debug("Deleting file {}".format(file))
-                if file in self._ghost_files:
-                    self._ghost_files.remove(file)
                 await wait_run_in_executor(os.remove, file)
             except OSError as e:
                 log.warning("Could not delete file {}: {}".format(file, e))
@@ -236,6 +246,27 @@ class Dynamips(BaseManager):
         if project.id in self._dynamips_ids:
             del self._dynamips_ids[project.id]
 
+        if project.id in self._router_hypervisors:
+            del self._router_hypervisors[project.id]
+
+    @property
+    def ghost_cache(self):
+        """
+        Returns the ghost IOS image cache shared by all the projects.
+
+        :returns: GhostCache instance
+        """
+
+        if self._ghost_cache is None:
+            dynamips_config = self.config.get_section_config("Dynamips")
+            path = dynamips_config.get("ghost_cache_path")
+            if not path:
+                images_path = self.config.get_section_config("Server").get("images_path", "~/GNS3/images")
+                path = os.path.join(os.path.dirname(os.path.expanduser(images_path).rstrip(os.sep)), "ghosts")
+            budget = int(dynamips_config.get("ghost_cache_budget", 2048)) * 1024 * 1024
+            self._ghost_cache = GhostCache(os.path.expanduser(path), budget)
+        return self._ghost_cache
+
     @property
     def dynamips_path(self):
         """
@@ -309,15 +340,59 @@ class Dynamips(BaseManager):
 
         return hypervisor
 
+    async def get_router_hypervisor(self, router):
+        """
+        Returns the hypervisor which will run a new router.
+
+        Routers of a project are placed on shared hypervisors according to the
+        routers_per_hypervisor and hypervisor_memory_budget settings. A shared
+        hypervisor only runs routers of the same platform and IOS image so they
+        use the same ghost IOS files.
+
+        :param router: Router instance
+
+        :returns: hypervisor instance
+        """
+
+        dynamips_config = self.config.get_section_config("Dynamips")
+        routers_per_hypervisor = int(dynamips_config.get("routers_per_hypervisor", 1))
+        memory_budget = int(dynamips_config.get("hypervisor_memory_budget", 0))
+        working_dir = router.project.module_working_directory(self.module_name.lower())
+        if routers_per_hypervisor == 1:
+            return await self.start_new_hypervisor(working_dir=working_dir)
+
+        async with self._placement_lock:
+            hypervisors = [hypervisor for hypervisor in self._router_hypervisors.get(router.project.id, []) if hypervisor.is_running()]
+            for hypervisor in hypervisors:
+                routers = [device for device in hypervisor.devices if isinstance(device, Router)]
+                if routers_per_hypervisor > 0 and len(routers) >= routers_per_hypervisor:
+                    continue
+                if any(device.platform != router.platform or device.image != router.image for device in routers):
+                    continue
+                if memory_budget > 0 and routers and sum(device.ram for device in routers) + router.ram > memory_budget:
+                    continue
+                break
+            else:
+                hypervisor = await self.start_new_hypervisor(working_dir=working_dir)
+                hypervisors.append(hypervisor)
+            self._router_hypervisors[router.project.id] = hypervisors
+            # reserve the place before the lock is released, the router is not created yet
+            hypervisor.devices.append(router)
+
+        log.info('Router "{name}" placed on hypervisor {host}:{port} ({count} routers)'.format(name=router.name,
+                                                                                         host=hypervisor.host,
+                                                                                         port=hypervisor.port,
+                                                                                         count=len(hypervisor.devices)))
+        return hypervisor
+
     async def ghost_ios_support(self, vm):
 
         ghost_ios_support = self.config.get_section_config("Dynamips").getboolean("ghost_ios_support", True)
         if ghost_ios_support:
-            async with Dynamips._ghost_ios_lock:
-                try:
-                    await self._set_ghost_ios(vm)
-                except GeneratorExit:
-                    log.warning("Could not create ghost IOS image {} (GeneratorExit)".format(vm.name))
+            try:
+                await self._set_ghost_ios(vm)
+            except GeneratorExit:
+                log.warning("Could not create ghost IOS image {} (GeneratorExit)".format(vm.name))
 
     async def create_nio(self, node, nio_settings):
         """
@@ -404,32 +479,37 @@ class Dynamips(BaseManager):
             log.warning("Ghost IOS is not supported for c7200 with NPE-G2")
             return
 
-        ghost_file = vm.formatted_ghost_file()
-
-        module_workdir = vm.project.module_working_directory(self.module_name.lower())
-        ghost_file_path = os.path.join(module_workdir, ghost_file)
-        if ghost_file_path not in self._ghost_files:
-            # create a new ghost IOS instance
-            ghost_id = str(uuid4())
-            ghost = Router("ghost-" + ghost_file, ghost_id, vm.project, vm.manager, platform=vm.platform, hypervisor=vm.hypervisor, ghost_flag=True)
-            try:
-                await ghost.create()
-                await ghost.set_image(vm.image)
-                await ghost.set_ghost_status(1)
-                await ghost.set_ghost_file(ghost_file_path)
-                await ghost.set_ram(vm.ram)
+        checksum = await wait_run_in_executor(md5sum, vm.image)
+        if checksum is None:
+            log.warning('Could not compute the checksum of IOS image "{}", ghost IOS is not used'.format(vm.image))
+            return
+        ghost_file = GhostCache.filename(checksum, vm.platform, vm.ram)
+
+        # only the routers using the same ghost file wait for its creation
+        async with self.ghost_cache.lock(ghost_file):
+            ghost_file_path = self.ghost_cache.get(ghost_file)
+            if ghost_file_path is None:
+                # create a new ghost IOS instance
+                ghost_id = str(uuid4())
+                ghost = Router("ghost-" + ghost_file, ghost_id, vm.project, vm.manager, platform=vm.platform, hypervisor=vm.hypervisor, ghost_flag=True)
                 try:
-                    await ghost.start()
-                    await ghost.stop()
-                    self._ghost_files.add(ghost_file_path)
-                except DynamipsError:
-                    raise
-                finally:
-                    await ghost.clean_delete()
-            except DynamipsError as e:
-                log.warning("Could not create ghost instance: {}".format(e))
-
-        if vm.ghost_file != ghost_file and os.path.isfile(ghost_file_path):
+                    await ghost.create()
+                    await ghost.set_image(vm.image)
+                    await ghost.set_ghost_status(1)
+                    await ghost.set_ghost_file(self.ghost_cache.new_file_path(ghost_file))
+                    await ghost.set_ram(vm.ram)
+                    try:
+                        await ghost.start()
+                        await ghost.stop()
+                    finally:
+                        await ghost.clean_delete()
+                    ghost_file_path = self.ghost_cache.add(ghost_file)
+                except DynamipsError as e:
+                    log.warning("Could not create ghost instance: {}".format(e))
+            if ghost_file_path:
+                self.ghost_cache.acquire(ghost_file, vm.id)
+
+        if ghost_file_path and vm.ghost_file != ghost_file_path:
             # set the ghost file to the router
             await vm.set_ghost_status(2)
             await vm.set_ghost_file(ghost_file_path)
@@ -548,6 +628,55 @@ class Dynamips(BaseManager):
 
         return os.path.join("configs", os.path.basename(path))
 
+    async def _wait_for_console_ready(self, vm, timeout=AUTO_IDLEPC_BOOT_TIMEOUT):
+        """
+        Waits for a router to print its first prompt on the console,
+        Idle-PC values can only be found once IOS runs its idle loop.
+
+        :param vm: VM instance
+        :param timeout: maximum time to wait in seconds
+        """
+
+        if vm.console_type != "telnet" or not vm.console:
+            await asyncio.sleep(20)  # leave time to the router to boot
+            return
+
+        console_host = self.port_manager.console_host
+        if console_host == "0.0.0.0":
+            console_host = "127.0.0.1"
+        elif console_host == "::":
+            console_host = "::1"
+
+        begin = time.monotonic()
+        writer = None
+        try:
+            while writer is None:
+                try:
+                    reader, writer = await asyncio.open_connection(console_host, vm.console)
+                except OSError:
+                    if time.monotonic() - begin > timeout:
+                        raise asyncio.TimeoutError()
+                    await asyncio.sleep(0.5)
+            output = b""
+            while True:
+                remaining = timeout - (time.monotonic() - begin)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                data = await asyncio.wait_for(reader.read(1024), remaining)
+                if not data:
+                    log.warning("Console of router {} closed before the router was ready".format(vm.name))
+                    return
+                # keep the end of the output, a prompt can be split across reads
+                output = (output + data)[-1024:]
+                if CONSOLE_READY_RE.search(output):
+                    log.debug("Auto Idle-PC: router {} is ready after {:.2f} seconds".format(vm.name, time.monotonic() - begin))
+                    return
+        except asyncio.TimeoutError:
+            log.warning("Router {} is not ready after {} seconds, trying to find Idle-PC values anyway".format(vm.name, timeout))
+        finally:
+            if writer:
+                writer.close()
+
     async def auto_idlepc(self, vm):
         """
         Try to find the best possible idle-pc value.
@@ -563,7 +692,7 @@ class Dynamips(BaseManager):
             if status != "running":
                 await vm.start()
                 was_auto_started = True
-                await asyncio.sleep(20)  # leave time to the router to boot
+                await self._wait_for_console_ready(vm)
             validated_idlepc = None
             idlepcs = await vm.get_idle_pc_prop()
             if not idlepcs:
@@ -20,12 +20,12 @@ Interface for Dynamips hypervisor management module ("hypervisor")
 http://github.com/GNS3/dynamips/blob/master/README.hypervisor#L46
 """
 
-import re
 import time
 import logging
 import asyncio
 
 from .dynamips_error import DynamipsError
+from ...utils.asyncio.line_protocol import LineProtocolClient, LineProtocolResponseError
 
 log = logging.getLogger(__name__)
 
@@ -42,10 +42,6 @@ class DynamipsHypervisor:
     hypervisor (defaults to 30 seconds)
     """
 
-    # Used to parse Dynamips response codes
-    error_re = re.compile(r"""^2[0-9]{2}-""")
-    success_re = re.compile(r"""^1[0-9]{2}\s{1}""")
-
     def __init__(self, working_dir, host, port=7200, timeout=30.0):
 
         self._host = host
@@ -57,7 +53,7 @@ class DynamipsHypervisor:
         self._timeout = timeout
         self._reader = None
         self._writer = None
-        self._io_lock = asyncio.Lock()
+        self._client = None
 
     async def connect(self, timeout=10):
         """
@@ -90,6 +86,7 @@ class DynamipsHypervisor:
             raise DynamipsError("Couldn't connect to hypervisor on {}:{} :{}".format(host, self._port, last_exception))
         else:
             log.info("Connected to Dynamips hypervisor on {}:{} after {:.4f} seconds".format(host, self._port, time.time() - begin))
+            self._client = LineProtocolClient(self._reader, self._writer)
 
         try:
             version = await self.send("hypervisor version")
@@ -117,7 +114,7 @@ class DynamipsHypervisor:
 
         await self.send("hypervisor close")
         self._writer.close()
-        self._reader, self._writer = None
+        self._reader = self._writer = self._client = None
 
     async def stop(self):
         """
@@ -135,7 +132,7 @@ class DynamipsHypervisor:
                 self._writer.close()
         except OSError as e:
             log.debug("Stopping hypervisor {}:{} {}".format(self._host, self._port, e))
-        self._reader = self._writer = None
+        self._reader = self._writer = self._client = None
 
     async def reset(self):
         """
@@ -225,94 +222,35 @@ class DynamipsHypervisor:
         :returns: results as a list
         """
 
-        # Dynamips responses are of the form:
-        #   1xx yyyyyy\r\n
-        #   1xx yyyyyy\r\n
-        #   ...
-        #   100-yyyy\r\n
-        # or
-        #   2xx-yyyy\r\n
-        #
-        # Where 1xx is a code from 100-199 for a success or 200-299 for an error
-        # The result might be multiple lines and might be less than the buffer size
-        # but still have more data. The only thing we know for sure is the last line
-        # will begin with '100-' or a '2xx-' and end with '\r\n'
-
-        async with self._io_lock:
-            if self._writer is None or self._reader is None:
-                raise DynamipsError("Not connected")
+        results = await self.send_batch([command])
+        return results[0]
 
-            try:
-                command = command.strip() + '\n'
-                log.debug("sending {}".format(command))
-                self._writer.write(command.encode())
-                await self._writer.drain()
-            except OSError as e:
-                raise DynamipsError("Could not send Dynamips command '{command}' to {host}:{port}: {error}, process running: {run}"
-                                    .format(command=command.strip(), host=self._host, port=self._port, error=e, run=self.is_running()))
-
-            # Now retrieve the result
-            data = []
-            buf = ''
-            retries = 0
-            max_retries = 10
-            while True:
-                try:
-                    try:
-                        # line = await self._reader.readline()  # this can lead to ValueError: Line is too long
-                        chunk = await self._reader.read(1024)  # match to Dynamips' buffer size
-                    except asyncio.CancelledError:
-                        # task has been canceled but continue to read
-                        # any remaining data sent by the hypervisor
-                        continue
-                    except ConnectionResetError as e:
-                        # Sometimes WinError 64 (ERROR_NETNAME_DELETED) is returned here on Windows.
-                        # These happen if connection reset is received before IOCP could complete
-                        # a previous operation. Ignore and try again....
-                        log.warning("Connection reset received while reading Dynamips response: {}".format(e))
-                        continue
-                    if not chunk:
-                        if retries > max_retries:
-                            raise DynamipsError("No data returned from {host}:{port}, Dynamips process running: {run}"
-                                                .format(host=self._host, port=self._port, run=self.is_running()))
-                        else:
-                            retries += 1
-                            await asyncio.sleep(0.1)
-                            continue
-                    retries = 0
-                    buf += chunk.decode("utf-8", errors="ignore")
-                except OSError as e:
-                    raise DynamipsError("Could not read response for '{command}' from {host}:{port}: {error}, process running: {run}"
-                                        .format(command=command.strip(), host=self._host, port=self._port, error=e, run=self.is_running()))
-
-                # If the buffer doesn't end in '\n' then we can't be done
-                try:
-                    if buf[-1] != '\n':
-                        continue
-                except IndexError:
-                    raise DynamipsError("Could not communicate with {host}:{port}, Dynamips process running: {run}"
-                                        .format(host=self._host, port=self._port, run=self.is_running()))
-
-                data += buf.split('\r\n')
-                if data[-1] == '':
-                    data.pop()
-                buf = ''
-
-                # Does it contain an error code?
-                if self.error_re.search(data[-1]):
-                    raise DynamipsError("Dynamips error when running command '{}': {}".format(command, data[-1][4:]))
-
-                # Or does the last line begin with '100-'? Then we are done!
-                if data[-1][:4] == '100-':
-                    data[-1] = data[-1][4:]
-                    if data[-1] == 'OK':
-                        data.pop()
-                    break
-
-            # Remove success responses codes
-            for index in range(len(data)):
-                if self.success_re.search(data[index]):
-                    data[index] = data[index][4:]
-
-            log.debug("returned result {}".format(data))
-            return data
+    async def send_batch(self, commands, pipeline=True):
+        """
+        Sends several commands to this hypervisor in one go,
+        the responses are collected in the same order.
+
+        :param commands: list of Dynamips hypervisor commands
+        :param pipeline: if False, the commands are not pipelined and
+        the first failed command stops the sequence
+
+        :returns: list of results (one list per command)
+        """
+
+        if self._writer is None or self._reader is None or self._client is None:
+            raise DynamipsError("Not connected")
+
+        log.debug("sending {}".format(commands))
+        try:
+            results = await self._client.send_batch(commands, pipeline=pipeline)
+        except LineProtocolResponseError as e:
+            raise DynamipsError("Dynamips error when running command '{}': {}".format(e.command, e.message))
+        except EOFError:
+            raise DynamipsError("No data returned from {host}:{port}, Dynamips process running: {run}"
+                                .format(host=self._host, port=self._port, run=self.is_running()))
+        except OSError as e:
+            raise DynamipsError("Could not communicate with {host}:{port} for '{command}': {error}, process running: {run}"
+                                .format(command="; ".join(commands), host=self._host, port=self._port, error=e, run=self.is_running()))
+
+        log.debug("returned result {}".format(results))
+        return results
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of ghost IOS images shared by all the projects.
+
+Ghost files are stored in one directory and named after the image checksum,
+the platform and the RAM size. The modification time of a file is its last
+use, the least recently used files which are not used by a router are
+deleted when the cache is larger than its budget.
+"""
+
+import os
+import asyncio
+
+from .dynamips_error import DynamipsError
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class GhostCache:
+    """
+    Ghost IOS image cache.
+
+    :param path: cache directory
+    :param budget: maximum size of the cache in bytes (0 for no limit)
+    """
+
+    def __init__(self, path, budget=0):
+
+        self._path = path
+        self._budget = budget
+        self._locks = {}
+        self._users = {}
+
+    @property
+    def path(self):
+
+        return self._path
+
+    @property
+    def budget(self):
+
+        return self._budget
+
+    @staticmethod
+    def filename(checksum, platform, ram):
+        """
+        Returns the name of a ghost file.
+
+        :param checksum: MD5 checksum of the IOS image
+        :param platform: router platform
+        :param ram: router RAM in MB
+        """
+
+        return "{}-{}-{}.ghost".format(platform, checksum, ram)
+
+    def file_path(self, filename):
+
+        return os.path.join(self._path, filename)
+
+    def lock(self, filename):
+        """
+        Returns the lock protecting the creation of a ghost file.
+
+        :param filename: ghost file name
+        """
+
+        lock = self._locks.get(filename)
+        if lock is None:
+            lock = self._locks[filename] = asyncio.Lock()
+        return lock
+
+    def get(self, filename):
+        """
+        Returns the path of a ghost file if it is in the cache
+        and marks it as recently used.
+
+        :param filename: ghost file name
+
+        :returns: path or None
+        """
+
+        path = self.file_path(filename)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def new_file_path(self, filename):
+        """
+        Returns a temporary path to create a ghost file,
+        the file is added to the cache by add().
+
+        :param filename: ghost file name
+        """
+
+        try:
+            os.makedirs(self._path, exist_ok=True)
+        except OSError as e:
+            raise DynamipsError("Could not create the ghost IOS cache directory {}: {}".format(self._path, e))
+        return self.file_path(filename + ".tmp")
+
+    def add(self, filename):
+        """
+        Adds a ghost file created at new_file_path() to the cache.
+
+        :param filename: ghost file name
+
+        :returns: path to the ghost file
+        """
+
+        path = self.file_path(filename)
+        try:
+            os.replace(self.file_path(filename + ".tmp"), path)
+        except OSError as e:
+            raise DynamipsError("Could not add {} to the ghost IOS cache: {}".format(filename, e))
+        log.info("Ghost IOS image {} added to the cache".format(filename))
+        self.evict()
+        return path
+
+    def acquire(self, filename, user):
+        """
+        Records that a router is using a ghost file,
+        a router only uses one ghost file at a time.
+
+        :param filename: ghost file name
+        :param user: router identifier
+        """
+
+        self._users[user] = filename
+
+    def release(self, user):
+        """
+        Records that a router is not using its ghost file anymore.
+
+        :param user: router identifier
+        """
+
+        self._users.pop(user, None)
+
+    def references(self, filename):
+        """
+        Returns the number of routers using a ghost file.
+        """
+
+        return sum(1 for used in self._users.values() if used == filename)
+
+    def _entries(self):
+        """
+        Returns the ghost files as a list of (last use, size, filename), the least recently used first.
+        """
+
+        entries = []
+        try:
+            with os.scandir(self._path) as it:
+                for entry in it:
+                    if entry.name.endswith(".ghost") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.name))
+        except OSError as e:
+            log.warning("Could not list the ghost IOS cache {}: {}".format(self._path, e))
+        return sorted(entries)
+
+    def size(self):
+        """
+        Returns the size of the cache in bytes.
+        """
+
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Deletes the least recently used ghost files which are not
+        used by a router until the cache fits in its budget.
+
+        :returns: list of deleted file names
+        """
+
+        if self._budget <= 0:
+            return []
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, filename in entries:
+            if total_size <= self._budget:
+                break
+            lock = self._locks.get(filename)
+            if self.references(filename) or (lock and lock.locked()):
+                continue
+            try:
+                os.remove(self.file_path(filename))
+            except OSError as e:
+                log.warning("Could not delete ghost IOS image {}: {}".format(filename, e))
+                continue
+            total_size -= size
+            evicted.append(filename)
+            log.info("Ghost IOS image {} evicted from the cache".format(filename))
+        if total_size > self._budget:
+            log.warning("The ghost IOS cache uses {} bytes which is more than its budget of {} bytes".format(total_size, self._budget))
+        return evicted
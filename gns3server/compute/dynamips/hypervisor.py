@@ -60,6 +60,7 @@ class Hypervisor(DynamipsHypervisor):
         self._process = None
         self._stdout_file = ""
         self._started = False
+        self._cgroup = None
 
     @property
     def id(self):
@@ -81,6 +82,21 @@ class Hypervisor(DynamipsHypervisor):
 
         return self._process
 
+    @property
+    def cgroup(self):
+        """
+        Returns the cgroup of the hypervisor process, shared by its routers.
+
+        :returns: Cgroup instance or None
+        """
+
+        return self._cgroup
+
+    @cgroup.setter
+    def cgroup(self, cgroup):
+
+        self._cgroup = cgroup
+
     @property
     def started(self):
         """
@@ -167,6 +183,10 @@ class Hypervisor(DynamipsHypervisor):
                 os.remove(self._stdout_file)
             except OSError as e:
                 log.warning("could not delete temporary Dynamips log file: {}".format(e))
+        if self._cgroup:
+            # the process has stopped, whether routers have been started on it or not
+            self._cgroup.remove()
+            self._cgroup = None
         self._started = False
 
     def read_stdout(self):
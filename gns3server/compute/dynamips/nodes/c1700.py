@@ -44,11 +44,12 @@ class C1700(Router):
     :param chassis: chassis for this router:
     1720, 1721, 1750, 1751 or 1760 (default = 1720).
     1710 is not supported.
+    :param image: path to IOS image file
     """
 
-    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="1720"):
+    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="1720", image=None):
 
-        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c1700")
+        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c1700", image=image)
 
         # Set default values for this platform (must be the same as Dynamips)
         self._ram = 64
@@ -46,6 +46,7 @@ class C2600(Router):
     :param chassis: chassis for this router:
     2610, 2611, 2620, 2621, 2610XM, 2611XM
     2620XM, 2621XM, 2650XM or 2651XM (default = 2610).
+    :param image: path to IOS image file
     """
 
     # adapters to insert by default corresponding the
@@ -61,9 +62,9 @@ class C2600(Router):
                            "2650XM": C2600_MB_1FE,
                            "2651XM": C2600_MB_2FE}
 
-    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="2610"):
+    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="2610", image=None):
 
-        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c2600")
+        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c2600", image=image)
 
         # Set default values for this platform (must be the same as Dynamips)
         self._ram = 64
@@ -42,11 +42,12 @@ class C3600(Router):
     :param aux: auxiliary console port
     :param chassis: chassis for this router:
     3620, 3640 or 3660 (default = 3640).
+    :param image: path to IOS image file
     """
 
-    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="3640"):
+    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis="3640", image=None):
 
-        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c3600")
+        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c3600", image=image)
 
         # Set default values for this platform (must be the same as Dynamips)
         self._ram = 128
@@ -41,11 +41,12 @@ class C3725(Router):
     :param dynamips_id: ID to use with Dynamips
     :param console: console port
     :param aux: auxiliary console port
+    :param image: path to IOS image file
     """
 
-    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis=None):
+    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, chassis=None, image=None):
 
-        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c3725")
+        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c3725", image=image)
 
         # Set default values for this platform (must be the same as Dynamips)
         self._ram = 128
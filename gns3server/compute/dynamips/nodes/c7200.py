@@ -44,11 +44,12 @@ class C7200(Router):
     :param console: console port
     :param aux: auxiliary console port
     :param npe: Default NPE
+    :param image: path to IOS image file
     """
 
-    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, npe="npe-400", chassis=None):
+    def __init__(self, name, node_id, project, manager, dynamips_id, console=None, console_type="telnet", aux=None, npe="npe-400", chassis=None, image=None):
 
-        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c7200")
+        super().__init__(name, node_id, project, manager, dynamips_id, console, console_type, aux, platform="c7200", image=image)
 
         # Set default values for this platform (must be the same as Dynamips)
         self._ram = 256
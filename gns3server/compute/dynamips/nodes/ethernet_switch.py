@@ -168,10 +168,26 @@ class EthernetSwitch(Device):
             self._ports = ports
 
     async def update_port_settings(self):
+        """
+        Applies the settings of all the connected ports with one round trip to Dynamips.
+        The settings of a port do not depend on the other ports so they can be pipelined.
+        """
+
+        commands = []
+        mappings = {}
         for port_settings in self._ports:
             port_number = port_settings["port_number"]
             if port_number in self._nios and self._nios[port_number] is not None:
-                await self.set_port_settings(port_number, port_settings)
+                command, mapping = self._port_settings_command(self._nios[port_number], port_settings)
+                if command:
+                    commands.append(command)
+                    mappings[port_number] = mapping
+        if commands:
+            await self._hypervisor.send_batch(commands)
+            self._mappings.update(mappings)
+            log.info('Ethernet switch "{name}" [{id}]: settings applied to {count} ports'.format(name=self._name,
+                                                                                                id=self._id,
+                                                                                                count=len(commands)))
 
     async def create(self):
 
@@ -266,17 +282,33 @@ class EthernetSwitch(Device):
         if port_number in self._nios:
             raise DynamipsError("Port {} isn't free".format(port_number))
 
-        await self._hypervisor.send('ethsw add_nio "{name}" {nio}'.format(name=self._name, nio=nio))
+        # the port is added and configured with one round trip to Dynamips
+        commands = ['ethsw add_nio "{name}" {nio}'.format(name=self._name, nio=nio)]
+        mapping = None
+        for port_settings in self._ports:
+            if port_settings["port_number"] == port_number:
+                command, mapping = self._port_settings_command(nio, port_settings)
+                if command:
+                    commands.append(command)
+                break
+
+        try:
+            await self._hypervisor.send_batch(commands)
+        except DynamipsError:
+            # do not leave a port half configured
+            try:
+                await self._hypervisor.send('ethsw remove_nio "{name}" {nio}'.format(name=self._name, nio=nio))
+            except DynamipsError:
+                pass
+            raise
 
         log.info('Ethernet switch "{name}" [{id}]: NIO {nio} bound to port {port}'.format(name=self._name,
                                                                                           id=self._id,
                                                                                           nio=nio,
                                                                                           port=port_number))
         self._nios[port_number] = nio
-        for port_settings in self._ports:
-            if port_settings["port_number"] == port_number:
-                await self.set_port_settings(port_number, port_settings)
-                break
+        if mapping:
+            self._mappings[port_number] = mapping
 
     async def remove_nio(self, port_number):
         """
@@ -327,6 +359,37 @@ class EthernetSwitch(Device):
 
         return nio
 
+    def _port_settings_command(self, nio, settings):
+        """
+        Returns the Dynamips command applying port settings.
+
+        :param nio: NIO instance bound to the port
+        :param settings: port settings
+
+        :returns: tuple (command, port mapping), (None, None) if there is nothing to apply
+        """
+
+        if settings["type"] == "access":
+            command = 'ethsw set_access_port "{name}" {nio} {vlan_id}'.format(name=self._name,
+                                                                              nio=nio,
+                                                                              vlan_id=settings["vlan"])
+            return command, ("access", settings["vlan"])
+        elif settings["type"] == "dot1q":
+            command = 'ethsw set_dot1q_port "{name}" {nio} {native_vlan}'.format(name=self._name,
+                                                                                 nio=nio,
+                                                                                 native_vlan=settings["vlan"])
+            return command, ("dot1q", settings["vlan"])
+        elif settings["type"] == "qinq":
+            ethertype = settings.get("ethertype")
+            if ethertype != "0x8100" and parse_version(self.hypervisor.version) < parse_version('0.2.16'):
+                raise DynamipsError("Dynamips version required is >= 0.2.16 to change the default QinQ Ethernet type, detected version is {}".format(self.hypervisor.version))
+            command = 'ethsw set_qinq_port "{name}" {nio} {outer_vlan} {ethertype}'.format(name=self._name,
+                                                                                           nio=nio,
+                                                                                           outer_vlan=settings["vlan"],
+                                                                                           ethertype=ethertype if ethertype != "0x8100" else "")
+            return command, ("qinq", settings["vlan"], ethertype)
+        return None, None
+
     async def set_port_settings(self, port_number, settings):
         """
         Applies port settings to a specific port.
@@ -353,16 +416,14 @@ class EthernetSwitch(Device):
         if port_number not in self._nios:
             raise DynamipsError("Port {} is not allocated".format(port_number))
 
-        nio = self._nios[port_number]
-        await self._hypervisor.send('ethsw set_access_port "{name}" {nio} {vlan_id}'.format(name=self._name,
-                                                                                                 nio=nio,
-                                                                                                 vlan_id=vlan_id))
+        command, mapping = self._port_settings_command(self._nios[port_number], {"type": "access", "vlan": vlan_id})
+        await self._hypervisor.send(command)
 
         log.info('Ethernet switch "{name}" [{id}]: port {port} set as an access port in VLAN {vlan_id}'.format(name=self._name,
                                                                                                                id=self._id,
                                                                                                                port=port_number,
                                                                                                                vlan_id=vlan_id))
-        self._mappings[port_number] = ("access", vlan_id)
+        self._mappings[port_number] = mapping
 
     async def set_dot1q_port(self, port_number, native_vlan):
         """
@@ -375,17 +436,15 @@ class EthernetSwitch(Device):
         if port_number not in self._nios:
             raise DynamipsError("Port {} is not allocated".format(port_number))
 
-        nio = self._nios[port_number]
-        await self._hypervisor.send('ethsw set_dot1q_port "{name}" {nio} {native_vlan}'.format(name=self._name,
-                                                                                                    nio=nio,
-                                                                                                    native_vlan=native_vlan))
+        command, mapping = self._port_settings_command(self._nios[port_number], {"type": "dot1q", "vlan": native_vlan})
+        await self._hypervisor.send(command)
 
         log.info('Ethernet switch "{name}" [{id}]: port {port} set as a 802.1Q port with native VLAN {vlan_id}'.format(name=self._name,
                                                                                                                        id=self._id,
                                                                                                                        port=port_number,
                                                                                                                        vlan_id=native_vlan))
 
-        self._mappings[port_number] = ("dot1q", native_vlan)
+        self._mappings[port_number] = mapping
 
     async def set_qinq_port(self, port_number, outer_vlan, ethertype):
         """
@@ -398,21 +457,15 @@ class EthernetSwitch(Device):
         if port_number not in self._nios:
             raise DynamipsError("Port {} is not allocated".format(port_number))
 
-        nio = self._nios[port_number]
-        if ethertype != "0x8100" and parse_version(self.hypervisor.version) < parse_version('0.2.16'):
-            raise DynamipsError("Dynamips version required is >= 0.2.16 to change the default QinQ Ethernet type, detected version is {}".format(self.hypervisor.version))
-
-        await self._hypervisor.send('ethsw set_qinq_port "{name}" {nio} {outer_vlan} {ethertype}'.format(name=self._name,
-                                                                                                              nio=nio,
-                                                                                                              outer_vlan=outer_vlan,
-                                                                                                              ethertype=ethertype if ethertype != "0x8100" else ""))
+        command, mapping = self._port_settings_command(self._nios[port_number], {"type": "qinq", "vlan": outer_vlan, "ethertype": ethertype})
+        await self._hypervisor.send(command)
 
         log.info('Ethernet switch "{name}" [{id}]: port {port} set as a QinQ ({ethertype}) port with outer VLAN {vlan_id}'.format(name=self._name,
                                                                                                                                   id=self._id,
                                                                                                                                   port=port_number,
                                                                                                                                   vlan_id=outer_vlan,
                                                                                                                                   ethertype=ethertype))
-        self._mappings[port_number] = ("qinq", outer_vlan, ethertype)
+        self._mappings[port_number] = mapping
 
     async def get_mac_addr_table(self):
         """
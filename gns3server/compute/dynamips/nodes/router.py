@@ -33,7 +33,8 @@ import logging
 
 log = logging.getLogger(__name__)
 
-from ...base_node import BaseNode
+from ...base_node import BaseNode, timed_start
+from ...config_save_scheduler import write_config_if_changed
 from ..dynamips_error import DynamipsError
 
 from gns3server.utils.file_watcher import FileWatcher
@@ -54,6 +55,7 @@ class Router(BaseNode):
     :param console: console port
     :param aux: auxiliary console port
     :param platform: Platform of this router
+    :param image: path to IOS image file
     """
 
     _status = {0: "inactive",
@@ -61,7 +63,7 @@ class Router(BaseNode):
                2: "running",
                3: "suspended"}
 
-    def __init__(self, name, node_id, project, manager, dynamips_id=None, console=None, console_type="telnet", aux=None, platform="c7200", hypervisor=None, ghost_flag=False):
+    def __init__(self, name, node_id, project, manager, dynamips_id=None, console=None, console_type="telnet", aux=None, platform="c7200", hypervisor=None, ghost_flag=False, image=None):
 
         super().__init__(name, node_id, project, manager, console=console, console_type=console_type, aux=aux, allocate_aux=aux)
 
@@ -76,7 +78,8 @@ class Router(BaseNode):
         self._hypervisor = hypervisor
         self._dynamips_id = dynamips_id
         self._platform = platform
-        self._image = ""
+        # the image is known before the router is placed on a hypervisor
+        self._image = manager.get_abs_image_path(image, project.path) if image else ""
         self._ram = 128  # Megabytes
         self._nvram = 128  # Kilobytes
         self._mmap = True
@@ -99,6 +102,7 @@ class Router(BaseNode):
         self._slots = []
         self._ghost_flag = ghost_flag
         self._memory_watcher = None
+        self._written_configs = {}
 
         if not ghost_flag:
             if not dynamips_id:
@@ -167,7 +171,8 @@ class Router(BaseNode):
                        "console_type": self.console_type,
                        "aux": self.aux,
                        "mac_addr": self._mac_addr,
-                       "system_id": self._system_id}
+                       "system_id": self._system_id,
+                       "start_timings": self.start_timings}
 
         router_info["image"] = self.manager.get_relative_image_path(self._image, self.project.path)
 
@@ -193,7 +198,7 @@ class Router(BaseNode):
         """
         Called when the NVRAM file has changed
         """
-        asyncio.ensure_future(self.save_configs())
+        self._project.config_save_scheduler.schedule(self.id, self.save_configs)
 
     @property
     def dynamips_id(self):
@@ -210,12 +215,16 @@ class Router(BaseNode):
         if not self._hypervisor:
             # We start the hypervisor is the dynamips folder and next we change to node dir
             # this allow the creation of common files in the dynamips folder
-            self._hypervisor = await self.manager.start_new_hypervisor(working_dir=self.project.module_working_directory(self.manager.module_name.lower()))
-            await self._hypervisor.set_working_dir(self._working_directory)
+            self._hypervisor = await self.manager.get_router_hypervisor(self)
 
-        await self._hypervisor.send('vm create "{name}" {id} {platform}'.format(name=self._name,
-                                                                                     id=self._dynamips_id,
-                                                                                     platform=self._platform))
+        try:
+            await self._send_in_working_dir('vm create "{name}" {id} {platform}'.format(name=self._name,
+                                                                                        id=self._dynamips_id,
+                                                                                        platform=self._platform))
+        except DynamipsError:
+            if self in self._hypervisor.devices:
+                self._hypervisor.devices.remove(self)
+            raise
 
         if not self._ghost_flag:
 
@@ -229,12 +238,31 @@ class Router(BaseNode):
             if self.aux is not None:
                 await self._hypervisor.send('vm set_aux_tcp_port "{name}" {aux}'.format(name=self._name, aux=self.aux))
 
+            if self._image:
+                await self.set_image(self._image)
+
             # get the default base MAC address
             mac_addr = await self._hypervisor.send('{platform} get_mac_addr "{name}"'.format(platform=self._platform,
                                                                                                   name=self._name))
             self._mac_addr = mac_addr[0]
 
-        self._hypervisor.devices.append(self)
+        if self not in self._hypervisor.devices:
+            self._hypervisor.devices.append(self)
+
+    async def _send_in_working_dir(self, command):
+        """
+        Sends a command creating files in the working directory of this router.
+
+        The hypervisor may run other routers with their own working directory,
+        the working directory is changed in the same batch as the command. The
+        batch is not pipelined so the command is not run if the working directory
+        cannot be changed.
+
+        :param command: command to send
+        """
+
+        results = await self._hypervisor.send_batch(['hypervisor working_dir "{}"'.format(self._working_directory), command], pipeline=False)
+        return results[1]
 
     async def get_status(self):
         """
@@ -248,6 +276,7 @@ class Router(BaseNode):
             raise DynamipsError("Can't get vm {name} status".format(name=self._name))
         return self._status[int(status[0])]
 
+    @timed_start
     async def start(self):
         """
         Starts this router.
@@ -289,11 +318,19 @@ class Router(BaseNode):
                 # an empty private-config can prevent a router to boot.
                 private_config_path = ''
 
-            await self._hypervisor.send('vm set_config "{name}" "{startup}" "{private}"'.format(
-                name=self._name,
-                startup=startup_config_path,
-                private=private_config_path))
-            await self._hypervisor.send('vm start "{name}"'.format(name=self._name))
+            with self.timing_span("configs"):
+                await self._hypervisor.send('vm set_config "{name}" "{startup}" "{private}"'.format(
+                    name=self._name,
+                    startup=startup_config_path,
+                    private=private_config_path))
+            with self.timing_span("process"):
+                await self._send_in_working_dir('vm start "{name}"'.format(name=self._name))
+            if self._hypervisor.process:
+                # the routers sharing a hypervisor share its cgroup
+                ram = sum(getattr(device, "ram", 0) for device in self._hypervisor.devices)
+                if self._set_resource_limits(self._hypervisor.process.pid, memory=ram, name="dynamips-{}".format(self._hypervisor.port)):
+                    # the cgroup is removed when the hypervisor stops
+                    self._hypervisor.cgroup = self._cgroup
             self.status = "started"
             log.info('router "{name}" [{id}] has been started'.format(name=self._name, id=self._id))
 
@@ -329,6 +366,7 @@ class Router(BaseNode):
         if self._memory_watcher:
             self._memory_watcher.close()
             self._memory_watcher = None
+        self._project.config_save_scheduler.cancel(self.id)
         await self.save_configs()
 
     async def reload(self):
@@ -386,15 +424,22 @@ class Router(BaseNode):
 
         await self._stop_ubridge()
 
-        if self in self._hypervisor.devices:
-            self._hypervisor.devices.remove(self)
-        if self._hypervisor and not self._hypervisor.devices:
+        if self._hypervisor:
+            if self in self._hypervisor.devices:
+                self._hypervisor.devices.remove(self)
+            # the hypervisor can be shared with other routers
             try:
                 await self.stop()
                 await self._hypervisor.send('vm delete "{}"'.format(self._name))
             except DynamipsError as e:
                 log.warning("Could not stop and delete {}: {}".format(self._name, e))
-            await self.hypervisor.stop()
+            if not self._hypervisor.devices:
+                await self.hypervisor.stop()
+            self._cgroup = None
+
+        if self._ghost_file and not self._ghost_flag:
+            # the ghost file can be evicted from the cache once no router uses it
+            self.manager.ghost_cache.release(self.id)
 
         if self._auto_delete_disks:
             # delete nvram and disk files
@@ -1595,9 +1640,8 @@ class Router(BaseNode):
                 config = base64.b64decode(startup_config_base64).decode("utf-8", errors="replace")
                 config = "!\n" + config.replace("\r", "")
                 config_path = os.path.join(self._working_directory, startup_config)
-                with open(config_path, "wb") as f:
+                if write_config_if_changed(config_path, config.encode("utf-8"), self._written_configs):
                     log.info("saving startup-config to {}".format(startup_config))
-                    f.write(config.encode("utf-8"))
             except (binascii.Error, OSError) as e:
                 raise DynamipsError("Could not save the startup configuration {}: {}".format(config_path, e))
 
@@ -1606,9 +1650,8 @@ class Router(BaseNode):
             try:
                 config = base64.b64decode(private_config_base64).decode("utf-8", errors="replace")
                 config_path = os.path.join(self._working_directory, private_config)
-                with open(config_path, "wb") as f:
+                if write_config_if_changed(config_path, config.encode("utf-8"), self._written_configs):
                     log.info("saving private-config to {}".format(private_config))
-                    f.write(config.encode("utf-8"))
             except (binascii.Error, OSError) as e:
                 raise DynamipsError("Could not save the private configuration {}: {}".format(config_path, e))
 
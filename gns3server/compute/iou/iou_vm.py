@@ -37,7 +37,9 @@ from .iou_error import IOUError
 from ..adapters.ethernet_adapter import EthernetAdapter
 from ..adapters.serial_adapter import SerialAdapter
 from ..nios.nio_udp import NIOUDP
-from ..base_node import BaseNode
+from ..base_node import BaseNode, timed_start
+from ..binary_cache import BinaryCache
+from ..config_save_scheduler import write_config_if_changed
 from .utils.iou_import import nvram_import
 from .utils.iou_export import nvram_export
 from gns3server.ubridge.ubridge_error import UbridgeError
@@ -79,6 +81,7 @@ class IOUVM(BaseNode):
         self._iou_stdout_file = ""
         self._started = False
         self._nvram_watcher = None
+        self._written_configs = {}
         self._path = self.manager.get_abs_image_path(path, project.path)
         self._license_check = True
 
@@ -103,8 +106,16 @@ class IOUVM(BaseNode):
         Called when the NVRAM file has changed
         """
         log.debug("NVRAM changed: {}".format(path))
-        self.save_configs()
-        self.updated()
+        self._project.config_save_scheduler.schedule(self.id, self._save_changed_configs)
+
+    async def _save_changed_configs(self):
+        """
+        Saves the configs after a NVRAM change and notifies
+        the clients if they have been modified.
+        """
+
+        if await gns3server.utils.asyncio.wait_run_in_executor(self.save_configs):
+            self.updated()
 
     async def close(self):
         """
@@ -174,7 +185,7 @@ class IOUVM(BaseNode):
         """
 
         try:
-            output = await gns3server.utils.asyncio.subprocess_check_output(self._path, "-h", cwd=self.working_dir, stderr=True)
+            output = await BinaryCache.instance().probe(self._path, "help", lambda: gns3server.utils.asyncio.subprocess_check_output(self._path, "-h", cwd=self.working_dir, stderr=True))
             match = re.search(r"-n <n>\s+Size of nvram in Kb \(default ([0-9]+)KB\)", output)
             if match:
                 self.nvram = int(match.group(1))
@@ -235,7 +246,8 @@ class IOUVM(BaseNode):
                        "l1_keepalives": self._l1_keepalives,
                        "use_default_iou_values": self._use_default_iou_values,
                        "command_line": self.command_line,
-                       "application_id": self.application_id}
+                       "application_id": self.application_id,
+                       "start_timings": self.start_timings}
 
         iou_vm_info["path"] = self.manager.get_relative_image_path(self.path, self.project.path)
         return iou_vm_info
@@ -379,7 +391,7 @@ class IOUVM(BaseNode):
         """
 
         try:
-            output = await gns3server.utils.asyncio.subprocess_check_output("ldd", self._path)
+            output = await BinaryCache.instance().probe(self._path, "ldd", lambda: gns3server.utils.asyncio.subprocess_check_output("ldd", self._path))
         except (OSError, subprocess.SubprocessError) as e:
             log.warning("Could not determine the shared library dependencies for {}: {}".format(self._path, e))
             return
@@ -387,6 +399,8 @@ class IOUVM(BaseNode):
         p = re.compile(r"([\.\w]+)\s=>\s+not found")
         missing_libs = p.findall(output)
         if missing_libs:
+            # check again next time, the libraries may have been installed
+            BinaryCache.instance().invalidate(self._path, "ldd")
             raise IOUError("The following shared library dependencies cannot be found for IOU image {}: {}".format(self._path,
                                                                                                                    ", ".join(missing_libs)))
 
@@ -496,6 +510,7 @@ class IOUVM(BaseNode):
             except OSError as e:
                 raise IOUError("Cannot write nvram file {}: {}".format(nvram_file, e))
 
+    @timed_start
     async def start(self):
         """
         Starts the IOU process.
@@ -504,7 +519,8 @@ class IOUVM(BaseNode):
         self._check_requirements()
         if not self.is_running():
 
-            await self._library_check()
+            with self.timing_span("requirements"):
+                await self._library_check()
 
             try:
                 self._rename_nvram_file()
@@ -517,14 +533,16 @@ class IOUVM(BaseNode):
             if not os.path.isfile(iourc_path):
                 raise IOUError("The iourc path '{}' is not a regular file".format(iourc_path))
 
-            await self._check_iou_licence()
+            with self.timing_span("requirements"):
+                await self._check_iou_licence()
             await self._start_ubridge()
 
-            self._create_netmap_config()
-            if self.use_default_iou_values:
-                # make sure we have the default nvram amount to correctly push the configs
-                await self.update_default_iou_values()
-            self._push_configs_to_nvram()
+            with self.timing_span("configs"):
+                self._create_netmap_config()
+                if self.use_default_iou_values:
+                    # make sure we have the default nvram amount to correctly push the configs
+                    await self.update_default_iou_values()
+                self._push_configs_to_nvram()
 
             # check if there is enough RAM to run
             self.check_available_ram(self.ram)
@@ -550,14 +568,16 @@ class IOUVM(BaseNode):
             try:
                 log.info("Starting IOU: {}".format(command))
                 self.command_line = ' '.join(command)
-                self._iou_process = await asyncio.create_subprocess_exec(
-                    *command,
-                    stdout=asyncio.subprocess.PIPE,
-                    stdin=asyncio.subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    cwd=self.working_dir,
-                    env=env)
+                with self.timing_span("process"):
+                    self._iou_process = await asyncio.create_subprocess_exec(
+                        *command,
+                        stdout=asyncio.subprocess.PIPE,
+                        stdin=asyncio.subprocess.PIPE,
+                        stderr=subprocess.STDOUT,
+                        cwd=self.working_dir,
+                        env=env)
                 log.info("IOU instance {} started PID={}".format(self._id, self._iou_process.pid))
+                self._set_resource_limits(self._iou_process.pid, memory=self.ram)
                 self._started = True
                 self.status = "started"
                 callback = functools.partial(self._termination_callback, "IOU")
@@ -570,15 +590,21 @@ class IOUVM(BaseNode):
                 raise IOUError("Could not start IOU {}: {}\n{}".format(self._path, e, iou_stdout))
 
             if self.console and self.console_type == "telnet":
-                server = AsyncioTelnetServer(reader=self._iou_process.stdout, writer=self._iou_process.stdin, binary=True, echo=True)
+                server = AsyncioTelnetServer(reader=self._iou_process.stdout,
+                                             writer=self._iou_process.stdin,
+                                             binary=True,
+                                             echo=True,
+                                             scrollback=self.console_scrollback)
                 try:
-                    self._telnet_server = await asyncio.start_server(server.run, self._manager.port_manager.console_host, self.console)
+                    with self.timing_span("console"):
+                        self._telnet_server = await asyncio.start_server(server.run, self._manager.port_manager.console_host, self.console)
                 except OSError as e:
                     await self.stop()
                     raise IOUError("Could not start Telnet server on socket {}:{}: {}".format(self._manager.port_manager.console_host, self.console, e))
 
             # configure networking support
-            await self._networking()
+            with self.timing_span("links"):
+                await self._networking()
 
     @locking
     async def _networking(self):
@@ -660,6 +686,7 @@ class IOUVM(BaseNode):
         if self._nvram_watcher:
             self._nvram_watcher.close()
             self._nvram_watcher = None
+        self._project.config_save_scheduler.cancel(self.id)
 
         if self._telnet_server:
             self._telnet_server.close()
@@ -678,6 +705,7 @@ class IOUVM(BaseNode):
                         except ProcessLookupError:
                             pass
             self._iou_process = None
+        self._remove_resource_limits()
 
         try:
             symlink = os.path.join(self.working_dir, os.path.basename(self.path))
@@ -1048,7 +1076,8 @@ class IOUVM(BaseNode):
         if "IOURC" not in os.environ:
             env["IOURC"] = self.iourc_path
         try:
-            output = await gns3server.utils.asyncio.subprocess_check_output(self._path, "-h", cwd=self.working_dir, env=env, stderr=True)
+            # the help output may depend on the license, it is not cached with the output of the probe run without IOURC
+            output = await BinaryCache.instance().probe(self._path, "help-iourc", lambda: gns3server.utils.asyncio.subprocess_check_output(self._path, "-h", cwd=self.working_dir, env=env, stderr=True))
             if re.search(r"-l\s+Enable Layer 1 keepalive messages", output):
                 command.extend(["-l"])
             else:
@@ -1256,17 +1285,20 @@ class IOUVM(BaseNode):
     def save_configs(self):
         """
         Saves the startup-config and private-config to files.
+
+        :returns: True if a config file has been modified
         """
 
+        changed = False
         if self.startup_config_content or self.private_config_content:
             startup_config_content, private_config_content = self.extract_configs()
             if startup_config_content:
                 config_path = os.path.join(self.working_dir, "startup-config.cfg")
                 try:
                     config = startup_config_content.decode("utf-8", errors="replace")
-                    with open(config_path, "wb") as f:
+                    if write_config_if_changed(config_path, config.encode("utf-8"), self._written_configs):
                         log.info("saving startup-config to {}".format(config_path))
-                        f.write(config.encode("utf-8"))
+                        changed = True
                 except (binascii.Error, OSError) as e:
                     raise IOUError("Could not save the startup configuration {}: {}".format(config_path, e))
 
@@ -1274,11 +1306,12 @@ class IOUVM(BaseNode):
                 config_path = os.path.join(self.working_dir, "private-config.cfg")
                 try:
                     config = private_config_content.decode("utf-8", errors="replace")
-                    with open(config_path, "wb") as f:
+                    if write_config_if_changed(config_path, config.encode("utf-8"), self._written_configs):
                         log.info("saving private-config to {}".format(config_path))
-                        f.write(config.encode("utf-8"))
+                        changed = True
                 except (binascii.Error, OSError) as e:
                     raise IOUError("Could not save the private configuration {}: {}".format(config_path, e))
+        return changed
 
     async def start_capture(self, adapter_number, port_number, output_file, data_link_type="DLT_EN10MB"):
         """
@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import socket
+import functools
 from aiohttp.web import HTTPConflict
 from gns3server.config import Config
 
@@ -43,6 +44,12 @@ class PortManager:
         self._used_tcp_ports = set()
         self._used_udp_ports = set()
 
+        # bitmaps of the ports that cannot be allocated (used or banned)
+        # and where to resume the search for each port range
+        self._tcp_port_bitmap = self._new_port_bitmap()
+        self._udp_port_bitmap = self._new_port_bitmap()
+        self._port_cursors = {}
+
         server_config = Config.instance().get_section_config("Server")
 
         console_start_port_range = server_config.getint("console_start_port_range", 5000)
@@ -136,6 +143,74 @@ class PortManager:
 
         return self._used_udp_ports
 
+    @staticmethod
+    def _new_port_bitmap():
+        """
+        Creates a bitmap covering all port numbers, banned ports are marked as not available.
+
+        :returns: bytearray (0 means the port can be allocated)
+        """
+
+        bitmap = bytearray(65536)
+        for port in BANNED_PORTS:
+            bitmap[port] = 1
+        return bitmap
+
+    @staticmethod
+    def _mark_port(bitmap, port, used):
+        """
+        Marks a port as used or free in a bitmap.
+
+        :param bitmap: port bitmap
+        :param port: port number
+        :param used: boolean
+        """
+
+        if 0 <= port < len(bitmap):
+            bitmap[port] = 1 if used or port in BANNED_PORTS else 0
+
+    def _find_free_port(self, bitmap, start_port, end_port, host, socket_type):
+        """
+        Finds an unused port in a range using a port bitmap.
+
+        The search starts where the previous search in the same range stopped
+        and only the ports not already allocated are checked with bind().
+
+        :param bitmap: port bitmap
+        :param start_port: first port in the range
+        :param end_port: last port in the range
+        :param host: host/address for bind()
+        :param socket_type: TCP or UDP
+
+        :returns: port number
+        """
+
+        if end_port < start_port:
+            raise HTTPConflict(text="Invalid port range {}-{}".format(start_port, end_port))
+
+        cursor_key = (socket_type, start_port, end_port)
+        cursor = self._port_cursors.get(cursor_key, start_port)
+        last_exception = None
+
+        # search from the cursor to the end of the range then from the start of the range to the cursor
+        for first_port, last_port in ((cursor, end_port), (start_port, cursor - 1)):
+            port = bitmap.find(0, first_port, last_port + 1)
+            while port != -1:
+                try:
+                    PortManager._check_port(host, port, socket_type)
+                    if host != "0.0.0.0":
+                        PortManager._check_port("0.0.0.0", port, socket_type)
+                    self._port_cursors[cursor_key] = port + 1 if port < end_port else start_port
+                    return port
+                except OSError as e:
+                    last_exception = e
+                port = bitmap.find(0, port + 1, last_port + 1)
+
+        raise HTTPConflict(text="Could not find a free port between {} and {} on host {}, last exception: {}".format(start_port,
+                                                                                                                     end_port,
+                                                                                                                     host,
+                                                                                                                     last_exception))
+
     @staticmethod
     def find_unused_port(start_port, end_port, host="127.0.0.1", socket_type="TCP", ignore_ports=None):
         """
@@ -173,6 +248,17 @@ class PortManager:
                                                                                                                      host,
                                                                                                                      last_exception))
 
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _getaddrinfo(host, socket_type):
+        """
+        Cached address resolution of a host, the port is set later.
+
+        :returns: list of addresses returned by getaddrinfo() for port 0
+        """
+
+        return socket.getaddrinfo(host, 0, socket.AF_UNSPEC, socket_type, 0, socket.AI_PASSIVE)
+
     @staticmethod
     def _check_port(host, port, socket_type):
         """
@@ -185,8 +271,9 @@ class PortManager:
         else:
             socket_type = socket.SOCK_STREAM
 
-        for res in socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket_type, 0, socket.AI_PASSIVE):
+        for res in PortManager._getaddrinfo(host, socket_type):
             af, socktype, proto, _, sa = res
+            sa = (sa[0], port) + tuple(sa[2:])
             with socket.socket(af, socktype, proto) as s:
                 s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 s.bind(sa)  # the port is available if bind is a success
@@ -204,13 +291,14 @@ class PortManager:
             port_range_start = self._console_port_range[0]
             port_range_end = self._console_port_range[1]
 
-        port = self.find_unused_port(port_range_start,
-                                     port_range_end,
-                                     host=self._console_host,
-                                     socket_type="TCP",
-                                     ignore_ports=self._used_tcp_ports)
+        port = self._find_free_port(self._tcp_port_bitmap,
+                                    port_range_start,
+                                    port_range_end,
+                                    host=self._console_host,
+                                    socket_type="TCP")
 
         self._used_tcp_ports.add(port)
+        self._mark_port(self._tcp_port_bitmap, port, True)
         project.record_tcp_port(port)
         log.debug("TCP port {} has been allocated".format(port))
         return port
@@ -254,6 +342,7 @@ class PortManager:
             return port
 
         self._used_tcp_ports.add(port)
+        self._mark_port(self._tcp_port_bitmap, port, True)
         project.record_tcp_port(port)
         log.debug("TCP port {} has been reserved".format(port))
         return port
@@ -268,6 +357,7 @@ class PortManager:
 
         if port in self._used_tcp_ports:
             self._used_tcp_ports.remove(port)
+            self._mark_port(self._tcp_port_bitmap, port, False)
             project.remove_tcp_port(port)
             log.debug("TCP port {} has been released".format(port))
 
@@ -277,17 +367,38 @@ class PortManager:
 
         :param project: Project instance
         """
-        port = self.find_unused_port(self._udp_port_range[0],
-                                     self._udp_port_range[1],
-                                     host=self._udp_host,
-                                     socket_type="UDP",
-                                     ignore_ports=self._used_udp_ports)
+        port = self._find_free_port(self._udp_port_bitmap,
+                                    self._udp_port_range[0],
+                                    self._udp_port_range[1],
+                                    host=self._udp_host,
+                                    socket_type="UDP")
 
         self._used_udp_ports.add(port)
+        self._mark_port(self._udp_port_bitmap, port, True)
         project.record_udp_port(port)
         log.debug("UDP port {} has been allocated".format(port))
         return port
 
+    def get_free_udp_ports(self, project, count):
+        """
+        Get several available UDP ports and reserve them
+
+        :param project: Project instance
+        :param count: number of UDP ports
+
+        :returns: list of UDP ports
+        """
+
+        ports = []
+        try:
+            for _ in range(count):
+                ports.append(self.get_free_udp_port(project))
+        except HTTPConflict:
+            for port in ports:
+                self.release_udp_port(port, project)
+            raise
+        return ports
+
     def reserve_udp_port(self, port, project):
         """
         Reserve a specific UDP port number
@@ -301,6 +412,7 @@ class PortManager:
         if port < self._udp_port_range[0] or port > self._udp_port_range[1]:
             raise HTTPConflict(text="UDP port {} is outside the range {}-{}".format(port, self._udp_port_range[0], self._udp_port_range[1]))
         self._used_udp_ports.add(port)
+        self._mark_port(self._udp_port_bitmap, port, True)
         project.record_udp_port(port)
         log.debug("UDP port {} has been reserved".format(port))
 
@@ -314,5 +426,6 @@ class PortManager:
 
         if port in self._used_udp_ports:
             self._used_udp_ports.remove(port)
+            self._mark_port(self._udp_port_bitmap, port, False)
             project.remove_udp_port(port)
             log.debug("UDP port {} has been released".format(port))
@@ -26,6 +26,8 @@ from uuid import UUID, uuid4
 from .port_manager import PortManager
 from .notification_manager import NotificationManager
 from ..config import Config
+from ..ubridge.shared_hypervisor import UbridgePool
+from .config_save_scheduler import ConfigSaveScheduler
 from ..utils.asyncio import wait_run_in_executor
 from ..utils.path import check_path_allowed, get_default_project_directory
 
@@ -59,6 +61,8 @@ class Project:
         self._used_tcp_ports = set()
         self._used_udp_ports = set()
         self._variables = variables
+        self._ubridge_pool = None
+        self._config_save_scheduler = None
 
         if path is None:
             location = get_default_project_directory()
@@ -138,6 +142,33 @@ class Project:
     def variables(self, variables):
         self._variables = variables
 
+    @property
+    def ubridge_pool(self):
+        """
+        Returns the uBridge hypervisors shared by the nodes of this project.
+
+        :returns: UbridgePool instance
+        """
+
+        if self._ubridge_pool is None:
+            self._ubridge_pool = UbridgePool(self)
+        return self._ubridge_pool
+
+    @property
+    def config_save_scheduler(self):
+        """
+        Returns the scheduler of the node config extractions of this project.
+
+        :returns: ConfigSaveScheduler instance
+        """
+
+        if self._config_save_scheduler is None:
+            server_config = Config.instance().get_section_config("Server")
+            concurrency = int(server_config.get("config_save_concurrency", 4))
+            interval = int(server_config.get("config_save_interval", 50))
+            self._config_save_scheduler = ConfigSaveScheduler(concurrency=concurrency, interval=interval / 1000)
+        return self._config_save_scheduler
+
     def record_tcp_port(self, port):
         """
         Associate a reserved TCP port number with this project.
@@ -338,6 +369,10 @@ class Project:
         :param cleanup: Whether to delete the project directory
         """
 
+        if self._config_save_scheduler:
+            # the configs are saved when the nodes are closed
+            await self._config_save_scheduler.close()
+
         tasks = []
         for node in self._nodes:
             tasks.append(asyncio.ensure_future(node.manager.close_node(node.id)))
@@ -350,6 +385,9 @@ class Project:
                 except (Exception, GeneratorExit) as e:
                     log.error("Could not close node {}".format(e), exc_info=1)
 
+        if self._ubridge_pool:
+            await self._ubridge_pool.close()
+
         if cleanup and os.path.exists(self.path):
             self._deleted = True
             try:
@@ -21,16 +21,21 @@ Qemu server module.
 
 import asyncio
 import os
+import json
+import shutil
 import platform
 import sys
 import re
+import time
 import subprocess
 
-from ...utils.asyncio import subprocess_check_output
+from ...utils.asyncio import subprocess_check_output, wait_run_in_executor
 from ..base_manager import BaseManager
+from ..binary_cache import BinaryCache
 from .qemu_error import QemuError
 from .qemu_vm import QemuVM
 from .utils.guest_cid import get_next_guest_cid
+from .utils.ksm import KSM
 
 import logging
 log = logging.getLogger(__name__)
@@ -45,6 +50,10 @@ class Qemu(BaseManager):
 
         super().__init__()
         self._guest_cid_lock = asyncio.Lock()
+        self._warm_images = {}
+        self._warm_images_expiry = {}
+        self._warm_images_lock = asyncio.Lock()
+        self._ksm = KSM()
 
     async def create_node(self, *args, **kwargs):
         """
@@ -68,6 +77,242 @@ class Qemu(BaseManager):
                 node.guest_cid = get_next_guest_cid(self.nodes)
         return node
 
+    @property
+    def ksm(self):
+        """
+        Returns the host KSM (memory merging).
+
+        :returns: KSM instance
+        """
+
+        return self._ksm
+
+    def memory_merging_enabled(self):
+        """
+        :returns: True if the guest RAM of the VMs must be merged by KSM
+        """
+
+        return sys.platform.startswith("linux") and self.config.get_section_config("Qemu").getboolean("memory_merging", False)
+
+    def enable_memory_merging(self):
+        """
+        Starts KSM on the host, when memory merging is enabled.
+        """
+
+        if self.memory_merging_enabled():
+            self._ksm.enable()
+
+    def memory_merging_statistics(self):
+        """
+        Returns the KSM counters of the host and the pages of
+        the running VMs merged or not, for each project.
+
+        :returns: dictionary or None if KSM is not available
+        """
+
+        stats = self._ksm.stats()
+        if stats is None:
+            return None
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        projects = {}
+        for node in self._nodes.values():
+            if not node.is_running():
+                continue
+            merged_pages = self._ksm.process_merged_pages(node.process.pid)
+            if merged_pages is None:
+                continue
+            project = projects.setdefault(node.project.id, {"project_id": node.project.id, "shared_pages": 0, "unshared_pages": 0})
+            ram_pages = node.ram * 1024 * 1024 // page_size
+            project["shared_pages"] += merged_pages
+            project["unshared_pages"] += max(ram_pages - merged_pages, 0)
+        stats["projects"] = list(projects.values())
+        return stats
+
+    def _base_image_users(self):
+        """
+        Gets the linked clones using each base image.
+
+        :returns: dictionary with base image paths as keys and lists of nodes as values
+        """
+
+        users = {}
+        for node in self._nodes.values():
+            if node.linked_clone:
+                for disk_image in node.disk_images:
+                    users.setdefault(disk_image, []).append(node)
+        return users
+
+    @staticmethod
+    def _warm_image(path, size):
+        """
+        Asks the kernel to read an image into the page cache.
+
+        :param path: image path
+        :param size: image size in bytes
+
+        :returns: True if the image is being read ahead, False if not supported on this host
+        """
+
+        if not hasattr(os, "posix_fadvise"):
+            return False
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        return True
+
+    async def warm_base_images(self, node):
+        """
+        Warms the page cache with the base images of a linked clone before it starts
+        when these images are shared with other stopped linked clones. This avoids every
+        QEMU process cold-reading the same backing file at random offsets when many
+        nodes are started at once.
+
+        :param node: QemuVM instance about to start
+        """
+
+        server_config = self.config.get_section_config("Qemu")
+        if not node.linked_clone or not server_config.getboolean("base_image_warming", True):
+            return
+        budget = server_config.getint("base_image_warming_budget", 1024) * 1024 * 1024
+        ttl = server_config.getint("base_image_warming_ttl", 600)
+
+        async with self._warm_images_lock:
+            users = self._base_image_users()
+
+            # forget the images not used anymore and the images warmed too long ago
+            # (the kernel may have evicted their pages since), they are not counted in the budget
+            self._expire_warm_images(users)
+            used = sum(image["size"] for image in self._warm_images.values() if image["status"] == "warm")
+
+            for disk_image in node.disk_images:
+                image = self._warm_images.get(disk_image)
+                if image and image["status"] in ("warm", "unsupported"):
+                    continue
+                nodes = [n for n in users.get(disk_image, []) if n is node or not n.is_running()]
+                if len(nodes) < 2:
+                    continue
+                try:
+                    size = os.path.getsize(disk_image)
+                except OSError as e:
+                    log.warning("Could not warm base image '{}': {}".format(disk_image, e))
+                    continue
+                image = {"path": disk_image, "size": size, "nodes": len(nodes)}
+                if used + size > budget:
+                    log.info("Not warming base image '{}' ({} bytes), memory budget exceeded".format(disk_image, size))
+                    image["status"] = "skipped"
+                else:
+                    try:
+                        if await wait_run_in_executor(self._warm_image, disk_image, size):
+                            log.info("Base image '{}' shared by {} nodes is being read ahead".format(disk_image, len(nodes)))
+                            image["status"] = "warm"
+                            self._warm_images_expiry[disk_image] = time.monotonic() + ttl
+                            used += size
+                        else:
+                            image["status"] = "unsupported"
+                    except OSError as e:
+                        log.warning("Could not warm base image '{}': {}".format(disk_image, e))
+                        image["status"] = "error"
+                self._warm_images[disk_image] = image
+
+    def _expire_warm_images(self, users):
+        """
+        Forgets the images not used by linked clones anymore and
+        the images warmed for longer than the warming TTL.
+
+        :param users: base images and their linked clones
+        """
+
+        now = time.monotonic()
+        for path in list(self._warm_images.keys()):
+            expiry = self._warm_images_expiry.get(path)
+            if path not in users or (expiry is not None and expiry <= now):
+                del self._warm_images[path]
+                self._warm_images_expiry.pop(path, None)
+
+    def warm_images(self):
+        """
+        Gets the warm status of the base images shared by linked clones.
+
+        :returns: list of dictionaries {"path", "size", "nodes", "status"}
+        """
+
+        self._expire_warm_images(self._base_image_users())
+        return [image.copy() for _, image in sorted(self._warm_images.items())]
+
+    def golden_states_directory(self):
+        """
+        Returns the directory where the golden states are saved.
+        """
+
+        return os.path.join(self.get_images_directory(), "golden")
+
+    def golden_state_directory(self, checksum):
+        """
+        Returns the directory of a golden state.
+
+        :param checksum: MD5 checksum of the hda base image of the golden state
+        """
+
+        if not re.match(r"^[0-9a-f]{32}$", checksum or ""):
+            raise QemuError("Invalid golden state checksum '{}'".format(checksum))
+        return os.path.join(self.golden_states_directory(), checksum)
+
+    def load_golden_state(self, checksum):
+        """
+        Loads the description of a golden state.
+
+        :param checksum: MD5 checksum of the hda base image of the golden state
+
+        :returns: dictionary or None if there is no golden state for this image
+        """
+
+        path = os.path.join(self.golden_state_directory(checksum), "golden_state.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Could not load golden state {}: {}".format(path, e))
+            return None
+
+    def golden_states(self):
+        """
+        Gets the saved golden states.
+
+        :returns: list of golden state descriptions
+        """
+
+        golden_states = []
+        try:
+            checksums = sorted(os.listdir(self.golden_states_directory()))
+        except OSError:
+            return golden_states
+        for checksum in checksums:
+            if re.match(r"^[0-9a-f]{32}$", checksum):
+                golden_state = self.load_golden_state(checksum)
+                if golden_state:
+                    golden_states.append(golden_state)
+        return golden_states
+
+    async def delete_golden_state(self, checksum):
+        """
+        Deletes a golden state, linked clones will boot normally.
+
+        :param checksum: MD5 checksum of the hda base image of the golden state
+        """
+
+        directory = self.golden_state_directory(checksum)
+        if not os.path.isdir(directory):
+            raise QemuError("Golden state {} does not exist".format(checksum))
+        try:
+            await wait_run_in_executor(shutil.rmtree, directory)
+        except OSError as e:
+            raise QemuError("Could not delete golden state {}: {}".format(checksum, e))
+        log.info("Golden state {} has been deleted".format(checksum))
+
     @staticmethod
     async def get_kvm_archs():
         """
@@ -214,7 +459,7 @@ class Qemu(BaseManager):
             return ""
         else:
             try:
-                output = await subprocess_check_output(qemu_path, "-version", "-nographic")
+                output = await BinaryCache.instance().probe(qemu_path, "version", lambda: subprocess_check_output(qemu_path, "-version", "-nographic"))
                 match = re.search("version\s+([0-9a-z\-\.]+)", output)
                 if match:
                     version = match.group(1)
@@ -233,7 +478,7 @@ class Qemu(BaseManager):
         """
 
         try:
-            output = await subprocess_check_output(qemu_img_path, "--version")
+            output = await BinaryCache.instance().probe(qemu_img_path, "version", lambda: subprocess_check_output(qemu_img_path, "--version"))
             match = re.search(r"version\s+([0-9a-z\-\.]+)", output)
             if match:
                 version = match.group(1)
@@ -25,22 +25,23 @@ import os
 import re
 import shlex
 import math
+import time
 import shutil
 import asyncio
 import socket
 import gns3server
 import subprocess
-import time
 import json
 
 from gns3server.utils import parse_version, shlex_quote
-from gns3server.utils.asyncio import subprocess_check_output, cancellable_wait_run_in_executor
+from gns3server.utils.asyncio import cancellable_wait_run_in_executor, wait_run_in_executor
 from .qemu_error import QemuError
 from .utils.qcow2 import Qcow2, Qcow2Error
+from .utils.qmp import QMPClient
 from ..adapters.ethernet_adapter import EthernetAdapter
 from ..nios.nio_udp import NIOUDP
 from ..nios.nio_tap import NIOTAP
-from ..base_node import BaseNode
+from ..base_node import BaseNode, timed_start
 from ...schemas.qemu import QEMU_OBJECT_SCHEMA, QEMU_PLATFORMS
 from ...utils.asyncio import monitor_process
 from ...utils.images import md5sum
@@ -52,8 +53,6 @@ log = logging.getLogger(__name__)
 
 
 class QemuVM(BaseNode):
-    module_name = 'qemu'
-
     """
     QEMU VM implementation.
 
@@ -67,6 +66,24 @@ class QemuVM(BaseNode):
     :param platform: Platform to emulate
     """
 
+    module_name = 'qemu'
+
+    # QEMU VM status after a QMP event
+    QMP_EVENTS_STATUS = {"STOP": "paused",
+                         "RESUME": "running",
+                         "SUSPEND": "suspended",
+                         "WAKEUP": "running",
+                         "SHUTDOWN": "shutdown"}
+
+    # snapshot containing the RAM state new linked clones start from
+    GOLDEN_STATE_SNAPSHOT = "GNS3_GOLDEN_STATE"
+
+    # network adapters which are not PCI devices and cannot be hot-plugged
+    NON_HOTPLUGGABLE_ADAPTERS = ("ne2k_isa", "virtio-net-device")
+
+    # time to wait for the guest to release a network adapter being unplugged
+    ADAPTER_UNPLUG_TIMEOUT = 10  # seconds
+
     def __init__(self, name, node_id, project, manager, linked_clone=True, qemu_path=None, console=None, console_type="telnet", platform=None):
 
         super().__init__(name, node_id, project, manager, console=console, console_type=console_type, linked_clone=linked_clone, wrap_console=True)
@@ -76,12 +93,17 @@ class QemuVM(BaseNode):
         self._process = None
         self._cpulimit_process = None
         self._monitor = None
+        self._qmp = None
+        self._vm_status = None
         self._stdout_file = ""
         self._qemu_img_stdout_file = ""
         self._execute_lock = asyncio.Lock()
         self._local_udp_tunnels = {}
         self._guest_cid = None
         self._command_line_changed = False
+        self._golden_state = None
+        self._network_devices = {}
+        self._adapters_to_replug = {}
 
         # QEMU VM settings
         if qemu_path:
@@ -246,6 +268,21 @@ class QemuVM(BaseNode):
                                                                                                    id=self._id,
                                                                                                    disk_image=value))
 
+    @property
+    def disk_images(self):
+        """
+        Returns the disk images (hda to hdd) used by this QEMU VM.
+
+        :returns: list of disk image paths
+        """
+
+        disk_images = []
+        for drive in ["a", "b", "c", "d"]:
+            disk_image = getattr(self, "_hd{}_disk_image".format(drive))
+            if disk_image:
+                disk_images.append(disk_image)
+        return disk_images
+
     @property
     def hda_disk_image(self):
         """
@@ -696,8 +733,7 @@ class QemuVM(BaseNode):
                                                                                                  cpu=cpu_throttling))
         self._cpu_throttling = cpu_throttling
         self._stop_cpulimit()
-        if cpu_throttling:
-            self._set_cpu_throttling()
+        self._set_cpu_throttling()
 
     @property
     def process_priority(self):
@@ -937,24 +973,37 @@ class QemuVM(BaseNode):
         if self._cpulimit_process and self._cpulimit_process.returncode is None:
             self._cpulimit_process.kill()
             try:
-                self._process.wait(3)
+                self._cpulimit_process.wait(3)
             except subprocess.TimeoutExpired:
                 log.error("Could not kill cpulimit process {}".format(self._cpulimit_process.pid))
+        self._cpulimit_process = None
 
     def _set_cpu_throttling(self):
         """
-        Limits the CPU usage for current QEMU process.
+        Limits the CPU usage for current QEMU process, with
+        its cgroup if there is one or with cpulimit.
         """
 
         if not self.is_running():
             return
 
+        if self._cgroup:
+            try:
+                self._cgroup.set_cpu_max(self._cpu_throttling)
+                log.info("CPU throttled to {}% with cgroup {}".format(self._cpu_throttling, self._cgroup.path))
+                return
+            except OSError as e:
+                log.warning("Could not throttle CPU with cgroup {}, using cpulimit instead: {}".format(self._cgroup.path, e))
+
+        if not self._cpu_throttling:
+            return
+
         try:
             if sys.platform.startswith("win") and hasattr(sys, "frozen"):
                 cpulimit_exec = os.path.join(os.path.dirname(os.path.abspath(sys.executable)), "cpulimit", "cpulimit.exe")
             else:
                 cpulimit_exec = "cpulimit"
-            subprocess.Popen([cpulimit_exec, "--lazy", "--pid={}".format(self._process.pid), "--limit={}".format(self._cpu_throttling)], cwd=self.working_dir)
+            self._cpulimit_process = subprocess.Popen([cpulimit_exec, "--lazy", "--pid={}".format(self._process.pid), "--limit={}".format(self._cpu_throttling)], cwd=self.working_dir)
             log.info("CPU throttled to {}%".format(self._cpu_throttling))
         except FileNotFoundError:
             raise QemuError("cpulimit could not be found, please install it or deactivate CPU throttling")
@@ -976,6 +1025,7 @@ class QemuVM(BaseNode):
 
         super(QemuVM, self).create()
 
+    @timed_start
     async def start(self):
         """
         Starts this QEMU VM.
@@ -988,30 +1038,34 @@ class QemuVM(BaseNode):
                 return
 
             if self._manager.config.get_section_config("Qemu").getboolean("monitor", True):
-                try:
-                    info = socket.getaddrinfo(self._monitor_host, 0, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
-                    if not info:
-                        raise QemuError("getaddrinfo returns an empty list on {}".format(self._monitor_host))
-                    for res in info:
-                        af, socktype, proto, _, sa = res
-                        # let the OS find an unused port for the Qemu monitor
-                        with socket.socket(af, socktype, proto) as sock:
-                            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                            sock.bind(sa)
-                            self._monitor = sock.getsockname()[1]
-                except OSError as e:
-                    raise QemuError("Could not find free port for the Qemu monitor: {}".format(e))
+                with self.timing_span("ports"):
+                    try:
+                        info = socket.getaddrinfo(self._monitor_host, 0, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+                        if not info:
+                            raise QemuError("getaddrinfo returns an empty list on {}".format(self._monitor_host))
+                        for res in info:
+                            af, socktype, proto, _, sa = res
+                            # let the OS find an unused port for the Qemu monitor
+                            with socket.socket(af, socktype, proto) as sock:
+                                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                                sock.bind(sa)
+                                self._monitor = sock.getsockname()[1]
+                    except OSError as e:
+                        raise QemuError("Could not find free port for the Qemu monitor: {}".format(e))
 
             # check if there is enough RAM to run
             self.check_available_ram(self.ram)
 
+            with self.timing_span("base_images"):
+                await self.manager.warm_base_images(self)
+            self.manager.enable_memory_merging()
             command = await self._build_command()
             command_string = " ".join(shlex_quote(s) for s in command)
             try:
                 log.info("Starting QEMU with: {}".format(command_string))
                 self._stdout_file = os.path.join(self.working_dir, "qemu.log")
                 log.info("logging to {}".format(self._stdout_file))
-                with open(self._stdout_file, "w", encoding="utf-8") as fd:
+                with open(self._stdout_file, "w", encoding="utf-8") as fd, self.timing_span("process"):
                     fd.write("Start QEMU with {}\n\nExecution log:\n".format(command_string))
                     self.command_line = ' '.join(command)
                     self._process = await asyncio.create_subprocess_exec(*command,
@@ -1027,9 +1081,12 @@ class QemuVM(BaseNode):
                 log.error("Could not start QEMU {}: {}\n{}".format(self.qemu_path, e, stdout))
                 raise QemuError("Could not start QEMU {}: {}\n{}".format(self.qemu_path, e, stdout))
 
+            if self._monitor:
+                with self.timing_span("qmp"):
+                    await self._connect_qmp()
             await self._set_process_priority()
-            if self._cpu_throttling:
-                self._set_cpu_throttling()
+            self._set_resource_limits(self._process.pid, memory=self.ram)
+            self._set_cpu_throttling()
 
             if "-enable-kvm" in command_string or "-enable-hax" in command_string:
                 self._hw_virtualization = True
@@ -1047,9 +1104,12 @@ class QemuVM(BaseNode):
                 elif self._replicate_network_connection_state:
                     set_link_commands.append("set_link gns3-{} off".format(adapter_number))
 
-            if "-loadvm" not in command_string and self._replicate_network_connection_state:
-                # only set the link statuses if not restoring a previous VM state
-                await self._control_vm_commands(set_link_commands)
+            with self.timing_span("links"):
+                if self._golden_state:
+                    await self._golden_state_reset()
+                elif "-loadvm" not in command_string and self._replicate_network_connection_state:
+                    # only set the link statuses if not restoring a previous VM state
+                    await self._control_vm_commands(set_link_commands)
 
         try:
             if self.is_running():
@@ -1077,16 +1137,18 @@ class QemuVM(BaseNode):
         """
 
         await self._stop_ubridge()
+        self._adapters_to_replug.clear()
         async with self._execute_lock:
             # stop the QEMU process
             self._hw_virtualization = False
+            clean_shutdown = self._process is not None and self._process.returncode == 0
             if self.is_running():
                 log.info('Stopping QEMU VM "{}" PID={}'.format(self._name, self._process.pid))
                 try:
 
                     if self.on_close == "save_vm_state":
                         await self._control_vm("stop")
-                        await self._control_vm("savevm GNS3_SAVED_STATE")
+                        await self._control_vm("savevm GNS3_SAVED_STATE", timeout=120)
                         wait_for_savevm = 120
                         while wait_for_savevm:
                             await asyncio.sleep(1)
@@ -1101,6 +1163,7 @@ class QemuVM(BaseNode):
                     else:
                         self._process.terminate()
                         await gns3server.utils.asyncio.wait_for_process_termination(self._process, timeout=3)
+                    clean_shutdown = True
                 except ProcessLookupError:
                     pass
                 except asyncio.TimeoutError:
@@ -1112,87 +1175,97 @@ class QemuVM(BaseNode):
                         if self._process.returncode is None:
                             log.warning('QEMU VM "{}" PID={} is still running'.format(self._name, self._process.pid))
             self._process = None
+            await self._close_qmp()
             self._stop_cpulimit()
+            self._remove_resource_limits()
+            if clean_shutdown:
+                self._update_disk_check_markers()
             if self.on_close != "save_vm_state":
                 await self._clear_save_vm_stated()
             await super().stop()
 
-    async def _open_qemu_monitor_connection_vm(self, timeout=10):
+    async def _connect_qmp(self):
+        """
+        Opens the QMP session of this VM, the session
+        stays open while the VM is running.
         """
-        Opens a connection to the QEMU monitor.
 
-        :param timeout: timeout to connect to the monitor TCP server
-        :returns: The reader returned is a StreamReader instance; the writer is a StreamWriter instance
+        self._qmp = QMPClient(self._monitor_host,
+                              self._monitor,
+                              event_callback=self._qmp_event,
+                              disconnect_callback=self._qmp_disconnected)
+        try:
+            await self._qmp.connect()
+            result = await self._qmp.execute("query-status")
+            self._vm_status = result.get("status")
+        except QemuError as e:
+            log.warning("Could not open the QMP session of QEMU VM {}: {}".format(self._name, e))
+
+    async def _close_qmp(self):
+        """
+        Closes the QMP session of this VM.
         """
 
-        begin = time.time()
-        connection_success = False
-        last_exception = None
-        reader = writer = None
-        while time.time() - begin < timeout:
-            await asyncio.sleep(0.01)
-            try:
-                log.debug("Connecting to Qemu monitor on {}:{}".format(self._monitor_host, self._monitor))
-                reader, writer = await asyncio.open_connection(self._monitor_host, self._monitor)
-            except (asyncio.TimeoutError, OSError) as e:
-                last_exception = e
-                continue
-            connection_success = True
-            break
+        if self._qmp:
+            await self._qmp.close()
+            self._qmp = None
+        self._vm_status = None
 
-        if not connection_success:
-            log.warning("Could not connect to QEMU monitor on {}:{}: {}".format(self._monitor_host, self._monitor,
-                                                                                last_exception))
-        else:
-            log.info("Connected to QEMU monitor on {}:{} after {:.4f} seconds".format(self._monitor_host, self._monitor, time.time() - begin))
-        return reader, writer
+    def _qmp_event(self, event, data):
+        """
+        Called when QEMU sends an asynchronous event.
+
+        :param event: event name
+        :param data: event data
+        """
+
+        if event == "DEVICE_DELETED":
+            replug = self._adapters_to_replug.pop(data.get("device"), None)
+            if replug:
+                # the guest has released the adapter, plug it again with the MAC address of this VM
+                asyncio.ensure_future(replug())
+            return
+        vm_status = self.QMP_EVENTS_STATUS.get(event)
+        if vm_status is None:
+            return
+        log.info('QEMU VM "{}" event {}'.format(self._name, event))
+        self._vm_status = vm_status
+        if vm_status != "shutdown":
+            # the end of the process is handled by the termination callback
+            self._update_status(vm_status)
+
+    def _qmp_disconnected(self):
+        """
+        Called when the QMP session is lost, events may have been
+        missed so the VM status must be queried again.
+        """
+
+        self._vm_status = None
 
-    async def _control_vm(self, command, expected=None):
+    async def _control_vm(self, command, expected=None, timeout=30):
         """
         Executes a command with QEMU monitor when this VM is running.
 
         :param command: QEMU monitor command (e.g. info status, stop etc.)
         :param expected: An array of expected strings
+        :param timeout: timeout to wait for the result of the command
 
         :returns: result of the command (matched object or None)
         """
 
         result = None
-        if self.is_running() and self._monitor:
+        if self.is_running() and self._qmp:
             log.info("Execute QEMU monitor command: {}".format(command))
-            reader, writer = await self._open_qemu_monitor_connection_vm()
-            if reader is None and writer is None:
-                return result
-
             try:
-                cmd_byte = command.encode('ascii')
-                writer.write(cmd_byte + b"\n")
-                if not expected:
-                    while True:
-                        line = await asyncio.wait_for(reader.readline(), timeout=3)  # echo of the command
-                        if not line or cmd_byte in line:
-                            break
-            except asyncio.TimeoutError:
-                log.warning("Missing echo of command '{}'".format(command))
-            except OSError as e:
-                log.warning("Could not write to QEMU monitor: {}".format(e))
-                writer.close()
+                output = await self._qmp.human_monitor_command(command, timeout=timeout)
+            except QemuError as e:
+                log.warning("Could not execute QEMU monitor command '{}': {}".format(command, e))
                 return result
-            if expected:
-                try:
-                    while result is None:
-                        line = await asyncio.wait_for(reader.readline(), timeout=3)
-                        if not line:
-                            break
-                        for expect in expected:
-                            if expect in line:
-                                result = line.decode("utf-8").strip()
-                                break
-                except asyncio.TimeoutError:
-                    log.warning("Timeout while waiting for result of command '{}'".format(command))
-                except (ConnectionError, EOFError) as e:
-                    log.warning("Could not read from QEMU monitor: {}".format(e))
-            writer.close()
+            if expected and output:
+                for line in output.splitlines():
+                    if any(expect in line.encode("utf-8") for expect in expected):
+                        result = line.strip()
+                        break
         return result
 
     async def _control_vm_commands(self, commands):
@@ -1202,26 +1275,8 @@ class QemuVM(BaseNode):
         :param commands: a list of QEMU monitor commands (e.g. info status, stop etc.)
         """
 
-        if self.is_running() and self._monitor:
-
-            reader, writer = await self._open_qemu_monitor_connection_vm()
-            if reader is None and writer is None:
-                return
-
-            for command in commands:
-                log.info("Execute QEMU monitor command: {}".format(command))
-                try:
-                    cmd_byte = command.encode('ascii')
-                    writer.write(cmd_byte + b"\n")
-                    while True:
-                        line = await asyncio.wait_for(reader.readline(), timeout=3)  # echo of the command
-                        if not line or cmd_byte in line:
-                            break
-                except asyncio.TimeoutError:
-                    log.warning("Missing echo of command '{}'".format(command))
-                except OSError as e:
-                    log.warning("Could not write to QEMU monitor: {}".format(e))
-            writer.close()
+        for command in commands:
+            await self._control_vm(command)
 
     async def close(self):
         """
@@ -1251,29 +1306,46 @@ class QemuVM(BaseNode):
         """
         Returns this VM suspend status.
 
+        The status is kept up to date by the QMP events and
+        only queried when the QMP session has been (re)opened.
+
         Status are extracted from:
           https://github.com/qemu/qemu/blob/master/qapi-schema.json#L152
 
         :returns: status (string)
         """
 
-        result = await self._control_vm("info status", [
-            b"debug", b"inmigrate", b"internal-error", b"io-error",
-            b"paused", b"postmigrate", b"prelaunch", b"finish-migrate",
-            b"restore-vm", b"running", b"save-vm", b"shutdown", b"suspended",
-            b"watchdog", b"guest-panicked"
-        ])
-        if result is None:
-            return result
-        status = result.rsplit(' ', 1)[1]
-        if status == "running" or status == "prelaunch":
-            self.status = "started"
-        elif status == "suspended":
-            self.status = "suspended"
-        elif status == "shutdown":
-            self.status = "stopped"
+        if not self.is_running() or not self._qmp:
+            return None
+        if self._vm_status is None or not self._qmp.connected:
+            try:
+                result = await self._qmp.execute("query-status")
+            except QemuError as e:
+                log.warning("Could not get the status of QEMU VM {}: {}".format(self._name, e))
+                return None
+            self._vm_status = result.get("status")
+        status = self._vm_status
+        self._update_status(status)
         return status
 
+    def _update_status(self, vm_status):
+        """
+        Updates the node status from the QEMU VM status.
+
+        :param vm_status: QEMU VM status
+        """
+
+        if vm_status == "running" or vm_status == "prelaunch":
+            status = "started"
+        elif vm_status == "suspended" or vm_status == "paused":
+            status = "suspended"
+        elif vm_status == "shutdown":
+            status = "stopped"
+        else:
+            return
+        if self.status != status:
+            self.status = status
+
     async def suspend(self):
         """
         Suspends this QEMU VM.
@@ -1285,6 +1357,7 @@ class QemuVM(BaseNode):
                 raise QemuError("Suspending a QEMU VM is not supported")
             elif vm_status == "running" or vm_status == "prelaunch":
                 await self._control_vm("stop")
+                self._vm_status = "paused"
                 self.status = "suspended"
                 log.debug("QEMU VM has been suspended")
             else:
@@ -1312,6 +1385,7 @@ class QemuVM(BaseNode):
             raise QemuError("Resuming a QEMU VM is not supported")
         elif vm_status == "paused":
             await self._control_vm("cont")
+            self._vm_status = "running"
             self.status = "started"
             log.debug("QEMU VM has been resumed")
         else:
@@ -1489,20 +1563,36 @@ class QemuVM(BaseNode):
                 log.warning("Could not read {}: {}".format(self._stdout_file, e))
         return output
 
-    def read_qemu_img_stdout(self):
+    def read_qemu_img_stdout(self, stdout_file=None):
         """
         Reads the standard output of the QEMU-IMG process.
+
+        :param stdout_file: log file name in the working directory (last QEMU-IMG log file by default)
         """
 
         output = ""
-        if self._qemu_img_stdout_file:
+        if stdout_file:
+            stdout_file = os.path.join(self.working_dir, stdout_file)
+        else:
+            stdout_file = self._qemu_img_stdout_file
+        if stdout_file:
             try:
-                with open(self._qemu_img_stdout_file, "rb") as file:
+                with open(stdout_file, "rb") as file:
                     output = file.read().decode("utf-8", errors="replace")
             except OSError as e:
-                log.warning("Could not read {}: {}".format(self._qemu_img_stdout_file, e))
+                log.warning("Could not read {}: {}".format(stdout_file, e))
         return output
 
+    @property
+    def process(self):
+        """
+        Returns the QEMU process.
+
+        :returns: asyncio subprocess or None
+        """
+
+        return self._process
+
     def is_running(self):
         """
         Checks if the QEMU process is running
@@ -1587,10 +1677,16 @@ class QemuVM(BaseNode):
             spice_options.extend(folder_sharing_options)
         return spice_options
 
+    def _memory_merging_options(self):
+
+        if self.manager.memory_merging_enabled():
+            return ["-machine", "mem-merge=on"]
+        return []
+
     def _monitor_options(self):
 
         if self._monitor:
-            return ["-monitor", "tcp:{}:{},server,nowait".format(self._monitor_host, self._monitor)]
+            return ["-qmp", "tcp:{}:{},server,nowait".format(self._monitor_host, self._monitor)]
         else:
             return []
 
@@ -1615,9 +1711,9 @@ class QemuVM(BaseNode):
 
         return qemu_img_path
 
-    async def _qemu_img_exec(self, command):
+    async def _qemu_img_exec(self, command, stdout_file="qemu-img.log"):
 
-        self._qemu_img_stdout_file = os.path.join(self.working_dir, "qemu-img.log")
+        self._qemu_img_stdout_file = os.path.join(self.working_dir, stdout_file)
         log.info("logging to {}".format(self._qemu_img_stdout_file))
         command_string = " ".join(shlex_quote(s) for s in command)
         log.info("Executing qemu-img with: {}".format(command_string))
@@ -1627,11 +1723,239 @@ class QemuVM(BaseNode):
         log.info("{} returned with {}".format(self._get_qemu_img(), retcode))
         return retcode
 
+    def _disk_check_policy(self):
+        """
+        Returns when disk images must be checked by qemu-img before starting the VM.
+
+        :returns: "always", "on_unclean_shutdown" or "never"
+        """
+
+        policy = self.manager.config.get_section_config("Qemu").get("disk_check", "on_unclean_shutdown")
+        if policy not in ("always", "on_unclean_shutdown", "never"):
+            log.warning("Invalid disk check policy '{}', using 'on_unclean_shutdown'".format(policy))
+            policy = "on_unclean_shutdown"
+        return policy
+
+    def _load_disk_check_markers(self):
+        """
+        Loads the markers recorded after successful disk image checks.
+
+        :returns: dictionary with the disk image paths as keys
+        """
+
+        markers_path = os.path.join(self.working_dir, "disk_checks.json")
+        try:
+            with open(markers_path, encoding="utf-8") as f:
+                markers = json.load(f)
+            if isinstance(markers, dict):
+                return markers
+        except (OSError, ValueError) as e:
+            if os.path.exists(markers_path):
+                log.warning("Could not read disk check markers {}: {}".format(markers_path, e))
+        return {}
+
+    def _save_disk_check_markers(self, markers):
+        """
+        Saves the markers recorded after successful disk image checks.
+
+        :param markers: dictionary with the disk image paths as keys
+        """
+
+        markers_path = os.path.join(self.working_dir, "disk_checks.json")
+        try:
+            with open(markers_path, "w", encoding="utf-8") as f:
+                json.dump(markers, f)
+        except OSError as e:
+            log.warning("Could not save disk check markers {}: {}".format(markers_path, e))
+
+    @staticmethod
+    def _disk_image_marker(disk_image):
+        """
+        Returns what identifies a version of a disk image (size and modification time).
+
+        :param disk_image: path to the disk image
+        """
+
+        stat = os.stat(disk_image)
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def _disk_image_needs_check(self, disk_image):
+        """
+        Checks if a disk image must be checked by qemu-img according to the disk check policy.
+
+        :param disk_image: path to the disk image
+
+        :returns: boolean
+        """
+
+        policy = self._disk_check_policy()
+        if policy == "never":
+            return False
+        if policy == "always":
+            return True
+        try:
+            qcow2 = Qcow2(disk_image)
+            if qcow2.dirty or qcow2.corrupt:
+                return True
+        except Qcow2Error:
+            pass  # not a qcow2 image, only rely on the marker
+        except OSError:
+            return True
+        marker = self._load_disk_check_markers().get(disk_image)
+        try:
+            return marker != self._disk_image_marker(disk_image)
+        except OSError:
+            return True
+
+    def _record_disk_check(self, disk_image):
+        """
+        Records that a disk image has been successfully checked.
+
+        :param disk_image: path to the disk image
+        """
+
+        try:
+            marker = self._disk_image_marker(disk_image)
+        except OSError as e:
+            log.warning("Could not record the check of disk image {}: {}".format(disk_image, e))
+            return
+        markers = self._load_disk_check_markers()
+        markers[disk_image] = marker
+        self._save_disk_check_markers(markers)
+
+    def _update_disk_check_markers(self):
+        """
+        Refreshes the markers of previously checked disk images after a clean shutdown,
+        QEMU may have modified these images while running.
+        """
+
+        markers = self._load_disk_check_markers()
+        if not markers:
+            return
+        for drive in ["a", "b", "c", "d"]:
+            disk_image = getattr(self, "_hd{}_disk_image".format(drive))
+            if disk_image in markers:
+                try:
+                    markers[disk_image] = self._disk_image_marker(disk_image)
+                except OSError:
+                    del markers[disk_image]
+        self._save_disk_check_markers(markers)
+
+    async def _check_disk_image(self, qemu_img_path, disk_name, disk_image):
+        """
+        Checks a disk image for corruption and tries to fix it.
+
+        :param qemu_img_path: Path to the qemu-img binary
+        :param disk_name: Disk name (hda, hdb etc.)
+        :param disk_image: Path to the disk image
+        """
+
+        if not self._disk_image_needs_check(disk_image):
+            log.info("Skipping check of {} disk image '{}' (unchanged since last successful check)".format(disk_name, disk_image))
+            return
+
+        # each disk is checked concurrently and needs its own log file
+        stdout_file = "qemu-img-{}.log".format(disk_name)
+        try:
+            # check for corrupt disk image
+            retcode = await self._qemu_img_exec([qemu_img_path, "check", disk_image], stdout_file=stdout_file)
+            if retcode == 3:
+                # image has leaked clusters, but is not corrupted, let's try to fix it
+                log.warning("Qemu image {} has leaked clusters".format(disk_image))
+                retcode = await self._qemu_img_exec([qemu_img_path, "check", "-r", "leaks", "{}".format(disk_image)], stdout_file=stdout_file)
+                if retcode == 3:
+                    self.project.emit("log.warning", {"message": "Qemu image '{}' has leaked clusters and could not be fixed".format(disk_image)})
+            elif retcode == 2:
+                # image is corrupted, let's try to fix it
+                log.warning("Qemu image {} is corrupted".format(disk_image))
+                retcode = await self._qemu_img_exec([qemu_img_path, "check", "-r", "all", "{}".format(disk_image)], stdout_file=stdout_file)
+                if retcode == 2:
+                    self.project.emit("log.warning", {"message": "Qemu image '{}' is corrupted and could not be fixed".format(disk_image)})
+        except (OSError, subprocess.SubprocessError) as e:
+            stdout = self.read_qemu_img_stdout(stdout_file)
+            raise QemuError("Could not check '{}' disk image: {}\n{}".format(disk_name, e, stdout))
+
+        if retcode == 0:
+            self._record_disk_check(disk_image)
+
+    async def _create_linked_clone_disk(self, qemu_img_path, disk_name, disk_image, disk):
+        """
+        Creates a linked clone disk image using qemu-img.
+
+        :param qemu_img_path: Path to the qemu-img binary
+        :param disk_name: Disk name (hda, hdb etc.)
+        :param disk_image: Path to the base image
+        :param disk: Path to the disk image to create
+        """
+
+        # disks are prepared concurrently and each one needs its own log file
+        stdout_file = "qemu-img-{}.log".format(disk_name)
+        try:
+            command = [qemu_img_path, "create", "-o", "backing_file={}".format(disk_image), "-f", "qcow2", disk]
+            retcode = await self._qemu_img_exec(command, stdout_file=stdout_file)
+            if retcode:
+                stdout = self.read_qemu_img_stdout(stdout_file)
+                raise QemuError("Could not create '{}' disk image: qemu-img returned with {}\n{}".format(disk_name,
+                                                                                                         retcode,
+                                                                                                         stdout))
+        except (OSError, subprocess.SubprocessError) as e:
+            stdout = self.read_qemu_img_stdout(stdout_file)
+            raise QemuError("Could not create '{}' disk image: {}\n{}".format(disk_name, e, stdout))
+
+    async def _prepare_disk(self, qemu_img_path, disk_name, disk_image):
+        """
+        Checks a disk image and creates or rebases its linked clone disk.
+
+        :param qemu_img_path: Path to the qemu-img binary
+        :param disk_name: Disk name (hda, hdb etc.)
+        :param disk_image: Path to the disk image
+
+        :returns: Path to the disk image to use
+        """
+
+        begin = time.time()
+        await self._check_disk_image(qemu_img_path, disk_name, disk_image)
+        if self.linked_clone:
+            disk = os.path.join(self.working_dir, "{}_disk.qcow2".format(disk_name))
+            golden_state_disk = self._golden_state_disk(disk_name)
+            if not os.path.exists(disk) and golden_state_disk:
+                # start from the disk of the golden state
+                try:
+                    await wait_run_in_executor(shutil.copyfile, golden_state_disk, disk)
+                    await Qcow2(disk).rebase(qemu_img_path, disk_image)
+                    log.info("Created '{}' linked clone disk image {} from golden state disk {}".format(disk_name, disk, golden_state_disk))
+                except (Qcow2Error, OSError) as e:
+                    raise QemuError("Could not create '{}' disk image from golden state disk {}: {}".format(disk_name, golden_state_disk, e))
+            elif not os.path.exists(disk):
+                # create the disk
+                try:
+                    Qcow2.create_overlay(disk, disk_image)
+                    log.info("Created '{}' linked clone disk image {} backed by {}".format(disk_name, disk, disk_image))
+                except (Qcow2Error, OSError) as e:
+                    # fallback to qemu-img (e.g. base image is not a qcow2 image)
+                    log.info("Could not create '{}' disk image without qemu-img, using qemu-img instead: {}".format(disk_name, e))
+                    await self._create_linked_clone_disk(qemu_img_path, disk_name, disk_image, disk)
+            else:
+                # The disk exists we check if the clone works
+                try:
+                    qcow2 = Qcow2(disk)
+                    await qcow2.rebase(qemu_img_path, disk_image)
+                except (Qcow2Error, OSError) as e:
+                    raise QemuError("Could not use qcow2 disk image '{}' for {} {}".format(disk_image, disk_name, e))
+        else:
+            disk = disk_image
+        log.info('QEMU VM "{name}" [{id}]: {disk_name} disk prepared in {time:.4f} seconds'.format(name=self._name,
+                                                                                                  id=self._id,
+                                                                                                  disk_name=disk_name,
+                                                                                                  time=time.time() - begin))
+        return disk
+
     async def _disk_options(self):
         options = []
         qemu_img_path = self._get_qemu_img()
 
         drives = ["a", "b", "c", "d"]
+        disks = []
 
         for disk_index, drive in enumerate(drives):
             disk_image = getattr(self, "_hd{}_disk_image".format(drive))
@@ -1647,50 +1971,23 @@ class QemuVM(BaseNode):
                     raise QemuError("{} disk image '{}' linked to '{}' is not accessible".format(disk_name, disk_image, os.path.realpath(disk_image)))
                 else:
                     raise QemuError("{} disk image '{}' is not accessible".format(disk_name, disk_image))
-            else:
-                try:
-                    # check for corrupt disk image
-                    retcode = await self._qemu_img_exec([qemu_img_path, "check", disk_image])
-                    if retcode == 3:
-                        # image has leaked clusters, but is not corrupted, let's try to fix it
-                        log.warning("Qemu image {} has leaked clusters".format(disk_image))
-                        if (await self._qemu_img_exec([qemu_img_path, "check", "-r", "leaks", "{}".format(disk_image)])) == 3:
-                            self.project.emit("log.warning", {"message": "Qemu image '{}' has leaked clusters and could not be fixed".format(disk_image)})
-                    elif retcode == 2:
-                        # image is corrupted, let's try to fix it
-                        log.warning("Qemu image {} is corrupted".format(disk_image))
-                        if (await self._qemu_img_exec([qemu_img_path, "check", "-r", "all", "{}".format(disk_image)])) == 2:
-                            self.project.emit("log.warning", {"message": "Qemu image '{}' is corrupted and could not be fixed".format(disk_image)})
-                except (OSError, subprocess.SubprocessError) as e:
-                    stdout = self.read_qemu_img_stdout()
-                    raise QemuError("Could not check '{}' disk image: {}\n{}".format(disk_name, e, stdout))
-
-            if self.linked_clone:
-                disk = os.path.join(self.working_dir, "{}_disk.qcow2".format(disk_name))
-                if not os.path.exists(disk):
-                    # create the disk
-                    try:
-                        command = [qemu_img_path, "create", "-o", "backing_file={}".format(disk_image), "-f", "qcow2", disk]
-                        retcode = await self._qemu_img_exec(command)
-                        if retcode:
-                            stdout = self.read_qemu_img_stdout()
-                            raise QemuError("Could not create '{}' disk image: qemu-img returned with {}\n{}".format(disk_name,
-                                                                                                                     retcode,
-                                                                                                                     stdout))
-                    except (OSError, subprocess.SubprocessError) as e:
-                        stdout = self.read_qemu_img_stdout()
-                        raise QemuError("Could not create '{}' disk image: {}\n{}".format(disk_name, e, stdout))
-                else:
-                    # The disk exists we check if the clone works
-                    try:
-                        qcow2 = Qcow2(disk)
-                        await qcow2.rebase(qemu_img_path, disk_image)
-                    except (Qcow2Error, OSError) as e:
-                        raise QemuError("Could not use qcow2 disk image '{}' for {} {}".format(disk_image, disk_name, e))
-
-            else:
-                disk = disk_image
+            disks.append((disk_index, disk_name, disk_image, interface))
 
+        # prepare all the disks of this VM at the same time, the options
+        # are still generated in the drive order once they are all ready
+        begin = time.time()
+        results = await asyncio.gather(*[self._prepare_disk(qemu_img_path, disk_name, disk_image) for _, disk_name, disk_image, _ in disks],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        if disks:
+            log.info('QEMU VM "{name}" [{id}]: {count} disk(s) prepared in {time:.4f} seconds'.format(name=self._name,
+                                                                                                    id=self._id,
+                                                                                                    count=len(disks),
+                                                                                                    time=time.time() - begin))
+
+        for (disk_index, disk_name, disk_image, interface), disk in zip(disks, results):
             # From Qemu man page: if the filename contains comma, you must double it
             # (for instance, "file=my,,file" to use file "my,file").
             disk = disk.replace(",", ",,")
@@ -1803,6 +2100,7 @@ class QemuVM(BaseNode):
                 raise QemuError("Qemu version 2.4 or later is required to run this VM with a large number of network adapters")
 
         pci_device_id = 4 + pci_bridges  # Bridge consume PCI ports
+        self._network_devices = {}
         for adapter_number, adapter in enumerate(self._ethernet_adapters):
             mac = int_to_macaddress(macaddress_to_int(self._mac_address) + adapter_number)
 
@@ -1845,6 +2143,7 @@ class QemuVM(BaseNode):
             else:
                 # newer QEMU networking syntax
                 device_string = "{},mac={}".format(adapter_type, mac)
+                device = {"driver": adapter_type, "id": "gns3-nic{}".format(adapter_number), "mac": mac}
                 bridge_id = math.floor(pci_device_id / 32)
                 if bridge_id > 0:
                     if pci_bridges_created < bridge_id:
@@ -1853,7 +2152,14 @@ class QemuVM(BaseNode):
                         pci_bridges_created += 1
                     addr = pci_device_id % 32
                     device_string = "{},bus=pci-bridge{bridge_id},addr=0x{addr:02x}".format(device_string, bridge_id=bridge_id, addr=addr)
+                    device.update({"bus": "pci-bridge{}".format(bridge_id), "addr": "0x{:02x}".format(addr)})
                 pci_device_id += 1
+                if self._golden_state:
+                    # the adapters are plugged again with their own MAC address once the golden state is loaded
+                    device_string = "{},id={}".format(device_string, device["id"])
+                if nio:
+                    device["netdev"] = "gns3-{}".format(adapter_number)
+                self._network_devices[adapter_number] = device
                 if nio:
                     network_options.extend(["-device", "{},netdev=gns3-{}".format(device_string, adapter_number)])
                     if isinstance(nio, NIOUDP):
@@ -1950,74 +2256,344 @@ class QemuVM(BaseNode):
             return True
         return False
 
-    async def _clear_save_vm_stated(self, snapshot_name="GNS3_SAVED_STATE"):
+    def _saved_state_disks(self, snapshot_name):
+        """
+        Returns the disks containing a saved state snapshot.
+
+        The snapshot table is read directly from the qcow2 image headers
+        instead of spawning "qemu-img info" for each disk.
+
+        :param snapshot_name: snapshot name
 
+        :returns: list of disk paths
+        """
+
+        disks = []
         drives = ["a", "b", "c", "d"]
-        qemu_img_path = self._get_qemu_img()
         for disk_index, drive in enumerate(drives):
             disk_image = getattr(self, "_hd{}_disk_image".format(drive))
             if not disk_image:
                 continue
+            if self.linked_clone:
+                disk = os.path.join(self.working_dir, "hd{}_disk.qcow2".format(drive))
+            else:
+                disk = disk_image
+            if not os.path.exists(disk):
+                continue
             try:
-                if self.linked_clone:
-                    disk = os.path.join(self.working_dir, "hd{}_disk.qcow2".format(drive))
-                else:
-                    disk = disk_image
-                if not os.path.exists(disk):
-                    continue
-                output = await subprocess_check_output(qemu_img_path, "info", "--output=json", disk)
-                if output:
-                    try:
-                        json_data = json.loads(output)
-                    except ValueError as e:
-                        raise QemuError("Invalid JSON data returned by qemu-img while looking for the Qemu VM saved state snapshot: {}".format(e))
-                    if "snapshots" in json_data:
-                        for snapshot in json_data["snapshots"]:
-                            if snapshot["name"] == snapshot_name:
-                                # delete the snapshot
-                                command = [qemu_img_path, "snapshot", "-d", snapshot_name, disk]
-                                retcode = await self._qemu_img_exec(command)
-                                if retcode:
-                                    stdout = self.read_qemu_img_stdout()
-                                    log.warning("Could not delete saved VM state from disk {}: {}".format(disk, stdout))
-                                else:
-                                    log.info("Deleted saved VM state from disk {}".format(disk))
-            except subprocess.SubprocessError as e:
+                if Qcow2(disk).has_snapshot(snapshot_name):
+                    disks.append(disk)
+            except Qcow2Error as e:
+                # only qcow2 images can store a VM state
+                log.debug("Skipping disk {} while looking for the Qemu VM saved state snapshot: {}".format(disk, e))
+            except OSError as e:
                 raise QemuError("Error while looking for the Qemu VM saved state snapshot: {}".format(e))
+        return disks
 
-    async def _saved_state_option(self, snapshot_name="GNS3_SAVED_STATE"):
+    async def _clear_save_vm_stated(self, snapshot_name="GNS3_SAVED_STATE"):
 
-        drives = ["a", "b", "c", "d"]
+        disks = self._saved_state_disks(snapshot_name)
+        if not disks:
+            return
         qemu_img_path = self._get_qemu_img()
-        for disk_index, drive in enumerate(drives):
-            disk_image = getattr(self, "_hd{}_disk_image".format(drive))
-            if not disk_image:
-                continue
+        for disk in disks:
             try:
-                if self.linked_clone:
-                    disk = os.path.join(self.working_dir, "hd{}_disk.qcow2".format(drive))
+                # delete the snapshot
+                command = [qemu_img_path, "snapshot", "-d", snapshot_name, disk]
+                retcode = await self._qemu_img_exec(command)
+                if retcode:
+                    stdout = self.read_qemu_img_stdout()
+                    log.warning("Could not delete saved VM state from disk {}: {}".format(disk, stdout))
                 else:
-                    disk = disk_image
-                if not os.path.exists(disk):
-                    continue
-                output = await subprocess_check_output(qemu_img_path, "info", "--output=json", disk)
-                if output:
-                    try:
-                        json_data = json.loads(output)
-                    except ValueError as e:
-                        raise QemuError("Invalid JSON data returned by qemu-img while looking for the Qemu VM saved state snapshot: {}".format(e))
-                    if "snapshots" in json_data:
-                        for snapshot in json_data["snapshots"]:
-                            if snapshot["name"] == snapshot_name:
-                                log.info('QEMU VM "{name}" [{id}] VM saved state detected (snapshot name: {snapshot})'.format(name=self._name,
-                                                                                                                              id=self.id,
-                                                                                                                              snapshot=snapshot_name))
-                                return ["-loadvm", snapshot_name.replace(",", ",,")]
-
-            except subprocess.SubprocessError as e:
-                raise QemuError("Error while looking for the Qemu VM saved state snapshot: {}".format(e))
+                    log.info("Deleted saved VM state from disk {}".format(disk))
+            except (OSError, subprocess.SubprocessError) as e:
+                raise QemuError("Error while deleting the Qemu VM saved state snapshot: {}".format(e))
+
+    async def _saved_state_option(self, snapshot_name="GNS3_SAVED_STATE"):
+
+        if self._saved_state_disks(snapshot_name):
+            log.info('QEMU VM "{name}" [{id}] VM saved state detected (snapshot name: {snapshot})'.format(name=self._name,
+                                                                                                          id=self.id,
+                                                                                                          snapshot=snapshot_name))
+            return ["-loadvm", snapshot_name.replace(",", ",,")]
         return []
 
+    def _golden_state_base_disks(self):
+        """
+        Returns the disks of this VM which are part of a golden state.
+
+        :returns: list of (disk name, base image path)
+        """
+
+        disks = []
+        for drive in ["a", "b", "c", "d"]:
+            disk_image = getattr(self, "_hd{}_disk_image".format(drive))
+            if disk_image:
+                disks.append(("hd" + drive, disk_image))
+        return disks
+
+    async def _golden_state_signature(self):
+        """
+        Returns the settings a saved RAM state depends on, a VM
+        with different settings cannot start from this state.
+        """
+
+        disk_interfaces = {}
+        for disk_name, _ in self._golden_state_base_disks():
+            disk_interfaces[disk_name] = getattr(self, "{}_disk_interface".format(disk_name))
+        return {"qemu_version": await self.manager.get_qemu_version(self.qemu_path),
+                "platform": self._platform,
+                "ram": self._ram,
+                "cpus": self._cpus,
+                "adapters": len(self._ethernet_adapters),
+                "adapter_type": self._adapter_type,
+                "disk_interfaces": disk_interfaces,
+                "bios_image": os.path.basename(self._bios_image) if self._bios_image else "",
+                "options": self._options}
+
+    def _golden_state_disk(self, disk_name):
+        """
+        Returns the golden state disk a new linked clone disk must be copied from.
+
+        :param disk_name: Disk name (hda, hdb etc.)
+
+        :returns: path or None if this VM does not start from a golden state
+        """
+
+        if not self._golden_state:
+            return None
+        directory = self.manager.golden_state_directory(self._golden_state["checksum"])
+        return os.path.join(directory, "{}_disk.qcow2".format(disk_name))
+
+    async def _find_golden_state(self):
+        """
+        Returns the golden state this VM can start from. Only new linked
+        clones, without any disk yet, start from a golden state.
+
+        :returns: golden state description or None to boot normally
+        """
+
+        if not self.linked_clone or not self._hda_disk_image or not os.path.isdir(self.manager.golden_states_directory()):
+            return None
+        disks = self._golden_state_base_disks()
+        for disk_name, _ in disks:
+            if os.path.exists(os.path.join(self.working_dir, "{}_disk.qcow2".format(disk_name))):
+                return None
+        checksum = await wait_run_in_executor(md5sum, self._hda_disk_image)
+        golden_state = self.manager.load_golden_state(checksum)
+        if golden_state is None:
+            return None
+
+        mismatch = None
+        if sorted(golden_state.get("disks", {})) != sorted(disk_name for disk_name, _ in disks):
+            mismatch = "the VM does not have the same disks"
+        else:
+            directory = self.manager.golden_state_directory(checksum)
+            for disk_name, disk_image in disks:
+                if await wait_run_in_executor(md5sum, disk_image) != golden_state["disks"][disk_name]["md5sum"]:
+                    mismatch = "{} disk image '{}' is different".format(disk_name, disk_image)
+                    break
+                if not os.path.isfile(os.path.join(directory, "{}_disk.qcow2".format(disk_name))):
+                    mismatch = "{} golden state disk is missing".format(disk_name)
+                    break
+        if mismatch is None:
+            mismatch = self._golden_state_hotplug_error()
+        if mismatch is None:
+            signature = await self._golden_state_signature()
+            saved_signature = golden_state.get("machine", {})
+            changes = [key for key in sorted(set(signature) | set(saved_signature)) if signature.get(key) != saved_signature.get(key)]
+            if changes:
+                mismatch = "settings have changed ({})".format(", ".join(changes))
+
+        if mismatch:
+            message = 'QEMU VM "{}" cannot start from golden state {}, booting normally: {}'.format(self._name, checksum, mismatch)
+            log.warning(message)
+            self.project.emit("log.warning", {"message": message})
+            return None
+        log.info('QEMU VM "{name}" [{id}] starts from golden state {checksum}'.format(name=self._name, id=self._id, checksum=checksum))
+        return golden_state
+
+    def _golden_state_hotplug_error(self):
+        """
+        The MAC addresses of the network adapters are restored with the golden
+        state, the adapters must be hot-plugged again to get the MAC addresses
+        of this VM.
+
+        :returns: reason why the adapters cannot be hot-plugged or None
+        """
+
+        if not self._ethernet_adapters:
+            return None
+        if self._legacy_networking:
+            return "network adapters cannot be hot-plugged with legacy networking"
+        if self._platform not in ("x86_64", "i386"):
+            return "network adapters cannot be hot-plugged on platform {}".format(self._platform)
+        if "q35" in self._options:
+            return "network adapters cannot be hot-plugged on the root bus of a q35 machine"
+        for adapter_number in range(len(self._ethernet_adapters)):
+            adapter_type = self._get_custom_adapter_settings(adapter_number).get("adapter_type", self._adapter_type)
+            if adapter_type in self.NON_HOTPLUGGABLE_ADAPTERS:
+                return "{} network adapters cannot be hot-plugged".format(adapter_type)
+        return None
+
+    async def _replug_network_adapters(self):
+        """
+        Unplugs the network adapters and plugs them again with the MAC addresses
+        of this VM, the guest must release an adapter before it can be plugged again.
+        """
+
+        loop = asyncio.get_event_loop()
+        replugged = []
+        for adapter_number, device in sorted(self._network_devices.items()):
+            future = loop.create_future()
+            replugged.append((adapter_number, future))
+
+            async def replug(device=device, future=future):
+                try:
+                    await self._qmp.execute("device_add", device)
+                except QemuError as e:
+                    if future.done():
+                        log.warning('QEMU VM "{}" could not plug network adapter {} again: {}'.format(self._name, device["id"], e))
+                    else:
+                        future.set_exception(e)
+                    return
+                if not future.done():
+                    future.set_result(True)
+
+            self._adapters_to_replug[device["id"]] = replug
+            try:
+                await self._qmp.execute("device_del", {"id": device["id"]})
+            except QemuError as e:
+                self._adapters_to_replug.pop(device["id"], None)
+                future.set_exception(e)
+
+        if replugged:
+            await asyncio.wait([future for _, future in replugged], timeout=self.ADAPTER_UNPLUG_TIMEOUT)
+        for adapter_number, future in replugged:
+            if future.done() and future.exception() is None:
+                continue
+            if future.done():
+                reason = future.exception()
+            else:
+                # the adapter is plugged again if the guest releases it later
+                reason = "the guest has not released it after {} seconds".format(self.ADAPTER_UNPLUG_TIMEOUT)
+            message = 'QEMU VM "{}" adapter {} still has the MAC address of the golden state: {}'.format(self._name, adapter_number, reason)
+            log.warning(message)
+            self.project.emit("log.warning", {"message": message})
+            future.cancel()
+
+    async def _golden_state_reset(self):
+        """
+        Gives its own identity to a VM started from a golden state.
+
+        The golden state snapshot is deleted from the disks of the VM, its
+        network adapters are plugged again with the MAC addresses of this VM
+        (the loaded state contains the MAC addresses of the saved VM), its
+        links are restarted so the guest renews its network configuration,
+        then the reset commands saved with the golden state are executed.
+        """
+
+        golden_state = self._golden_state
+        self._golden_state = None
+        await self._control_vm("delvm {}".format(self.GOLDEN_STATE_SNAPSHOT), timeout=120)
+        await self._replug_network_adapters()
+
+        set_link_commands = []
+        for adapter_number, adapter in enumerate(self._ethernet_adapters):
+            set_link_commands.append("set_link gns3-{} off".format(adapter_number))
+        for adapter_number, adapter in enumerate(self._ethernet_adapters):
+            nio = adapter.get_nio(0)
+            if self._replicate_network_connection_state and (nio is None or nio.suspend):
+                continue
+            set_link_commands.append("set_link gns3-{} on".format(adapter_number))
+        await self._control_vm_commands(set_link_commands)
+
+        for command in golden_state.get("reset_commands", []):
+            try:
+                command = command.format(name=self._name,
+                                         node_id=self._id,
+                                         mac_address=self._mac_address,
+                                         console=self._console)
+            except (KeyError, IndexError, ValueError) as e:
+                log.warning("Invalid golden state reset command '{}': {}".format(command, e))
+                continue
+            await self._control_vm(command)
+
+    async def save_golden_state(self, reset_commands=None):
+        """
+        Saves the state of this running VM as the golden state of its base
+        images: new linked clones of the same images start from this state
+        instead of booting.
+
+        :param reset_commands: QEMU monitor commands executed on the clones
+        once started from the golden state ({name}, {node_id}, {mac_address}
+        and {console} are replaced by the values of each clone)
+
+        :returns: golden state description
+        """
+
+        if not self.is_running() or not self._qmp:
+            raise QemuError("QEMU VM must be running to save a golden state")
+        if not self.linked_clone:
+            raise QemuError("Only linked clones can save a golden state")
+        if not self._hda_disk_image:
+            raise QemuError("A golden state requires an hda disk image")
+
+        disks = {}
+        for disk_name, disk_image in self._golden_state_base_disks():
+            disk = os.path.join(self.working_dir, "{}_disk.qcow2".format(disk_name))
+            if not os.path.exists(disk):
+                raise QemuError("{} disk image '{}' does not exist".format(disk_name, disk))
+            disks[disk_name] = {"base_image": disk_image,
+                                "md5sum": await wait_run_in_executor(md5sum, disk_image),
+                                "disk": disk}
+        checksum = disks["hda"]["md5sum"]
+        golden_state = {"checksum": checksum,
+                        "name": self._name,
+                        "created_at": int(time.time()),
+                        "disks": {disk_name: {"base_image": disk["base_image"], "md5sum": disk["md5sum"]} for disk_name, disk in disks.items()},
+                        "machine": await self._golden_state_signature(),
+                        "reset_commands": reset_commands or []}
+
+        directory = self.manager.golden_state_directory(checksum)
+        tmp_directory = directory + ".tmp"
+        qemu_img_path = self._get_qemu_img()
+        was_running = await self._get_vm_status() == "running"
+        await self._qmp.execute("stop")
+        try:
+            output = await self._qmp.human_monitor_command("savevm {}".format(self.GOLDEN_STATE_SNAPSHOT), timeout=120)
+            if output and "error" in output.lower():
+                raise QemuError("Could not save the golden state of QEMU VM {}: {}".format(self._name, output.strip()))
+            try:
+                await wait_run_in_executor(shutil.rmtree, tmp_directory, ignore_errors=True)
+                os.makedirs(tmp_directory)
+                for disk_name, disk in disks.items():
+                    await wait_run_in_executor(shutil.copyfile, disk["disk"], os.path.join(tmp_directory, "{}_disk.qcow2".format(disk_name)))
+            except OSError as e:
+                raise QemuError("Could not copy the disks of the golden state: {}".format(e))
+            finally:
+                # the state only lives in the copies
+                await self._qmp.human_monitor_command("delvm {}".format(self.GOLDEN_STATE_SNAPSHOT), timeout=120)
+        finally:
+            if was_running:
+                await self._qmp.execute("cont")
+
+        try:
+            for disk_name in disks:
+                # a saved state of this VM must not be restored by the clones
+                disk = os.path.join(tmp_directory, "{}_disk.qcow2".format(disk_name))
+                if Qcow2(disk).has_snapshot("GNS3_SAVED_STATE"):
+                    await self._qemu_img_exec([qemu_img_path, "snapshot", "-d", "GNS3_SAVED_STATE", disk])
+            with open(os.path.join(tmp_directory, "golden_state.json"), "w") as f:
+                json.dump(golden_state, f)
+            if os.path.exists(directory):
+                await wait_run_in_executor(shutil.rmtree, directory)
+            os.rename(tmp_directory, directory)
+        except (Qcow2Error, OSError, subprocess.SubprocessError) as e:
+            raise QemuError("Could not save the golden state of QEMU VM {}: {}".format(self._name, e))
+        log.info('QEMU VM "{name}" [{id}] saved golden state {checksum}'.format(name=self._name, id=self._id, checksum=checksum))
+        return golden_state
+
     async def _build_command(self):
         """
         Command to start the QEMU process.
@@ -2038,6 +2614,7 @@ class QemuVM(BaseNode):
         command.extend(["-name", vm_name])
         command.extend(["-m", "{}M".format(self._ram)])
         command.extend(["-smp", "cpus={},sockets=1".format(self._cpus)])
+        command.extend(self._memory_merging_options())
         if await self._run_with_hardware_acceleration(self.qemu_path, self._options):
             if sys.platform.startswith("linux"):
                 command.extend(["-enable-kvm"])
@@ -2051,7 +2628,9 @@ class QemuVM(BaseNode):
         command.extend(["-boot", "order={}".format(self._boot_priority)])
         command.extend(self._bios_option())
         command.extend(self._cdrom_option())
-        command.extend((await self._disk_options()))
+        with self.timing_span("disks"):
+            self._golden_state = await self._find_golden_state()
+            command.extend((await self._disk_options()))
         command.extend(self._linux_boot_options())
         if "-uuid" not in additional_options:
             command.extend(["-uuid", self._id])
@@ -2071,6 +2650,8 @@ class QemuVM(BaseNode):
             await self._clear_save_vm_stated()
         else:
             command.extend((await self._saved_state_option()))
+        if self._golden_state and "-loadvm" not in command:
+            command.extend(["-loadvm", self.GOLDEN_STATE_SNAPSHOT])
         if self._console_type == "telnet":
             command.extend((await self._disable_graphics()))
         if additional_options:
@@ -2109,4 +2690,5 @@ class QemuVM(BaseNode):
         answer["initrd_md5sum"] = md5sum(self._initrd)
         answer["kernel_image"] = self.manager.get_relative_image_path(self._kernel_image, self.project.path)
         answer["kernel_image_md5sum"] = md5sum(self._kernel_image)
+        answer["start_timings"] = self.start_timings
         return answer
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Kernel Samepage Merging (KSM) control and statistics (Linux only).
+
+QEMU marks the guest RAM as mergeable (-machine mem-merge=on) and the
+KSM daemon of the host merges the identical pages of the VMs, which saves
+a lot of memory when many VMs run the same appliance.
+"""
+
+import os
+import sys
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class KSM:
+    """
+    Host KSM.
+
+    :param path: KSM sysfs directory
+    :param proc_path: procfs directory, to read the pages merged for each process
+    """
+
+    COUNTERS = ("pages_shared", "pages_sharing", "pages_unshared", "pages_volatile", "full_scans")
+
+    def __init__(self, path="/sys/kernel/mm/ksm", proc_path="/proc"):
+
+        self._path = path
+        self._proc_path = proc_path
+
+    def available(self):
+        """
+        :returns: True if the host supports KSM
+        """
+
+        return sys.platform.startswith("linux") and os.path.isfile(os.path.join(self._path, "run"))
+
+    def _read(self, filename):
+
+        with open(os.path.join(self._path, filename)) as f:
+            return int(f.read().strip())
+
+    def enable(self):
+        """
+        Starts the KSM daemon if it is stopped and the server is allowed to.
+
+        :returns: True if KSM is running
+        """
+
+        if not self.available():
+            return False
+        try:
+            if self._read("run") == 1:
+                return True
+            with open(os.path.join(self._path, "run"), "w") as f:
+                f.write("1")
+        except (OSError, ValueError) as e:
+            log.warning("Could not start KSM, memory will not be merged until it is started: {}".format(e))
+            return False
+        log.info("KSM has been started")
+        return True
+
+    def stats(self):
+        """
+        Returns the KSM counters of the host.
+
+        :returns: dictionary or None if KSM is not available
+        """
+
+        if not self.available():
+            return None
+        stats = {}
+        for counter in ("run",) + self.COUNTERS:
+            try:
+                stats[counter] = self._read(counter)
+            except (OSError, ValueError):
+                continue
+        return stats
+
+    def process_merged_pages(self, pid):
+        """
+        Returns the number of pages of a process merged by KSM.
+
+        :param pid: process identifier
+
+        :returns: integer or None if unknown (requires Linux >= 5.19)
+        """
+
+        try:
+            with open(os.path.join(self._proc_path, str(pid), "ksm_merging_pages")) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
@@ -29,6 +29,10 @@ class Qcow2:
     Allows to parse a Qcow2 file
     """
 
+    # Incompatible feature bits (QCOW2 version 3 only)
+    DIRTY_BIT = 1 << 0
+    CORRUPT_BIT = 1 << 1
+
     def __init__(self, path):
 
         self._path = path
@@ -56,20 +60,56 @@ class Qcow2:
         #
         #     uint32_t nb_snapshots;
         #     uint64_t snapshots_offset;
+        #
+        #     /* The following fields are only valid for version >= 3 */
+        #     uint64_t incompatible_features;
+        #     uint64_t compatible_features;
+        #     uint64_t autoclear_features;
+        #
+        #     uint32_t refcount_order;
+        #     uint32_t header_length;
         # } QCowHeader;
 
-        struct_format = ">IIQi"
+        struct_format = ">IIQiIQIIQQIIQ"
+        v3_struct_format = ">QQQII"
         with open(self._path, 'rb') as f:
-            content = f.read(struct.calcsize(struct_format))
-            try:
-                self.magic, self.version, self.backing_file_offset, self.backing_file_size = struct.unpack_from(struct_format, content)
-
-            except struct.error:
-                raise Qcow2Error("Invalid file header for {}".format(self._path))
+            content = f.read(struct.calcsize(struct_format) + struct.calcsize(v3_struct_format))
+        try:
+            (self.magic,
+             self.version,
+             self.backing_file_offset,
+             self.backing_file_size,
+             self.cluster_bits,
+             self.size,
+             self.crypt_method,
+             self.l1_size,
+             self.l1_table_offset,
+             self.refcount_table_offset,
+             self.refcount_table_clusters,
+             self.nb_snapshots,
+             self.snapshots_offset) = struct.unpack_from(struct_format, content)
+        except struct.error:
+            raise Qcow2Error("Invalid file header for {}".format(self._path))
 
         if self.magic != 1363560955:  # The first 4 bytes contain the characters 'Q', 'F', 'I' followed by 0xfb.
             raise Qcow2Error("Invalid magic for {}".format(self._path))
 
+        # default values for version 2 images
+        self.incompatible_features = 0
+        self.compatible_features = 0
+        self.autoclear_features = 0
+        self.refcount_order = 4
+        self.header_length = struct.calcsize(struct_format)
+        if self.version >= 3:
+            try:
+                (self.incompatible_features,
+                 self.compatible_features,
+                 self.autoclear_features,
+                 self.refcount_order,
+                 self.header_length) = struct.unpack_from(v3_struct_format, content, struct.calcsize(struct_format))
+            except struct.error:
+                raise Qcow2Error("Invalid version 3 file header for {}".format(self._path))
+
     @property
     def backing_file(self):
         """
@@ -87,6 +127,208 @@ class Qcow2:
             return None
         return path
 
+    @property
+    def cluster_size(self):
+        """
+        :returns: Cluster size in bytes
+        """
+
+        return 1 << self.cluster_bits
+
+    @property
+    def virtual_size(self):
+        """
+        :returns: Virtual disk size in bytes (as seen by the guest)
+        """
+
+        return self.size
+
+    @property
+    def dirty(self):
+        """
+        :returns: True if the image was not closed cleanly (refcounts may be inconsistent)
+        """
+
+        return bool(self.incompatible_features & self.DIRTY_BIT)
+
+    @property
+    def corrupt(self):
+        """
+        :returns: True if the image has been marked as corrupt by Qemu
+        """
+
+        return bool(self.incompatible_features & self.CORRUPT_BIT)
+
+    @property
+    def snapshots(self):
+        """
+        Parses the snapshot table.
+
+        Each snapshot entry is using the same keys as the
+        output of "qemu-img info --output=json".
+
+        :returns: list of snapshots (dict)
+        """
+
+        # Each snapshot table entry is as follows (big endian):
+        #
+        #     uint64_t l1_table_offset;
+        #     uint32_t l1_size;
+        #     uint16_t id_str_size;
+        #     uint16_t name_size;
+        #     uint32_t date_sec;
+        #     uint32_t date_nsec;
+        #     uint64_t vm_clock_nsec;
+        #     uint32_t vm_state_size;
+        #     uint32_t extra_data_size;
+        #     /* extra data follows */
+        #     /* id_str follows (not null terminated) */
+        #     /* name follows (not null terminated) */
+        #     /* padding to round up to a multiple of 8 bytes */
+
+        snapshots = []
+        if self.nb_snapshots == 0:
+            return snapshots
+
+        entry_format = ">QIHHIIQII"
+        entry_size = struct.calcsize(entry_format)
+        with open(self._path, 'rb') as f:
+            f.seek(self.snapshots_offset)
+            for _ in range(self.nb_snapshots):
+                try:
+                    (_,
+                     _,
+                     id_str_size,
+                     name_size,
+                     date_sec,
+                     date_nsec,
+                     vm_clock_nsec,
+                     vm_state_size,
+                     extra_data_size) = struct.unpack(entry_format, f.read(entry_size))
+                except struct.error:
+                    raise Qcow2Error("Invalid snapshot table for {}".format(self._path))
+
+                extra_data = f.read(extra_data_size)
+                if len(extra_data) >= 8:
+                    # version 3 images store the 64-bit VM state size in the extra data
+                    vm_state_size = struct.unpack_from(">Q", extra_data)[0]
+                id_str = f.read(id_str_size)
+                name = f.read(name_size)
+                if len(id_str) != id_str_size or len(name) != name_size:
+                    raise Qcow2Error("Invalid snapshot table for {}".format(self._path))
+
+                # skip the padding, each entry is aligned to 8 bytes
+                f.seek(-(entry_size + extra_data_size + id_str_size + name_size) % 8, os.SEEK_CUR)
+
+                snapshots.append({
+                    "id": id_str.decode(errors="replace"),
+                    "name": name.decode(errors="replace"),
+                    "vm-state-size": vm_state_size,
+                    "date-sec": date_sec,
+                    "date-nsec": date_nsec,
+                    "vm-clock-nsec": vm_clock_nsec
+                })
+        return snapshots
+
+    def has_snapshot(self, name):
+        """
+        Checks if a snapshot exists in this image.
+
+        :param name: snapshot name
+
+        :returns: boolean
+        """
+
+        for snapshot in self.snapshots:
+            if snapshot["name"] == name:
+                return True
+        return False
+
+    @classmethod
+    def create_overlay(cls, path, base_image, cluster_bits=16):
+        """
+        Creates an empty qcow2 (version 3) overlay using base_image as backing file,
+        without spawning "qemu-img create".
+
+        Only qcow2 base images are supported because the virtual size
+        of the overlay is read from the base image header.
+
+        The layout is the same as the one created by qemu-img:
+        header, refcount table, refcount block then the L1 table.
+
+        :param path: Path of the overlay to create
+        :param base_image: Path to the base image
+
+        :returns: Qcow2 instance of the new overlay
+        """
+
+        base = cls(base_image)
+        backing_file = base_image.encode()
+        backing_format = b"qcow2"
+        cluster_size = 1 << cluster_bits
+        if len(backing_file) > 1023:
+            raise Qcow2Error("Backing file name is too long: {}".format(base_image))
+
+        # each L2 table maps cluster_size / 8 clusters
+        l2_coverage = cluster_size * (cluster_size // 8)
+        l1_size = (base.virtual_size + l2_coverage - 1) // l2_coverage
+        l1_clusters = max(1, (l1_size * 8 + cluster_size - 1) // cluster_size)
+        refcount_table_offset = cluster_size
+        refcount_block_offset = 2 * cluster_size
+        l1_table_offset = 3 * cluster_size
+        nb_clusters = 3 + l1_clusters
+        if nb_clusters > cluster_size // 2:
+            # a single refcount block (16-bit refcounts) must cover the whole metadata
+            raise Qcow2Error("Virtual size is too large to create an overlay for {}".format(base_image))
+
+        # header extensions: backing file format then end of extensions
+        header_length = 104
+        extensions = struct.pack(">II", 0xe2792aca, len(backing_format)) + backing_format
+        extensions += b"\0" * (-len(extensions) % 8)
+        extensions += struct.pack(">II", 0, 0)
+        backing_file_offset = header_length + len(extensions)
+
+        header = struct.pack(">IIQIIQIIQQIIQQQQII",
+                             1363560955,  # magic
+                             3,  # version
+                             backing_file_offset,
+                             len(backing_file),
+                             cluster_bits,
+                             base.virtual_size,
+                             0,  # no encryption
+                             l1_size,
+                             l1_table_offset,
+                             refcount_table_offset,
+                             1,  # refcount table clusters
+                             0,  # no snapshots
+                             0,  # snapshots offset
+                             0,  # incompatible features
+                             0,  # compatible features
+                             0,  # autoclear features
+                             4,  # refcount order (16-bit refcounts)
+                             header_length)
+
+        header_cluster = header + extensions + backing_file
+        header_cluster += b"\0" * (cluster_size - len(header_cluster))
+        refcount_table = struct.pack(">Q", refcount_block_offset)
+        refcount_table += b"\0" * (cluster_size - len(refcount_table))
+        refcount_block = struct.pack(">{}H".format(nb_clusters), *([1] * nb_clusters))
+        refcount_block += b"\0" * (cluster_size - len(refcount_block))
+
+        # write to a temporary file first so a partial overlay is never left behind
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header_cluster)
+                f.write(refcount_table)
+                f.write(refcount_block)
+                f.write(b"\0" * (l1_clusters * cluster_size))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return cls(path)
+
     async def rebase(self, qemu_img, base_image):
         """
         Rebase a linked clone in order to use the correct disk
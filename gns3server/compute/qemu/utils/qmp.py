@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Client for the QEMU Machine Protocol (QMP).
+
+One connection is kept open while the VM is running. Commands are tagged
+with an id to match their response and asynchronous events (STOP, RESUME,
+SHUTDOWN etc.) are passed to a callback.
+"""
+
+import json
+import time
+import asyncio
+
+from ..qemu_error import QemuError
+
+import logging
+log = logging.getLogger(__name__)
+
+# buffer limit of the QMP connection, the output of some
+# human monitor commands (info qtree, info mtree etc.) is large
+QMP_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class QMPClient:
+    """
+    QMP connection to a QEMU VM.
+
+    :param host: QMP server host
+    :param port: QMP server port
+    :param event_callback: function called with the name and data of each event
+    :param disconnect_callback: function called when the connection is lost
+    """
+
+    def __init__(self, host, port, event_callback=None, disconnect_callback=None):
+
+        self._host = host
+        self._port = port
+        self._event_callback = event_callback
+        self._disconnect_callback = disconnect_callback
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._connect_lock = asyncio.Lock()
+        self._responses = {}
+        self._next_id = 0
+
+    @property
+    def connected(self):
+
+        return self._read_task is not None and not self._read_task.done()
+
+    async def connect(self, timeout=10):
+        """
+        Connects to the QMP server and negotiates the capabilities,
+        retries until the QEMU process is listening.
+
+        :param timeout: timeout to connect to the QMP server
+        """
+
+        async with self._connect_lock:
+            if self.connected:
+                return
+            begin = time.time()
+            delay = 0.01
+            last_exception = None
+            while True:
+                try:
+                    log.debug("Connecting to QMP on {}:{}".format(self._host, self._port))
+                    self._reader, self._writer = await asyncio.open_connection(self._host, self._port, limit=QMP_STREAM_LIMIT)
+                    greeting = await asyncio.wait_for(self._reader.readline(), timeout=timeout)
+                    if not greeting:
+                        raise ConnectionError("connection closed")
+                    if "QMP" not in json.loads(greeting.decode("utf-8")):
+                        raise QemuError("Invalid QMP greeting: {}".format(greeting))
+                    break
+                except (asyncio.TimeoutError, OSError, ValueError) as e:
+                    last_exception = e
+                    self._close_writer()
+                if time.time() - begin >= timeout:
+                    raise QemuError("Could not connect to QMP on {}:{}: {}".format(self._host, self._port, last_exception))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+            self._read_task = asyncio.ensure_future(self._read_loop())
+            await self._execute("qmp_capabilities")
+            log.info("Connected to QMP on {}:{} after {:.4f} seconds".format(self._host, self._port, time.time() - begin))
+
+    async def execute(self, command, arguments=None, timeout=30):
+        """
+        Executes a QMP command, reconnects if the connection has been lost.
+
+        :param command: QMP command name
+        :param arguments: command arguments
+        :param timeout: timeout to wait for the response
+
+        :returns: command return value
+        """
+
+        if not self.connected:
+            await self.connect()
+        return await self._execute(command, arguments, timeout)
+
+    async def human_monitor_command(self, command, timeout=30):
+        """
+        Executes a human monitor (HMP) command.
+
+        :param command: HMP command (e.g. savevm, eject etc.)
+        :param timeout: timeout to wait for the response
+
+        :returns: command output
+        """
+
+        return await self.execute("human-monitor-command", {"command-line": command}, timeout=timeout)
+
+    async def _execute(self, command, arguments=None, timeout=30):
+
+        self._next_id += 1
+        request_id = self._next_id
+        request = {"execute": command, "id": request_id}
+        if arguments:
+            request["arguments"] = arguments
+        if self._writer is None:
+            raise QemuError("Could not send QMP command '{}': not connected to QMP on {}:{}".format(command, self._host, self._port))
+        future = asyncio.get_event_loop().create_future()
+        self._responses[request_id] = future
+        try:
+            self._writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            response = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise QemuError("Timeout while waiting for the result of QMP command '{}'".format(command))
+        except OSError as e:
+            raise QemuError("Could not send QMP command '{}': {}".format(command, e))
+        finally:
+            self._responses.pop(request_id, None)
+        if "error" in response:
+            raise QemuError("QMP command '{}' has failed: {}".format(command, response["error"].get("desc", response["error"])))
+        return response.get("return")
+
+    async def _read_loop(self):
+
+        error = ConnectionError("QMP connection closed")
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    log.warning("Invalid QMP message: {}".format(line))
+                    continue
+                if "event" in message:
+                    log.debug("QMP event {} received from {}:{}".format(message["event"], self._host, self._port))
+                    if self._event_callback:
+                        try:
+                            self._event_callback(message["event"], message.get("data", {}))
+                        except Exception as e:
+                            log.error("Error while handling QMP event {}: {}".format(message["event"], e), exc_info=1)
+                    continue
+                future = self._responses.get(message.get("id"))
+                if future and not future.done():
+                    future.set_result(message)
+        except OSError as e:
+            error = e
+        except (ValueError, asyncio.LimitOverrunError) as e:
+            # the message does not fit in the buffer, the stream cannot be read anymore
+            error = ConnectionError("QMP message too large: {}".format(e))
+        finally:
+            for future in self._responses.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._close_writer()
+            if self._disconnect_callback:
+                self._disconnect_callback()
+
+    def _close_writer(self):
+
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+
+        if self._read_task:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+        self._close_writer()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Durations of the recent node starts and of their phases (disk preparation,
+uBridge, console, emulator process, links etc.), aggregated by node type
+so the slow phases can be found with percentiles.
+"""
+
+import collections
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class StartTimings:
+    """
+    Durations of the recent node starts, shared by all the emulator managers.
+
+    :param max_samples: number of starts kept for each node type and phase
+    """
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, max_samples=1000):
+
+        self._max_samples = max_samples
+        self._samples = {}
+
+    @staticmethod
+    def reset():
+        StartTimings._instance = None
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of StartTimings.
+
+        :returns: instance of StartTimings
+        """
+
+        if not hasattr(StartTimings, "_instance") or StartTimings._instance is None:
+            StartTimings._instance = StartTimings()
+        return StartTimings._instance
+
+    def record(self, node_type, phases, total):
+        """
+        Records the durations of a node start.
+
+        :param node_type: node type (e.g. qemu, vpcs)
+        :param phases: dictionary of phase name -> duration in seconds
+        :param total: duration in seconds of the whole start
+        """
+
+        samples = self._samples.setdefault(node_type, collections.OrderedDict())
+        for phase, duration in list(phases.items()) + [("total", total)]:
+            if phase not in samples:
+                samples[phase] = collections.deque(maxlen=self._max_samples)
+            samples[phase].append(duration)
+
+    @staticmethod
+    def _percentile(values, percentile):
+        """
+        Returns a percentile of sorted values (nearest rank).
+        """
+
+        rank = max(int(-(-percentile * len(values) // 100)), 1)
+        return values[rank - 1]
+
+    def percentiles(self):
+        """
+        Returns the percentiles of the start durations.
+
+        :returns: dictionary node type -> phase -> {"count", "p50", "p90", "p99", "max"}
+        """
+
+        result = {}
+        for node_type, samples in self._samples.items():
+            result[node_type] = {}
+            for phase, durations in samples.items():
+                values = sorted(durations)
+                stats = {"count": len(values)}
+                for percentile in self.PERCENTILES:
+                    stats["p{}".format(percentile)] = round(self._percentile(values, percentile), 4)
+                stats["max"] = round(values[-1], 4)
+                result[node_type][phase] = stats
+        return result
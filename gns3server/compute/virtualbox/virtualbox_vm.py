@@ -37,7 +37,7 @@ from gns3server.utils.asyncio import locking
 from gns3server.compute.virtualbox.virtualbox_error import VirtualBoxError
 from gns3server.compute.nios.nio_udp import NIOUDP
 from gns3server.compute.adapters.ethernet_adapter import EthernetAdapter
-from gns3server.compute.base_node import BaseNode
+from gns3server.compute.base_node import BaseNode, timed_start
 
 if sys.platform.startswith('win'):
     import msvcrt
@@ -89,7 +89,8 @@ class VirtualBoxVM(BaseNode):
                 "ram": self.ram,
                 "status": self.status,
                 "use_any_adapter": self.use_any_adapter,
-                "linked_clone": self.linked_clone}
+                "linked_clone": self.linked_clone,
+                "start_timings": self.start_timings}
         if self.linked_clone:
             json["node_directory"] = self.working_path
         else:
@@ -254,6 +255,7 @@ class VirtualBoxVM(BaseNode):
         return False
 
     @locking
+    @timed_start
     async def start(self):
         """
         Starts this VirtualBox VM.
@@ -276,8 +278,9 @@ class VirtualBoxVM(BaseNode):
             else:
                 await self.manager.execute("guestproperty", ["delete", self._uuid, "SavedByGNS3"])
         elif vm_state == "poweroff":
-            await self._set_network_options()
-            await self._set_serial_console()
+            with self.timing_span("configs"):
+                await self._set_network_options()
+                await self._set_serial_console()
         else:
             raise VirtualBoxError("VirtualBox VM '{}' is not powered off (current state is '{}')".format(self.name, vm_state))
 
@@ -287,15 +290,17 @@ class VirtualBoxVM(BaseNode):
         args = [self._uuid]
         if self._headless:
             args.extend(["--type", "headless"])
-        result = await self.manager.execute("startvm", args)
+        with self.timing_span("process"):
+            result = await self.manager.execute("startvm", args)
         self.status = "started"
         log.info("VirtualBox VM '{name}' [{id}] started".format(name=self.name, id=self.id))
         log.debug("Start result: {}".format(result))
 
-        # add a guest property to let the VM know about the GNS3 name
-        await self.manager.execute("guestproperty", ["set", self._uuid, "NameInGNS3", self.name])
-        # add a guest property to let the VM know about the GNS3 project directory
-        await self.manager.execute("guestproperty", ["set", self._uuid, "ProjectDirInGNS3", self.working_dir])
+        with self.timing_span("configs"):
+            # add a guest property to let the VM know about the GNS3 name
+            await self.manager.execute("guestproperty", ["set", self._uuid, "NameInGNS3", self.name])
+            # add a guest property to let the VM know about the GNS3 project directory
+            await self.manager.execute("guestproperty", ["set", self._uuid, "ProjectDirInGNS3", self.working_dir])
 
         await self._start_ubridge()
         for adapter_number in range(0, self._adapters):
@@ -305,7 +310,8 @@ class VirtualBoxVM(BaseNode):
                                                            self._local_udp_tunnels[adapter_number][1],
                                                            nio)
 
-        await self._start_console()
+        with self.timing_span("console"):
+            await self._start_console()
 
         if (await self.check_hw_virtualization()):
             self._hw_virtualization = True
@@ -963,7 +969,8 @@ class VirtualBoxVM(BaseNode):
             server = AsyncioTelnetServer(reader=self._remote_pipe,
                                          writer=self._remote_pipe,
                                          binary=True,
-                                         echo=True)
+                                         echo=True,
+                                         scrollback=self.console_scrollback)
             try:
                 self._telnet_server = await asyncio.start_server(server.run, self._manager.port_manager.console_host, self.console)
             except OSError as e:
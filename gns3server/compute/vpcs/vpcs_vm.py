@@ -37,7 +37,8 @@ from gns3server.utils import parse_version
 from .vpcs_error import VPCSError
 from ..adapters.ethernet_adapter import EthernetAdapter
 from ..nios.nio_udp import NIOUDP
-from ..base_node import BaseNode
+from ..base_node import BaseNode, timed_start
+from ..binary_cache import BinaryCache
 
 
 import logging
@@ -129,7 +130,8 @@ class VPCSVM(BaseNode):
                 "console": self._console,
                 "console_type": self._console_type,
                 "project_id": self.project.id,
-                "command_line": self.command_line}
+                "command_line": self.command_line,
+                "start_timings": self.start_timings}
 
     def _vpcs_path(self):
         """
@@ -200,7 +202,8 @@ class VPCSVM(BaseNode):
         Checks if the VPCS executable version is >= 0.8b or == 0.6.1.
         """
         try:
-            output = await subprocess_check_output(self._vpcs_path(), "-v", cwd=self.working_dir)
+            vpcs_path = self._vpcs_path()
+            output = await BinaryCache.instance().probe(vpcs_path, "version", lambda: subprocess_check_output(vpcs_path, "-v", cwd=self.working_dir))
             match = re.search(r"Welcome to Virtual PC Simulator, version ([0-9a-z\.]+)", output)
             if match:
                 version = match.group(1)
@@ -212,12 +215,14 @@ class VPCSVM(BaseNode):
         except (OSError, subprocess.SubprocessError) as e:
             raise VPCSError("Error while looking for the VPCS version: {}".format(e))
 
+    @timed_start
     async def start(self):
         """
         Starts the VPCS process.
         """
 
-        await self._check_requirements()
+        with self.timing_span("requirements"):
+            await self._check_requirements()
         if not self.is_running():
             nio = self._ethernet_adapter.get_nio(0)
             command = self._build_command()
@@ -228,7 +233,7 @@ class VPCSVM(BaseNode):
                 flags = 0
                 if sys.platform.startswith("win32"):
                     flags = subprocess.CREATE_NEW_PROCESS_GROUP
-                with open(self._vpcs_stdout_file, "w", encoding="utf-8") as fd:
+                with open(self._vpcs_stdout_file, "w", encoding="utf-8") as fd, self.timing_span("process"):
                     self.command_line = ' '.join(command)
                     self._process = await asyncio.create_subprocess_exec(*command,
                                                                               stdout=fd,
@@ -237,6 +242,7 @@ class VPCSVM(BaseNode):
                                                                               creationflags=flags)
                     monitor_process(self._process, self._termination_callback)
 
+                self._set_resource_limits(self._process.pid)
                 await self._start_ubridge()
                 if nio:
                     await self.add_ubridge_udp_connection("VPCS-{}".format(self._id), self._local_udp_tunnel[1], nio)
@@ -288,6 +294,7 @@ class VPCSVM(BaseNode):
 
         self._process = None
         self._started = False
+        self._remove_resource_limits()
         await super().stop()
 
     async def reload(self):
@@ -32,6 +32,7 @@ from .template_manager import TemplateManager
 from .compute import Compute, ComputeError
 from .notification import Notification
 from .symbols import Symbols
+from .idlepc_database import IdlePCDatabase
 from ..version import __version__
 from .topology import load_topology
 from .gns3vm import GNS3VM
@@ -58,6 +59,7 @@ class Controller:
         self._iou_license_settings = {"iourc_content": "",
                                       "license_check": True}
         self._config_loaded = False
+        self._idlepc_database = None
         self._config_file = Config.instance().controller_config
         log.info("Load controller configuration file {}".format(self._config_file))
 
@@ -555,6 +557,38 @@ class Controller:
             Controller._instance = Controller()
         return Controller._instance
 
+    @property
+    def idlepc_database(self):
+        """
+        :returns: Idle-PC values found for the IOS images
+        """
+
+        if self._idlepc_database is None:
+            self._idlepc_database = IdlePCDatabase(os.path.join(os.path.dirname(self._config_file), "idlepc.json"))
+        return self._idlepc_database
+
+    async def dynamips_image_checksum(self, compute, image):
+        """
+        Returns the checksum of a Dynamips image on a compute.
+
+        :param compute: Compute instance
+        :param image: image file name or path
+
+        :returns: MD5 checksum or None if the image is not found
+        """
+
+        try:
+            images = await compute.images("dynamips")
+        except (ComputeError, aiohttp.web.HTTPException) as e:
+            log.warning("Cannot list the Dynamips images on compute {}: {}".format(compute.id, e))
+            return None
+        if not isinstance(images, list):
+            return None
+        for image_info in images:
+            if image in (image_info.get("filename"), image_info.get("path")) or os.path.basename(image) == image_info.get("filename"):
+                return image_info.get("md5sum")
+        return None
+
     async def autoidlepc(self, compute_id, platform, image, ram):
         """
         Compute and IDLE PC value for an image
@@ -566,13 +600,19 @@ class Controller:
         """
 
         compute = self.get_compute(compute_id)
+        checksum = await self.dynamips_image_checksum(compute, image)
+        idlepc = self.idlepc_database.get(checksum, platform, ram)
+        if idlepc:
+            log.info("Idle-PC value {} found in the database for image {}".format(idlepc, image))
+            return {"idlepc": idlepc}
+
         for project in list(self._projects.values()):
             if project.name == "AUTOIDLEPC":
                 await project.delete()
                 self.remove_project(project)
         project = await self.add_project(name="AUTOIDLEPC")
         node = await project.add_node(compute, "AUTOIDLEPC", str(uuid.uuid4()), node_type="dynamips", platform=platform, image=image, ram=ram)
-        res = await node.dynamips_auto_idlepc()
+        res = await node.dynamips_auto_idlepc(checksum=checksum)
         await project.delete()
         self.remove_project(project)
         return res
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class IdlePCDatabase:
+    """
+    Idle-PC values found for the IOS images, shared by all the computes.
+
+    Values are keyed by image checksum, platform and RAM and saved in a JSON file.
+
+    :param path: path to the JSON file
+    """
+
+    def __init__(self, path):
+
+        self._path = path
+        self._idlepcs = None
+
+    @property
+    def path(self):
+
+        return self._path
+
+    @staticmethod
+    def _key(checksum, platform, ram):
+
+        return "{}:{}:{}".format(checksum, platform, ram)
+
+    def _load(self):
+
+        if self._idlepcs is not None:
+            return self._idlepcs
+        self._idlepcs = {}
+        if os.path.exists(self._path):
+            try:
+                with open(self._path, encoding="utf-8") as f:
+                    self._idlepcs = json.load(f).get("idlepcs", {})
+            except (OSError, ValueError, AttributeError) as e:
+                log.error("Cannot load the Idle-PC database '{}': {}".format(self._path, e))
+        return self._idlepcs
+
+    def get(self, checksum, platform, ram):
+        """
+        Returns the Idle-PC value of an image.
+
+        :param checksum: MD5 checksum of the IOS image
+        :param platform: router platform
+        :param ram: router RAM in MB
+
+        :returns: Idle-PC value or None
+        """
+
+        if not checksum:
+            return None
+        return self._load().get(self._key(checksum, platform, ram))
+
+    def set(self, checksum, platform, ram, idlepc):
+        """
+        Records the Idle-PC value of an image.
+
+        :param checksum: MD5 checksum of the IOS image
+        :param platform: router platform
+        :param ram: router RAM in MB
+        :param idlepc: Idle-PC value
+        """
+
+        if not checksum or not idlepc:
+            return
+        idlepcs = self._load()
+        key = self._key(checksum, platform, ram)
+        if idlepcs.get(key) == idlepc:
+            return
+        idlepcs[key] = idlepc
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"idlepcs": idlepcs}, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            log.error("Cannot write the Idle-PC database '{}': {}".format(self._path, e))
@@ -68,6 +68,7 @@ class Node:
         self._console_type = None
         self._properties = None
         self._command_line = None
+        self._start_timings = None
         self._node_directory = None
         self._status = "stopped"
         self._template_id = template_id
@@ -90,7 +91,7 @@ class Node:
         self._console_auto_start = False
 
         # This properties will be recompute
-        ignore_properties = ("width", "height", "hover_symbol")
+        ignore_properties = ("width", "height", "hover_symbol", "start_timings")
         self.properties = kwargs.pop('properties', {})
 
         # Update node properties with additional elements
@@ -430,6 +431,11 @@ class Node:
                 self._node_directory = value
             elif key == "command_line":
                 self._command_line = value
+            elif key == "start_timings":
+                # not saved with the topology
+                self._start_timings = value
+                if key in self._properties:
+                    del self._properties[key]
             elif key == "status":
                 self._status = value
             elif key == "console_type":
@@ -500,9 +506,11 @@ class Node:
                 iourc_content = self._project.controller.iou_license.get("iourc_content", None)
                 #if license_check and not iourc_content:
                 #    raise aiohttp.web.HTTPConflict(text="IOU licence is not configured")
-                await self.post("/start", timeout=240, data={"license_check": license_check, "iourc_content": iourc_content})
+                response = await self.post("/start", timeout=240, data={"license_check": license_check, "iourc_content": iourc_content})
             else:
-                await self.post("/start", data=data, timeout=240)
+                response = await self.post("/start", data=data, timeout=240)
+            if response and isinstance(response.json, dict) and "start_timings" in response.json:
+                self._start_timings = response.json["start_timings"]
         except asyncio.TimeoutError:
             raise aiohttp.web.HTTPRequestTimeout(text="Timeout when starting {}".format(self._name))
 
@@ -585,11 +593,28 @@ class Node:
                 return True
         return False
 
-    async def dynamips_auto_idlepc(self):
+    async def dynamips_auto_idlepc(self, checksum=None):
         """
-        Compute the idle PC for a dynamips node
+        Compute the idle PC for a dynamips node, the Idle-PC database
+        of the controller is consulted first.
+
+        :param checksum: checksum of the node image if already known
         """
-        return (await self._compute.get("/projects/{}/{}/nodes/{}/auto_idlepc".format(self._project.id, self._node_type, self._id), timeout=240)).json
+
+        controller = self._project.controller
+        image = self._properties.get("image")
+        platform = self._properties.get("platform")
+        ram = self._properties.get("ram")
+        if checksum is None and image:
+            checksum = await controller.dynamips_image_checksum(self._compute, image)
+        idlepc = controller.idlepc_database.get(checksum, platform, ram)
+        if idlepc:
+            return {"idlepc": idlepc}
+
+        res = (await self._compute.get("/projects/{}/{}/nodes/{}/auto_idlepc".format(self._project.id, self._node_type, self._id), timeout=240)).json
+        if isinstance(res, dict):
+            controller.idlepc_database.set(checksum, platform, ram, res.get("idlepc"))
+        return res
 
     async def dynamips_idlepc_proposals(self):
         """
@@ -715,6 +740,7 @@ class Node:
             "console_type": self._console_type,
             "console_auto_start": self._console_auto_start,
             "command_line": self._command_line,
+            "start_timings": self._start_timings,
             "properties": self._properties,
             "status": self._status,
             "label": self._label,
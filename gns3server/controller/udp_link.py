@@ -15,12 +15,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-
+import asyncio
 import aiohttp
 
 
 from .link import Link
 
+import logging
+log = logging.getLogger(__name__)
+
 
 class UDPLink(Link):
 
@@ -36,6 +39,40 @@ class UDPLink(Link):
         """
         return self._link_data
 
+    async def _reserve_udp_ports(self, node1, node2):
+        """
+        Reserve a UDP port on the compute of each node.
+        Both ports are reserved with one query when the nodes are on the same compute.
+
+        :returns: tuple with the UDP ports for node1 and node2
+        """
+
+        if node1.compute == node2.compute:
+            response = await node1.compute.post("/projects/{}/ports/udp/reserve".format(self._project.id), data={"count": 2})
+            return tuple(response.json["udp_ports"])
+
+        results = await asyncio.gather(node1.compute.post("/projects/{}/ports/udp".format(self._project.id)),
+                                       node2.compute.post("/projects/{}/ports/udp".format(self._project.id)),
+                                       return_exceptions=True)
+        for node, result in zip((node1, node2), results):
+            if isinstance(result, BaseException):
+                # release the port reserved on the other side
+                for other_node, other_result in zip((node1, node2), results):
+                    if other_node != node and not isinstance(other_result, BaseException):
+                        await self._release_udp_ports(other_node.compute, [other_result.json["udp_port"]])
+                raise result
+        return results[0].json["udp_port"], results[1].json["udp_port"]
+
+    async def _release_udp_ports(self, compute, udp_ports):
+        """
+        Release UDP ports reserved on a compute but not used by a NIO.
+        """
+
+        try:
+            await compute.post("/projects/{}/ports/udp/release".format(self._project.id), data={"udp_ports": udp_ports})
+        except (aiohttp.web.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("Could not release UDP ports {} on compute {}: {}".format(udp_ports, compute.id, e))
+
     async def create(self):
         """
         Create the link on the nodes
@@ -55,10 +92,7 @@ class UDPLink(Link):
             raise aiohttp.web.HTTPConflict(text="Cannot get an IP address on same subnet: {}".format(e))
 
         # Reserve a UDP port on both side
-        response = await node1.compute.post("/projects/{}/ports/udp".format(self._project.id))
-        self._node1_port = response.json["udp_port"]
-        response = await node2.compute.post("/projects/{}/ports/udp".format(self._project.id))
-        self._node2_port = response.json["udp_port"]
+        self._node1_port, self._node2_port = await self._reserve_udp_ports(node1, node2)
 
         node1_filters = {}
         node2_filters = {}
@@ -77,8 +111,6 @@ class UDPLink(Link):
             "filters": node1_filters,
             "suspend": self._suspended
         })
-        await node1.post("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number1, port_number=port_number1), data=self._link_data[0], timeout=120)
-
         self._link_data.append({
             "lport": self._node2_port,
             "rhost": node1_host,
@@ -87,12 +119,25 @@ class UDPLink(Link):
             "filters": node2_filters,
             "suspend": self._suspended
         })
-        try:
-            await node2.post("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number2, port_number=port_number2), data=self._link_data[1], timeout=120)
-        except Exception as e:
-            # We clean the first NIO
-            await node1.delete("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number1, port_number=port_number1), timeout=120)
-            raise e
+
+        sides = ((node1, adapter_number1, port_number1, self._node1_port, self._link_data[0]),
+                 (node2, adapter_number2, port_number2, self._node2_port, self._link_data[1]))
+        results = await asyncio.gather(*[node.post("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number, port_number=port_number), data=link_data, timeout=120)
+                                         for node, adapter_number, port_number, _, link_data in sides],
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # rollback: delete the NIOs that have been created and release the UDP ports not used by a NIO
+            for (node, adapter_number, port_number, udp_port, _), result in zip(sides, results):
+                if isinstance(result, BaseException):
+                    await self._release_udp_ports(node.compute, [udp_port])
+                else:
+                    try:
+                        await node.delete("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number, port_number=port_number), timeout=120)
+                    except aiohttp.web.HTTPException as e:
+                        log.warning("Could not delete the NIO on {} while rolling back the link creation: {}".format(node.name, e))
+            self._link_data = []
+            raise errors[0]
         self._created = True
 
     async def update(self):
@@ -113,19 +158,30 @@ class UDPLink(Link):
         elif filter_node == node2:
             node2_filters = self.get_active_filters()
 
+        queries = []
         adapter_number1 = self._nodes[0]["adapter_number"]
         port_number1 = self._nodes[0]["port_number"]
         self._link_data[0]["filters"] = node1_filters
         self._link_data[0]["suspend"] = self._suspended
         if node1.node_type not in ("ethernet_switch", "ethernet_hub"):
-            await node1.put("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number1, port_number=port_number1), data=self._link_data[0], timeout=120)
+            queries.append(node1.put("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number1, port_number=port_number1), data=self._link_data[0], timeout=120))
 
         adapter_number2 = self._nodes[1]["adapter_number"]
         port_number2 = self._nodes[1]["port_number"]
         self._link_data[1]["filters"] = node2_filters
         self._link_data[1]["suspend"] = self._suspended
         if node2.node_type not in ("ethernet_switch", "ethernet_hub"):
-            await node2.put("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number2, port_number=port_number2), data=self._link_data[1], timeout=221)
+            queries.append(node2.put("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number2, port_number=port_number2), data=self._link_data[1], timeout=221))
+
+        await asyncio.gather(*queries)
+
+    async def _delete_nio(self, node, adapter_number, port_number):
+
+        try:
+            await node.delete("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number, port_number=port_number), timeout=120)
+        # If the node is already delete (user selected multiple element and delete all in the same time)
+        except aiohttp.web.HTTPNotFound:
+            pass
 
     async def delete(self):
         """
@@ -133,29 +189,15 @@ class UDPLink(Link):
         """
         if not self._created:
             return
-        try:
-            node1 = self._nodes[0]["node"]
-            adapter_number1 = self._nodes[0]["adapter_number"]
-            port_number1 = self._nodes[0]["port_number"]
-        except IndexError:
-            return
-        try:
-            await node1.delete("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number1, port_number=port_number1), timeout=120)
-        # If the node is already delete (user selected multiple element and delete all in the same time)
-        except aiohttp.web.HTTPNotFound:
-            pass
 
-        try:
-            node2 = self._nodes[1]["node"]
-            adapter_number2 = self._nodes[1]["adapter_number"]
-            port_number2 = self._nodes[1]["port_number"]
-        except IndexError:
+        queries = []
+        for node in self._nodes[:2]:
+            queries.append(self._delete_nio(node["node"], node["adapter_number"], node["port_number"]))
+        if not queries:
+            return
+        await asyncio.gather(*queries)
+        if len(queries) < 2:
             return
-        try:
-            await node2.delete("/adapters/{adapter_number}/ports/{port_number}/nio".format(adapter_number=adapter_number2, port_number=port_number2), timeout=120)
-        # If the node is already delete (user selected multiple element and delete all in the same time)
-        except aiohttp.web.HTTPNotFound:
-            pass
         await super().delete()
 
     async def start_capture(self, data_link_type="DLT_EN10MB", capture_file_name=None):
@@ -425,3 +425,24 @@ class DockerHandler:
         docker_manager = Docker.instance()
         container = docker_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
         return await container.start_websocket_console(request)
+
+    @Route.get(
+        r"/projects/{project_id}/docker/nodes/{node_id}/console/scrollback",
+        description="Get the recent output of the console",
+        parameters={
+            "project_id": "Project UUID",
+            "node_id": "Node UUID",
+        },
+        status_codes={
+            200: "Console output returned",
+            400: "Invalid request",
+            404: "Instance doesn't exist"
+        },
+        raw=True)
+    async def console_scrollback(request, response):
+
+        docker_manager = Docker.instance()
+        container = docker_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
+        response.set_status(200)
+        response.content_type = "application/octet-stream"
+        response.body = container.get_console_scrollback()
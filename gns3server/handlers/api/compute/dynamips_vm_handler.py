@@ -78,6 +78,7 @@ class DynamipsVMHandler:
                                                 console_type=request.json.get("console_type", "telnet"),
                                                 aux=request.json.get("aux"),
                                                 chassis=request.json.pop("chassis", default_chassis),
+                                                image=request.json.pop("image", None),
                                                 node_type="dynamips")
         await dynamips_manager.update_vm_settings(vm, request.json)
         response.set_status(201)
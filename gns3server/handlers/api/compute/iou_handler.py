@@ -466,3 +466,24 @@ class IOUHandler:
         iou_manager = IOU.instance()
         vm = iou_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
         return await vm.start_websocket_console(request)
+
+    @Route.get(
+        r"/projects/{project_id}/iou/nodes/{node_id}/console/scrollback",
+        description="Get the recent output of the console",
+        parameters={
+            "project_id": "Project UUID",
+            "node_id": "Node UUID",
+        },
+        status_codes={
+            200: "Console output returned",
+            400: "Invalid request",
+            404: "Instance doesn't exist"
+        },
+        raw=True)
+    async def console_scrollback(request, response):
+
+        iou_manager = IOU.instance()
+        vm = iou_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
+        response.set_status(200)
+        response.content_type = "application/octet-stream"
+        response.body = vm.get_console_scrollback()
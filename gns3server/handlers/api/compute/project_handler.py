@@ -23,7 +23,10 @@ import psutil
 import tempfile
 
 from gns3server.web.route import Route
+from gns3server.config import Config
 from gns3server.compute.project_manager import ProjectManager
+from gns3server.compute.console_gateway import ConsoleGateway
+from gns3server.utils.asyncio.frame_coalescer import DEFAULT_MAX_FRAME_SIZE, DEFAULT_FLUSH_DELAY
 from gns3server.compute import MODULES
 from gns3server.utils.cpu_percent import CpuPercent
 
@@ -200,6 +203,25 @@ class ProjectHandler:
         if project.id in ProjectHandler._notifications_listening:
             ProjectHandler._notifications_listening[project.id] -= 1
 
+    @Route.get(
+        r"/projects/{project_id}/console/ws",
+        description="WebSocket multiplexing the consoles of the project nodes",
+        parameters={
+            "project_id": "Project UUID",
+        },
+        status_codes={
+            404: "The project doesn't exist"
+        })
+    async def console_gateway(request, response):
+
+        pm = ProjectManager.instance()
+        project = pm.get_project(request.match_info["project_id"])
+        server_config = Config.instance().get_section_config("Server")
+        gateway = ConsoleGateway(project,
+                                 max_frame_size=int(server_config.get("console_ws_max_frame_size", DEFAULT_MAX_FRAME_SIZE)),
+                                 flush_delay=float(server_config.get("console_ws_flush_delay", DEFAULT_FLUSH_DELAY)))
+        return await gateway.run(request)
+
     def _getPingMessage(cls):
         """
         Ping messages are regularly sent to the client to
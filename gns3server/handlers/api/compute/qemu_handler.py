@@ -39,6 +39,10 @@ from gns3server.schemas.qemu import (
     QEMU_BINARY_LIST_SCHEMA,
     QEMU_BINARY_FILTER_SCHEMA,
     QEMU_CAPABILITY_LIST_SCHEMA,
+    QEMU_WARM_IMAGE_LIST_SCHEMA,
+    QEMU_GOLDEN_STATE_CREATE_SCHEMA,
+    QEMU_GOLDEN_STATE_OBJECT_SCHEMA,
+    QEMU_GOLDEN_STATE_LIST_SCHEMA,
     QEMU_IMAGE_CREATE_SCHEMA,
     QEMU_IMAGE_UPDATE_SCHEMA
 )
@@ -184,6 +188,28 @@ class QEMUHandler:
         await vm.resize_disk(request.json["drive_name"], request.json["extend"])
         response.set_status(201)
 
+    @Route.post(
+        r"/projects/{project_id}/qemu/nodes/{node_id}/golden_state",
+        parameters={
+            "project_id": "Project UUID",
+            "node_id": "Node UUID"
+        },
+        status_codes={
+            201: "Golden state saved",
+            404: "Instance doesn't exist",
+            409: "Conflict"
+        },
+        description="Save the state of a running Qemu VM, new linked clones of the same images will start from this state",
+        input=QEMU_GOLDEN_STATE_CREATE_SCHEMA,
+        output=QEMU_GOLDEN_STATE_OBJECT_SCHEMA)
+    async def save_golden_state(request, response):
+
+        qemu_manager = Qemu.instance()
+        vm = qemu_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
+        golden_state = await vm.save_golden_state(request.json.get("reset_commands"))
+        response.set_status(201)
+        response.json(golden_state)
+
     @Route.post(
         r"/projects/{project_id}/qemu/nodes/{node_id}/start",
         parameters={
@@ -482,6 +508,46 @@ class QEMUHandler:
             capabilities["kvm"] = kvms
         response.json(capabilities)
 
+    @Route.get(
+        r"/qemu/warm-images",
+        status_codes={
+            200: "Success"
+        },
+        description="Get the warm status of the base images shared by linked clones",
+        output=QEMU_WARM_IMAGE_LIST_SCHEMA
+    )
+    async def get_warm_images(request, response):
+
+        response.json(Qemu.instance().warm_images())
+
+    @Route.get(
+        r"/qemu/golden-states",
+        status_codes={
+            200: "Success"
+        },
+        description="Get the golden states new linked clones start from",
+        output=QEMU_GOLDEN_STATE_LIST_SCHEMA
+    )
+    async def get_golden_states(request, response):
+
+        response.json(Qemu.instance().golden_states())
+
+    @Route.delete(
+        r"/qemu/golden-states/{checksum:[0-9a-f]{32}}",
+        parameters={
+            "checksum": "MD5 checksum of the hda base image"
+        },
+        status_codes={
+            204: "Golden state deleted",
+            409: "Conflict"
+        },
+        description="Delete a golden state, new linked clones will boot normally"
+    )
+    async def delete_golden_state(request, response):
+
+        await Qemu.instance().delete_golden_state(request.match_info["checksum"])
+        response.set_status(204)
+
     @Route.post(
         r"/qemu/img",
         status_codes={
@@ -589,3 +655,24 @@ class QEMUHandler:
         qemu_manager = Qemu.instance()
         vm = qemu_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
         return await vm.start_websocket_console(request)
+
+    @Route.get(
+        r"/projects/{project_id}/qemu/nodes/{node_id}/console/scrollback",
+        description="Get the recent output of the console",
+        parameters={
+            "project_id": "Project UUID",
+            "node_id": "Node UUID",
+        },
+        status_codes={
+            200: "Console output returned",
+            400: "Invalid request",
+            404: "Instance doesn't exist"
+        },
+        raw=True)
+    async def console_scrollback(request, response):
+
+        qemu_manager = Qemu.instance()
+        vm = qemu_manager.get_node(request.match_info["node_id"], project_id=request.match_info["project_id"])
+        response.set_status(200)
+        response.content_type = "application/octet-stream"
+        response.body = vm.get_console_scrollback()
@@ -22,7 +22,10 @@ from gns3server.web.route import Route
 from gns3server.config import Config
 from gns3server.schemas.version import VERSION_SCHEMA
 from gns3server.schemas.server_statistics import SERVER_STATISTICS_SCHEMA
+from gns3server.compute import MODULES
 from gns3server.compute.port_manager import PortManager
+from gns3server.compute.qemu import Qemu
+from gns3server.compute.start_timings import StartTimings
 from gns3server.utils.cpu_percent import CpuPercent
 from gns3server.version import __version__
 from aiohttp.web import HTTPConflict
@@ -64,17 +67,28 @@ class ServerHandler:
             disk_usage_percent = int(psutil.disk_usage('/').percent)
         except psutil.Error as e:
             raise HTTPConflict(text="Psutil error detected: {}".format(e))
-        response.json({"memory_total": memory_total,
-                       "memory_free": memory_free,
-                       "memory_used": memory_used,
-                       "swap_total": swap_total,
-                       "swap_free": swap_free,
-                       "swap_used": swap_used,
-                       "cpu_usage_percent": cpu_percent,
-                       "memory_usage_percent": memory_percent,
-                       "swap_usage_percent": swap_percent,
-                       "disk_usage_percent": disk_usage_percent,
-                       "load_average_percent": load_average_percent})
+        statistics = {"memory_total": memory_total,
+                      "memory_free": memory_free,
+                      "memory_used": memory_used,
+                      "swap_total": swap_total,
+                      "swap_free": swap_free,
+                      "swap_used": swap_used,
+                      "cpu_usage_percent": cpu_percent,
+                      "memory_usage_percent": memory_percent,
+                      "swap_usage_percent": swap_percent,
+                      "disk_usage_percent": disk_usage_percent,
+                      "load_average_percent": load_average_percent,
+                      "node_start_timings": StartTimings.instance().percentiles()}
+        node_resource_usage = []
+        for module in MODULES:
+            # only the managers already in use
+            if getattr(module, "_instance", None) is not None:
+                node_resource_usage.extend(module.instance().resource_usage())
+        statistics["node_resource_usage"] = node_resource_usage
+        memory_merging = Qemu.instance().memory_merging_statistics()
+        if memory_merging is not None:
+            statistics["memory_merging"] = memory_merging
+        response.json(statistics)
 
     @Route.get(
         r"/debug",
@@ -176,6 +176,8 @@ class NodeHandler:
         request.json.pop("node_id", None)
         request.json.pop("node_type", None)
         request.json.pop("compute_id", None)
+        # read only
+        request.json.pop("start_timings", None)
 
         await node.update(**request.json)
         response.set_status(200)
@@ -17,6 +17,7 @@
 
 
 from .custom_adapters import CUSTOM_ADAPTERS_ARRAY_SCHEMA
+from .start_timings import NODE_START_TIMINGS_SCHEMA
 
 
 DOCKER_CREATE_SCHEMA = {
@@ -222,7 +223,8 @@ DOCKER_OBJECT_SCHEMA = {
             "description": "VM status Read only",
             "enum": ["started", "stopped", "suspended"]
         },
-        "custom_adapters": CUSTOM_ADAPTERS_ARRAY_SCHEMA
+        "custom_adapters": CUSTOM_ADAPTERS_ARRAY_SCHEMA,
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False,
 }
@@ -16,6 +16,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from .start_timings import NODE_START_TIMINGS_SCHEMA
+
+
 DYNAMIPS_ADAPTERS = {
     "description": "Dynamips Network Module",
     "enum": ["C7200-IO-2FE",
@@ -756,6 +759,7 @@ VM_OBJECT_SCHEMA = {
             "minimum": 0,
             "maximum": 100
         },
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False,
     "required": ["name", "node_id", "project_id", "dynamips_id", "console", "console_type"]
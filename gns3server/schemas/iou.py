@@ -16,6 +16,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from .start_timings import NODE_START_TIMINGS_SCHEMA
+
+
 IOU_CREATE_SCHEMA = {
     "$schema": "http://json-schema.org/draft-04/schema#",
     "description": "Request validation to create a new IOU instance",
@@ -203,6 +206,7 @@ IOU_OBJECT_SCHEMA = {
             "description": "Application ID for running IOU image",
             "type": "integer"
         },
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False
 }
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+UDP_PORTS_RESERVE_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Request validation to reserve UDP ports",
+    "type": "object",
+    "properties": {
+        "count": {
+            "description": "Number of UDP ports to reserve",
+            "type": "integer",
+            "minimum": 1,
+            "maximum": 1000
+        }
+    },
+    "additionalProperties": False,
+    "required": ["count"]
+}
+
+UDP_PORTS_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "List of UDP ports",
+    "type": "object",
+    "properties": {
+        "udp_ports": {
+            "description": "UDP ports",
+            "type": "array",
+            "items": {
+                "type": "integer",
+                "minimum": 1,
+                "maximum": 65535
+            }
+        }
+    },
+    "additionalProperties": False,
+    "required": ["udp_ports"]
+}
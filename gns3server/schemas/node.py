@@ -18,6 +18,7 @@
 import copy
 from .label import LABEL_OBJECT_SCHEMA
 from .custom_adapters import CUSTOM_ADAPTERS_ARRAY_SCHEMA
+from .start_timings import NODE_START_TIMINGS_SCHEMA
 
 NODE_TYPE_SCHEMA = {
     "description": "Type of node",
@@ -135,6 +136,7 @@ NODE_OBJECT_SCHEMA = {
             "description": "Command line use to start the node",
             "type": ["null", "string"]
         },
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
         "name": {
             "description": "Node name",
             "type": "string",
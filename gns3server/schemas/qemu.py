@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from .custom_adapters import CUSTOM_ADAPTERS_ARRAY_SCHEMA
+from .start_timings import NODE_START_TIMINGS_SCHEMA
 
 QEMU_PLATFORMS = ["aarch64", "alpha", "arm", "cris", "i386", "lm32", "m68k", "microblaze", "microblazeel", "mips", "mips64", "mips64el", "mipsel", "moxie", "or32", "ppc", "ppc64", "ppcemb", "s390x", "sh4", "sh4eb", "sparc", "sparc64", "tricore", "unicore32", "x86_64", "xtensa", "xtensaeb", ""]
 
@@ -613,7 +614,8 @@ QEMU_OBJECT_SCHEMA = {
         "command_line": {
             "description": "Last command line used by GNS3 to start QEMU",
             "type": "string"
-        }
+        },
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False,
     "required": ["node_id",
@@ -736,6 +738,95 @@ QEMU_CAPABILITY_LIST_SCHEMA = {
     "additionalProperties": False,
 }
 
+QEMU_WARM_IMAGE_LIST_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Warm status of the base images shared by QEMU linked clones",
+    "type": "array",
+    "items": {
+        "$ref": "#/definitions/QemuWarmImage"
+    },
+    "definitions": {
+        "QemuWarmImage": {
+            "description": "Base image warm status",
+            "properties": {
+                "path": {
+                    "description": "Base image path",
+                    "type": "string",
+                },
+                "size": {
+                    "description": "Base image size in bytes",
+                    "type": "integer",
+                },
+                "nodes": {
+                    "description": "Number of stopped linked clones sharing this base image when it was warmed",
+                    "type": "integer",
+                },
+                "status": {
+                    "description": "Warm status",
+                    "enum": ["warm", "skipped", "unsupported", "error"]
+                },
+            },
+        }
+    },
+    "additionalProperties": False,
+}
+
+QEMU_GOLDEN_STATE_CREATE_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Save the state of a running QEMU VM as the golden state of its base images",
+    "type": "object",
+    "properties": {
+        "reset_commands": {
+            "description": "QEMU monitor commands executed on the linked clones started from the golden state "
+                           "({name}, {node_id}, {mac_address} and {console} are replaced by the values of each clone)",
+            "type": "array",
+            "items": {"type": "string"}
+        },
+    },
+    "additionalProperties": False
+}
+
+QEMU_GOLDEN_STATE_OBJECT_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Golden state new QEMU linked clones start from",
+    "type": "object",
+    "properties": {
+        "checksum": {
+            "description": "MD5 checksum of the hda base image",
+            "type": "string"
+        },
+        "name": {
+            "description": "Name of the VM the golden state was saved from",
+            "type": "string"
+        },
+        "created_at": {
+            "description": "Date of creation (seconds since epoch)",
+            "type": "integer"
+        },
+        "disks": {
+            "description": "Base images of the golden state",
+            "type": "object"
+        },
+        "machine": {
+            "description": "Settings the linked clones must have to start from the golden state",
+            "type": "object"
+        },
+        "reset_commands": {
+            "description": "QEMU monitor commands executed on the linked clones started from the golden state",
+            "type": "array",
+            "items": {"type": "string"}
+        },
+    },
+    "additionalProperties": False
+}
+
+QEMU_GOLDEN_STATE_LIST_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Golden states new QEMU linked clones start from",
+    "type": "array",
+    "items": QEMU_GOLDEN_STATE_OBJECT_SCHEMA,
+}
+
 QEMU_IMAGE_CREATE_SCHEMA = {
     "$schema": "http://json-schema.org/draft-04/schema#",
     "description": "Create a new QEMU image. Options can be specific to a format. Read qemu-img manual for more information",
@@ -15,6 +15,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from .start_timings import START_TIMINGS_PERCENTILES_SCHEMA
+
+
 SERVER_STATISTICS_SCHEMA = {
     "$schema": "http://json-schema.org/draft-04/schema#",
     "type": "object",
@@ -78,5 +81,47 @@ SERVER_STATISTICS_SCHEMA = {
             "minItems": 3,
             "maxItems": 3
         },
+        "node_start_timings": START_TIMINGS_PERCENTILES_SCHEMA,
+        "node_resource_usage": {
+            "description": "Resources used by the node processes limited with cgroups",
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "node_id": {"type": "string"},
+                    "project_id": {"type": "string"},
+                    "name": {"type": "string"},
+                    "cpu_usage_usec": {"description": "CPU time used in microseconds", "type": "integer"},
+                    "cpu_throttled_usec": {"description": "CPU time throttled in microseconds", "type": "integer"},
+                    "memory_current": {"description": "Memory used in bytes", "type": "integer"},
+                    "io_read_bytes": {"description": "Bytes read", "type": "integer"},
+                    "io_write_bytes": {"description": "Bytes written", "type": "integer"}
+                }
+            }
+        },
+        "memory_merging": {
+            "description": "Memory merged by KSM for the QEMU VMs (Linux only)",
+            "type": "object",
+            "properties": {
+                "run": {"description": "KSM daemon state", "type": "integer"},
+                "pages_shared": {"description": "Shared pages in use", "type": "integer"},
+                "pages_sharing": {"description": "Pages sharing a shared page (memory saved)", "type": "integer"},
+                "pages_unshared": {"description": "Pages unique but repeatedly checked for merging", "type": "integer"},
+                "pages_volatile": {"description": "Pages changing too fast to be merged", "type": "integer"},
+                "full_scans": {"description": "Number of times all the mergeable areas have been scanned", "type": "integer"},
+                "projects": {
+                    "description": "Pages of the running VMs for each project",
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "project_id": {"type": "string"},
+                            "shared_pages": {"description": "Pages merged by KSM", "type": "integer"},
+                            "unshared_pages": {"description": "Pages of guest RAM not merged", "type": "integer"}
+                        }
+                    }
+                }
+            }
+        },
     }
 }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+NODE_START_TIMINGS_SCHEMA = {
+    "description": "Duration in seconds of the last start of the node and of its phases",
+    "type": ["object", "null"],
+    "properties": {
+        "total": {
+            "description": "Duration of the whole start",
+            "type": "number"
+        },
+        "phases": {
+            "description": "Duration of each phase (disks, ubridge, console, process, links etc.)",
+            "type": "object",
+            "additionalProperties": {"type": "number"}
+        },
+    },
+    "additionalProperties": False
+}
+
+START_TIMINGS_PERCENTILES_SCHEMA = {
+    "description": "Percentiles of the durations in seconds of the recent node starts, for each node type and phase",
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "properties": {
+                "count": {"description": "Number of starts", "type": "integer"},
+                "p50": {"type": "number"},
+                "p90": {"type": "number"},
+                "p99": {"type": "number"},
+                "max": {"type": "number"},
+            },
+            "additionalProperties": False
+        }
+    }
+}
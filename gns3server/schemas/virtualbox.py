@@ -17,6 +17,7 @@
 
 
 from .custom_adapters import CUSTOM_ADAPTERS_ARRAY_SCHEMA
+from .start_timings import NODE_START_TIMINGS_SCHEMA
 
 
 VBOX_CREATE_SCHEMA = {
@@ -182,7 +183,8 @@ VBOX_OBJECT_SCHEMA = {
             "description": "Whether the VM is a linked clone or not",
             "type": "boolean"
         },
-        "custom_adapters": CUSTOM_ADAPTERS_ARRAY_SCHEMA
+        "custom_adapters": CUSTOM_ADAPTERS_ARRAY_SCHEMA,
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False,
 }
@@ -16,6 +16,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from .start_timings import NODE_START_TIMINGS_SCHEMA
+
+
 VPCS_CREATE_SCHEMA = {
     "$schema": "http://json-schema.org/draft-04/schema#",
     "description": "Request validation to create a new VPCS instance",
@@ -124,7 +127,8 @@ VPCS_OBJECT_SCHEMA = {
         "command_line": {
             "description": "Last command line used by GNS3 to start VPCS",
             "type": "string"
-        }
+        },
+        "start_timings": NODE_START_TIMINGS_SCHEMA,
     },
     "additionalProperties": False,
     "required": ["name", "node_id", "status", "console", "console_type", "project_id", "command_line"]
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+uBridge hypervisors shared by several nodes of a project.
+
+Each node gets a client namespacing its bridges with the node ID,
+the commands sent by a node are recorded so the bridges can be
+restored if the uBridge process crashes.
+"""
+
+import os
+import re
+import time
+import asyncio
+
+from gns3server.utils.asyncio import monitor_process
+from .hypervisor import Hypervisor
+from .ubridge_error import UbridgeError
+
+import logging
+log = logging.getLogger(__name__)
+
+# commands with a bridge name as first argument: "bridge create NAME", 'bridge add_nio_tap "NAME" ...'
+BRIDGE_COMMAND_RE = re.compile(r'^(bridge|iol_bridge) (\w+) ("?)([^\s"]+)\3(.*)$')
+
+# commands which do not change the state of the hypervisor
+READ_ONLY_COMMANDS = ("list", "show", "get_stats")
+
+# do not automatically restart a uBridge process which crashes right after being started
+MIN_UPTIME_FOR_RESTART = 10  # seconds
+
+
+class SharedHypervisor:
+    """
+    uBridge hypervisor hosting the bridges of several nodes.
+
+    :param project: Project instance
+    :param path: path to uBridge executable
+    :param working_dir: working directory
+    :param host: host/address for the hypervisor
+    """
+
+    def __init__(self, project, path, working_dir, host):
+
+        self._project = project
+        self._path = path
+        self._working_dir = working_dir
+        self._host = host
+        self._hypervisor = None
+        self._journals = {}
+        self._lock = asyncio.Lock()
+        self._started_at = None
+        self._stopping = False
+        self._restarts = 0
+
+    @property
+    def namespaces(self):
+        """
+        Returns the namespaces (node IDs) using this hypervisor.
+        """
+
+        return list(self._journals)
+
+    @property
+    def restarts(self):
+        """
+        Returns the number of times uBridge has been restarted after a crash.
+        """
+
+        return self._restarts
+
+    @property
+    def host(self):
+
+        return self._host
+
+    @property
+    def port(self):
+
+        return self._hypervisor.port if self._hypervisor else None
+
+    def is_running(self):
+
+        return self._hypervisor is not None and self._hypervisor.is_running()
+
+    def read_stdout(self):
+
+        return self._hypervisor.read_stdout() if self._hypervisor else ""
+
+    def attach(self, namespace):
+        """
+        Reserves a namespace for a node.
+
+        :param namespace: namespace (node ID)
+        """
+
+        self._journals.setdefault(namespace, [])
+
+    async def detach(self, namespace):
+        """
+        Deletes the bridges of a namespace and stops uBridge when
+        there are no more namespaces.
+
+        :param namespace: namespace (node ID)
+        """
+
+        journal = self._journals.pop(namespace, [])
+        bridges = []
+        for bridge, command in journal:
+            if bridge and bridge not in bridges:
+                bridges.append(bridge)
+        if bridges and self.is_running():
+            try:
+                await self._hypervisor.send_batch(["{} delete {}".format(kind, name) for kind, name in bridges])
+            except UbridgeError as e:
+                log.warning("Could not delete the bridges of {}: {}".format(namespace, e))
+        if not self._journals:
+            await self.stop()
+
+    async def start(self):
+        """
+        Starts uBridge if it is not running and restores the bridges of all
+        the namespaces when uBridge is restarted.
+        """
+
+        async with self._lock:
+            if self.is_running():
+                return
+            restart = self._hypervisor is not None
+            if restart:
+                # clean the previous hypervisor (connection and log file)
+                self._stopping = True
+                try:
+                    await self._hypervisor.stop()
+                finally:
+                    self._stopping = False
+                self._hypervisor = None
+
+            try:
+                os.makedirs(self._working_dir, exist_ok=True)
+            except OSError as e:
+                raise UbridgeError("Could not create the uBridge working directory: {}".format(e))
+
+            hypervisor = Hypervisor(self._project, self._path, self._working_dir, self._host)
+            log.info("Starting new shared uBridge hypervisor {}:{}".format(hypervisor.host, hypervisor.port))
+            await hypervisor.start()
+            await hypervisor.connect()
+            if restart:
+                await self._restore(hypervisor)
+            # only available to the nodes once the bridges have been restored
+            self._hypervisor = hypervisor
+            self._started_at = time.monotonic()
+            if hypervisor.process:
+                monitor_process(hypervisor.process, self._termination_callback)
+
+    async def _restore(self, hypervisor):
+        """
+        Replays the commands of each namespace on a new uBridge process.
+        """
+
+        self._restarts += 1
+        for namespace, journal in self._journals.items():
+            if not journal:
+                continue
+            try:
+                await hypervisor.send_batch([command for _, command in journal])
+            except UbridgeError as e:
+                log.error("Could not restore the bridges of {}: {}".format(namespace, e))
+        log.info("Bridges of {} nodes restored on uBridge hypervisor {}:{}".format(len(self._journals), hypervisor.host, hypervisor.port))
+
+    async def _termination_callback(self, returncode):
+        """
+        Called when the uBridge process has stopped.
+
+        :param returncode: Process returncode
+        """
+
+        if self._stopping or not self._journals:
+            return
+        error_msg = "Shared uBridge process has stopped, return code: {}\n{}\n".format(returncode, self.read_stdout())
+        log.error(error_msg)
+        self._project.emit("log.error", {"message": error_msg})
+        if self._started_at is not None and time.monotonic() - self._started_at < MIN_UPTIME_FOR_RESTART:
+            # the bridges will be restored on the next command sent by a node
+            log.warning("Shared uBridge process has stopped too quickly, it will not be restarted automatically")
+            return
+        try:
+            await self.start()
+        except UbridgeError as e:
+            log.error("Could not restart the shared uBridge process: {}".format(e))
+
+    async def stop(self):
+        """
+        Stops uBridge.
+        """
+
+        if self._hypervisor:
+            self._stopping = True
+            try:
+                log.info("Stopping shared uBridge hypervisor {}:{}".format(self._hypervisor.host, self._hypervisor.port))
+                await self._hypervisor.stop()
+            finally:
+                self._stopping = False
+            self._hypervisor = None
+
+    async def send_batch(self, namespace, commands):
+        """
+        Sends commands on behalf of a namespace.
+
+        :param namespace: namespace (node ID)
+        :param commands: list of commands
+
+        :returns: list of results
+        """
+
+        if namespace not in self._journals:
+            raise UbridgeError("uBridge namespace {} is not attached".format(namespace))
+        commands = [self._namespace_command(namespace, command) for command in commands]
+        if not self.is_running():
+            await self.start()
+        results = await self._hypervisor.send_batch([command for _, command in commands])
+        journal = self._journals.get(namespace)
+        if journal is not None:
+            for bridge, command in commands:
+                self._record(journal, bridge, command)
+        return results
+
+    @staticmethod
+    def _namespace_command(namespace, command):
+        """
+        Prefixes the bridge name of a command with the namespace.
+
+        :returns: tuple (bridge, command), bridge is a (kind, name) tuple or None
+        """
+
+        command = command.strip()
+        match = BRIDGE_COMMAND_RE.match(command)
+        if match is None:
+            # commands without bridge name like "bridge list" or "docker move_to_ns"
+            return None, command
+        kind, action, quote, name, arguments = match.groups()
+        name = "{}-{}".format(namespace, name)
+        return (kind, name), "{kind} {action} {quote}{name}{quote}{arguments}".format(kind=kind,
+                                                                                     action=action,
+                                                                                     quote=quote,
+                                                                                     name=name,
+                                                                                     arguments=arguments)
+
+    @staticmethod
+    def _record(journal, bridge, command):
+        """
+        Records a command to be able to restore the state of a namespace.
+        """
+
+        if command.startswith("hypervisor "):
+            return
+        if bridge is None:
+            journal.append((None, command))
+            return
+        kind, name = bridge
+        action = command.split(" ", 2)[1]
+        if action in READ_ONLY_COMMANDS:
+            return
+        if action == "delete":
+            journal[:] = [entry for entry in journal if entry[0] != bridge]
+            return
+        if kind == "bridge" and action in ("stop_capture", "reset_packet_filters"):
+            # previous captures or filters on this bridge are not needed anymore
+            replaced = ("start_capture",) if action == "stop_capture" else ("add_packet_filter", "reset_packet_filters")
+            journal[:] = [entry for entry in journal if entry[0] != bridge or entry[1].split(" ", 2)[1] not in replaced]
+            if action == "stop_capture":
+                return
+        journal.append((bridge, command))
+
+
+class SharedHypervisorClient:
+    """
+    Used by a node in place of its own uBridge hypervisor.
+
+    :param pool: UbridgePool instance
+    :param hypervisor: SharedHypervisor instance
+    :param namespace: namespace (node ID)
+    """
+
+    def __init__(self, pool, hypervisor, namespace):
+
+        self._pool = pool
+        self._hypervisor = hypervisor
+        self._namespace = namespace
+
+    @property
+    def hypervisor(self):
+
+        return self._hypervisor
+
+    @property
+    def host(self):
+
+        return self._hypervisor.host
+
+    @property
+    def port(self):
+
+        return self._hypervisor.port
+
+    def is_running(self):
+        """
+        A client is running as long as it is attached, uBridge
+        is restarted on demand if the process has crashed.
+        """
+
+        return self._namespace in self._hypervisor.namespaces
+
+    async def start(self):
+
+        await self._hypervisor.start()
+
+    async def connect(self, timeout=10):
+
+        pass
+
+    async def stop(self):
+
+        await self._pool.release(self._namespace)
+
+    async def send(self, command):
+
+        results = await self.send_batch([command])
+        return results[0]
+
+    async def send_batch(self, commands):
+
+        return await self._hypervisor.send_batch(self._namespace, commands)
+
+    def read_stdout(self):
+
+        return self._hypervisor.read_stdout()
+
+
+class UbridgePool:
+    """
+    uBridge hypervisors shared by the nodes of a project.
+
+    :param project: Project instance
+    """
+
+    def __init__(self, project):
+
+        self._project = project
+        self._hypervisors = []
+        self._clients = {}
+        self._count = 0
+
+    @property
+    def hypervisors(self):
+
+        return list(self._hypervisors)
+
+    def attach(self, namespace, path, host, nodes_per_hypervisor=0):
+        """
+        Returns the client of a namespace, the namespace is placed on the first
+        hypervisor with less than nodes_per_hypervisor namespaces.
+
+        :param namespace: namespace (node ID)
+        :param path: path to uBridge executable
+        :param host: host/address for the hypervisor
+        :param nodes_per_hypervisor: maximum number of nodes per hypervisor (0 for no limit)
+
+        :returns: SharedHypervisorClient instance
+        """
+
+        client = self._clients.get(namespace)
+        if client:
+            return client
+
+        for hypervisor in self._hypervisors:
+            if nodes_per_hypervisor <= 0 or len(hypervisor.namespaces) < nodes_per_hypervisor:
+                break
+        else:
+            self._count += 1
+            working_dir = os.path.join(self._project.tmp_working_directory(), "ubridge-{}".format(self._count))
+            hypervisor = SharedHypervisor(self._project, path, working_dir, host)
+            self._hypervisors.append(hypervisor)
+
+        hypervisor.attach(namespace)
+        client = SharedHypervisorClient(self, hypervisor, namespace)
+        self._clients[namespace] = client
+        return client
+
+    async def release(self, namespace):
+        """
+        Releases a namespace, the hypervisor is stopped when not used anymore.
+
+        :param namespace: namespace (node ID)
+        """
+
+        client = self._clients.pop(namespace, None)
+        if client is None:
+            return
+        hypervisor = client.hypervisor
+        await hypervisor.detach(namespace)
+        if not hypervisor.namespaces and hypervisor in self._hypervisors:
+            self._hypervisors.remove(hypervisor)
+
+    async def close(self):
+        """
+        Stops all the hypervisors.
+        """
+
+        for hypervisor in self._hypervisors:
+            await hypervisor.stop()
+        self._hypervisors = []
+        self._clients = {}
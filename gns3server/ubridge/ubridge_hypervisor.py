@@ -15,12 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import re
 import time
 import logging
 import asyncio
 
-from ..utils.asyncio import locking
+from ..utils.asyncio.line_protocol import LineProtocolClient, LineProtocolResponseError
 from .ubridge_error import UbridgeError
 
 log = logging.getLogger(__name__)
@@ -37,10 +36,6 @@ class UBridgeHypervisor:
     hypervisor (defaults to 30 seconds)
     """
 
-    # Used to parse Ubridge response codes
-    error_re = re.compile(r"""^2[0-9]{2}-""")
-    success_re = re.compile(r"""^1[0-9]{2}\s{1}""")
-
     def __init__(self, host, port, timeout=30.0):
 
         self._host = host
@@ -49,6 +44,7 @@ class UBridgeHypervisor:
         self._timeout = timeout
         self._reader = None
         self._writer = None
+        self._client = None
 
     async def connect(self, timeout=10):
         """
@@ -81,6 +77,7 @@ class UBridgeHypervisor:
             raise UbridgeError("Couldn't connect to hypervisor on {}:{} :{}".format(host, self._port, last_exception))
         else:
             log.info("Connected to uBridge hypervisor on {}:{} after {:.4f} seconds".format(host, self._port, time.time() - begin))
+            self._client = LineProtocolClient(self._reader, self._writer)
 
         try:
             await asyncio.sleep(0.1)
@@ -106,7 +103,7 @@ class UBridgeHypervisor:
 
         await self.send("hypervisor close")
         self._writer.close()
-        self._reader, self._writer = None
+        self._reader = self._writer = self._client = None
 
     async def stop(self):
         """
@@ -124,7 +121,7 @@ class UBridgeHypervisor:
                 self._writer.close()
         except OSError as e:
             log.debug("Stopping hypervisor {}:{} {}".format(self._host, self._port, e))
-        self._reader = self._writer = None
+        self._reader = self._writer = self._client = None
 
     async def reset(self):
         """
@@ -173,7 +170,6 @@ class UBridgeHypervisor:
 
         self._host = host
 
-    @locking
     async def send(self, command):
         """
         Sends commands to this hypervisor.
@@ -183,92 +179,33 @@ class UBridgeHypervisor:
         :returns: results as a list
         """
 
-        # uBridge responses are of the form:
-        #   1xx yyyyyy\r\n
-        #   1xx yyyyyy\r\n
-        #   ...
-        #   100-yyyy\r\n
-        # or
-        #   2xx-yyyy\r\n
-        #
-        # Where 1xx is a code from 100-199 for a success or 200-299 for an error
-        # The result might be multiple lines and might be less than the buffer size
-        # but still have more data. The only thing we know for sure is the last line
-        # will begin with '100-' or a '2xx-' and end with '\r\n'
-
-        if self._writer is None or self._reader is None:
+        results = await self.send_batch([command])
+        return results[0]
+
+    async def send_batch(self, commands):
+        """
+        Sends several commands to this hypervisor in one go,
+        the responses are collected in the same order.
+
+        :param commands: list of uBridge hypervisor commands
+
+        :returns: list of results (one list per command)
+        """
+
+        if self._writer is None or self._reader is None or self._client is None:
             raise UbridgeError("Not connected")
 
+        log.debug("sending {}".format(commands))
         try:
-            command = command.strip() + '\n'
-            log.debug("sending {}".format(command))
-            self._writer.write(command.encode())
-            await self._writer.drain()
+            results = await self._client.send_batch(commands)
+        except LineProtocolResponseError as e:
+            raise UbridgeError(e.message)
+        except EOFError:
+            raise UbridgeError("No data returned from {host}:{port} after sending command '{command}', uBridge process running: {run}"
+                               .format(host=self._host, port=self._port, command="; ".join(commands), run=self.is_running()))
         except OSError as e:
             raise UbridgeError("Lost communication with {host}:{port} when sending command '{command}': {error}, uBridge process running: {run}"
-                               .format(host=self._host, port=self._port, command=command, error=e, run=self.is_running()))
-
-        # Now retrieve the result
-        data = []
-        buf = ''
-        retries = 0
-        max_retries = 10
-        while True:
-            try:
-                try:
-                    chunk = await self._reader.read(1024)
-                except asyncio.CancelledError:
-                    # task has been canceled but continue to read
-                    # any remaining data sent by the hypervisor
-                    continue
-                except ConnectionResetError as e:
-                    # Sometimes WinError 64 (ERROR_NETNAME_DELETED) is returned here on Windows.
-                    # These happen if connection reset is received before IOCP could complete
-                    # a previous operation. Ignore and try again....
-                    log.warning("Connection reset received while reading uBridge response: {}".format(e))
-                    continue
-                if not chunk:
-                    if retries > max_retries:
-                        raise UbridgeError("No data returned from {host}:{port} after sending command '{command}', uBridge process running: {run}"
-                                            .format(host=self._host, port=self._port, command=command, run=self.is_running()))
-                    else:
-                        retries += 1
-                        await asyncio.sleep(0.5)
-                        continue
-                retries = 0
-                buf += chunk.decode("utf-8")
-            except OSError as e:
-                raise UbridgeError("Lost communication with {host}:{port} after sending command '{command}': {error}, uBridge process running: {run}"
-                                   .format(host=self._host, port=self._port, command=command, error=e, run=self.is_running()))
+                               .format(host=self._host, port=self._port, command="; ".join(commands), error=e, run=self.is_running()))
 
-            # If the buffer doesn't end in '\n' then we can't be done
-            try:
-                if buf[-1] != '\n':
-                    continue
-            except IndexError:
-                raise UbridgeError("Could not communicate with {host}:{port} after sending command '{command}', uBridge process running: {run}"
-                                   .format(host=self._host, port=self._port, command=command, run=self.is_running()))
-
-            data += buf.split('\r\n')
-            if data[-1] == '':
-                data.pop()
-            buf = ''
-
-            # Does it contain an error code?
-            if self.error_re.search(data[-1]):
-                raise UbridgeError(data[-1][4:])
-
-            # Or does the last line begin with '100-'? Then we are done!
-            if data[-1][:4] == '100-':
-                data[-1] = data[-1][4:]
-                if data[-1] == 'OK':
-                    data.pop()
-                break
-
-        # Remove success responses codes
-        for index in range(len(data)):
-            if self.success_re.search(data[index]):
-                data[index] = data[index][4:]
-
-        log.debug("returned result {}".format(data))
-        return data
+        log.debug("returned result {}".format(results))
+        return results
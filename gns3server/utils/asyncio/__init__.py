@@ -58,6 +58,19 @@ async def cancellable_wait_run_in_executor(func, *args, **kwargs):
         stopped_event.set()
 
 
+def current_task():
+    """
+    Returns the task currently running in the event loop
+    (asyncio.current_task() is not available on Python 3.6).
+
+    :returns: Task instance or None
+    """
+
+    if sys.version_info >= (3, 7):
+        return asyncio.current_task()
+    return asyncio.Task.current_task()
+
+
 async def subprocess_check_output(*args, cwd=None, env=None, stderr=False):
     """
     Run a command and capture output
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import asyncio
+
+DEFAULT_MAX_FRAME_SIZE = 16384  # bytes
+DEFAULT_FLUSH_DELAY = 5  # ms
+
+
+class FrameCoalescer:
+    """
+    Reads console output and groups it in frames.
+
+    A frame is returned as soon as the output arrives when the console is
+    quiet, so interactive use isn't delayed. When the console is busy
+    (the previous frame was sent less than flush_delay ago), the output is
+    accumulated for up to flush_delay or until max_frame_size is reached.
+
+    :param reader: stream reader of the console
+    :param max_frame_size: maximum size of a frame in bytes
+    :param flush_delay: maximum time in ms to wait for more output
+    """
+
+    def __init__(self, reader, max_frame_size=DEFAULT_MAX_FRAME_SIZE, flush_delay=DEFAULT_FLUSH_DELAY):
+
+        self._reader = reader
+        self._max_frame_size = max(1, max_frame_size)
+        self._flush_delay = max(0, flush_delay) / 1000
+        self._last_frame = None
+        self._started = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+
+    async def read_frame(self):
+        """
+        Reads the next frame.
+
+        :returns: frame (bytes), empty at the end of the stream
+        """
+
+        data = await self._reader.read(self._max_frame_size)
+        if not data:
+            return data
+
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        busy = self._last_frame is not None and now - self._last_frame < self._flush_delay
+        if busy and len(data) < self._max_frame_size:
+            deadline = now + self._flush_delay
+            while len(data) < self._max_frame_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    chunk = await asyncio.wait_for(self._reader.read(self._max_frame_size - len(data)), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                data += chunk
+
+        self._last_frame = loop.time()
+        self.frames += 1
+        self.bytes += len(data)
+        return data
+
+    def stats(self):
+        """
+        :returns: dict with the number of frames and bytes sent, per second and in total
+        """
+
+        elapsed = max(time.monotonic() - self._started, 0.001)
+        return {"frames": self.frames,
+                "bytes": self.bytes,
+                "frames_per_second": round(self.frames / elapsed, 1),
+                "bytes_per_second": round(self.bytes / elapsed, 1)}
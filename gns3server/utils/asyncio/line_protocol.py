@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import asyncio
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class LineProtocolResponseError(Exception):
+    """
+    Raised when the hypervisor returns an error for a command.
+
+    :param command: command which failed
+    :param message: error message returned by the hypervisor
+    """
+
+    def __init__(self, command, message):
+
+        super().__init__(message)
+        self.command = command
+        self.message = message
+
+
+class LineProtocolClient:
+    """
+    Client for the line protocol of the Dynamips and uBridge hypervisors.
+
+    Responses are of the form:
+      1xx yyyyyy\\r\\n
+      1xx yyyyyy\\r\\n
+      ...
+      100-yyyy\\r\\n
+    or
+      2xx-yyyy\\r\\n
+
+    Where 1xx is a code from 100-199 for a success or 200-299 for an error.
+    The last line of a response is the only one with a '-' after the code.
+
+    Commands can be pipelined: send_batch() writes all the commands
+    at once then reads the responses, which are sent in the same order.
+    The hypervisor runs all the commands of a pipeline even if one fails,
+    so only commands which do not depend on each other should be pipelined
+    unless the caller undoes the commands of a failed batch.
+
+    :param reader: stream reader connected to the hypervisor
+    :param writer: stream writer connected to the hypervisor
+    """
+
+    READ_SIZE = 65536
+
+    # Used to parse the response codes
+    last_line_re = re.compile(r"""^[0-9]{3}-""")
+    success_re = re.compile(r"""^1[0-9]{2}\s{1}""")
+
+    def __init__(self, reader, writer):
+
+        self._reader = reader
+        self._writer = writer
+        self._buffer = bytearray()
+        self._lock = asyncio.Lock()
+        self._unread_responses = 0
+
+    async def send(self, command):
+        """
+        Sends a command.
+
+        :param command: command to send
+
+        :returns: results as a list of lines
+        """
+
+        results = await self.send_batch([command])
+        return results[0]
+
+    async def send_batch(self, commands, pipeline=True):
+        """
+        Sends several commands in one go and collects their responses in order.
+
+        All the responses are read even if a command fails so the following
+        commands are not affected, then the error of the first failed command is raised.
+
+        :param commands: list of commands
+        :param pipeline: if False, the commands are sent one after the other and
+        the first failed command stops the sequence, no other command can be sent in between
+
+        :returns: list of results, each result is a list of lines
+        """
+
+        commands = [command.strip() for command in commands]
+        if not commands:
+            return []
+
+        async with self._lock:
+            # discard the responses of commands sent by a cancelled call
+            while self._unread_responses > 0:
+                await self._read_response()
+                self._unread_responses -= 1
+
+            if not pipeline:
+                results = []
+                for command in commands:
+                    self._writer.write((command + "\n").encode())
+                    self._unread_responses += 1
+                    await self._writer.drain()
+                    success, lines = await self._read_response()
+                    self._unread_responses -= 1
+                    if not success:
+                        raise LineProtocolResponseError(command, lines[-1])
+                    results.append(lines)
+                return results
+
+            self._writer.write("".join(command + "\n" for command in commands).encode())
+            self._unread_responses += len(commands)
+            await self._writer.drain()
+
+            results = []
+            error = None
+            for command in commands:
+                success, lines = await self._read_response()
+                self._unread_responses -= 1
+                if not success and error is None:
+                    error = LineProtocolResponseError(command, lines[-1])
+                results.append(lines)
+
+        if error:
+            raise error
+        return results
+
+    async def _read_line(self):
+        """
+        Reads a line from the hypervisor.
+
+        :returns: line without the line terminator
+        """
+
+        while True:
+            end = self._buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                return line.rstrip(b"\r").decode("utf-8", errors="ignore")
+            try:
+                chunk = await self._reader.read(self.READ_SIZE)
+            except ConnectionResetError as e:
+                # Sometimes WinError 64 (ERROR_NETNAME_DELETED) is returned here on Windows.
+                # These happen if connection reset is received before IOCP could complete
+                # a previous operation. Ignore and try again....
+                log.warning("Connection reset received while reading hypervisor response: {}".format(e))
+                continue
+            if not chunk:
+                raise EOFError("Connection closed by the hypervisor")
+            self._buffer += chunk
+
+    async def _read_response(self):
+        """
+        Reads the response of a command.
+
+        :returns: tuple (success boolean, list of lines). The last line is the error message on failure.
+        """
+
+        lines = []
+        while True:
+            line = await self._read_line()
+            if self.last_line_re.search(line):
+                if line[0] == "2":
+                    return False, lines + [line[4:]]
+                if line[4:] != "OK":
+                    lines.append(line[4:])
+                return True, lines
+            if self.success_re.search(line):
+                line = line[4:]
+            lines.append(line)
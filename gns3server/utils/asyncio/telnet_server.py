@@ -19,6 +19,11 @@ import socket
 import asyncio
 import asyncio.subprocess
 import struct
+import weakref
+import collections
+
+from gns3server.config import Config
+from gns3server.utils.asyncio import current_task
 
 import logging
 log = logging.getLogger(__name__)
@@ -57,6 +62,121 @@ LINEMO = 34     # Line Mode
 
 READ_SIZE = 1024
 
+# What to do when the output buffer of a client is full
+OVERFLOW_POLICIES = ("drop", "disconnect", "block")
+DEFAULT_OVERFLOW_POLICY = "drop"
+DEFAULT_CLIENT_BUFFER_SIZE = 256  # KB
+DEFAULT_SCROLLBACK_SIZE = 64  # KB
+DEFAULT_SCROLLBACK_MEMORY_CAP = 64  # MB
+
+
+class TelnetParser:
+    """
+    Resumable parser removing the Telnet commands from the data sent by a client.
+
+    The parser state is kept between calls to feed() so a command
+    split across two reads is handled without waiting for more data.
+    """
+
+    # parser states
+    DATA = 0
+    COMMAND = 1
+    OPTION = 2
+    SUBNEGOTIATION = 3
+    SUBNEGOTIATION_IAC = 4
+
+    # a sub-negotiation longer than this is truncated
+    MAX_SUBNEGOTIATION_SIZE = 64
+
+    def __init__(self):
+
+        self._state = self.DATA
+        self._command = None
+        self._subnegotiation = bytearray()
+
+    @property
+    def state(self):
+
+        return self._state
+
+    def feed(self, data):
+        """
+        Parses a chunk of data.
+
+        :param data: data received from the client
+
+        :returns: tuple (data minus Telnet commands, list of (command, argument) tuples).
+        The argument is the option for WILL, WONT, DO and DONT, the sub-negotiation
+        bytes (without IAC SB and IAC SE) for SB and None for the other commands.
+        """
+
+        if self._state == self.DATA and IAC not in data:
+            return data, []
+
+        output = bytearray()
+        commands = []
+        position = 0
+        length = len(data)
+        while position < length:
+            state = self._state
+            if state == self.DATA:
+                iac = data.find(IAC, position)
+                if iac < 0:
+                    output += data[position:]
+                    break
+                output += data[position:iac]
+                position = iac + 1
+                self._state = self.COMMAND
+            elif state == self.COMMAND:
+                command = data[position]
+                position += 1
+                if command == IAC:
+                    # escaped 0xff, it's data
+                    output.append(IAC)
+                    self._state = self.DATA
+                elif command in (WILL, WONT, DO, DONT):
+                    if position < length:
+                        # the option is in the same chunk
+                        commands.append((command, data[position]))
+                        position += 1
+                        self._state = self.DATA
+                    else:
+                        self._command = command
+                        self._state = self.OPTION
+                elif command == SB:
+                    self._subnegotiation.clear()
+                    self._state = self.SUBNEGOTIATION
+                else:
+                    commands.append((command, None))
+                    self._state = self.DATA
+            elif state == self.OPTION:
+                commands.append((self._command, data[position]))
+                position += 1
+                self._state = self.DATA
+            elif state == self.SUBNEGOTIATION:
+                iac = data.find(IAC, position)
+                end = length if iac < 0 else iac
+                room = self.MAX_SUBNEGOTIATION_SIZE - len(self._subnegotiation)
+                if room > 0:
+                    self._subnegotiation += data[position:min(end, position + room)]
+                if iac < 0:
+                    break
+                position = iac + 1
+                self._state = self.SUBNEGOTIATION_IAC
+            else:
+                command = data[position]
+                position += 1
+                if command == SE:
+                    commands.append((SB, bytes(self._subnegotiation)))
+                    self._subnegotiation.clear()
+                    self._state = self.DATA
+                else:
+                    if command == IAC and len(self._subnegotiation) < self.MAX_SUBNEGOTIATION_SIZE:
+                        # escaped 0xff inside the sub-negotiation
+                        self._subnegotiation.append(IAC)
+                    self._state = self.SUBNEGOTIATION
+        return bytes(output), commands
+
 
 class TelnetConnection(object):
     """Default implementation of telnet connection which may but may not be used."""
@@ -111,14 +231,287 @@ class TelnetConnection(object):
         self.is_closing = True
 
 
+class TelnetClientOutput:
+    """
+    Bounded output buffer of a telnet client, flushed by its own writer task
+    so a slow client doesn't delay the output sent to the other clients.
+
+    :param writer: client stream writer
+    :param max_size: maximum number of bytes waiting to be sent to the client
+    :param overflow_policy: drop the data, disconnect the client or block the producer when the buffer is full
+    """
+
+    def __init__(self, writer, max_size, overflow_policy=DEFAULT_OVERFLOW_POLICY):
+
+        self._writer = writer
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._buffer = collections.deque()
+        self._buffer_size = 0
+        self._pending_size = 0
+        self._data_available = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._task = None
+        self._closed = False
+
+        # lag counters
+        self.written_bytes = 0
+        self.dropped_bytes = 0
+        self.max_lag = 0
+        self.overflows = 0
+
+    @property
+    def lag(self):
+        """
+        :returns: number of bytes not yet sent to the client
+        """
+
+        return self._pending_size
+
+    @property
+    def closed(self):
+
+        return self._closed
+
+    def start(self):
+        """
+        Starts the writer task.
+        """
+
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def put(self, data):
+        """
+        Queues data for the client.
+
+        :param data: data to send
+        """
+
+        if self._closed or len(data) == 0:
+            return
+
+        if self._pending_size + len(data) > self._max_size:
+            self.overflows += 1
+            if self._overflow_policy == "drop":
+                if self.overflows == 1:
+                    log.warning("Telnet client output buffer is full ({} bytes), dropping data".format(self._pending_size))
+                self.dropped_bytes += len(data)
+                return
+            elif self._overflow_policy == "disconnect":
+                log.warning("Telnet client output buffer is full ({} bytes), disconnecting client".format(self._pending_size))
+                self.dropped_bytes += len(data) + self._pending_size
+                await self.close()
+                self._writer.close()
+                return
+            else:
+                # block the producer until the client has caught up,
+                # a chunk bigger than the buffer is accepted once the buffer is empty
+                while self._pending_size > 0 and self._pending_size + len(data) > self._max_size and not self._closed:
+                    self._space_available.clear()
+                    await self._space_available.wait()
+                if self._closed:
+                    return
+
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        self._pending_size += len(data)
+        self.max_lag = max(self.max_lag, self._pending_size)
+        self._data_available.set()
+
+    async def _run(self):
+
+        try:
+            while not self._closed:
+                if not self._buffer:
+                    self._data_available.clear()
+                    await self._data_available.wait()
+                    continue
+                # send everything queued since the last write in one go
+                data = b"".join(self._buffer)
+                self._buffer.clear()
+                self._buffer_size = 0
+                self._writer.write(data)
+                await self._writer.drain()
+                self._pending_size -= len(data)
+                self.written_bytes += len(data)
+                self._space_available.set()
+        except ConnectionError:
+            self._closed = True
+        finally:
+            self._space_available.set()
+
+    async def close(self):
+        """
+        Stops the writer task, data not sent yet is discarded.
+        """
+
+        self._closed = True
+        self._space_available.set()
+        self._data_available.set()
+        if self._task and not self._task.done() and self._task is not current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+
+    def stats(self):
+        """
+        :returns: dict with the lag counters of the client
+        """
+
+        return {"lag": self.lag,
+                "max_lag": self.max_lag,
+                "written_bytes": self.written_bytes,
+                "dropped_bytes": self.dropped_bytes,
+                "overflows": self.overflows}
+
+
+class TelnetScrollback:
+    """
+    Ring buffer keeping the most recent console output,
+    replayed to the clients when they connect.
+
+    The memory used by all the scrollback buffers is capped (see set_memory_cap()),
+    when the cap is reached the oldest output of the largest buffers is discarded first.
+
+    :param max_size: maximum number of bytes kept in this buffer
+    """
+
+    _buffers = weakref.WeakSet()
+    _total_size = 0
+    _memory_cap = DEFAULT_SCROLLBACK_MEMORY_CAP * 1024 * 1024
+
+    def __init__(self, max_size):
+
+        self._max_size = max_size
+        self._chunks = collections.deque()
+        self._size = 0
+        self.discarded_bytes = 0
+        TelnetScrollback._buffers.add(self)
+
+    def __del__(self):
+
+        TelnetScrollback._total_size -= self._size
+
+    @classmethod
+    def set_memory_cap(cls, memory_cap):
+        """
+        Sets the maximum number of bytes kept by all the buffers.
+
+        :param memory_cap: memory cap in bytes
+        """
+
+        cls._memory_cap = memory_cap
+        if cls._total_size > cls._memory_cap:
+            cls._enforce_memory_cap()
+
+    @classmethod
+    def total_size(cls):
+        """
+        :returns: number of bytes kept by all the scrollback buffers
+        """
+
+        return cls._total_size
+
+    @property
+    def size(self):
+
+        return self._size
+
+    @property
+    def max_size(self):
+
+        return self._max_size
+
+    def append(self, data):
+        """
+        Adds console output to the buffer.
+
+        :param data: console output
+        """
+
+        if self._max_size <= 0 or len(data) == 0:
+            return
+        if len(data) > self._max_size:
+            self.discarded_bytes += len(data) - self._max_size
+            data = data[-self._max_size:]
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        TelnetScrollback._total_size += len(data)
+        if self._size > self._max_size:
+            self._discard(self._size - self._max_size)
+        if TelnetScrollback._total_size > TelnetScrollback._memory_cap:
+            self._enforce_memory_cap()
+
+    def _discard(self, nbytes):
+        """
+        Discards the oldest output.
+
+        :param nbytes: number of bytes to discard
+        """
+
+        while nbytes > 0 and self._chunks:
+            chunk = self._chunks[0]
+            if len(chunk) <= nbytes:
+                self._chunks.popleft()
+                removed = len(chunk)
+            else:
+                self._chunks[0] = chunk[nbytes:]
+                removed = nbytes
+            self._size -= removed
+            TelnetScrollback._total_size -= removed
+            self.discarded_bytes += removed
+            nbytes -= removed
+
+    @classmethod
+    def _enforce_memory_cap(cls):
+
+        while cls._total_size > cls._memory_cap:
+            largest = max(cls._buffers, key=lambda scrollback: scrollback.size, default=None)
+            if largest is None or largest.size == 0:
+                break
+            largest._discard(cls._total_size - cls._memory_cap)
+
+    def get(self, max_size=None):
+        """
+        Returns the content of the buffer.
+
+        :param max_size: only returns the most recent max_size bytes
+
+        :returns: bytes
+        """
+
+        if len(self._chunks) > 1:
+            # merge the chunks, this is cheaper for the next calls
+            self._chunks = collections.deque([b"".join(self._chunks)])
+        data = self._chunks[0] if self._chunks else b""
+        if max_size is not None and len(data) > max_size:
+            data = data[-max_size:]
+        return data
+
+    def clear(self):
+        """
+        Discards the content of the buffer.
+        """
+
+        TelnetScrollback._total_size -= self._size
+        self._chunks.clear()
+        self._size = 0
+
+
 class AsyncioTelnetServer:
-    MAX_NEGOTIATION_READ = 10
 
-    def __init__(self, reader=None, writer=None, binary=True, echo=False, naws=False, window_size_changed_callback=None, connection_factory=None):
+    def __init__(self, reader=None, writer=None, binary=True, echo=False, naws=False, window_size_changed_callback=None, connection_factory=None,
+                 client_buffer_size=None, overflow_policy=None, scrollback=None):
         """
         Initializes telnet server
         :param naws when True make a window size negotiation
         :param connection_factory: when set it's possible to inject own implementation of connection
+        :param client_buffer_size: size in bytes of the output buffer of each client (default: console_client_buffer_size in the server config)
+        :param overflow_policy: drop, disconnect or block when the output buffer of a client is full (default: console_overflow_policy in the server config)
+        :param scrollback: TelnetScrollback instance keeping the output replayed to new clients
         """
         assert connection_factory is None or (connection_factory is not None and reader is None and writer is None), \
             "Please use either reader and writer either connection_factory, otherwise duplicate data may be produced."
@@ -126,9 +519,11 @@ class AsyncioTelnetServer:
         self._reader = reader
         self._writer = writer
         self._connections = dict()
+        self._outputs = dict()
         self._lock = asyncio.Lock()
         self._reader_process = None
         self._current_read = None
+        self._scrollback = scrollback
         self._window_size_changed_callback = window_size_changed_callback
 
         self._binary = binary
@@ -146,6 +541,17 @@ class AsyncioTelnetServer:
 
         self._connection_factory = connection_factory
 
+        server_config = Config.instance().get_section_config("Server")
+        if client_buffer_size is None:
+            client_buffer_size = int(server_config.get("console_client_buffer_size", DEFAULT_CLIENT_BUFFER_SIZE)) * 1024
+        if overflow_policy is None:
+            overflow_policy = server_config.get("console_overflow_policy", DEFAULT_OVERFLOW_POLICY)
+        if overflow_policy not in OVERFLOW_POLICIES:
+            log.warning("Unknown console overflow policy '{}', using '{}'".format(overflow_policy, DEFAULT_OVERFLOW_POLICY))
+            overflow_policy = DEFAULT_OVERFLOW_POLICY
+        self._client_buffer_size = client_buffer_size
+        self._overflow_policy = overflow_policy
+
     @staticmethod
     async def write_client_intro(writer, echo=False):
         # Send initial telnet session opening
@@ -194,9 +600,15 @@ class AsyncioTelnetServer:
         # Keep track of connected clients
         connection = self._connection_factory(network_reader, network_writer, self._window_size_changed_callback)
         self._connections[network_writer] = connection
+        output = TelnetClientOutput(network_writer, self._client_buffer_size, self._overflow_policy)
 
         try:
             await self._write_intro(network_writer, echo=self._echo, binary=self._binary, naws=self._naws)
+            if self._scrollback is not None:
+                # replay the recent output before any new output is sent to this client
+                await output.put(self._scrollback.get(max_size=self._client_buffer_size))
+            self._outputs[network_writer] = output
+            output.start()
             await connection.connected()
             await self._process(network_reader, network_writer, connection)
         except ConnectionError:
@@ -210,8 +622,14 @@ class AsyncioTelnetServer:
 
             await connection.disconnected()
             del self._connections[network_writer]
+        finally:
+            await output.close()
+            self._outputs.pop(network_writer, None)
+            log.debug("Telnet client disconnected: {}".format(output.stats()))
 
     async def close(self):
+        for output in list(self._outputs.values()):
+            await output.close()
         for writer, connection in self._connections.items():
             try:
                 writer.write_eof()
@@ -219,6 +637,15 @@ class AsyncioTelnetServer:
             except (AttributeError, ConnectionError):
                 continue
 
+    def clients_stats(self):
+        """
+        Returns the output lag counters of the connected clients.
+
+        :returns: list of dict
+        """
+
+        return [output.stats() for output in self._outputs.values()]
+
     async def client_connected_hook(self):
         pass
 
@@ -236,6 +663,7 @@ class AsyncioTelnetServer:
         return None
 
     async def _process(self, network_reader, network_writer, connection):
+        parser = TelnetParser()
         network_read = asyncio.ensure_future(network_reader.read(READ_SIZE))
         reader_read = await self._get_reader(network_reader)
 
@@ -264,8 +692,9 @@ class AsyncioTelnetServer:
 
                     network_read = asyncio.ensure_future(network_reader.read(READ_SIZE))
 
-                    if IAC in data:
-                        data = await self._IAC_parser(data, network_reader, network_writer, connection)
+                    data, commands = parser.feed(data)
+                    if commands:
+                        await self._process_commands(commands, network_writer, connection)
 
                     if len(data) == 0:
                         continue
@@ -287,22 +716,13 @@ class AsyncioTelnetServer:
 
                     reader_read = await self._get_reader(network_reader)
 
-                    # Replicate the output on all clients
-                    for connection in self._connections.values():
-                        connection.writer.write(data)
-                        await connection.writer.drain()
+                    if self._scrollback is not None:
+                        self._scrollback.append(data)
 
-    async def _read(self, cmd, buffer, location, reader):
-        """ Reads next op from the buffer or reader"""
-        try:
-            op = buffer[location]
-            cmd.append(op)
-            return op
-        except IndexError:
-            op = await reader.read(1)
-            buffer.extend(op)
-            cmd.append(buffer[location])
-            return op
+                    # Replicate the output on all clients, each client has
+                    # its own buffer so a slow client doesn't slow down the others
+                    for output in list(self._outputs.values()):
+                        await output.put(data)
 
     async def _negotiate(self, data, connection):
         """ Performs negotiation commands"""
@@ -315,104 +735,46 @@ class AsyncioTelnetServer:
             else:
                 log.warning('Wrong number of NAWS bytes')
         else:
-            log.debug("Not supported negotiation sequence, received {} bytes", len(data))
+            log.debug("Not supported negotiation sequence, received {} bytes".format(len(data)))
 
-    async def _IAC_parser(self, buf, network_reader, network_writer, connection):
+    async def _process_commands(self, commands, network_writer, connection):
         """
-        Processes and removes any Telnet commands from the buffer.
+        Replies to the Telnet commands sent by a client.
 
-        :param buf: buffer
-        :returns: buffer minus Telnet commands
+        :param commands: list of commands returned by TelnetParser.feed()
         """
 
-
-        skip_to = 0
-        while True:
-            # Locate an IAC to process
-            iac_loc = buf.find(IAC, skip_to)
-            if iac_loc < 0:
-                break
-
-            # Get the TELNET command
-            iac_cmd = bytearray([IAC])
-            try:
-                iac_cmd.append(buf[iac_loc + 1])
-            except IndexError:
-                d = await network_reader.read(1)
-                buf.extend(d)
-                iac_cmd.append(buf[iac_loc + 1])
-
-            # Is this just a 2-byte TELNET command?
-            if iac_cmd[1] not in [WILL, WONT, DO, DONT, SB]:
-                if iac_cmd[1] == AYT:
-                    log.debug("Telnet server received Are-You-There (AYT)")
-                    network_writer.write(b'\r\nYour Are-You-There received. I am here.\r\n')
-                elif iac_cmd[1] == IAC:
-                    # It's data, not an IAC
-                    iac_cmd.pop()
-                    # This prevents the 0xff from being
-                    # interrupted as yet another IAC
-                    skip_to = iac_loc + 1
-                    log.debug("Received IAC IAC")
-                elif iac_cmd[1] == NOP:
-                    pass
-                else:
-                    log.debug("Unhandled telnet command: "
-                              "{0:#x} {1:#x}".format(*iac_cmd))
-            elif iac_cmd[1] == SB:  # starts negotiation commands
-                negotiation = []
-                for pos in range(2, self.MAX_NEGOTIATION_READ):
-                    op = await self._read(iac_cmd, buf, iac_loc + pos, network_reader)
-                    negotiation.append(op)
-                    if op == SE:
-                        # ends negotiation commands
-                        break
-
-                # SE command is followed by IAC, remove the last two operations from stack
-                await self._negotiate(negotiation[0:-2], connection)
-
-            # This must be a 3-byte TELNET command
-            else:
-                try:
-                    iac_cmd.append(buf[iac_loc + 2])
-                except IndexError:
-                    d = await network_reader.read(1)
-                    buf.extend(d)
-                    iac_cmd.append(buf[iac_loc + 2])
+        for command, argument in commands:
+            if command == AYT:
+                log.debug("Telnet server received Are-You-There (AYT)")
+                network_writer.write(b'\r\nYour Are-You-There received. I am here.\r\n')
+            elif command == NOP:
+                pass
+            elif command == SB:
+                if len(argument) > 0:
+                    await self._negotiate(argument, connection)
+            elif command == DO:
                 # We do ECHO, SGA, and BINARY. Period.
-                if iac_cmd[1] == DO:
-                    if iac_cmd[2] not in [ECHO, SGA, BINARY]:
-                        network_writer.write(bytes([IAC, WONT, iac_cmd[2]]))
-                        log.debug("Telnet WON'T {:#x}".format(iac_cmd[2]))
+                if argument not in [ECHO, SGA, BINARY]:
+                    network_writer.write(bytes([IAC, WONT, argument]))
+                    log.debug("Telnet WON'T {:#x}".format(argument))
+                elif argument == SGA:
+                    if self._binary:
+                        network_writer.write(bytes([IAC, WILL, argument]))
                     else:
-                        if iac_cmd[2] == SGA:
-                            if self._binary:
-                                network_writer.write(bytes([IAC, WILL, iac_cmd[2]]))
-                            else:
-                                network_writer.write(bytes([IAC, WONT, iac_cmd[2]]))
-                                log.debug("Telnet WON'T {:#x}".format(iac_cmd[2]))
-
-                elif iac_cmd[1] == DONT:
-                    log.debug("Unhandled DONT telnet command: "
-                              "{0:#x} {1:#x} {2:#x}".format(*iac_cmd))
-                elif iac_cmd[1] == WILL:
-                    if iac_cmd[2] not in [BINARY, NAWS]:
-                        log.debug("Unhandled WILL telnet command: "
-                                  "{0:#x} {1:#x} {2:#x}".format(*iac_cmd))
-                elif iac_cmd[1] == WONT:
-                    log.debug("Unhandled WONT telnet command: "
-                              "{0:#x} {1:#x} {2:#x}".format(*iac_cmd))
-                else:
-                    log.debug("Unhandled telnet command: "
-                              "{0:#x} {1:#x} {2:#x}".format(*iac_cmd))
-
-            # Remove the entire TELNET command from the buffer
-            buf = buf.replace(iac_cmd, b'', 1)
-
-            await network_writer.drain()
+                        network_writer.write(bytes([IAC, WONT, argument]))
+                        log.debug("Telnet WON'T {:#x}".format(argument))
+            elif command == DONT:
+                log.debug("Unhandled DONT telnet command: {0:#x} {1:#x} {2:#x}".format(IAC, command, argument))
+            elif command == WILL:
+                if argument not in [BINARY, NAWS]:
+                    log.debug("Unhandled WILL telnet command: {0:#x} {1:#x} {2:#x}".format(IAC, command, argument))
+            elif command == WONT:
+                log.debug("Unhandled WONT telnet command: {0:#x} {1:#x} {2:#x}".format(IAC, command, argument))
+            else:
+                log.debug("Unhandled telnet command: {0:#x} {1:#x}".format(IAC, command))
+        await network_writer.drain()
 
-        # Return the new copy of the buffer, minus telnet commands
-        return buf
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
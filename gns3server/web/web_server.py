@@ -39,6 +39,7 @@ from ..config import Config
 from ..compute import MODULES
 from ..compute.port_manager import PortManager
 from ..compute.qemu import Qemu
+from ..utils.asyncio.telnet_server import TelnetScrollback, DEFAULT_SCROLLBACK_MEMORY_CAP
 from ..controller import Controller
 
 # do not delete this import
@@ -305,6 +306,7 @@ class WebServer:
         })
 
         PortManager.instance().console_host = self._host
+        TelnetScrollback.set_memory_cap(int(server_config.get("console_scrollback_memory_cap", DEFAULT_SCROLLBACK_MEMORY_CAP)) * 1024 * 1024)
 
         for method, route, handler in Route.get_routes():
             log.debug("Adding route: {} {}".format(method, route))
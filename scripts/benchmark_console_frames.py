@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the number of WebSocket frames sent for a busy console
+(for instance a router printing its boot log or "debug all").
+
+A simulated console prints short lines over a TCP connection and the
+output is grouped in frames like in BaseNode.start_websocket_console().
+A flush delay of 0 disables the grouping (one frame per read).
+
+Usage: python benchmark_console_frames.py [--lines 100000] [--line-size 80] [--flush-delay 5] [--max-frame-size 16384]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gns3server.utils.asyncio.frame_coalescer import FrameCoalescer
+
+
+async def console(writer, lines, line_size):
+
+    line = b"x" * (line_size - 2) + b"\r\n"
+    for i in range(lines):
+        writer.write(line)
+        if i % 10 == 0:
+            await writer.drain()
+            # let the other tasks run, like an emulator writing to its console
+            await asyncio.sleep(0)
+    await writer.drain()
+    writer.close()
+
+
+async def run(lines, line_size, flush_delay, max_frame_size):
+
+    done = asyncio.Event()
+
+    async def handle(reader, writer):
+        await console(writer, lines, line_size)
+        done.set()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    coalescer = FrameCoalescer(reader, max_frame_size=max_frame_size, flush_delay=flush_delay)
+    begin = time.monotonic()
+    while True:
+        frame = await coalescer.read_frame()
+        if not frame:
+            break
+    elapsed = time.monotonic() - begin
+    await done.wait()
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return elapsed, coalescer.frames, coalescer.bytes
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000, help="number of lines printed by the console")
+    parser.add_argument("--line-size", type=int, default=80, help="size of each line in bytes")
+    parser.add_argument("--flush-delay", type=float, default=5, help="flush delay in ms")
+    parser.add_argument("--max-frame-size", type=int, default=16384, help="maximum frame size in bytes")
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    for name, flush_delay, max_frame_size in (("one frame per read", 0, 1024),
+                                              ("coalesced", args.flush_delay, args.max_frame_size)):
+        elapsed, frames, nbytes = loop.run_until_complete(run(args.lines, args.line_size, flush_delay, max_frame_size))
+        print("{:<19} {:8} frames {:10} bytes {:10.1f} frames/s {:12.1f} bytes/s".format(name,
+                                                                                       frames,
+                                                                                       nbytes,
+                                                                                       frames / elapsed,
+                                                                                       nbytes / elapsed))
+
+
+if __name__ == '__main__':
+    main()
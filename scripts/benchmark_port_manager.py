@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark the allocation of all the UDP ports of the default range (10,000 ports)
+with the port manager, compared to a linear scan from the start of the range
+for each allocation (find_unused_port()).
+
+Usage: python benchmark_port_manager.py [--ports 10000] [--skip-linear-scan]
+"""
+
+import os
+import sys
+import time
+import argparse
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gns3server.compute.port_manager import PortManager
+
+
+class FakeProject:
+
+    def record_udp_port(self, port):
+        pass
+
+    def remove_udp_port(self, port):
+        pass
+
+
+def count_calls(function):
+
+    calls = [0]
+
+    def wrapper(*args, **kwargs):
+        calls[0] += 1
+        return function(*args, **kwargs)
+    return wrapper, calls
+
+
+def bench_port_manager(ports):
+
+    pm = PortManager()
+    pm.udp_port_range = (20000, 20000 + ports - 1)
+    project = FakeProject()
+    check_port, calls = count_calls(PortManager._check_port)
+    with patch("gns3server.compute.port_manager.PortManager._check_port", side_effect=check_port):
+        begin = time.time()
+        for _ in range(ports):
+            pm.get_free_udp_port(project)
+        return time.time() - begin, calls[0]
+
+
+def bench_linear_scan(ports):
+
+    used_ports = set()
+    check_port, calls = count_calls(PortManager._check_port)
+    with patch("gns3server.compute.port_manager.PortManager._check_port", side_effect=check_port):
+        begin = time.time()
+        for _ in range(ports):
+            port = PortManager.find_unused_port(20000, 20000 + ports - 1, host="0.0.0.0", socket_type="UDP", ignore_ports=used_ports)
+            used_ports.add(port)
+        return time.time() - begin, calls[0]
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ports", type=int, default=10000, help="number of UDP ports to allocate")
+    parser.add_argument("--skip-linear-scan", action="store_true", help="do not run the linear scan benchmark")
+    args = parser.parse_args()
+
+    benchmarks = [("port manager", bench_port_manager)]
+    if not args.skip_linear_scan:
+        benchmarks.append(("linear scan", bench_linear_scan))
+    for name, bench in benchmarks:
+        elapsed, checks = bench(args.ports)
+        print("{:<14} {} ports allocated in {:.3f}s ({:.1f} us per port), {} bind checks".format(name,
+                                                                                                args.ports,
+                                                                                                elapsed,
+                                                                                                elapsed * 1000000 / args.ports,
+                                                                                                checks))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare the boot I/O of many linked clones sharing the same base image
+with and without warming the page cache (Linux only).
+
+Each simulated QEMU process reads random clusters of the base image,
+like a guest booting from a backing file. Before each run the base image
+is evicted from the page cache with POSIX_FADV_DONTNEED.
+
+Usage: python benchmark_qemu_image_warming.py [--size 512] [--nodes 50] [--reads 200] [image]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gns3server.compute.qemu import Qemu
+
+CLUSTER_SIZE = 64 * 1024
+
+
+def disk_read_bytes():
+    """
+    Returns the number of bytes this process has read from the storage layer.
+    """
+
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("read_bytes:"):
+                return int(line.split()[1])
+    return 0
+
+
+def boot(path, size, reads, seed):
+    """
+    Simulates a linked clone reading clusters of its base image.
+    """
+
+    rng = random.Random(seed)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        for _ in range(reads):
+            offset = rng.randrange(0, size // CLUSTER_SIZE) * CLUSTER_SIZE
+            os.pread(fd, CLUSTER_SIZE, offset)
+    finally:
+        os.close(fd)
+
+
+def run(path, nodes, reads, warm):
+
+    size = os.path.getsize(path)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, size, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+    read_bytes = disk_read_bytes()
+    begin = time.time()
+    if warm:
+        Qemu._warm_image(path, size)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=nodes) as executor:
+        futures = [executor.submit(boot, path, size, reads, seed) for seed in range(nodes)]
+        for future in futures:
+            future.result()
+    return time.time() - begin, disk_read_bytes() - read_bytes
+
+
+def main():
+
+    if not hasattr(os, "posix_fadvise"):
+        sys.exit("posix_fadvise is not supported on this platform")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=512, help="size in MB of the generated base image")
+    parser.add_argument("--nodes", type=int, default=50, help="number of linked clones booting at the same time")
+    parser.add_argument("--reads", type=int, default=200, help="number of random cluster reads per linked clone")
+    parser.add_argument("image", nargs="?", help="existing base image to use instead of a generated one")
+    args = parser.parse_args()
+
+    path = args.image
+    tmp_dir = None
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "base.img")
+        with open(path, "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+    try:
+        for warm in (False, True):
+            elapsed, read_bytes = run(path, args.nodes, args.reads, warm)
+            print("{:<16} {:8.3f}s {:10.1f} MB read from disk".format("with warming" if warm else "without warming",
+                                                                       elapsed,
+                                                                       read_bytes / (1024 * 1024)))
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
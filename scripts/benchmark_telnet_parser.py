@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark the Telnet parser of the console server with data sent
+by a client: plain text, binary data (escaped 0xff bytes) and
+negotiation heavy input. The data is fed in chunks of the size
+read from the network by the telnet server.
+
+Usage: python benchmark_telnet_parser.py [--size 16] [--chunk-size 1024]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from gns3server.utils.asyncio.telnet_server import TelnetParser, READ_SIZE, IAC, SB, SE, DO, WILL, NOP, NAWS, ECHO
+
+
+def plain_text(size):
+
+    line = b"Router#show ip interface brief\r\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def binary(size):
+
+    # random bytes where each 0xff is escaped, like a file transfer over telnet
+    rng = random.Random(0)
+    return bytes(rng.getrandbits(8) for _ in range(size)).replace(bytes([IAC]), bytes([IAC, IAC]))[:size]
+
+
+def negotiations(size):
+
+    # window resizes and option negotiations between keystrokes
+    pattern = b"a" + bytes([IAC, SB, NAWS, 0, 80, 0, 24, IAC, SE, IAC, DO, ECHO, IAC, WILL, NAWS, IAC, NOP])
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+
+def bench(data, chunk_size):
+
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    parser = TelnetParser()
+    output_size = 0
+    nb_commands = 0
+    begin = time.perf_counter()
+    for chunk in chunks:
+        output, commands = parser.feed(chunk)
+        output_size += len(output)
+        nb_commands += len(commands)
+    return time.perf_counter() - begin, output_size, nb_commands
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=16, help="size in MB of the data sent by the client")
+    parser.add_argument("--chunk-size", type=int, default=READ_SIZE, help="size of the chunks fed to the parser")
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    for name, generator in (("plain text", plain_text), ("binary", binary), ("negotiations", negotiations)):
+        data = generator(size)
+        elapsed, output_size, nb_commands = bench(data, args.chunk_size)
+        print("{:<13} {:8.3f}s {:8.1f} MB/s {:10} bytes of data {:8} commands".format(name,
+                                                                                     elapsed,
+                                                                                     len(data) / (1024 * 1024) / elapsed,
+                                                                                     output_size,
+                                                                                     nb_commands))
+
+
+if __name__ == '__main__':
+    main()
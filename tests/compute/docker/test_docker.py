@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import pytest
+import asyncio
 from unittest.mock import MagicMock, patch
 
 from tests.utils import asyncio_patch, AsyncioMagicMock
@@ -200,3 +201,61 @@ async def test_docker_check_connection_docker_preferred_version_against_older(vm
         vm._connected = False
         await vm._check_connection()
         assert vm._api_version == DOCKER_MINIMUM_API_VERSION
+
+
+async def test_watch_events(vm):
+
+    lines = [
+        b'{"Type": "container", "Action": "start", "Actor": {"ID": "e90e34656842", "Attributes": {}}}\n',
+        b'{"Type": "container", "Action": "pause", "Actor": {"ID": "e90e34656843", "Attributes": {}}}\n',
+        b'{"Type": "container", "Action": "die", "Actor": {"ID": "e90e34656843", "Attributes": {"exitCode": "137"}}}\n',
+        b'{"Type": "container", "Action": "destroy", "Actor": {"ID": "e90e34656844", "Attributes": {}}}\n',
+    ]
+    blocked = asyncio.get_event_loop().create_future()
+
+    async def readline():
+        if lines:
+            return lines.pop(0)
+        await blocked
+
+    response = MagicMock()
+    response.content.readline = readline
+    vm._container_states["e90e34656844"] = "exited"
+    with asyncio_patch("gns3server.compute.docker.Docker.http_query", return_value=response) as mock:
+        vm.watch_events()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert mock.call_args[0] == ("GET", "events")
+    assert vm.events_received == 4
+    assert vm.container_state("e90e34656842") == "running"
+    assert vm.container_state("e90e34656843") == "exited"
+    assert vm.container_state("e90e34656844") is None
+
+    await vm.unload()
+    assert vm.container_state("e90e34656842") is None
+
+
+async def test_cache_container_state(vm):
+
+    vm.cache_container_state("e90e34656842", "running", 0)
+    assert vm.container_state("e90e34656842") is None  # not subscribed to the events
+
+    vm._events_connected = True
+    vm.cache_container_state("e90e34656842", "running", 0)
+    assert vm.container_state("e90e34656842") == "running"
+
+    # an event has been received during the inspection
+    vm._container_event({"Type": "container", "Action": "die", "Actor": {"ID": "e90e34656843"}})
+    vm.cache_container_state("e90e34656843", "running", 0)
+    assert vm.container_state("e90e34656843") == "exited"
+
+
+async def test_query_invalidates_container_state(vm):
+
+    response = MagicMock()
+    response.status = 204
+    vm._events_connected = True
+    vm._container_states["e90e34656842"] = "running"
+    vm._session.request = AsyncioMagicMock(return_value=response)
+    await vm.http_query("POST", "containers/e90e34656842/stop", params={"t": 5})
+    assert vm.container_state("e90e34656842") is None
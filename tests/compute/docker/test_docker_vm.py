@@ -23,7 +23,7 @@ import sys
 import os
 from tests.utils import asyncio_patch, AsyncioMagicMock
 
-from gns3server.ubridge.ubridge_error import UbridgeNamespaceError
+from gns3server.ubridge.ubridge_error import UbridgeError, UbridgeNamespaceError
 from gns3server.compute.docker.docker_vm import DockerVM
 from gns3server.compute.docker.docker_error import DockerError, DockerHttp404Error, DockerHttp304Error
 from gns3server.compute.docker import Docker
@@ -38,6 +38,7 @@ async def manager(loop, port_manager):
 
     m = Docker.instance()
     m.port_manager = port_manager
+    m.watch_events = MagicMock()
     return m
 
 
@@ -71,7 +72,8 @@ def test_json(vm, compute_project):
         'environment': vm.environment,
         'node_directory': vm.working_dir,
         'status': 'stopped',
-        'usage': ''
+        'usage': '',
+        'start_timings': None
     }
 
 
@@ -820,6 +822,80 @@ async def test_get_container_state(vm):
         assert await vm._get_container_state() == "exited"
 
 
+async def test_get_container_state_from_events(vm, manager):
+
+    manager._events_connected = True
+    response = {"State": {"Paused": False, "Running": True}}
+    with asyncio_patch("gns3server.compute.docker.Docker.query", return_value=response) as mock:
+        assert await vm._get_container_state() == "running"
+        assert await vm._get_container_state() == "running"
+        assert mock.call_count == 1
+
+    manager._container_event({"Type": "container", "Action": "pause", "Actor": {"ID": vm.container_id}})
+    with asyncio_patch("gns3server.compute.docker.Docker.query") as mock:
+        assert await vm._get_container_state() == "paused"
+        assert not mock.called
+
+
+async def test_container_event_die(vm, manager):
+
+    manager._nodes[vm.id] = vm
+    vm._node_status = "started"
+    with asyncio_patch("gns3server.compute.docker.DockerVM.stop") as mock:
+        manager._container_event({"Type": "container", "Action": "die", "Actor": {"ID": vm.container_id, "Attributes": {"exitCode": "1"}}})
+        await asyncio.sleep(0)
+        assert mock.called
+    assert vm.status == "stopped"
+
+
+async def test_container_event_die_when_stopping(vm, manager):
+
+    manager._nodes[vm.id] = vm
+    vm._node_status = "started"
+    vm._stop_task = MagicMock()
+    with asyncio_patch("gns3server.compute.docker.DockerVM.stop") as mock:
+        manager._container_event({"Type": "container", "Action": "die", "Actor": {"ID": vm.container_id, "Attributes": {}}})
+        await asyncio.sleep(0)
+        assert not mock.called
+    assert vm.status == "started"
+
+
+async def test_container_event_die_after_restart(vm, manager):
+
+    manager._nodes[vm.id] = vm
+    vm._node_status = "started"
+    with asyncio_patch("gns3server.compute.docker.Docker.query"):
+        await vm.restart()
+    # the events of the restart are received after the restart query has returned
+    with asyncio_patch("gns3server.compute.docker.DockerVM.stop") as mock:
+        manager._container_event({"Type": "container", "Action": "die", "Actor": {"ID": vm.container_id, "Attributes": {}}})
+        manager._container_event({"Type": "container", "Action": "start", "Actor": {"ID": vm.container_id, "Attributes": {}}})
+        await asyncio.sleep(0)
+        assert not mock.called
+        assert vm.status == "started"
+        # a later exit is a crash
+        manager._container_event({"Type": "container", "Action": "die", "Actor": {"ID": vm.container_id, "Attributes": {}}})
+        await asyncio.sleep(0)
+        assert mock.called
+    assert vm.status == "stopped"
+
+
+async def test_restart_error(vm):
+
+    with asyncio_patch("gns3server.compute.docker.Docker.query", side_effect=DockerError("error")):
+        with pytest.raises(DockerError):
+            await vm.restart()
+    assert vm._restarts_in_flight == 0
+
+
+async def test_container_event_oom(vm):
+
+    with patch("gns3server.compute.project.Project.emit") as mock:
+        vm.container_event("oom", {})
+        assert mock.call_args_list[0][0][0] == "log.warning"
+        mock.assert_called_with("node.updated", vm)
+
+
 async def test_is_running(vm):
 
     response = {
@@ -959,6 +1035,29 @@ async def test_stop(vm):
     assert vm._fix_permissions.called
 
 
+async def test_stop_concurrent(vm):
+
+    stopped = asyncio.Event()
+
+    async def clean_servers():
+        await stopped.wait()
+
+    vm._clean_servers = clean_servers
+    vm._stop_ubridge = AsyncioMagicMock()
+    vm._fix_permissions = AsyncioMagicMock()
+    with asyncio_patch("gns3server.compute.docker.DockerVM._get_container_state", return_value="running"):
+        with asyncio_patch("gns3server.compute.docker.Docker.query") as mock_query:
+            # the console reader and the die event both stop the node
+            stops = asyncio.gather(vm.stop(), vm.stop())
+            await asyncio.sleep(0)
+            stopped.set()
+            await stops
+            assert mock_query.call_count == 1
+    assert vm._stop_ubridge.call_count == 1
+    assert vm.status == "stopped"
+    assert vm._stop_task is None
+
+
 async def test_stop_paused_container(vm):
 
     with asyncio_patch("gns3server.compute.docker.DockerVM._get_container_state", return_value="paused"):
@@ -1154,15 +1253,26 @@ async def test_add_ubridge_connection(vm):
         call.send('bridge create bridge0'),
         call.send("bridge add_nio_tap bridge0 tap-gns3-e0"),
         call.send('docker move_to_ns tap-gns3-e0 42 eth0'),
-        call.send('bridge add_nio_udp bridge0 4242 127.0.0.1 4343'),
-        call.send('bridge start_capture bridge0 "/tmp/capture.pcap"'),
-        call.send('bridge start bridge0')
+        call.send_batch(['bridge add_nio_udp bridge0 4242 127.0.0.1 4343',
+                         'bridge start_capture bridge0 "/tmp/capture.pcap"',
+                         'bridge start bridge0'])
     ]
     assert 'bridge0' in vm._bridges
     # We need to check any_order ortherwise mock is confused by asyncio
     vm._ubridge_hypervisor.assert_has_calls(calls, any_order=True)
 
 
+async def test_add_ubridge_connection_error(vm):
+
+    nio = vm.manager.create_nio({"type": "nio_udp", "lport": 4242, "rport": 4343, "rhost": "127.0.0.1"})
+    vm._ubridge_send_batch = AsyncioMagicMock(side_effect=UbridgeError("unable to add NIO"))
+    vm._ubridge_send = AsyncioMagicMock()
+    with pytest.raises(UbridgeError):
+        await vm._connect_nio(0, nio)
+    vm._ubridge_send.assert_has_calls([call("bridge stop bridge0"),
+                                       call("bridge remove_nio_udp bridge0 4242 127.0.0.1 4343")])
+
+
 async def test_add_ubridge_connection_none_nio(vm):
 
     nio = None
@@ -17,14 +17,17 @@
 
 
 import pytest
+import asyncio
 import tempfile
 import sys
 import uuid
 import os
 
-from gns3server.compute.dynamips import Dynamips
+from gns3server.compute.dynamips import Dynamips, CONSOLE_READY_RE
 from gns3server.compute.dynamips.dynamips_error import DynamipsError
-from unittest.mock import patch
+from gns3server.compute.dynamips.nodes.c7200 import C7200
+from gns3server.compute.dynamips.nodes.c3745 import C3745
+from unittest.mock import patch, MagicMock
 from tests.utils import asyncio_patch, AsyncioMagicMock
 
 
@@ -126,3 +129,112 @@ async def test_duplicate_node(manager, compute_project):
         with open(destination_node.startup_config_path) as f:
             content = f.read()
             assert content == '!\nhostname R2\necho TEST'
+
+
+async def test_get_router_hypervisor(manager, compute_project, config):
+
+    config.set("Dynamips", "routers_per_hypervisor", "2")
+    config.set("Dynamips", "hypervisor_memory_budget", "600")
+
+    async def new_hypervisor(working_dir=None):
+        hypervisor = MagicMock()
+        hypervisor.devices = []
+        hypervisor.is_running.return_value = True
+        return hypervisor
+
+    with patch("gns3server.compute.dynamips.Dynamips.start_new_hypervisor", side_effect=new_hypervisor):
+        r1 = C7200("R1", str(uuid.uuid4()), compute_project, manager, None)
+        r2 = C7200("R2", str(uuid.uuid4()), compute_project, manager, None)
+        r3 = C7200("R3", str(uuid.uuid4()), compute_project, manager, None)
+        r4 = C3745("R4", str(uuid.uuid4()), compute_project, manager, None)
+        r6 = C7200("R6", str(uuid.uuid4()), compute_project, manager, None)
+        for router in (r1, r2, r3, r6):
+            router._image = "/images/c7200-adventerprisek9-mz.124-24.T5.image"
+        h1 = await manager.get_router_hypervisor(r1)
+        assert await manager.get_router_hypervisor(r2) is h1
+        # maximum number of routers reached
+        h3 = await manager.get_router_hypervisor(r3)
+        assert h3 is not h1
+        # different platform
+        assert await manager.get_router_hypervisor(r4) not in (h1, h3)
+        # memory budget: 512MB + 256MB > 600MB
+        r3._ram = 512
+        r5 = C7200("R5", str(uuid.uuid4()), compute_project, manager, None)
+        r5._image = r3.image
+        assert await manager.get_router_hypervisor(r5) is not h3
+        # different IOS image, no ghost file to share
+        r3._ram = 256
+        r7 = C7200("R7", str(uuid.uuid4()), compute_project, manager, None)
+        r7._image = "/images/c7200-advipservicesk9-mz.152-4.S5.image"
+        assert await manager.get_router_hypervisor(r7) is not h3
+        assert await manager.get_router_hypervisor(r6) is h3
+    assert h1.devices == [r1, r2]
+
+
+async def test_get_router_hypervisor_dedicated(manager, compute_project, config):
+
+    with asyncio_patch("gns3server.compute.dynamips.Dynamips.start_new_hypervisor") as mock:
+        router = C7200("R1", str(uuid.uuid4()), compute_project, manager, None)
+        await manager.get_router_hypervisor(router)
+        assert mock.called
+        await manager.get_router_hypervisor(router)
+        assert mock.call_count == 2
+
+
+async def test_wait_for_console_ready(manager):
+
+    async def console(reader, writer):
+        writer.write(b"\xff\xfb\x01Self decompressing the image : ####\r\n")
+        await writer.drain()
+        await asyncio.sleep(0.1)
+        writer.write(b"\r\nPress RETURN to get started!\r\n")
+        await writer.drain()
+
+    server = await asyncio.start_server(console, "127.0.0.1", 0)
+    vm = MagicMock()
+    vm.console_type = "telnet"
+    vm.console = server.sockets[0].getsockname()[1]
+    manager.port_manager.console_host = "127.0.0.1"
+    # returns as soon as the router is ready
+    await asyncio.wait_for(manager._wait_for_console_ready(vm, timeout=5), 2)
+    server.close()
+
+
+async def test_wait_for_console_ready_setup_dialog(manager):
+
+    async def console(reader, writer):
+        writer.write(b"         --- System Configuration Dialog ---\r\n\r\n")
+        writer.write(b"Would you like to enter the initial configuration dialog? [yes/no]: ")
+        await writer.drain()
+
+    server = await asyncio.start_server(console, "127.0.0.1", 0)
+    vm = MagicMock()
+    vm.console_type = "telnet"
+    vm.console = server.sockets[0].getsockname()[1]
+    manager.port_manager.console_host = "127.0.0.1"
+    # a router without startup-config stops at the setup dialog
+    await asyncio.wait_for(manager._wait_for_console_ready(vm, timeout=5), 2)
+    server.close()
+
+
+def test_console_ready_re():
+
+    assert CONSOLE_READY_RE.search(b"\r\nWould you like to enter the initial configuration dialog? [yes/no]: ")
+    assert CONSOLE_READY_RE.search(b"\r\n% Please answer 'yes' or 'no'.\r\n")
+    assert CONSOLE_READY_RE.search(b"\r\nR1#")
+    assert not CONSOLE_READY_RE.search(b"Self decompressing the image : ####\r\n")
+
+
+async def test_wait_for_console_ready_timeout(manager):
+
+    async def console(reader, writer):
+        writer.write(b"ROM: System Bootstrap\r\n")
+        await writer.drain()
+
+    server = await asyncio.start_server(console, "127.0.0.1", 0)
+    vm = MagicMock()
+    vm.console_type = "telnet"
+    vm.console = server.sockets[0].getsockname()[1]
+    manager.port_manager.console_host = "127.0.0.1"
+    await asyncio.wait_for(manager._wait_for_console_ready(vm, timeout=0.2), 2)
+    server.close()
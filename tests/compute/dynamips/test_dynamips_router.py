@@ -17,13 +17,18 @@
 
 import os
 import uuid
+import base64
 import pytest
 import asyncio
 
+from unittest.mock import MagicMock
+
 from gns3server.compute.dynamips.nodes.router import Router
+from gns3server.compute.dynamips.hypervisor import Hypervisor
 from gns3server.compute.dynamips.dynamips_error import DynamipsError
 from gns3server.compute.dynamips import Dynamips
 from gns3server.config import Config
+from tests.utils import asyncio_patch, AsyncioMagicMock
 
 
 @pytest.fixture
@@ -40,6 +45,17 @@ def router(compute_project, manager):
     return Router("test", "00010203-0405-0607-0809-0a0b0c0d0e0f", compute_project, manager)
 
 
+async def test_hypervisor_stop_removes_cgroup(tmpdir):
+
+    hypervisor = Hypervisor("/bin/dynamips", str(tmpdir), "127.0.0.1", 7200, "127.0.0.1")
+    cgroup = MagicMock()
+    hypervisor.cgroup = cgroup
+    # the cgroup is removed even if no router has been started on the hypervisor
+    await hypervisor.stop()
+    assert cgroup.remove.called
+    assert hypervisor.cgroup is None
+
+
 def test_router(compute_project, manager):
 
     router = Router("test", "00010203-0405-0607-0809-0a0b0c0d0e0f", compute_project, manager)
@@ -47,6 +63,22 @@ def test_router(compute_project, manager):
     assert router.id == "00010203-0405-0607-0809-0a0b0c0d0e0f"
 
 
+async def test_router_image_set_on_create(compute_project, manager, images_dir):
+
+    image = os.path.join(images_dir, "IOS", "c7200.image")
+    os.makedirs(os.path.dirname(image))
+    open(image, "w+").close()
+    router = Router("test", "00010203-0405-0607-0809-0a0b0c0d0e0f", compute_project, manager, image="c7200.image")
+    # the image is known when the router is placed on a hypervisor
+    assert router.image == image
+    router._hypervisor = MagicMock()
+    router._hypervisor.devices = []
+    router._hypervisor.send = AsyncioMagicMock(return_value=["ca01.0000.0000"])
+    with asyncio_patch("gns3server.compute.dynamips.nodes.router.Router._send_in_working_dir"):
+        await router.create()
+    router._hypervisor.send.assert_any_call('vm set_ios "test" "{}"'.format(image))
+
+
 def test_convert_project_before_2_0_0_b3(compute_project, manager):
 
     node_id = str(uuid.uuid4())
@@ -75,3 +107,15 @@ async def test_router_invalid_dynamips_path(compute_project, manager):
         await router.create()
         assert router.name == "test"
         assert router.id == "00010203-0405-0607-0809-0a0b0c0d0e0e"
+
+
+async def test_save_configs_unchanged(router):
+
+    startup_config = base64.b64encode(b"hostname R1\r\n").decode()
+    with asyncio_patch("gns3server.compute.dynamips.nodes.router.Router.extract_config", return_value=(startup_config, None)):
+        await router.save_configs()
+        with open(router.startup_config_path) as f:
+            assert f.read() == "!\nhostname R1\n"
+        os.utime(router.startup_config_path, (1000, 1000))
+        await router.save_configs()
+    assert os.path.getmtime(router.startup_config_path) == 1000
@@ -15,7 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import uuid
+
+from unittest.mock import MagicMock
 from tests.utils import AsyncioMagicMock
+from gns3server.compute.dynamips.nodes.ethernet_switch import EthernetSwitch
 from gns3server.compute.nios.nio_udp import NIOUDP
 
 
@@ -35,3 +39,20 @@ def test_mac_command():
     #    "Ethernet0  00:50:79:66:68:01  1\n" \
     #    "Ethernet1  00:50:79:66:68:02  1\n"
     #node._hypervisor.send.assert_called_with("ethsw show_mac_addr_table Test")
+
+
+async def test_add_nio(loop, compute_project):
+
+    manager = MagicMock()
+    manager.port_manager.get_free_tcp_port.return_value = 5000
+    hypervisor = MagicMock()
+    hypervisor.send_batch = AsyncioMagicMock()
+    ports = [{"port_number": 0, "name": "Ethernet0", "type": "dot1q", "vlan": 1}]
+    switch = EthernetSwitch("SW1", str(uuid.uuid4()), compute_project, manager, ports=ports, hypervisor=hypervisor)
+    nio = MagicMock()
+    nio.__str__.return_value = "udp-test"
+    await switch.add_nio(nio, 0)
+    # the port is added and configured in one round trip
+    hypervisor.send_batch.assert_called_with(['ethsw add_nio "SW1" udp-test',
+                                              'ethsw set_dot1q_port "SW1" udp-test 1'])
+    assert switch._mappings[0] == ("dot1q", 1)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from gns3server.compute.dynamips.ghost_cache import GhostCache
+
+
+def create_ghost(cache, filename, size, mtime):
+
+    path = cache.file_path(filename)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_filename():
+
+    assert GhostCache.filename("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) == "c7200-e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4-512.ghost"
+
+
+def test_add_and_get(tmpdir):
+
+    cache = GhostCache(str(tmpdir / "ghosts"))
+    assert cache.get("c7200-abc-512.ghost") is None
+    with open(cache.new_file_path("c7200-abc-512.ghost"), "wb") as f:
+        f.write(b"\0" * 10)
+    path = cache.add("c7200-abc-512.ghost")
+    assert not os.path.exists(path + ".tmp")
+    os.utime(path, (1000, 1000))
+    assert cache.get("c7200-abc-512.ghost") == path
+    # marked as recently used
+    assert os.path.getmtime(path) > 1000
+
+
+def test_add_evicts(tmpdir):
+
+    cache = GhostCache(str(tmpdir), budget=15)
+    create_ghost(cache, "c7200-a-512.ghost", 10, 1000)
+    with open(cache.new_file_path("c7200-b-512.ghost"), "wb") as f:
+        f.write(b"\0" * 10)
+    cache.add("c7200-b-512.ghost")
+    assert not os.path.exists(cache.file_path("c7200-a-512.ghost"))
+    assert os.path.exists(cache.file_path("c7200-b-512.ghost"))
+
+
+def test_evict_least_recently_used(tmpdir):
+
+    cache = GhostCache(str(tmpdir), budget=25)
+    create_ghost(cache, "c7200-a-512.ghost", 10, 1000)
+    create_ghost(cache, "c7200-b-512.ghost", 10, 3000)
+    create_ghost(cache, "c7200-c-512.ghost", 10, 2000)
+    assert cache.evict() == ["c7200-a-512.ghost"]
+    assert cache.size() == 20
+
+
+def test_evict_skips_used_files(tmpdir):
+
+    cache = GhostCache(str(tmpdir), budget=15)
+    create_ghost(cache, "c7200-a-512.ghost", 10, 1000)
+    create_ghost(cache, "c7200-b-512.ghost", 10, 2000)
+    cache.acquire("c7200-a-512.ghost", "router1")
+    cache.acquire("c7200-a-512.ghost", "router2")
+    assert cache.references("c7200-a-512.ghost") == 2
+    assert cache.evict() == ["c7200-b-512.ghost"]
+
+    cache.release("router1")
+    create_ghost(cache, "c7200-c-512.ghost", 10, 3000)
+    assert os.path.exists(cache.file_path("c7200-a-512.ghost"))
+    cache.release("router2")
+    assert cache.evict() == ["c7200-a-512.ghost"]
+
+
+def test_no_budget(tmpdir):
+
+    cache = GhostCache(str(tmpdir))
+    create_ghost(cache, "c7200-a-512.ghost", 10, 1000)
+    assert cache.evict() == []
+
+
+async def test_lock_per_file(loop, tmpdir):
+
+    cache = GhostCache(str(tmpdir))
+    assert cache.lock("c7200-a-512.ghost") is cache.lock("c7200-a-512.ghost")
+    async with cache.lock("c7200-a-512.ghost"):
+        assert not cache.lock("c7200-b-512.ghost").locked()
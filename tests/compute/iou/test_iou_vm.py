@@ -27,6 +27,7 @@ import shutil
 from tests.utils import asyncio_patch, AsyncioMagicMock
 
 from unittest.mock import patch, MagicMock
+from gns3server.compute.binary_cache import BinaryCache
 
 pytestmark = pytest.mark.skipif(sys.platform.startswith("win"), reason="Not supported on Windows")
 
@@ -126,6 +127,7 @@ async def test_start_with_iourc(vm, tmpdir):
     vm._start_ioucon = AsyncioMagicMock(return_value=True)
     vm._start_ubridge = AsyncioMagicMock(return_value=True)
     vm._ubridge_send = AsyncioMagicMock()
+    vm._set_resource_limits = MagicMock(return_value=False)
 
     with patch("gns3server.config.Config.get_section_config", return_value={"iourc_path": fake_file}):
         with asyncio_patch("asyncio.create_subprocess_exec", return_value=mock_process) as exec_mock:
@@ -321,6 +323,8 @@ async def test_library_check(vm):
     with asyncio_patch("gns3server.utils.asyncio.subprocess_check_output", return_value=""):
         await vm._library_check()
 
+    # the results are cached until the IOU image is replaced
+    BinaryCache.reset()
     with asyncio_patch("gns3server.utils.asyncio.subprocess_check_output", return_value="libssl => not found"):
         with pytest.raises(IOUError):
             await vm._library_check()
@@ -333,6 +337,7 @@ async def test_enable_l1_keepalives(vm):
         await vm._enable_l1_keepalives(command)
         assert command == ["test", "-l"]
 
+    BinaryCache.reset()
     with asyncio_patch("gns3server.utils.asyncio.subprocess_check_output", return_value="***************************************************************\n\n-u <n>		UDP port base for distributed networks\n"):
 
         command = ["test"]
@@ -341,6 +346,18 @@ async def test_enable_l1_keepalives(vm):
             assert command == ["test"]
 
 
+async def test_help_probes_with_and_without_iourc(vm):
+
+    with asyncio_patch("gns3server.utils.asyncio.subprocess_check_output", return_value="-n <n>		Size of nvram in Kb (default 64KB)\n") as mock:
+        await vm.update_default_iou_values()
+        command = ["test"]
+        with pytest.raises(IOUError):
+            await vm._enable_l1_keepalives(command)
+        # the output of the probe without IOURC is not reused
+        assert mock.call_count == 2
+        assert "env" in mock.call_args[1]
+
+
 async def test_start_capture(vm, tmpdir, manager, free_console_port):
 
     output_file = str(tmpdir / "test.pcap")
@@ -450,3 +467,11 @@ def test_application_id(compute_project, manager):
 
     vm.application_id = 3
     assert vm.application_id == 3
+
+
+async def test_library_check_cached(vm):
+
+    with asyncio_patch("gns3server.utils.asyncio.subprocess_check_output", return_value="") as mock:
+        await vm._library_check()
+        await vm._library_check()
+    assert mock.call_count == 1
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import pytest
+
+from gns3server.compute.qemu.utils.ksm import KSM
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="KSM is only supported on Linux")
+
+
+@pytest.fixture
+def ksm(tmpdir):
+
+    path = str(tmpdir / "ksm")
+    os.makedirs(path)
+    for counter, value in (("run", 0), ("pages_shared", 10), ("pages_sharing", 30), ("pages_unshared", 5), ("pages_volatile", 1), ("full_scans", 2)):
+        with open(os.path.join(path, counter), "w+") as f:
+            f.write("{}\n".format(value))
+    os.makedirs(str(tmpdir / "proc" / "42"))
+    with open(str(tmpdir / "proc" / "42" / "ksm_merging_pages"), "w+") as f:
+        f.write("128\n")
+    return KSM(path, str(tmpdir / "proc"))
+
+
+def test_available(ksm, tmpdir):
+
+    assert ksm.available()
+    assert not KSM(str(tmpdir / "missing")).available()
+
+
+def test_enable(ksm, tmpdir):
+
+    assert ksm.enable()
+    with open(str(tmpdir / "ksm" / "run")) as f:
+        assert f.read() == "1"
+    assert not KSM(str(tmpdir / "missing")).enable()
+
+
+def test_stats(ksm):
+
+    assert ksm.stats() == {"run": 0,
+                           "pages_shared": 10,
+                           "pages_sharing": 30,
+                           "pages_unshared": 5,
+                           "pages_volatile": 1,
+                           "full_scans": 2}
+
+
+def test_process_merged_pages(ksm):
+
+    assert ksm.process_merged_pages(42) == 128
+    assert ksm.process_merged_pages(43) is None
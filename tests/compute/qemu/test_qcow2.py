@@ -16,8 +16,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import asyncio
 import pytest
 import shutil
+import struct
 
 from gns3server.compute.qemu.utils.qcow2 import Qcow2, Qcow2Error
 
@@ -52,6 +54,78 @@ def test_valid_linked_file():
     assert qcow2.backing_file == "empty8G.qcow2"
 
 
+def test_header_fields():
+
+    qcow2 = Qcow2("tests/resources/empty8G.qcow2")
+    assert qcow2.cluster_size == 65536
+    assert qcow2.virtual_size == 8 * 1024 * 1024 * 1024
+    assert qcow2.header_length == 104
+    assert qcow2.dirty is False
+    assert qcow2.corrupt is False
+    assert qcow2.snapshots == []
+    assert not qcow2.has_snapshot("GNS3_SAVED_STATE")
+
+
+def test_dirty_and_corrupt_flags(tmpdir):
+
+    path = str(tmpdir / "dirty.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", path)
+    with open(path, "r+b") as f:
+        f.seek(72)
+        f.write(struct.pack(">Q", Qcow2.DIRTY_BIT | Qcow2.CORRUPT_BIT))
+    qcow2 = Qcow2(path)
+    assert qcow2.dirty is True
+    assert qcow2.corrupt is True
+
+
+def write_snapshot_table(path, names):
+    """
+    Appends a snapshot table to a qcow2 image and updates the header to point to it.
+    """
+
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        offset += -offset % 8
+        f.seek(offset)
+        for index, name in enumerate(names):
+            id_str = str(index + 1).encode()
+            name = name.encode()
+            extra_data = struct.pack(">QQ", 4242, 8 * 1024 * 1024 * 1024)
+            entry = struct.pack(">QIHHIIQII", 0, 0, len(id_str), len(name), 1600000000, 0, 42, 0, len(extra_data))
+            entry += extra_data + id_str + name
+            entry += b"\0" * (-len(entry) % 8)
+            f.write(entry)
+        f.seek(60)
+        f.write(struct.pack(">IQ", len(names), offset))
+
+
+def test_snapshots(tmpdir):
+
+    path = str(tmpdir / "linked.qcow2")
+    shutil.copy("tests/resources/linked.qcow2", path)
+    write_snapshot_table(path, ["test", "GNS3_SAVED_STATE"])
+    qcow2 = Qcow2(path)
+    assert qcow2.nb_snapshots == 2
+    assert qcow2.snapshots == [
+        {"id": "1", "name": "test", "vm-state-size": 4242, "date-sec": 1600000000, "date-nsec": 0, "vm-clock-nsec": 42},
+        {"id": "2", "name": "GNS3_SAVED_STATE", "vm-state-size": 4242, "date-sec": 1600000000, "date-nsec": 0, "vm-clock-nsec": 42}
+    ]
+    assert qcow2.has_snapshot("GNS3_SAVED_STATE")
+    assert qcow2.backing_file == "empty8G.qcow2"
+
+
+def test_invalid_snapshot_table(tmpdir):
+
+    path = str(tmpdir / "linked.qcow2")
+    shutil.copy("tests/resources/linked.qcow2", path)
+    with open(path, "r+b") as f:
+        f.seek(60)
+        f.write(struct.pack(">IQ", 1, os.path.getsize(path)))
+    with pytest.raises(Qcow2Error):
+        Qcow2(path).snapshots
+
+
 def test_invalid_file():
 
     with pytest.raises(Qcow2Error):
@@ -65,6 +139,46 @@ def test_invalid_empty_file(tmpdir):
         Qcow2(str(tmpdir / 'a'))
 
 
+def test_create_overlay(tmpdir):
+
+    shutil.copy("tests/resources/empty8G.qcow2", str(tmpdir / "empty8G.qcow2"))
+    base_image = str(tmpdir / "empty8G.qcow2")
+    overlay = Qcow2.create_overlay(str(tmpdir / "linked.qcow2"), base_image)
+    assert overlay.version == 3
+    assert overlay.backing_file == base_image
+    assert overlay.virtual_size == Qcow2(base_image).virtual_size
+    assert overlay.cluster_size == 65536
+    assert overlay.snapshots == []
+    assert overlay.dirty is False
+
+    # same layout and metadata as an overlay created by qemu-img
+    reference = Qcow2("tests/resources/linked.qcow2")
+    for field in ("l1_size", "l1_table_offset", "refcount_table_offset", "refcount_table_clusters", "refcount_order", "header_length"):
+        assert getattr(overlay, field) == getattr(reference, field)
+    with open(str(tmpdir / "linked.qcow2"), "rb") as f1, open("tests/resources/linked.qcow2", "rb") as f2:
+        f1.seek(overlay.refcount_table_offset)
+        f2.seek(reference.refcount_table_offset)
+        # refcount table and refcount block
+        assert f1.read(2 * 65536) == f2.read(2 * 65536)
+    assert not os.path.exists(str(tmpdir / "linked.qcow2.tmp"))
+
+
+def test_create_overlay_invalid_base_image(tmpdir):
+
+    with pytest.raises(Qcow2Error):
+        Qcow2.create_overlay(str(tmpdir / "linked.qcow2"), "tests/resources/nvram_iou")
+    assert not os.path.exists(str(tmpdir / "linked.qcow2"))
+
+
+@pytest.mark.skipif(qemu_img() is None, reason="qemu-img is not available")
+async def test_create_overlay_check(loop, tmpdir):
+
+    shutil.copy("tests/resources/empty8G.qcow2", str(tmpdir / "empty8G.qcow2"))
+    Qcow2.create_overlay(str(tmpdir / "linked.qcow2"), str(tmpdir / "empty8G.qcow2"))
+    process = await asyncio.create_subprocess_exec(qemu_img(), "check", str(tmpdir / "linked.qcow2"))
+    assert await process.wait() == 0
+
+
 @pytest.mark.skipif(qemu_img() is None, reason="qemu-img is not available")
 async def test_rebase(loop, tmpdir):
 
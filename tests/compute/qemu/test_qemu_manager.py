@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import json
 import stat
 import sys
 import pytest
@@ -214,3 +215,147 @@ async def test_get_kvm_archs_kvm_ok():
     with patch("os.path.exists", return_value=False):
         archs = await Qemu.get_kvm_archs()
         assert archs == []
+
+
+def _linked_clone(node_id, disk_images, running=False):
+
+    node = MagicMock()
+    node.id = node_id
+    node.linked_clone = True
+    node.disk_images = disk_images
+    node.is_running.return_value = running
+    return node
+
+
+async def test_warm_base_images(tmpdir):
+
+    base_image = str(tmpdir / "base.qcow2")
+    with open(base_image, "wb") as f:
+        f.write(b"\0" * 4096)
+    qemu = Qemu.instance()
+    node1 = _linked_clone("1", [base_image])
+    node2 = _linked_clone("2", [base_image])
+    qemu._nodes = {"1": node1, "2": node2}
+    with patch("gns3server.compute.qemu.Qemu._warm_image", return_value=True) as warm_mock:
+        await qemu.warm_base_images(node1)
+        assert warm_mock.call_count == 1
+        assert warm_mock.call_args[0] == (base_image, 4096)
+        # the base image is already warm
+        await qemu.warm_base_images(node2)
+        assert warm_mock.call_count == 1
+    assert qemu.warm_images() == [{"path": base_image, "size": 4096, "nodes": 2, "status": "warm"}]
+
+    # the image is forgotten once no node uses it anymore
+    qemu._nodes = {}
+    await qemu.warm_base_images(_linked_clone("3", []))
+    assert qemu.warm_images() == []
+
+
+async def test_warm_base_images_not_shared(tmpdir):
+
+    base_image = str(tmpdir / "base.qcow2")
+    open(base_image, "w+").close()
+    qemu = Qemu.instance()
+    node1 = _linked_clone("1", [base_image])
+    node2 = _linked_clone("2", [base_image], running=True)
+    qemu._nodes = {"1": node1, "2": node2}
+    with patch("gns3server.compute.qemu.Qemu._warm_image", return_value=True) as warm_mock:
+        await qemu.warm_base_images(node1)
+        assert not warm_mock.called
+    assert qemu.warm_images() == []
+
+
+async def test_warm_base_images_budget(tmpdir):
+
+    base_image = str(tmpdir / "base.qcow2")
+    with open(base_image, "wb") as f:
+        f.write(b"\0" * 4096)
+    qemu = Qemu.instance()
+    qemu.config.set("Qemu", "base_image_warming_budget", "0")
+    node1 = _linked_clone("1", [base_image])
+    node2 = _linked_clone("2", [base_image])
+    qemu._nodes = {"1": node1, "2": node2}
+    with patch("gns3server.compute.qemu.Qemu._warm_image", return_value=True) as warm_mock:
+        await qemu.warm_base_images(node1)
+        assert not warm_mock.called
+    assert qemu.warm_images()[0]["status"] == "skipped"
+
+
+async def test_warm_base_images_expiry(tmpdir):
+
+    base_image = str(tmpdir / "base.qcow2")
+    with open(base_image, "wb") as f:
+        f.write(b"\0" * 4096)
+    other_image = str(tmpdir / "other.qcow2")
+    with open(other_image, "wb") as f:
+        f.write(b"\0" * 4096)
+    qemu = Qemu.instance()
+    qemu.config.set("Qemu", "base_image_warming_budget", "1")
+    node1 = _linked_clone("1", [base_image])
+    node2 = _linked_clone("2", [base_image])
+    node3 = _linked_clone("3", [other_image])
+    node4 = _linked_clone("4", [other_image])
+    qemu._nodes = {"1": node1, "2": node2, "3": node3, "4": node4}
+    qemu._warm_images[base_image] = {"path": base_image, "size": 1024 * 1024, "nodes": 2, "status": "warm"}
+    qemu._warm_images_expiry[base_image] = 0
+    with patch("gns3server.compute.qemu.Qemu._warm_image", return_value=True) as warm_mock:
+        # the budget used by the expired image is given back
+        await qemu.warm_base_images(node3)
+        assert warm_mock.call_args[0] == (other_image, 4096)
+    assert [image["path"] for image in qemu.warm_images()] == [other_image]
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="posix_fadvise is not supported")
+def test_warm_image(tmpdir):
+
+    path = str(tmpdir / "base.qcow2")
+    with open(path, "wb") as f:
+        f.write(b"\0" * 4096)
+    assert Qemu._warm_image(path, 4096) is True
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="KSM is only supported on Linux")
+async def test_memory_merging_statistics():
+
+    qemu = Qemu.instance()
+    qemu._ksm = MagicMock()
+    qemu._ksm.stats.return_value = {"run": 1, "pages_sharing": 100}
+    qemu._ksm.process_merged_pages.side_effect = lambda pid: {1: 100, 2: 50}.get(pid)
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    nodes = {}
+    for node_id, pid, project_id, running in (("1", 1, "p1", True), ("2", 2, "p1", True), ("3", 3, "p2", True), ("4", 4, "p2", False)):
+        node = MagicMock()
+        node.is_running.return_value = running
+        node.process.pid = pid
+        node.project.id = project_id
+        node.ram = 1
+        nodes[node_id] = node
+    qemu._nodes = nodes
+    ram_pages = 1024 * 1024 // page_size
+    assert qemu.memory_merging_statistics() == {
+        "run": 1,
+        "pages_sharing": 100,
+        "projects": [{"project_id": "p1", "shared_pages": 150, "unshared_pages": 2 * ram_pages - 150}]
+    }
+
+    qemu._ksm.stats.return_value = None
+    assert qemu.memory_merging_statistics() is None
+
+
+async def test_golden_states(tmpdir):
+
+    qemu = Qemu.instance()
+    assert qemu.golden_states() == []
+    checksum = "0" * 32
+    directory = qemu.golden_state_directory(checksum)
+    os.makedirs(directory)
+    with open(os.path.join(directory, "golden_state.json"), "w+") as f:
+        json.dump({"checksum": checksum, "name": "test"}, f)
+    assert qemu.golden_states() == [{"checksum": checksum, "name": "test"}]
+
+    await qemu.delete_golden_state(checksum)
+    assert not os.path.exists(directory)
+    with pytest.raises(QemuError):
+        await qemu.delete_golden_state(checksum)
+    with pytest.raises(QemuError):
+        qemu.golden_state_directory("../test")
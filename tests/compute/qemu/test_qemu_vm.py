@@ -20,7 +20,10 @@ import asyncio
 import os
 import sys
 import stat
+import shutil
+import struct
 from tests.utils import asyncio_patch, AsyncioMagicMock
+from tests.compute.qemu.test_qcow2 import write_snapshot_table
 
 
 from unittest import mock
@@ -28,8 +31,11 @@ from unittest.mock import patch, MagicMock
 
 from gns3server.compute.qemu.qemu_vm import QemuVM
 from gns3server.compute.qemu.qemu_error import QemuError
+from gns3server.compute.qemu.utils.qcow2 import Qcow2
+from gns3server.compute.cgroups import Cgroups
 from gns3server.compute.qemu import Qemu
 from gns3server.utils import force_unix_path, macaddress_to_int, int_to_macaddress
+from gns3server.utils.images import md5sum
 from gns3server.compute.notification_manager import NotificationManager
 
 
@@ -75,6 +81,7 @@ async def vm(compute_project, manager, fake_qemu_binary, fake_qemu_img_binary):
     vm._start_ubridge = AsyncioMagicMock()
     vm._ubridge_hypervisor = MagicMock()
     vm._ubridge_hypervisor.is_running.return_value = True
+    vm._connect_qmp = AsyncioMagicMock()
     vm.manager.config.set("Qemu", "enable_hardware_acceleration", False)
     return vm
 
@@ -362,6 +369,91 @@ async def test_disk_options(vm, tmpdir, fake_qemu_img_binary):
     assert options == ['-drive', 'file=' + os.path.join(vm.working_dir, "hda_disk.qcow2") + ',if=ide,index=0,media=disk,id=drive0']
 
 
+async def test_disk_options_qcow2_base_image(vm, tmpdir, fake_qemu_img_binary):
+
+    vm._hda_disk_image = str(tmpdir / "test.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=MagicMock()) as process:
+        options = await vm._disk_options()
+        # only qemu-img check is called, the linked clone is created without qemu-img
+        assert process.call_count == 1
+        args, kwargs = process.call_args
+        assert args == (fake_qemu_img_binary, "check", vm._hda_disk_image)
+
+    qcow2 = Qcow2(os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    assert qcow2.backing_file == vm._hda_disk_image
+    assert options == ['-drive', 'file=' + os.path.join(vm.working_dir, "hda_disk.qcow2") + ',if=ide,index=0,media=disk,id=drive0']
+    shutil.rmtree(vm.working_dir)
+
+
+async def test_disk_check_skipped_when_unchanged(vm, tmpdir, fake_qemu_img_binary):
+
+    vm.manager.config.set("Qemu", "disk_check", "on_unclean_shutdown")
+    vm._hda_disk_image = str(tmpdir / "test.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+
+    process_mock = MagicMock()
+    process_mock.wait = AsyncioMagicMock(return_value=0)
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=process_mock) as process:
+        await vm._check_disk_image(fake_qemu_img_binary, "hda", vm._hda_disk_image)
+        assert process.call_count == 1
+        # the image is unchanged, no need to check it again
+        await vm._check_disk_image(fake_qemu_img_binary, "hda", vm._hda_disk_image)
+        assert process.call_count == 1
+        # the image has changed
+        with open(vm._hda_disk_image, "ab") as f:
+            f.write(b"\0" * 512)
+        await vm._check_disk_image(fake_qemu_img_binary, "hda", vm._hda_disk_image)
+        assert process.call_count == 2
+    shutil.rmtree(vm.working_dir)
+
+
+async def test_disk_check_dirty_image(vm, tmpdir, fake_qemu_img_binary):
+
+    vm.manager.config.set("Qemu", "disk_check", "on_unclean_shutdown")
+    vm._hda_disk_image = str(tmpdir / "test.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+    vm._record_disk_check(vm._hda_disk_image)
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is False
+    with open(vm._hda_disk_image, "r+b") as f:
+        f.seek(72)
+        f.write(struct.pack(">Q", 1))  # dirty bit
+    vm._record_disk_check(vm._hda_disk_image)
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is True
+    shutil.rmtree(vm.working_dir)
+
+
+async def test_disk_check_policy(vm, tmpdir, fake_qemu_img_binary):
+
+    vm._hda_disk_image = str(tmpdir / "test.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+    vm._record_disk_check(vm._hda_disk_image)
+    vm.manager.config.set("Qemu", "disk_check", "always")
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is True
+    vm.manager.config.set("Qemu", "disk_check", "never")
+    os.remove(os.path.join(vm.working_dir, "disk_checks.json"))
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is False
+    vm.manager.config.set("Qemu", "disk_check", "invalid")
+    assert vm._disk_check_policy() == "on_unclean_shutdown"
+    shutil.rmtree(vm.working_dir)
+
+
+async def test_disk_check_markers_updated_after_clean_shutdown(vm, tmpdir):
+
+    vm._hda_disk_image = str(tmpdir / "test.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+    vm._record_disk_check(vm._hda_disk_image)
+    with open(vm._hda_disk_image, "ab") as f:
+        f.write(b"\0" * 512)
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is True
+    vm._process = MagicMock()
+    vm._process.returncode = 0
+    await vm.stop()
+    assert vm._disk_image_needs_check(vm._hda_disk_image) is False
+    shutil.rmtree(vm.working_dir)
+
+
 async def test_cdrom_option(vm, tmpdir, fake_qemu_img_binary):
 
     vm.manager.get_qemu_version = AsyncioMagicMock(return_value="3.1.0")
@@ -421,6 +513,255 @@ async def test_disk_options_multiple_disk(vm, tmpdir, fake_qemu_img_binary):
     ]
 
 
+async def test_disk_options_concurrent_preparation(vm, tmpdir):
+
+    vm.linked_clone = False
+    running = []
+    max_running = 0
+
+    async def prepare_disk(qemu_img_path, disk_name, disk_image):
+        nonlocal max_running
+        running.append(disk_name)
+        max_running = max(max_running, len(running))
+        # the first disks take the longest to prepare
+        await asyncio.sleep(0.01 * (4 - len(running)))
+        running.remove(disk_name)
+        return disk_image
+
+    for drive in "abcd":
+        disk_image = str(tmpdir / "hd{}.qcow2".format(drive))
+        open(disk_image, "w+").close()
+        setattr(vm, "_hd{}_disk_image".format(drive), disk_image)
+    vm._get_qemu_img = MagicMock(return_value="qemu-img")
+    vm._prepare_disk = prepare_disk
+    options = await vm._disk_options()
+    assert max_running == 4
+    assert options == [
+        '-drive', 'file=' + str(tmpdir / "hda.qcow2") + ',if=ide,index=0,media=disk,id=drive0',
+        '-drive', 'file=' + str(tmpdir / "hdb.qcow2") + ',if=ide,index=1,media=disk,id=drive1',
+        '-drive', 'file=' + str(tmpdir / "hdc.qcow2") + ',if=ide,index=2,media=disk,id=drive2',
+        '-drive', 'file=' + str(tmpdir / "hdd.qcow2") + ',if=ide,index=3,media=disk,id=drive3'
+    ]
+
+
+async def test_disk_options_preparation_error(vm, tmpdir):
+
+    prepared = []
+
+    async def prepare_disk(qemu_img_path, disk_name, disk_image):
+        if disk_name == "hda":
+            raise QemuError("hda is broken")
+        await asyncio.sleep(0.01)
+        prepared.append(disk_name)
+        return disk_image
+
+    for drive in "ab":
+        disk_image = str(tmpdir / "hd{}.qcow2".format(drive))
+        open(disk_image, "w+").close()
+        setattr(vm, "_hd{}_disk_image".format(drive), disk_image)
+    vm._get_qemu_img = MagicMock(return_value="qemu-img")
+    vm._prepare_disk = prepare_disk
+    with pytest.raises(QemuError, match="hda is broken"):
+        await vm._disk_options()
+    # the other disks are not left half prepared
+    assert prepared == ["hdb"]
+
+
+async def _save_golden_state(vm, tmpdir):
+
+    vm._hda_disk_image = str(tmpdir / "base.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+    os.makedirs(vm.working_dir, exist_ok=True)
+    shutil.copy("tests/resources/linked.qcow2", os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    vm.manager.get_qemu_version = AsyncioMagicMock(return_value="3.1.0")
+    vm._qmp = MagicMock()
+    vm._qmp.execute = AsyncioMagicMock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(return_value="")
+    vm._vm_status = "running"
+    with patch("gns3server.compute.qemu.qemu_vm.QemuVM.is_running", return_value=True):
+        golden_state = await vm.save_golden_state(["hostname {name}"])
+    vm._qmp = None
+    return golden_state
+
+
+async def test_save_golden_state(vm, tmpdir):
+
+    golden_state = await _save_golden_state(vm, tmpdir)
+    assert golden_state["checksum"] == md5sum(vm._hda_disk_image)
+    assert golden_state["disks"] == {"hda": {"base_image": vm._hda_disk_image, "md5sum": golden_state["checksum"]}}
+    assert golden_state["machine"]["ram"] == 256
+    assert golden_state["reset_commands"] == ["hostname {name}"]
+
+    directory = vm.manager.golden_state_directory(golden_state["checksum"])
+    assert os.path.isfile(os.path.join(directory, "hda_disk.qcow2"))
+    assert vm.manager.load_golden_state(golden_state["checksum"]) == golden_state
+
+
+async def test_save_golden_state_qmp_commands(vm, tmpdir):
+
+    vm._hda_disk_image = str(tmpdir / "base.qcow2")
+    shutil.copy("tests/resources/empty8G.qcow2", vm._hda_disk_image)
+    os.makedirs(vm.working_dir, exist_ok=True)
+    shutil.copy("tests/resources/linked.qcow2", os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    vm.manager.get_qemu_version = AsyncioMagicMock(return_value="3.1.0")
+    vm._qmp = MagicMock()
+    vm._qmp.execute = AsyncioMagicMock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(return_value="")
+    vm._vm_status = "running"
+    with patch("gns3server.compute.qemu.qemu_vm.QemuVM.is_running", return_value=True):
+        await vm.save_golden_state()
+    assert [c[0][0] for c in vm._qmp.execute.call_args_list] == ["stop", "cont"]
+    assert [c[0][0] for c in vm._qmp.human_monitor_command.call_args_list] == ["savevm GNS3_GOLDEN_STATE", "delvm GNS3_GOLDEN_STATE"]
+
+    # the VM is resumed even if the state could not be saved
+    vm._qmp.execute.reset_mock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(return_value="Error: no block device can accept snapshots")
+    with patch("gns3server.compute.qemu.qemu_vm.QemuVM.is_running", return_value=True):
+        with pytest.raises(QemuError):
+            await vm.save_golden_state()
+    assert [c[0][0] for c in vm._qmp.execute.call_args_list] == ["stop", "cont"]
+
+
+async def test_save_golden_state_not_running(vm):
+
+    with pytest.raises(QemuError):
+        await vm.save_golden_state()
+
+
+async def test_build_command_golden_state(vm, tmpdir):
+
+    await _save_golden_state(vm, tmpdir)
+    # a new linked clone of the same image
+    os.remove(os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    process_mock = MagicMock()
+    process_mock.wait = AsyncioMagicMock(return_value=0)
+    os.environ["DISPLAY"] = "0:0"
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=process_mock):
+        cmd = await vm._build_command()
+    assert cmd[cmd.index("-loadvm") + 1] == "GNS3_GOLDEN_STATE"
+    assert os.path.isfile(os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    assert vm._golden_state is not None
+    # the adapters can be unplugged to get the MAC address of the clone
+    assert "e1000,mac={},id=gns3-nic0,netdev=gns3-0".format(vm.mac_address) in cmd
+    assert vm._network_devices == {0: {"driver": "e1000", "id": "gns3-nic0", "mac": vm.mac_address, "netdev": "gns3-0"}}
+
+    # the clone has been started once, it boots from its own disk
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=process_mock):
+        cmd = await vm._build_command()
+    assert "-loadvm" not in cmd
+
+
+async def test_build_command_golden_state_mismatch(vm, tmpdir):
+
+    await _save_golden_state(vm, tmpdir)
+    os.remove(os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    vm.ram = 512
+    process_mock = MagicMock()
+    process_mock.wait = AsyncioMagicMock(return_value=0)
+    os.environ["DISPLAY"] = "0:0"
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=process_mock):
+        cmd = await vm._build_command()
+    assert "-loadvm" not in cmd
+    assert vm._golden_state is None
+
+
+async def test_golden_state_hotplug_error(vm):
+
+    assert vm._golden_state_hotplug_error() is None
+    vm.options = "-machine q35"
+    assert "q35" in vm._golden_state_hotplug_error()
+    vm.options = ""
+    vm.adapter_type = "ne2k_isa"
+    assert "ne2k_isa" in vm._golden_state_hotplug_error()
+
+
+async def test_golden_state_replug_network_adapters(vm):
+
+    device = {"driver": "virtio-net-pci", "id": "gns3-nic0", "mac": vm.mac_address, "netdev": "gns3-0"}
+    vm._network_devices = {0: device}
+
+    async def execute(command, arguments=None):
+        if command == "device_del":
+            # the guest releases the adapter
+            asyncio.get_event_loop().call_soon(vm._qmp_event, "DEVICE_DELETED", {"device": arguments["id"]})
+
+    vm._qmp = MagicMock()
+    vm._qmp.execute = AsyncioMagicMock(side_effect=execute)
+    await vm._replug_network_adapters()
+    assert vm._qmp.execute.call_args_list == [mock.call("device_del", {"id": "gns3-nic0"}),
+                                              mock.call("device_add", device)]
+    # the MAC address of the clone is applied, not the one restored from the golden state
+    assert vm._qmp.execute.call_args_list[1][0][1]["mac"] == vm.mac_address
+
+
+async def test_golden_state_replug_network_adapters_timeout(vm):
+
+    device = {"driver": "e1000", "id": "gns3-nic0", "mac": vm.mac_address}
+    vm._network_devices = {0: device}
+    vm._qmp = MagicMock()
+    vm._qmp.execute = AsyncioMagicMock()
+    vm.ADAPTER_UNPLUG_TIMEOUT = 0.01
+    with patch("gns3server.compute.project.Project.emit") as emit:
+        await vm._replug_network_adapters()
+        assert emit.call_args[0][0] == "log.warning"
+    vm._qmp.execute.assert_called_once_with("device_del", {"id": "gns3-nic0"})
+
+    # the guest releases the adapter later
+    vm._qmp_event("DEVICE_DELETED", {"device": "gns3-nic0"})
+    await asyncio.sleep(0)
+    vm._qmp.execute.assert_called_with("device_add", device)
+
+
+async def test_golden_state_reset(vm):
+
+    vm._golden_state = {"reset_commands": ["hostname {name}"]}
+    vm._control_vm = AsyncioMagicMock()
+    vm._control_vm_commands = AsyncioMagicMock()
+    await vm._golden_state_reset()
+    assert vm._control_vm.call_args_list[0] == mock.call("delvm GNS3_GOLDEN_STATE", timeout=120)
+    assert vm._control_vm.call_args_list[1] == mock.call("hostname test")
+    # the adapter is not connected, its link stays down
+    vm._control_vm_commands.assert_called_with(["set_link gns3-0 off"])
+    assert vm._golden_state is None
+
+
+async def test_saved_state_option(vm, tmpdir):
+
+    os.makedirs(vm.working_dir, exist_ok=True)
+    vm._hda_disk_image = str(tmpdir / "test0.qcow2")
+    shutil.copy("tests/resources/linked.qcow2", os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    with asyncio_patch("asyncio.create_subprocess_exec") as process:
+        assert await vm._saved_state_option() == []
+        write_snapshot_table(os.path.join(vm.working_dir, "hda_disk.qcow2"), ["GNS3_SAVED_STATE"])
+        assert await vm._saved_state_option() == ["-loadvm", "GNS3_SAVED_STATE"]
+        assert not process.called
+    shutil.rmtree(vm.working_dir)
+
+
+async def test_saved_state_option_not_qcow2(vm, tmpdir):
+
+    vm.linked_clone = False
+    vm._hda_disk_image = str(tmpdir / "test0.img")
+    open(vm._hda_disk_image, "w+").close()
+    assert await vm._saved_state_option() == []
+
+
+async def test_clear_save_vm_stated(vm, tmpdir, fake_qemu_img_binary):
+
+    os.makedirs(vm.working_dir, exist_ok=True)
+    vm._hda_disk_image = str(tmpdir / "test0.qcow2")
+    vm._hdb_disk_image = str(tmpdir / "test1.qcow2")
+    shutil.copy("tests/resources/linked.qcow2", os.path.join(vm.working_dir, "hda_disk.qcow2"))
+    shutil.copy("tests/resources/linked.qcow2", os.path.join(vm.working_dir, "hdb_disk.qcow2"))
+    write_snapshot_table(os.path.join(vm.working_dir, "hdb_disk.qcow2"), ["GNS3_SAVED_STATE"])
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=MagicMock()) as process:
+        await vm._clear_save_vm_stated()
+        assert process.call_count == 1
+        args, kwargs = process.call_args
+        assert args == (fake_qemu_img_binary, "snapshot", "-d", "GNS3_SAVED_STATE", os.path.join(vm.working_dir, "hdb_disk.qcow2"))
+    shutil.rmtree(vm.working_dir)
+
+
 @pytest.mark.skipif(sys.platform.startswith("win"), reason="Not supported on Windows")
 async def test_set_process_priority(vm, fake_qemu_img_binary):
 
@@ -451,33 +792,54 @@ def test_json(vm, compute_project):
     assert json["project_id"] == compute_project.id
 
 
-async def test_control_vm(vm):
+async def test_control_vm(vm, running_subprocess_mock):
 
-    vm._process = MagicMock()
-    reader = MagicMock()
-    writer = MagicMock()
-    with asyncio_patch("asyncio.open_connection", return_value=(reader, writer)):
-        res = await vm._control_vm("test")
-        assert writer.write.called_with("test")
+    vm._process = running_subprocess_mock
+    vm._qmp = MagicMock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(return_value="")
+    res = await vm._control_vm("test")
+    vm._qmp.human_monitor_command.assert_called_with("test", timeout=30)
     assert res is None
 
 
 async def test_control_vm_expect_text(vm, running_subprocess_mock):
 
     vm._process = running_subprocess_mock
-    reader = MagicMock()
-    writer = MagicMock()
-    with asyncio_patch("asyncio.open_connection", return_value=(reader, writer)):
+    vm._qmp = MagicMock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(return_value="product\r\nepic product\r\n")
+    res = await vm._control_vm("test", [b"epic"])
+    assert res == "epic product"
 
-        future = asyncio.Future()
-        future.set_result(b"epic product")
-        reader.readline.return_value = future
 
-        vm._monitor = 4242
-        res = await vm._control_vm("test", [b"epic"])
-        assert writer.write.called_with("test")
+async def test_control_vm_error(vm, running_subprocess_mock):
 
-    assert res == "epic product"
+    vm._process = running_subprocess_mock
+    vm._qmp = MagicMock()
+    vm._qmp.human_monitor_command = AsyncioMagicMock(side_effect=QemuError("connection lost"))
+    assert await vm._control_vm("test", [b"epic"]) is None
+
+
+async def test_get_vm_status(vm, running_subprocess_mock):
+
+    vm._process = running_subprocess_mock
+    vm._qmp = MagicMock()
+    vm._qmp.connected = True
+    vm._qmp.execute = AsyncioMagicMock(return_value={"status": "running", "running": True})
+    assert await vm._get_vm_status() == "running"
+    assert vm.status == "started"
+
+    # the status is updated by the QMP events
+    vm._qmp_event("STOP", {})
+    assert vm.status == "suspended"
+    assert await vm._get_vm_status() == "paused"
+    vm._qmp_event("RESUME", {})
+    assert vm.status == "started"
+    assert vm._qmp.execute.call_count == 1
+
+    # the session has been lost, the status is queried again
+    vm._qmp_disconnected()
+    assert await vm._get_vm_status() == "running"
+    assert vm._qmp.execute.call_count == 2
 
 
 async def test_build_command(vm, fake_qemu_binary):
@@ -512,6 +874,17 @@ async def test_build_command(vm, fake_qemu_binary):
         ]
 
 
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="KSM is only supported on Linux")
+async def test_build_command_memory_merging(vm, fake_qemu_binary):
+
+    vm.manager.get_qemu_version = AsyncioMagicMock(return_value="3.1.0")
+    vm.manager.config.set("Qemu", "memory_merging", "True")
+    os.environ["DISPLAY"] = "0:0"
+    with asyncio_patch("asyncio.create_subprocess_exec", return_value=MagicMock()):
+        cmd = await vm._build_command()
+    assert cmd[cmd.index("-smp") + 2:cmd.index("-smp") + 4] == ["-machine", "mem-merge=on"]
+
+
 async def test_build_command_manual_uuid(vm):
     """
     If user has set a uuid we keep it
@@ -894,3 +1267,27 @@ async def test_run_with_kvm_linux_dev_kvm_missing(linux_platform, vm):
         vm.manager.config.set("Qemu", "enable_kvm", True)
         with pytest.raises(QemuError):
             await vm._run_with_hardware_acceleration("qemu-system-x86_64", "")
+
+
+def test_cpu_throttling_cgroup(vm, running_subprocess_mock, tmpdir):
+
+    vm._process = running_subprocess_mock
+    vm._cgroup = Cgroups(str(tmpdir)).create("qemu")
+    with patch("subprocess.Popen") as mock:
+        vm.cpu_throttling = 25
+        assert not mock.called
+    with open(str(tmpdir / "qemu" / "cpu.max")) as f:
+        assert f.read() == "25000 100000"
+    vm.cpu_throttling = 0
+    with open(str(tmpdir / "qemu" / "cpu.max")) as f:
+        assert f.read() == "max 100000"
+
+
+def test_cpu_throttling_cpulimit(vm, running_subprocess_mock):
+
+    vm._process = running_subprocess_mock
+    vm._process.pid = 4242
+    with patch("subprocess.Popen") as mock:
+        vm.cpu_throttling = 25
+        assert mock.call_args[0][0] == ["cpulimit", "--lazy", "--pid=4242", "--limit=25"]
+    assert vm._cpulimit_process is mock.return_value
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import pytest
+import asyncio
+
+from unittest.mock import patch
+
+from gns3server.compute.qemu.qemu_error import QemuError
+from gns3server.compute.qemu.utils.qmp import QMPClient
+
+
+class FakeQMPServer:
+    """
+    QMP server answering the commands in reverse order, with
+    an event sent before each response.
+    """
+
+    def __init__(self):
+
+        self.connections = 0
+        self.commands = []
+        self.writers = []
+        self._server = None
+
+    async def start(self):
+
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+
+        self.connections += 1
+        self.writers.append(writer)
+        writer.write(b'{"QMP": {"version": {}, "capabilities": []}}\r\n')
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = json.loads(line.decode())
+            self.commands.append(request["execute"])
+            if request["execute"] == "stop":
+                writer.write(b'{"event": "STOP", "data": {}, "timestamp": {}}\r\n')
+            if request["execute"] == "human-monitor-command" and request["arguments"]["command-line"] == "info mtree":
+                response = {"return": "x" * 256 * 1024, "id": request["id"]}
+            elif request["execute"] == "human-monitor-command":
+                response = {"return": "output of {}".format(request["arguments"]["command-line"]), "id": request["id"]}
+            elif request["execute"] == "unknown":
+                response = {"error": {"class": "CommandNotFound", "desc": "The command unknown has not been found"}, "id": request["id"]}
+            else:
+                response = {"return": {}, "id": request["id"]}
+            writer.write(json.dumps(response).encode() + b"\r\n")
+        writer.close()
+
+    def close(self):
+
+        self._server.close()
+        for writer in self.writers:
+            writer.close()
+
+
+@pytest.fixture
+async def qmp_server(loop):
+
+    server = FakeQMPServer()
+    port = await server.start()
+    yield server, port
+    server.close()
+
+
+async def test_execute(qmp_server):
+
+    server, port = qmp_server
+    events = []
+    client = QMPClient("127.0.0.1", port, event_callback=lambda event, data: events.append(event))
+    await client.connect()
+    assert await client.execute("stop") == {}
+    assert await client.human_monitor_command("info status") == "output of info status"
+    assert events == ["STOP"]
+    assert server.commands == ["qmp_capabilities", "stop", "human-monitor-command"]
+    assert server.connections == 1
+    await client.close()
+
+
+async def test_concurrent_commands(qmp_server):
+
+    server, port = qmp_server
+    client = QMPClient("127.0.0.1", port)
+    results = await asyncio.gather(*[client.human_monitor_command("set_link gns3-{} off".format(i)) for i in range(5)])
+    assert results == ["output of set_link gns3-{} off".format(i) for i in range(5)]
+    assert server.connections == 1
+    await client.close()
+
+
+async def test_error(qmp_server):
+
+    server, port = qmp_server
+    client = QMPClient("127.0.0.1", port)
+    with pytest.raises(QemuError):
+        await client.execute("unknown")
+    await client.close()
+
+
+async def test_reconnect(qmp_server):
+
+    server, port = qmp_server
+    disconnections = []
+    client = QMPClient("127.0.0.1", port, disconnect_callback=lambda: disconnections.append(True))
+    await client.connect()
+    server.writers[0].close()
+    await asyncio.sleep(0.1)
+    assert not client.connected
+    assert disconnections == [True]
+    assert await client.execute("cont") == {}
+    assert server.connections == 2
+    await client.close()
+
+
+async def test_connect_timeout(loop):
+
+    client = QMPClient("127.0.0.1", 1)
+    with pytest.raises(QemuError):
+        await client.connect(timeout=0.1)
+
+
+async def test_large_response(qmp_server):
+
+    server, port = qmp_server
+    client = QMPClient("127.0.0.1", port)
+    assert len(await client.human_monitor_command("info mtree")) == 256 * 1024
+    assert client.connected
+    await client.close()
+
+
+async def test_response_over_limit(qmp_server):
+
+    server, port = qmp_server
+    disconnections = []
+    client = QMPClient("127.0.0.1", port, disconnect_callback=lambda: disconnections.append(True))
+    with patch("gns3server.compute.qemu.utils.qmp.QMP_STREAM_LIMIT", 64 * 1024):
+        await client.connect()
+    with pytest.raises(QemuError):
+        await client.human_monitor_command("info mtree")
+    # the read loop has ended cleanly and the next command reconnects
+    assert not client.connected
+    assert client._read_task.exception() is None
+    assert disconnections == [True]
+    assert await client.execute("cont") == {}
+    await client.close()
+
+
+async def test_execute_not_connected(loop):
+
+    client = QMPClient("127.0.0.1", 1)
+    with pytest.raises(QemuError):
+        await client._execute("cont")
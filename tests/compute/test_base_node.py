@@ -20,13 +20,17 @@ from collections import OrderedDict
 import pytest
 import asyncio
 
+from unittest.mock import patch, PropertyMock
 from tests.utils import asyncio_patch, AsyncioMagicMock
 
 from gns3server.compute.vpcs.vpcs_vm import VPCSVM
 from gns3server.compute.docker.docker_vm import DockerVM
 from gns3server.compute.error import NodeError
+from gns3server.compute.base_node import timed_start
+from gns3server.compute.start_timings import StartTimings
 from gns3server.compute.vpcs import VPCS
 from gns3server.compute.nios.nio_udp import NIOUDP
+from gns3server.ubridge.ubridge_error import UbridgeError
 
 
 @pytest.fixture(scope="function")
@@ -145,6 +149,32 @@ async def test_update_ubridge_udp_connection(node):
     mock.assert_called_with("VPCS-10", filters)
 
 
+async def test_add_ubridge_udp_connection_error(node):
+
+    snio = NIOUDP(1245, "localhost", 1246)
+    dnio = NIOUDP(1247, "localhost", 1248)
+    node._ubridge_send_batch = AsyncioMagicMock(side_effect=UbridgeError("Unknown NIO type"))
+    node._ubridge_send = AsyncioMagicMock()
+    with pytest.raises(UbridgeError):
+        await node.add_ubridge_udp_connection("VPCS-10", snio, dnio)
+    # the commands following the failed one have run, the bridge is removed
+    node._ubridge_send.assert_any_call("bridge create VPCS-10")
+    node._ubridge_send.assert_called_with("bridge delete VPCS-10")
+
+
+async def test_add_ubridge_udp_connection_existing_bridge(node):
+
+    snio = NIOUDP(1245, "localhost", 1246)
+    dnio = NIOUDP(1247, "localhost", 1248)
+    node._ubridge_send_batch = AsyncioMagicMock()
+    node._ubridge_send = AsyncioMagicMock(side_effect=UbridgeError("bridge 'VPCS-10' already exist"))
+    with pytest.raises(UbridgeError):
+        await node.add_ubridge_udp_connection("VPCS-10", snio, dnio)
+    # the existing bridge is neither configured nor deleted
+    assert not node._ubridge_send_batch.called
+    node._ubridge_send.assert_called_once_with("bridge create VPCS-10")
+
+
 async def test_ubridge_apply_filters(node):
 
     filters = OrderedDict((
@@ -167,3 +197,85 @@ async def test_ubridge_apply_bpf_filters(node):
     node._ubridge_send.assert_any_call("bridge reset_packet_filters VPCS-10")
     node._ubridge_send.assert_any_call("bridge add_packet_filter VPCS-10 filter0 bpf \"icmp[icmptype] == 8\"")
     node._ubridge_send.assert_any_call("bridge add_packet_filter VPCS-10 filter1 bpf \"tcp src port 53\"")
+
+
+async def test_start_shared_ubridge(node, config):
+
+    config.set("Server", "ubridge_nodes_per_hypervisor", "0")
+    with patch("gns3server.compute.base_node.BaseNode.ubridge_path", new_callable=PropertyMock, return_value="/bin/ubridge"):
+        with asyncio_patch("gns3server.ubridge.shared_hypervisor.SharedHypervisor.start") as mock:
+            await node._start_ubridge()
+            assert mock.called
+    assert node.ubridge is node._project.ubridge_pool.attach(node.id, "/bin/ubridge", None)
+    await node._stop_ubridge()
+    assert node._project.ubridge_pool.hypervisors == []
+
+
+def test_set_resource_limits(node, config, tmpdir):
+
+    (tmpdir / "cgroup.controllers").write("cpu io memory")
+    config.set("Server", "cgroups_support", "True")
+    config.set("Server", "cgroups_path", str(tmpdir))
+    assert node._set_resource_limits(4242, memory=256)
+    with open(str(tmpdir / node.id / "cgroup.procs")) as f:
+        assert f.read() == "4242"
+    assert node.resource_usage() == {}
+
+
+def test_manager_resource_usage(node, manager, config, tmpdir):
+
+    (tmpdir / "cgroup.controllers").write("cpu io memory")
+    config.set("Server", "cgroups_support", "True")
+    config.set("Server", "cgroups_path", str(tmpdir))
+    manager._nodes[node.id] = node
+    assert manager.resource_usage() == []
+    node._set_resource_limits(4242, memory=256)
+    (tmpdir / node.id / "memory.current").write("1024")
+    assert manager.resource_usage() == [{"node_id": node.id,
+                                         "project_id": node.project.id,
+                                         "name": node.name,
+                                         "memory_current": 1024}]
+
+
+def test_set_resource_limits_not_available(node, config, tmpdir):
+
+    config.set("Server", "cgroups_support", "True")
+    config.set("Server", "cgroups_path", str(tmpdir / "missing"))
+    assert not node._set_resource_limits(4242, memory=256)
+    assert node.resource_usage() is None
+
+
+async def test_timed_start(node):
+
+    async def start(node):
+        with node.timing_span("process"):
+            await asyncio.sleep(0.01)
+        with node.timing_span("links"):
+            pass
+        with node.timing_span("process"):
+            pass
+
+    with patch("gns3server.compute.project.Project.emit") as mock:
+        await timed_start(start)(node)
+        mock.assert_called_with("node.updated", node)
+    assert list(node.start_timings["phases"]) == ["process", "links"]
+    assert node.start_timings["phases"]["process"] >= 0.01
+    assert node.start_timings["total"] >= node.start_timings["phases"]["process"]
+    assert StartTimings.instance().percentiles()["vpcs"]["process"]["count"] == 1
+
+    # nothing is measured outside a start
+    with node.timing_span("console"):
+        pass
+    assert "console" not in node.start_timings["phases"]
+
+
+async def test_timed_start_error(node):
+
+    async def start(node):
+        with node.timing_span("process"):
+            raise NodeError("test")
+
+    with pytest.raises(NodeError):
+        await timed_start(start)(node)
+    assert node.start_timings is None
+    assert StartTimings.instance().percentiles() == {}
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+import asyncio
+
+from gns3server.compute.binary_cache import BinaryCache
+
+
+@pytest.fixture
+def binary(tmpdir):
+
+    path = str(tmpdir / "vpcs")
+    with open(path, "w") as f:
+        f.write("1")
+    os.utime(path, (1000, 1000))
+    return path
+
+
+async def test_probe(loop, binary):
+
+    calls = []
+
+    async def probe():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        return "version 0.8"
+
+    cache = BinaryCache()
+    results = await asyncio.gather(*[cache.probe(binary, "version", probe) for _ in range(10)])
+    assert results == ["version 0.8"] * 10
+    assert await cache.probe(binary, "version", probe) == "version 0.8"
+    assert len(calls) == 1
+
+    # other probe on the same executable
+    assert await cache.probe(binary, "help", probe) == "version 0.8"
+    assert len(calls) == 2
+
+
+async def test_probe_binary_replaced(loop, binary):
+
+    cache = BinaryCache()
+
+    async def probe_v1():
+        return "version 1"
+
+    async def probe_v2():
+        return "version 2"
+
+    assert await cache.probe(binary, "version", probe_v1) == "version 1"
+    with open(binary, "w") as f:
+        f.write("22")
+    assert await cache.probe(binary, "version", probe_v2) == "version 2"
+
+
+async def test_probe_error_not_cached(loop, binary):
+
+    cache = BinaryCache()
+
+    async def failing_probe():
+        raise OSError("cannot execute")
+
+    async def probe():
+        return "version 1"
+
+    with pytest.raises(OSError):
+        await cache.probe(binary, "version", failing_probe)
+    assert await cache.probe(binary, "version", probe) == "version 1"
+
+
+async def test_probe_missing_binary(loop, tmpdir):
+
+    cache = BinaryCache()
+    calls = []
+
+    async def probe():
+        calls.append(True)
+        return ""
+
+    await cache.probe(str(tmpdir / "missing"), "version", probe)
+    await cache.probe(str(tmpdir / "missing"), "version", probe)
+    await cache.probe(None, "version", probe)
+    assert len(calls) == 3
+
+
+async def test_invalidate(loop, binary):
+
+    cache = BinaryCache()
+    calls = []
+
+    async def probe():
+        calls.append(True)
+        return ""
+
+    await cache.probe(binary, "ldd", probe)
+    await cache.probe(binary, "version", probe)
+    cache.invalidate(binary, "ldd")
+    await cache.probe(binary, "ldd", probe)
+    await cache.probe(binary, "version", probe)
+    assert len(calls) == 3
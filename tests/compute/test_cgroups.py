@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import pytest
+
+from gns3server.compute.cgroups import Cgroups
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="cgroups are only supported on Linux")
+
+
+@pytest.fixture
+def cgroupfs(tmpdir):
+    """
+    Fake cgroup v2 parent directory.
+    """
+
+    path = tmpdir / "gns3"
+    path.mkdir()
+    (path / "cgroup.controllers").write("cpuset cpu io memory pids")
+    (path / "cgroup.subtree_control").write("")
+    return str(path)
+
+
+def read(path, filename):
+
+    with open(os.path.join(path, filename)) as f:
+        return f.read()
+
+
+def test_available(cgroupfs):
+
+    cgroups = Cgroups(cgroupfs)
+    assert cgroups.available
+    assert read(cgroupfs, "cgroup.subtree_control") == "+cpu +memory +io"
+
+
+def test_not_available(tmpdir, cgroupfs):
+
+    assert not Cgroups(str(tmpdir / "missing")).available
+    assert not Cgroups(cgroupfs, enabled=False).available
+    # cgroup v1 or not a cgroup
+    assert not Cgroups(str(tmpdir)).available
+
+
+def test_create(cgroupfs):
+
+    cgroups = Cgroups(cgroupfs, memory_overhead=128, io_weight=50)
+    cgroup = cgroups.create("node1", cpu=50, memory=512)
+    assert cgroup.path == os.path.join(cgroupfs, "node1")
+    assert read(cgroup.path, "cpu.max") == "50000 100000"
+    assert read(cgroup.path, "memory.max") == str(640 * 1024 * 1024)
+    assert read(cgroup.path, "io.weight") == "default 50"
+    cgroup.add_process(4242)
+    assert read(cgroup.path, "cgroup.procs") == "4242"
+
+    cgroup = cgroups.create("node2")
+    assert read(cgroup.path, "cpu.max") == "max 100000"
+    assert read(cgroup.path, "memory.max") == "max"
+
+
+def test_stats(cgroupfs):
+
+    cgroup = Cgroups(cgroupfs).create("node1")
+    with open(os.path.join(cgroup.path, "cpu.stat"), "w") as f:
+        f.write("usage_usec 1200\nuser_usec 1000\nsystem_usec 200\nnr_periods 10\nnr_throttled 2\nthrottled_usec 300\n")
+    with open(os.path.join(cgroup.path, "memory.current"), "w") as f:
+        f.write("1048576\n")
+    with open(os.path.join(cgroup.path, "io.stat"), "w") as f:
+        f.write("8:0 rbytes=1024 wbytes=2048 rios=1 wios=2 dbytes=0 dios=0\n8:16 rbytes=1 wbytes=2 rios=1 wios=1 dbytes=0 dios=0\n")
+    assert cgroup.stats() == {"cpu_usage_usec": 1200,
+                              "cpu_throttled_usec": 300,
+                              "memory_current": 1048576,
+                              "io_read_bytes": 1025,
+                              "io_write_bytes": 2050}
+
+
+def test_remove(tmpdir):
+
+    path = str(tmpdir / "node1")
+    os.makedirs(path)
+    cgroups = Cgroups(str(tmpdir))
+    cgroups._available = True
+    cgroup = cgroups.create("node1")
+    for filename in os.listdir(path):
+        # the files of a real cgroup are removed with the directory
+        os.remove(os.path.join(path, filename))
+    cgroup.remove()
+    assert not os.path.exists(path)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import asyncio
+
+from gns3server.compute.config_save_scheduler import ConfigSaveScheduler, write_config_if_changed
+
+
+def test_write_config_if_changed(tmpdir):
+
+    path = str(tmpdir / "startup-config.cfg")
+    written = {}
+    assert write_config_if_changed(path, b"hostname R1\n", written)
+    assert not write_config_if_changed(path, b"hostname R1\n", written)
+    assert write_config_if_changed(path, b"hostname R2\n", written)
+    with open(path, "rb") as f:
+        assert f.read() == b"hostname R2\n"
+
+    # modified by someone else
+    with open(path, "wb") as f:
+        f.write(b"hostname R3\n")
+    assert write_config_if_changed(path, b"hostname R2\n", written)
+    with open(path, "rb") as f:
+        assert f.read() == b"hostname R2\n"
+
+
+def test_write_config_if_changed_existing_file(tmpdir):
+
+    path = str(tmpdir / "startup-config.cfg")
+    with open(path, "wb") as f:
+        f.write(b"hostname R1\n")
+    os.utime(path, (1000, 1000))
+    assert not write_config_if_changed(path, b"hostname R1\n", {})
+    assert os.path.getmtime(path) == 1000
+
+
+async def test_schedule(loop):
+
+    scheduler = ConfigSaveScheduler(concurrency=2, interval=0)
+    running = []
+    max_running = 0
+    saved = []
+
+    def save(node_id):
+        async def callback():
+            nonlocal max_running
+            running.append(node_id)
+            max_running = max(max_running, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(node_id)
+            saved.append(node_id)
+        return callback
+
+    for node_id in range(10):
+        scheduler.schedule(node_id, save(node_id))
+    # already waiting
+    scheduler.schedule(0, save(0))
+    await scheduler.flush()
+    assert sorted(saved) == list(range(10))
+    assert max_running == 2
+
+
+async def test_schedule_function(loop):
+
+    scheduler = ConfigSaveScheduler()
+    saved = []
+    scheduler.schedule("node1", lambda: saved.append("node1"))
+    await scheduler.flush()
+    assert saved == ["node1"]
+
+
+async def test_interval(loop):
+
+    scheduler = ConfigSaveScheduler(concurrency=10, interval=0.05)
+    starts = []
+
+    async def callback():
+        starts.append(loop.time())
+
+    for node_id in range(3):
+        scheduler.schedule(node_id, callback)
+    await scheduler.flush()
+    assert len(starts) == 3
+    assert starts[2] - starts[0] >= 0.09
+
+
+async def test_cancel_and_close(loop):
+
+    scheduler = ConfigSaveScheduler(concurrency=1, interval=0)
+    saved = []
+
+    async def callback():
+        await asyncio.sleep(0.01)
+        saved.append(True)
+
+    scheduler.schedule("node1", callback)
+    scheduler.schedule("node2", callback)
+    scheduler.schedule("node3", callback)
+    scheduler.cancel("node3")
+    assert scheduler.pending == ["node1", "node2"]
+    await asyncio.sleep(0)
+    await scheduler.close()
+    assert scheduler.pending == []
+    assert len(saved) == 1
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import uuid
+import json
+import struct
+import asyncio
+import pytest
+
+from unittest.mock import MagicMock
+
+
+class FakeConsole:
+    """
+    Telnet console of a node: prints a prompt and records what it receives.
+    """
+
+    def __init__(self, prompt):
+
+        self.prompt = prompt
+        self.received = b""
+        self.writer = None
+        self.server = None
+
+    async def start(self):
+
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+
+        self.writer = writer
+        writer.write(self.prompt)
+        await writer.drain()
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            self.received += data
+        writer.close()
+
+    async def stop(self):
+
+        self.server.close()
+        await self.server.wait_closed()
+
+
+@pytest.fixture
+async def console(compute_project):
+
+    console = FakeConsole(b"R1>")
+    port = await console.start()
+    node = MagicMock()
+    node.id = str(uuid.uuid4())
+    node.name = "R1"
+    node.status = "started"
+    node.console_type = "telnet"
+    node.console = port
+    node.manager.port_manager.console_host = "127.0.0.1"
+    compute_project.add_node(node)
+    console.node = node
+    yield console
+    compute_project._nodes.discard(node)
+    await console.stop()
+
+
+async def receive_json(ws):
+
+    return json.loads(await asyncio.wait_for(ws.receive_str(), 1))
+
+
+async def receive_data(ws):
+
+    data = await asyncio.wait_for(ws.receive_bytes(), 1)
+    return struct.unpack(">H", data[:2])[0], data[2:]
+
+
+async def test_console_gateway(http_client, compute_project, console):
+
+    ws = await http_client.ws_connect("/v2/compute/projects/{}/console/ws".format(compute_project.id))
+    await ws.send_str(json.dumps({"action": "attach", "channel": 3, "node_id": console.node.id}))
+    assert await receive_json(ws) == {"action": "attached", "channel": 3, "node_id": console.node.id, "window": 65536}
+    assert await receive_data(ws) == (3, b"R1>")
+
+    await ws.send_bytes(struct.pack(">H", 3) + b"show version\r")
+    await asyncio.sleep(0.1)
+    assert console.received == b"show version\r"
+
+    await ws.send_str(json.dumps({"action": "detach", "channel": 3}))
+    assert await receive_json(ws) == {"action": "detached", "channel": 3, "reason": "Detached by the client"}
+    await ws.close()
+
+
+async def test_console_gateway_flow_control(http_client, compute_project, console):
+
+    ws = await http_client.ws_connect("/v2/compute/projects/{}/console/ws".format(compute_project.id))
+    await ws.send_str(json.dumps({"action": "attach", "channel": 1, "node_id": console.node.id, "window": 2}))
+    assert (await receive_json(ws))["window"] == 2
+    # the window is exhausted by the first frame
+    assert await receive_data(ws) == (1, b"R1>")
+
+    console.writer.write(b"more output")
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(ws.receive(), 0.2)
+
+    await ws.send_str(json.dumps({"action": "ack", "channel": 1, "bytes": 3}))
+    assert await receive_data(ws) == (1, b"more output")
+    await ws.close()
+
+
+async def test_console_gateway_console_closed(http_client, compute_project, console):
+
+    ws = await http_client.ws_connect("/v2/compute/projects/{}/console/ws".format(compute_project.id))
+    await ws.send_str(json.dumps({"action": "attach", "channel": 1, "node_id": console.node.id}))
+    await receive_json(ws)
+    await receive_data(ws)
+    console.writer.close()
+    assert await receive_json(ws) == {"action": "detached", "channel": 1, "reason": "Console connection closed"}
+    await ws.close()
+
+
+async def test_console_gateway_errors(http_client, compute_project, console):
+
+    ws = await http_client.ws_connect("/v2/compute/projects/{}/console/ws".format(compute_project.id))
+    await ws.send_str(json.dumps({"action": "attach", "channel": 1, "node_id": str(uuid.uuid4())}))
+    message = await receive_json(ws)
+    assert message["action"] == "error"
+    assert message["channel"] == 1
+    assert "doesn't exist" in message["message"]
+
+    console.node.status = "stopped"
+    await ws.send_str(json.dumps({"action": "attach", "channel": 1, "node_id": console.node.id}))
+    assert await receive_json(ws) == {"action": "error", "channel": 1, "message": "Node R1 is not started"}
+
+    await ws.send_bytes(struct.pack(">H", 2) + b"data")
+    assert await receive_json(ws) == {"action": "error", "channel": 2, "message": "Channel 2 is not attached"}
+
+    await ws.send_str("not json")
+    assert await receive_json(ws) == {"action": "error", "channel": None, "message": "Invalid control message"}
+    await ws.close()
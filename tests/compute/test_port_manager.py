@@ -17,6 +17,7 @@
 
 import aiohttp
 import pytest
+import socket
 import uuid
 from unittest.mock import patch
 
@@ -115,6 +116,19 @@ def test_release_udp_port():
     pm.reserve_udp_port(20000, project)
 
 
+def test_get_free_udp_ports():
+
+    pm = PortManager()
+    pm.udp_port_range = (20000, 20002)
+    project = Project(project_id=str(uuid.uuid4()))
+    with patch("gns3server.compute.port_manager.PortManager._check_port", return_value=True):
+        assert pm.get_free_udp_ports(project, 2) == [20000, 20001]
+        with pytest.raises(aiohttp.web.HTTPConflict):
+            pm.get_free_udp_ports(project, 2)
+        # the ports are released when there are not enough ports available
+        assert pm.udp_ports == {20000, 20001}
+
+
 def test_find_unused_port():
 
     p = PortManager().find_unused_port(1000, 10000)
@@ -141,3 +155,59 @@ def test_set_console_host(config):
     config.set_section_config("Server", {"allow_remote_console": True})
     p.console_host = "10.42.1.42"
     assert p.console_host == "0.0.0.0"
+
+
+def test_get_free_udp_port_rotating_cursor():
+
+    pm = PortManager()
+    pm.udp_port_range = (20000, 20002)
+    project = Project(project_id=str(uuid.uuid4()))
+    with patch("gns3server.compute.port_manager.PortManager._check_port", return_value=True) as mock_check:
+        assert pm.get_free_udp_port(project) == 20000
+        assert pm.get_free_udp_port(project) == 20001
+        # only the chosen ports have been checked
+        assert mock_check.call_count == 2
+        pm.release_udp_port(20000, project)
+        # the search continues after the last allocated port
+        assert pm.get_free_udp_port(project) == 20002
+        # then wraps around to the start of the range
+        assert pm.get_free_udp_port(project) == 20000
+        with pytest.raises(aiohttp.web.HTTPConflict):
+            pm.get_free_udp_port(project)
+
+
+def test_get_free_tcp_port_skip_reserved_and_banned_ports():
+
+    pm = PortManager()
+    pm.console_host = "127.0.0.1"
+    project = Project(project_id=str(uuid.uuid4()))
+    with patch("gns3server.compute.port_manager.PortManager._check_port", return_value=True):
+        pm.reserve_tcp_port(5000, project)
+        assert pm.get_free_tcp_port(project) == 5001
+        assert pm.get_free_tcp_port(project, port_range_start=6000, port_range_end=6010) == 6001
+
+
+def test_get_free_tcp_port_used_by_another_program():
+
+    pm = PortManager()
+    pm.console_host = "127.0.0.1"
+    project = Project(project_id=str(uuid.uuid4()))
+    with patch("gns3server.compute.port_manager.PortManager._check_port") as mock_check:
+
+        def execute_mock(host, port, *args):
+            if port == 5000:
+                raise OSError("Port is already used")
+            return True
+
+        mock_check.side_effect = execute_mock
+        assert pm.get_free_tcp_port(project) == 5001
+
+
+def test_check_port_getaddrinfo_cache():
+
+    PortManager._getaddrinfo.cache_clear()
+    with patch("socket.getaddrinfo", wraps=socket.getaddrinfo) as mock_getaddrinfo:
+        p = PortManager().find_unused_port(20000, 30000, host="127.0.0.1", socket_type="UDP")
+        PortManager._check_port("127.0.0.1", p, "UDP")
+        PortManager._check_port("127.0.0.1", p + 1, "UDP")
+        assert mock_getaddrinfo.call_count <= 2  # one for 127.0.0.1, one for 0.0.0.0
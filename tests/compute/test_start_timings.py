@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gns3server.compute.start_timings import StartTimings
+
+
+def test_percentiles():
+
+    start_timings = StartTimings()
+    for duration in range(1, 101):
+        start_timings.record("qemu", {"disks": duration / 100, "process": 0.5}, duration / 10)
+    start_timings.record("vpcs", {"process": 0.1}, 0.2)
+
+    percentiles = start_timings.percentiles()
+    assert list(percentiles["qemu"]) == ["disks", "process", "total"]
+    assert percentiles["qemu"]["disks"] == {"count": 100, "p50": 0.5, "p90": 0.9, "p99": 0.99, "max": 1.0}
+    assert percentiles["qemu"]["total"]["p50"] == 5.0
+    assert percentiles["vpcs"] == {"process": {"count": 1, "p50": 0.1, "p90": 0.1, "p99": 0.1, "max": 0.1},
+                                   "total": {"count": 1, "p50": 0.2, "p90": 0.2, "p99": 0.2, "max": 0.2}}
+
+
+def test_max_samples():
+
+    start_timings = StartTimings(max_samples=10)
+    for duration in range(100):
+        start_timings.record("qemu", {}, duration)
+    assert start_timings.percentiles()["qemu"]["total"]["count"] == 10
+    assert start_timings.percentiles()["qemu"]["total"]["p50"] == 94
@@ -114,6 +114,7 @@ async def test_stop(vm):
                     await vm.port_add_nio_binding(0, nio)
 
                     vm._ubridge_send = AsyncioMagicMock()
+                    vm._ubridge_send_batch = AsyncioMagicMock()
                     await vm.start("192.168.1.2")
                     assert vm.is_running()
 
@@ -148,6 +149,7 @@ async def test_reload(vm):
                 await vm.port_add_nio_binding(0, nio)
 
                 vm._ubridge_send = AsyncioMagicMock()
+                vm._ubridge_send_batch = AsyncioMagicMock()
                 await vm.start("192.168.1.2")
                 assert vm.is_running()
 
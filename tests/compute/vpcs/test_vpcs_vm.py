@@ -123,6 +123,7 @@ async def test_start(vm):
         (action, event, kwargs) = await queue.get(1)
         assert action == "node.updated"
         assert event == vm
+    assert list(vm.start_timings["phases"]) == ["requirements", "process"]
 
 
 async def test_start_0_6_1(vm):
@@ -211,6 +212,7 @@ async def test_reload(vm):
                 assert vm.is_running()
 
                 vm._ubridge_send = AsyncioMagicMock()
+                vm._ubridge_send_batch = AsyncioMagicMock()
                 with asyncio_patch("gns3server.utils.asyncio.wait_for_process_termination"):
                     await vm.reload()
                 assert vm.is_running() is True
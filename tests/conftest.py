@@ -14,6 +14,8 @@ from gns3server.config import Config
 from gns3server.compute import MODULES
 from gns3server.compute.port_manager import PortManager
 from gns3server.compute.project_manager import ProjectManager
+from gns3server.compute.binary_cache import BinaryCache
+from gns3server.compute.start_timings import StartTimings
 # this import will register all handlers
 from gns3server.handlers import *
 
@@ -246,6 +248,8 @@ def run_around_tests(monkeypatch, config, port_manager):#port_manager, controlle
 
     for module in MODULES:
         module._instance = None
+    BinaryCache.reset()
+    StartTimings.reset()
 
     os.makedirs(os.path.join(tmppath, 'projects'))
     config.set("Server", "projects_path", os.path.join(tmppath, 'projects'))
@@ -459,3 +459,14 @@ async def test_autoidlepc(controller):
         await controller.autoidlepc("local", "c7200", "test.bin", 512)
     assert node_mock.dynamips_auto_idlepc.called
     assert len(controller.projects) == 0
+
+
+async def test_autoidlepc_known_image(controller):
+
+    compute = AsyncioMagicMock()
+    compute.images = AsyncioMagicMock(return_value=[{"filename": "test.bin", "md5sum": "e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4"}])
+    controller._computes["local"] = compute
+    controller.idlepc_database.set("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512, "0x60606f54")
+    with asyncio_patch("gns3server.controller.Project.add_node") as mock:
+        assert await controller.autoidlepc("local", "c7200", "test.bin", 512) == {"idlepc": "0x60606f54"}
+    assert not mock.called
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+from gns3server.controller.idlepc_database import IdlePCDatabase
+
+
+def test_set_and_get(tmpdir):
+
+    path = str(tmpdir / "idlepc.json")
+    database = IdlePCDatabase(path)
+    assert database.get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) is None
+    database.set("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512, "0x60606f54")
+    assert database.get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) == "0x60606f54"
+    assert database.get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 256) is None
+    with open(path) as f:
+        assert json.load(f) == {"idlepcs": {"e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4:c7200:512": "0x60606f54"}}
+
+    # reloaded from the file
+    assert IdlePCDatabase(path).get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) == "0x60606f54"
+
+
+def test_no_checksum(tmpdir):
+
+    database = IdlePCDatabase(str(tmpdir / "idlepc.json"))
+    database.set(None, "c7200", 512, "0x60606f54")
+    assert database.get(None, "c7200", 512) is None
+
+
+def test_corrupted_file(tmpdir):
+
+    path = tmpdir / "idlepc.json"
+    path.write("{")
+    assert IdlePCDatabase(str(path)).get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) is None
@@ -122,6 +122,7 @@ def test_json(node, compute):
         "console_type": node.console_type,
         "console_host": str(compute.console_host),
         "command_line": None,
+        "start_timings": None,
         "node_directory": None,
         "properties": node.properties,
         "status": node.status,
@@ -541,3 +542,40 @@ async def test_parse_node_response(node):
     node.add_link(link)
     await node.parse_node_response({"status": "started"})
     assert link.node_updated.called
+
+
+async def test_parse_node_response_start_timings(node):
+
+    start_timings = {"total": 1.5, "phases": {"process": 1.0, "links": 0.5}}
+    await node.parse_node_response({"status": "started", "start_timings": start_timings})
+    assert node.__json__()["start_timings"] == start_timings
+    # the start timings are not saved with the topology
+    assert "start_timings" not in node.properties
+    assert "start_timings" not in node.__json__(topology_dump=True)
+
+
+async def test_start_timings_from_start_response(node, compute):
+
+    start_timings = {"total": 0.5, "phases": {"process": 0.5}}
+    response = MagicMock()
+    response.json = {"status": "started", "start_timings": start_timings}
+    compute.post = AsyncioMagicMock(return_value=response)
+    await node.start()
+    assert node.__json__()["start_timings"] == start_timings
+
+
+async def test_dynamips_idle_pc_database(node, compute, controller):
+
+    node._node_type = "dynamips"
+    node._properties = {"image": "c7200.bin", "platform": "c7200", "ram": 512}
+    compute.images = AsyncioMagicMock(return_value=[{"filename": "c7200.bin", "md5sum": "e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4"}])
+    response = MagicMock()
+    response.json = {"idlepc": "0x60606f54"}
+    compute.get = AsyncioMagicMock(return_value=response)
+    await node.dynamips_auto_idlepc()
+    assert controller.idlepc_database.get("e7ee6d5a5e1c7a7e5e5d1bd2c1d2a3f4", "c7200", 512) == "0x60606f54"
+
+    # the value is known, the compute is not asked again
+    compute.get.reset_mock()
+    assert await node.dynamips_auto_idlepc() == {"idlepc": "0x60606f54"}
+    assert not compute.get.called
@@ -159,6 +159,132 @@ async def test_create_one_side_failure(project):
     compute1.delete.assert_any_call("/projects/{}/vpcs/nodes/{}/adapters/0/ports/4/nio".format(project.id, node1.id), timeout=120)
 
 
+async def test_create_same_compute(project):
+
+    compute = MagicMock()
+    node1 = Node(project, compute, "node1", node_type="vpcs")
+    node1._ports = [EthernetPort("E0", 0, 0, 4)]
+    node2 = Node(project, compute, "node2", node_type="vpcs")
+    node2._ports = [EthernetPort("E0", 0, 3, 1)]
+
+    async def subnet_callback(compute2):
+        return ("192.168.1.1", "192.168.1.1")
+
+    compute.get_ip_on_same_subnet.side_effect = subnet_callback
+
+    link = UDPLink(project)
+    await link.add_node(node1, 0, 4)
+
+    async def compute_callback(path, data={}, **kwargs):
+        if "/ports/udp/reserve" in path:
+            response = MagicMock()
+            response.json = {"udp_ports": [1024, 2048]}
+            return response
+
+    compute.post.side_effect = compute_callback
+    compute.host = "example.com"
+    await link.add_node(node2, 3, 1)
+
+    # both UDP ports are reserved with one query
+    compute.post.assert_any_call("/projects/{}/ports/udp/reserve".format(project.id), data={"count": 2})
+    assert "/projects/{}/ports/udp".format(project.id) not in [call[0][0] for call in compute.post.call_args_list]
+    compute.post.assert_any_call("/projects/{}/vpcs/nodes/{}/adapters/0/ports/4/nio".format(project.id, node1.id), data={
+        "lport": 1024,
+        "rhost": "192.168.1.1",
+        "rport": 2048,
+        "type": "nio_udp",
+        "filters": {},
+        "suspend": False,
+    }, timeout=120)
+    compute.post.assert_any_call("/projects/{}/vpcs/nodes/{}/adapters/3/ports/1/nio".format(project.id, node2.id), data={
+        "lport": 2048,
+        "rhost": "192.168.1.1",
+        "rport": 1024,
+        "type": "nio_udp",
+        "filters": {},
+        "suspend": False,
+    }, timeout=120)
+
+
+async def test_create_one_side_failure_release_udp_port(project):
+
+    compute1 = MagicMock()
+    compute2 = MagicMock()
+
+    node1 = Node(project, compute1, "node1", node_type="vpcs")
+    node1._ports = [EthernetPort("E0", 0, 0, 4)]
+    node2 = Node(project, compute2, "node2", node_type="vpcs")
+    node2._ports = [EthernetPort("E0", 0, 3, 1)]
+
+    async def subnet_callback(compute2):
+        return ("192.168.1.1", "192.168.1.2")
+
+    compute1.get_ip_on_same_subnet.side_effect = subnet_callback
+
+    link = UDPLink(project)
+    await link.add_node(node1, 0, 4)
+
+    async def compute1_callback(path, data={}, **kwargs):
+        if "/ports/udp" in path:
+            response = MagicMock()
+            response.json = {"udp_port": 1024}
+            return response
+        elif "/adapters" in path:
+            raise aiohttp.web.HTTPConflict(text="Error when creating the NIO")
+
+    async def compute2_callback(path, data={}, **kwargs):
+        if "/ports/udp" in path:
+            response = MagicMock()
+            response.json = {"udp_port": 2048}
+            return response
+
+    compute1.post.side_effect = compute1_callback
+    compute1.host = "example.com"
+    compute2.post.side_effect = compute2_callback
+    compute2.host = "example.org"
+    with pytest.raises(aiohttp.web.HTTPConflict):
+        await link.add_node(node2, 3, 1)
+
+    # the UDP port of the failed side is released, the NIO of the other side is deleted
+    compute1.post.assert_any_call("/projects/{}/ports/udp/release".format(project.id), data={"udp_ports": [1024]})
+    compute2.delete.assert_any_call("/projects/{}/vpcs/nodes/{}/adapters/3/ports/1/nio".format(project.id, node2.id), timeout=120)
+    assert not compute1.delete.called
+    assert link.debug_link_data == []
+
+
+async def test_create_reserve_udp_port_failure(project):
+
+    compute1 = MagicMock()
+    compute2 = MagicMock()
+
+    node1 = Node(project, compute1, "node1", node_type="vpcs")
+    node1._ports = [EthernetPort("E0", 0, 0, 4)]
+    node2 = Node(project, compute2, "node2", node_type="vpcs")
+    node2._ports = [EthernetPort("E0", 0, 3, 1)]
+
+    async def subnet_callback(compute2):
+        return ("192.168.1.1", "192.168.1.2")
+
+    compute1.get_ip_on_same_subnet.side_effect = subnet_callback
+
+    link = UDPLink(project)
+    await link.add_node(node1, 0, 4)
+
+    async def compute1_callback(path, data={}, **kwargs):
+        response = MagicMock()
+        response.json = {"udp_port": 1024}
+        return response
+
+    async def compute2_callback(path, data={}, **kwargs):
+        raise aiohttp.web.HTTPConflict(text="No UDP port available")
+
+    compute1.post.side_effect = compute1_callback
+    compute2.post.side_effect = compute2_callback
+    with pytest.raises(aiohttp.web.HTTPConflict):
+        await link.add_node(node2, 3, 1)
+    compute1.post.assert_called_with("/projects/{}/ports/udp/release".format(project.id), data={"udp_ports": [1024]})
+
+
 async def test_delete(project):
 
     compute1 = MagicMock()
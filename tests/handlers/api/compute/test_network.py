@@ -26,6 +26,23 @@ async def test_udp_allocation(compute_api, compute_project):
     assert response.json['udp_port'] is not None
 
 
+async def test_udp_allocation_multiple_ports(compute_api, compute_project):
+
+    response = await compute_api.post('/projects/{}/ports/udp/reserve'.format(compute_project.id), {"count": 3})
+    assert response.status == 201
+    assert len(set(response.json['udp_ports'])) == 3
+
+
+async def test_udp_release(compute_api, compute_project):
+
+    response = await compute_api.post('/projects/{}/ports/udp/reserve'.format(compute_project.id), {"count": 2})
+    udp_ports = response.json['udp_ports']
+    response = await compute_api.post('/projects/{}/ports/udp/release'.format(compute_project.id), {"udp_ports": udp_ports})
+    assert response.status == 204
+    response = await compute_api.get('/network/ports')
+    assert not set(udp_ports) & set(response.json["udp_ports"])
+
+
 # Netfifaces is not available on Travis
 @pytest.mark.skipif(os.environ.get("TRAVIS", False) is not False, reason="Not supported on Travis")
 async def test_interfaces(compute_api):
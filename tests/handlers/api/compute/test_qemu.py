@@ -387,6 +387,43 @@ async def test_capabilities(compute_api):
         assert response.json["kvm"] == ["x86_64"]
 
 
+async def test_warm_images(compute_api):
+
+    with patch("gns3server.compute.Qemu.warm_images", return_value=[{"path": "/tmp/base.qcow2", "size": 42, "nodes": 2, "status": "warm"}]):
+        response = await compute_api.get("/qemu/warm-images")
+        assert response.status == 200
+        assert response.json == [{"path": "/tmp/base.qcow2", "size": 42, "nodes": 2, "status": "warm"}]
+
+
+async def test_golden_states(compute_api):
+
+    golden_state = {"checksum": "0" * 32, "name": "test", "created_at": 42, "disks": {}, "machine": {}, "reset_commands": []}
+    with patch("gns3server.compute.Qemu.golden_states", return_value=[golden_state]):
+        response = await compute_api.get("/qemu/golden-states")
+        assert response.status == 200
+        assert response.json == [golden_state]
+
+
+async def test_delete_golden_state(compute_api):
+
+    with asyncio_patch("gns3server.compute.Qemu.delete_golden_state") as mock:
+        response = await compute_api.delete("/qemu/golden-states/{}".format("0" * 32))
+        assert mock.called
+        assert mock.call_args[0] == ("0" * 32,)
+        assert response.status == 204
+
+
+async def test_save_golden_state(compute_api, vm):
+
+    golden_state = {"checksum": "0" * 32, "name": "test", "created_at": 42, "disks": {}, "machine": {}, "reset_commands": ["hostname {name}"]}
+    with asyncio_patch("gns3server.compute.qemu.qemu_vm.QemuVM.save_golden_state", return_value=golden_state) as mock:
+        response = await compute_api.post("/projects/{project_id}/qemu/nodes/{node_id}/golden_state".format(project_id=vm["project_id"], node_id=vm["node_id"]), {"reset_commands": ["hostname {name}"]})
+        assert mock.called
+        assert mock.call_args[0] == (["hostname {name}"],)
+        assert response.status == 201
+        assert response.json == golden_state
+
+
 async def test_qemu_duplicate(compute_api, vm):
 
     params = {"destination_node_id": str(uuid.uuid4())}
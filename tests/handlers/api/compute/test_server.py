@@ -37,3 +37,5 @@ async def test_statistics_output(compute_api):
 
     response = await compute_api.get('/statistics')
     assert response.status == 200
+    assert response.json["node_start_timings"] == {}
+    assert response.json["node_resource_usage"] == []
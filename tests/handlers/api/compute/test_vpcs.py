@@ -20,6 +20,8 @@ import uuid
 from tests.utils import asyncio_patch
 from unittest.mock import patch
 
+from gns3server.compute.vpcs import VPCS
+
 
 @pytest.fixture
 async def vm(compute_api, compute_project):
@@ -218,3 +220,12 @@ async def test_vpcs_pcap(compute_api, vm, compute_project):
         with asyncio_patch("gns3server.compute.vpcs.VPCS.stream_pcap_file"):
             response = await compute_api.get("/projects/{project_id}/vpcs/nodes/{node_id}/adapters/0/ports/0/pcap".format(project_id=compute_project.id, node_id=vm["node_id"]), raw=True)
             assert response.status == 200
+
+
+async def test_vpcs_console_scrollback(compute_api, vm):
+
+    node = VPCS.instance().get_node(vm["node_id"])
+    node.console_scrollback.append(b"VPCS> ping 10.0.0.1\r\n")
+    response = await compute_api.get("/projects/{project_id}/vpcs/nodes/{node_id}/console/scrollback".format(project_id=vm["project_id"], node_id=vm["node_id"]), raw=True)
+    assert response.status == 200
+    assert response.body == b"VPCS> ping 10.0.0.1\r\n"
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from unittest.mock import patch
+from gns3server.ubridge.shared_hypervisor import UbridgePool
+
+
+class FakeHypervisor:
+    """
+    uBridge hypervisor recording the commands it receives.
+    """
+
+    instances = []
+
+    def __init__(self, project, path, working_dir, host):
+
+        self.host = host
+        self.port = 4242 + len(self.instances)
+        self.process = None
+        self.commands = []
+        self.running = False
+        self.instances.append(self)
+
+    async def start(self):
+
+        self.running = True
+
+    async def connect(self):
+
+        pass
+
+    async def stop(self):
+
+        self.running = False
+
+    def is_running(self):
+
+        return self.running
+
+    def read_stdout(self):
+
+        return ""
+
+    async def send_batch(self, commands):
+
+        self.commands.extend(commands)
+        return [[] for _ in commands]
+
+
+@pytest.fixture
+def pool(compute_project):
+
+    FakeHypervisor.instances = []
+    with patch("gns3server.ubridge.shared_hypervisor.Hypervisor", FakeHypervisor):
+        yield UbridgePool(compute_project)
+
+
+async def test_namespaced_bridges(loop, pool):
+
+    node1 = pool.attach("node1", "ubridge", "127.0.0.1")
+    node2 = pool.attach("node2", "ubridge", "127.0.0.1")
+    assert node1.hypervisor is node2.hypervisor
+    await node1.start()
+    await node1.send_batch(["bridge create bridge0", "bridge add_nio_udp bridge0 10000 127.0.0.1 10001", "bridge start bridge0"])
+    await node2.send('bridge add_nio_tap "bridge0" "tap0"')
+    await node2.send("docker move_to_ns tap0 42 eth0")
+    assert FakeHypervisor.instances[0].commands == ["bridge create node1-bridge0",
+                                                    "bridge add_nio_udp node1-bridge0 10000 127.0.0.1 10001",
+                                                    "bridge start node1-bridge0",
+                                                    'bridge add_nio_tap "node2-bridge0" "tap0"',
+                                                    "docker move_to_ns tap0 42 eth0"]
+
+
+async def test_nodes_per_hypervisor(loop, pool):
+
+    node1 = pool.attach("node1", "ubridge", "127.0.0.1", nodes_per_hypervisor=2)
+    node2 = pool.attach("node2", "ubridge", "127.0.0.1", nodes_per_hypervisor=2)
+    node3 = pool.attach("node3", "ubridge", "127.0.0.1", nodes_per_hypervisor=2)
+    assert node1.hypervisor is node2.hypervisor
+    assert node3.hypervisor is not node1.hypervisor
+    assert pool.attach("node1", "ubridge", "127.0.0.1", nodes_per_hypervisor=2) is node1
+
+    await node1.start()
+    await node3.start()
+    await node3.stop()
+    assert not node3.is_running()
+    assert node3.hypervisor not in pool.hypervisors
+    assert not FakeHypervisor.instances[1].running
+    assert node1.is_running()
+
+
+async def test_release(loop, pool):
+
+    node1 = pool.attach("node1", "ubridge", "127.0.0.1")
+    node2 = pool.attach("node2", "ubridge", "127.0.0.1")
+    await node1.start()
+    await node1.send_batch(["bridge create VPCS-1", "bridge start VPCS-1"])
+    await node2.send("bridge create VPCS-2")
+    await node1.stop()
+    hypervisor = FakeHypervisor.instances[0]
+    assert hypervisor.commands[-1] == "bridge delete node1-VPCS-1"
+    assert hypervisor.running
+    await node2.stop()
+    assert hypervisor.commands[-1] == "bridge delete node2-VPCS-2"
+    assert not hypervisor.running
+
+
+async def test_restore_after_crash(loop, pool):
+
+    node1 = pool.attach("node1", "ubridge", "127.0.0.1")
+    node2 = pool.attach("node2", "ubridge", "127.0.0.1")
+    await node1.start()
+    await node1.send_batch(["bridge create bridge0", "bridge start bridge0"])
+    await node1.send('bridge start_capture bridge0 "/tmp/test.pcap"')
+    await node1.send("bridge stop_capture bridge0")
+    await node1.send("bridge reset_packet_filters bridge0")
+    await node1.send("bridge add_packet_filter bridge0 filter0 latency 10")
+    await node1.send("bridge reset_packet_filters bridge0")
+    await node2.send_batch(["bridge create bridge0", "bridge start bridge0"])
+    await node2.send("bridge delete bridge0")
+
+    # uBridge crashes, the bridges are restored on the next command
+    FakeHypervisor.instances[0].running = False
+    await node2.send("bridge create bridge1")
+    assert node1.hypervisor.restarts == 1
+    assert FakeHypervisor.instances[1].commands == ["bridge create node1-bridge0",
+                                                    "bridge start node1-bridge0",
+                                                    "bridge reset_packet_filters node1-bridge0",
+                                                    "bridge create node2-bridge1"]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+
+from gns3server.utils.asyncio.frame_coalescer import FrameCoalescer
+
+
+async def test_read_frame_quiet_console(loop):
+
+    reader = asyncio.StreamReader()
+    coalescer = FrameCoalescer(reader, max_frame_size=1024, flush_delay=1000)
+    reader.feed_data(b"R1#")
+    # the first frame is sent without delay
+    assert await asyncio.wait_for(coalescer.read_frame(), 0.5) == b"R1#"
+
+
+async def test_read_frame_busy_console(loop):
+
+    reader = asyncio.StreamReader()
+    coalescer = FrameCoalescer(reader, max_frame_size=1024, flush_delay=50)
+    reader.feed_data(b"line 1\r\n")
+    assert await coalescer.read_frame() == b"line 1\r\n"
+
+    async def produce():
+        for i in range(2, 5):
+            reader.feed_data("line {}\r\n".format(i).encode())
+            await asyncio.sleep(0.005)
+
+    producer = asyncio.ensure_future(produce())
+    assert await coalescer.read_frame() == b"line 2\r\nline 3\r\nline 4\r\n"
+    await producer
+    assert coalescer.frames == 2
+    assert coalescer.bytes == 32
+
+
+async def test_read_frame_max_size(loop):
+
+    reader = asyncio.StreamReader()
+    coalescer = FrameCoalescer(reader, max_frame_size=4, flush_delay=50)
+    reader.feed_data(b"abcdefghij")
+    assert await coalescer.read_frame() == b"abcd"
+    assert await coalescer.read_frame() == b"efgh"
+    assert await coalescer.read_frame() == b"ij"
+    reader.feed_eof()
+    assert await coalescer.read_frame() == b""
+    assert coalescer.stats()["frames"] == 3
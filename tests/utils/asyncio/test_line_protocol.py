@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import pytest
+
+from gns3server.utils.asyncio.line_protocol import LineProtocolClient, LineProtocolResponseError
+
+
+class FakeHypervisor:
+    """
+    Answers the commands with the responses given for each command,
+    responses are split in small chunks to test the framing.
+    """
+
+    def __init__(self, responses, chunk_size=3):
+
+        self.reader = asyncio.StreamReader()
+        self.commands = []
+        self._responses = responses
+        self._chunk_size = chunk_size
+        self._pending = b""
+
+    def write(self, data):
+
+        self._pending += data
+        while b"\n" in self._pending:
+            command, self._pending = self._pending.split(b"\n", 1)
+            command = command.decode()
+            self.commands.append(command)
+            response = self._responses[command]
+            for i in range(0, len(response), self._chunk_size):
+                self.reader.feed_data(response[i:i + self._chunk_size])
+
+    async def drain(self):
+
+        pass
+
+
+async def test_send(loop):
+
+    hypervisor = FakeHypervisor({"hypervisor version": b"100-0.2.17-amd64/Linux\r\n"})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    assert await client.send("hypervisor version") == ["0.2.17-amd64/Linux"]
+
+
+async def test_send_multiple_lines(loop):
+
+    hypervisor = FakeHypervisor({"nio list": b"101 nio_udp1\r\n101 nio_udp2\r\n100-OK\r\n"})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    assert await client.send("nio list") == ["nio_udp1", "nio_udp2"]
+
+
+async def test_send_batch(loop):
+
+    hypervisor = FakeHypervisor({"bridge create br0": b"100-OK\r\n",
+                                 "bridge add_nio_udp br0 4242 127.0.0.1 4243": b"100-OK\r\n",
+                                 "bridge show br0": b"101 bridge 'br0' is not running\r\n100-OK\r\n"})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    results = await client.send_batch(["bridge create br0", "bridge add_nio_udp br0 4242 127.0.0.1 4243", "bridge show br0"])
+    assert results == [[], [], ["bridge 'br0' is not running"]]
+    assert hypervisor.commands == ["bridge create br0", "bridge add_nio_udp br0 4242 127.0.0.1 4243", "bridge show br0"]
+
+
+async def test_send_batch_error(loop):
+
+    hypervisor = FakeHypervisor({"bridge create br0": b"209-bridge 'br0' already exist\r\n",
+                                 "bridge start br0": b"100-OK\r\n",
+                                 "hypervisor version": b"100-0.9.16\r\n"})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    with pytest.raises(LineProtocolResponseError) as e:
+        await client.send_batch(["bridge create br0", "bridge start br0"])
+    assert e.value.command == "bridge create br0"
+    assert e.value.message == "bridge 'br0' already exist"
+    # all the responses have been read
+    assert await client.send("hypervisor version") == ["0.9.16"]
+
+
+async def test_send_batch_not_pipelined(loop):
+
+    hypervisor = FakeHypervisor({"hypervisor working_dir \"/tmp/R1\"": b"206-unable to change working directory\r\n",
+                                 "vm extract_config R1": b"100-OK\r\n",
+                                 "hypervisor version": b"100-0.2.17\r\n"})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    with pytest.raises(LineProtocolResponseError) as e:
+        await client.send_batch(["hypervisor working_dir \"/tmp/R1\"", "vm extract_config R1"], pipeline=False)
+    assert e.value.command == "hypervisor working_dir \"/tmp/R1\""
+    # the sequence has stopped at the first error
+    assert hypervisor.commands == ["hypervisor working_dir \"/tmp/R1\""]
+    assert await client.send("hypervisor version") == ["0.2.17"]
+
+
+async def test_send_cancelled(loop):
+
+    hypervisor = FakeHypervisor({"hypervisor version": b"100-0.9.16\r\n",
+                                 "bridge list": b""})
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    task = asyncio.ensure_future(client.send("bridge list"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    # the response of the cancelled command arrives later and must be discarded
+    hypervisor.reader.feed_data(b"101 br0\r\n100-OK\r\n")
+    assert await client.send("hypervisor version") == ["0.9.16"]
+
+
+async def test_send_connection_closed(loop):
+
+    hypervisor = FakeHypervisor({"hypervisor stop": b""})
+    hypervisor.reader.feed_data(b"100-")
+    hypervisor.reader.feed_eof()
+    client = LineProtocolClient(hypervisor.reader, hypervisor)
+    with pytest.raises(EOFError):
+        await client.send("hypervisor stop")
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2020 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import weakref
+
+from unittest.mock import MagicMock
+
+from tests.utils import AsyncioMagicMock
+from gns3server.utils.asyncio.telnet_server import AsyncioTelnetServer, TelnetClientOutput, TelnetScrollback, TelnetParser
+from gns3server.utils.asyncio.telnet_server import IAC, DO, DONT, WILL, WONT, SB, SE, NOP, AYT, NAWS, ECHO, SGA, TTYPE
+
+
+class SlowWriter:
+    """
+    Stream writer draining only when allowed to.
+    """
+
+    def __init__(self):
+
+        self.data = b""
+        self.closed = False
+        self.can_drain = asyncio.Event()
+
+    def write(self, data):
+
+        self.data += data
+
+    async def drain(self):
+
+        await self.can_drain.wait()
+
+    def close(self):
+
+        self.closed = True
+
+
+async def test_client_output(loop):
+
+    writer = SlowWriter()
+    writer.can_drain.set()
+    output = TelnetClientOutput(writer, 1024)
+    output.start()
+    await output.put(b"hello ")
+    await output.put(b"world")
+    await asyncio.sleep(0.01)
+    assert writer.data == b"hello world"
+    assert output.lag == 0
+    assert output.written_bytes == 11
+    await output.close()
+
+
+async def test_client_output_drop(loop):
+
+    writer = SlowWriter()
+    output = TelnetClientOutput(writer, 10, "drop")
+    output.start()
+    await output.put(b"12345")
+    await asyncio.sleep(0.01)
+    await output.put(b"67890")
+    await output.put(b"abc")
+    assert output.lag == 10
+    assert output.dropped_bytes == 3
+    assert output.overflows == 1
+
+    writer.can_drain.set()
+    await asyncio.sleep(0.01)
+    assert writer.data == b"1234567890"
+    assert output.lag == 0
+    assert output.max_lag == 10
+    await output.close()
+
+
+async def test_client_output_disconnect(loop):
+
+    writer = SlowWriter()
+    output = TelnetClientOutput(writer, 10, "disconnect")
+    output.start()
+    await output.put(b"1234567890")
+    await output.put(b"a")
+    assert writer.closed
+    assert output.closed
+    await output.put(b"b")
+    assert output.dropped_bytes == 11
+
+
+async def test_client_output_block(loop):
+
+    writer = SlowWriter()
+    output = TelnetClientOutput(writer, 10, "block")
+    output.start()
+    await output.put(b"1234567890")
+    await asyncio.sleep(0.01)
+    put = asyncio.ensure_future(output.put(b"abc"))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+
+    writer.can_drain.set()
+    await asyncio.wait_for(put, 1)
+    await asyncio.sleep(0.01)
+    assert writer.data == b"1234567890abc"
+    assert output.dropped_bytes == 0
+    await output.close()
+
+
+async def test_slow_client_does_not_block_others(loop):
+
+    reader = asyncio.StreamReader()
+    server = AsyncioTelnetServer(reader=reader, writer=None, binary=True, echo=True, client_buffer_size=10, overflow_policy="drop")
+    fast_writer = SlowWriter()
+    fast_writer.can_drain.set()
+    slow_writer = SlowWriter()
+    server._outputs[fast_writer] = TelnetClientOutput(fast_writer, 10, "drop")
+    server._outputs[slow_writer] = TelnetClientOutput(slow_writer, 10, "drop")
+    for output in server._outputs.values():
+        output.start()
+
+    for output in list(server._outputs.values()):
+        await output.put(b"12345678")
+    await asyncio.sleep(0.01)
+    for output in list(server._outputs.values()):
+        await output.put(b"90")
+    await asyncio.sleep(0.01)
+    for output in list(server._outputs.values()):
+        await output.put(b"abc")
+    await asyncio.sleep(0.01)
+
+    assert fast_writer.data == b"1234567890abc"
+    stats = server.clients_stats()
+    assert stats[0]["dropped_bytes"] == 0
+    assert stats[1]["lag"] == 10
+    assert stats[1]["dropped_bytes"] == 3
+    await server.close()
+
+
+async def test_replicate_output_to_clients(loop):
+
+    reader = asyncio.StreamReader()
+    server = AsyncioTelnetServer(reader=reader, writer=None, binary=True, echo=True)
+    tcp_server = await asyncio.start_server(server.run, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+
+    clients = []
+    for _ in range(2):
+        clients.append(await asyncio.open_connection("127.0.0.1", port))
+    # wait for the telnet negotiation
+    for client_reader, _ in clients:
+        await asyncio.wait_for(client_reader.readexactly(12), 1)
+
+    reader.feed_data(b"Router>")
+    for client_reader, _ in clients:
+        assert await asyncio.wait_for(client_reader.readexactly(7), 1) == b"Router>"
+    assert len(server.clients_stats()) == 2
+
+    for _, client_writer in clients:
+        client_writer.close()
+    tcp_server.close()
+    await tcp_server.wait_closed()
+    await server.close()
+
+
+def test_scrollback():
+
+    scrollback = TelnetScrollback(10)
+    scrollback.append(b"12345")
+    scrollback.append(b"67890")
+    assert scrollback.get() == b"1234567890"
+    scrollback.append(b"abc")
+    assert scrollback.get() == b"4567890abc"
+    assert scrollback.get(max_size=3) == b"abc"
+    assert scrollback.discarded_bytes == 3
+    scrollback.append(b"x" * 20)
+    assert scrollback.get() == b"x" * 10
+    scrollback.clear()
+    assert scrollback.get() == b""
+
+
+def test_scrollback_memory_cap(monkeypatch):
+
+    # ignore the buffers created by the other tests
+    monkeypatch.setattr(TelnetScrollback, "_buffers", weakref.WeakSet())
+    monkeypatch.setattr(TelnetScrollback, "_total_size", 0)
+    monkeypatch.setattr(TelnetScrollback, "_memory_cap", TelnetScrollback._memory_cap)
+
+    TelnetScrollback.set_memory_cap(30)
+    scrollback1 = TelnetScrollback(100)
+    scrollback2 = TelnetScrollback(100)
+    scrollback1.append(b"a" * 20)
+    scrollback2.append(b"b" * 5)
+    assert TelnetScrollback.total_size() == 25
+    # the oldest output of the largest buffer is discarded first
+    scrollback2.append(b"c" * 10)
+    assert TelnetScrollback.total_size() == 30
+    assert scrollback1.get() == b"a" * 15
+    assert scrollback2.get() == b"bbbbbcccccccccc"
+    # lowering the cap applies to the existing buffers
+    TelnetScrollback.set_memory_cap(20)
+    assert TelnetScrollback.total_size() == 20
+    scrollback1.clear()
+    scrollback2.clear()
+
+
+async def test_scrollback_replay(loop):
+
+    reader = asyncio.StreamReader()
+    scrollback = TelnetScrollback(1024)
+    server = AsyncioTelnetServer(reader=reader, writer=None, binary=True, echo=True, scrollback=scrollback)
+    tcp_server = await asyncio.start_server(server.run, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+
+    client_reader, client_writer = await asyncio.open_connection("127.0.0.1", port)
+    await asyncio.wait_for(client_reader.readexactly(12), 1)
+    reader.feed_data(b"Router>")
+    assert await asyncio.wait_for(client_reader.readexactly(7), 1) == b"Router>"
+    assert scrollback.get() == b"Router>"
+
+    # a new client receives the previous output
+    client2_reader, client2_writer = await asyncio.open_connection("127.0.0.1", port)
+    assert await asyncio.wait_for(client2_reader.readexactly(19), 1) == bytes([255, 251, 1, 255, 251, 3, 255, 251, 0, 255, 253, 0]) + b"Router>"
+
+    client_writer.close()
+    client2_writer.close()
+    tcp_server.close()
+    await tcp_server.wait_closed()
+    await server.close()
+    scrollback.clear()
+
+
+def test_parser_data():
+
+    parser = TelnetParser()
+    assert parser.feed(b"show version\r\n") == (b"show version\r\n", [])
+    assert parser.feed(bytes([0x41, IAC, IAC, 0x42])) == (bytes([0x41, IAC, 0x42]), [])
+
+
+def test_parser_commands():
+
+    parser = TelnetParser()
+    data = b"a" + bytes([IAC, DO, ECHO]) + b"b" + bytes([IAC, NOP, IAC, WONT, SGA]) + b"c"
+    assert parser.feed(data) == (b"abc", [(DO, ECHO), (NOP, None), (WONT, SGA)])
+    assert parser.state == TelnetParser.DATA
+
+
+def test_parser_subnegotiation():
+
+    parser = TelnetParser()
+    data = bytes([IAC, SB, NAWS, 0, 80, 0, IAC, IAC, IAC, SE]) + b"x"
+    assert parser.feed(data) == (b"x", [(SB, bytes([NAWS, 0, 80, 0, IAC]))])
+
+
+def test_parser_split_commands():
+
+    data = b"ab" + bytes([IAC, WILL, NAWS, IAC, SB, NAWS, 0, 132, 0, 43, IAC, SE, IAC, IAC]) + b"cd"
+    # feed the data one byte at a time, the result must be the same
+    parser = TelnetParser()
+    output = b""
+    commands = []
+    for i in range(len(data)):
+        chunk_output, chunk_commands = parser.feed(data[i:i + 1])
+        output += chunk_output
+        commands += chunk_commands
+    assert output == b"ab" + bytes([IAC]) + b"cd"
+    assert commands == [(WILL, NAWS), (SB, bytes([NAWS, 0, 132, 0, 43]))]
+
+
+def test_parser_subnegotiation_too_long():
+
+    parser = TelnetParser()
+    data = bytes([IAC, SB, TTYPE]) + b"x" * 1000 + bytes([IAC, SE]) + b"y"
+    output, commands = parser.feed(data)
+    assert output == b"y"
+    assert commands == [(SB, bytes([TTYPE]) + b"x" * (TelnetParser.MAX_SUBNEGOTIATION_SIZE - 1))]
+
+
+async def test_process_commands(loop):
+
+    window_size_changed_callback = AsyncioMagicMock()
+    server = AsyncioTelnetServer(binary=True, echo=True, naws=True, window_size_changed_callback=window_size_changed_callback)
+    connection = server._connection_factory(None, None, window_size_changed_callback)
+    writer = MagicMock()
+    writer.drain = AsyncioMagicMock()
+    commands = [(DO, SGA), (DO, TTYPE), (DONT, ECHO), (AYT, None), (SB, bytes([NAWS, 0, 80, 0, 24]))]
+    await server._process_commands(commands, writer, connection)
+    writer.write.assert_any_call(bytes([IAC, WILL, SGA]))
+    writer.write.assert_any_call(bytes([IAC, WONT, TTYPE]))
+    writer.write.assert_any_call(b"\r\nYour Are-You-There received. I am here.\r\n")
+    window_size_changed_callback.assert_called_with(80, 24)
@@ -19,9 +19,9 @@
 import asyncio
 import pytest
 import sys
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
-from gns3server.utils.asyncio import wait_run_in_executor, subprocess_check_output, wait_for_process_termination, locking
+from gns3server.utils.asyncio import wait_run_in_executor, subprocess_check_output, wait_for_process_termination, locking, current_task
 from tests.utils import AsyncioMagicMock
 
 
@@ -51,6 +51,14 @@ async def test_subprocess_check_output(loop, tmpdir):
     assert result == path
 
 
+async def test_current_task(loop):
+
+    assert current_task() is asyncio.Task.current_task()
+    with patch("gns3server.utils.asyncio.sys") as sys_mock:
+        sys_mock.version_info = (3, 6, 9)
+        assert current_task() is asyncio.Task.current_task()
+
+
 async def test_lock_decorator():
     """
     The test check if the the second call to method_to_lock wait for the